@@ -0,0 +1,138 @@
+"""
+ACL Generation Mode Benchmark
+
+Compares the 'directory' and 'ifuser' modes of generate_proftpd_config on a
+seeded in-memory database: generation time, config size and, if a proftpd
+binary is available, the time of `proftpd -t` parsing the result.
+
+Run from the project root:
+    python benchmarks/acl_modes.py --users 5000 --folders 500 --grants 10
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proftpdcontrol.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def setup_django():
+    """Point Django at an in-memory database and create the schema"""
+    settings.DATABASES['default'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed(users, folders, grants, profiles, seed_value):
+    """
+    Create users and folders with grants folder permissions each
+
+    Users are assigned one of profiles permission sets, like members of the
+    same team, so the ifuser mode can share sections between them.
+    """
+    from ftpmanager.models import FTPUser, Folder, FolderAccess, bump_acl_revision
+
+    rng = random.Random(seed_value)
+    Folder.objects.bulk_create(
+        # bulk_create skips Folder.save(), which sets tree_path
+        Folder(name=f'folder{i:05d}', path=f'/srv/ftp/share{i:05d}', tree_path=f'/srv/ftp/share{i:05d}/')
+        for i in range(folders)
+    )
+    FTPUser.objects.bulk_create(
+        FTPUser(username=f'user{i:06d}', systemuser='1001', password_hash='x') for i in range(users)
+    )
+    folder_ids = list(Folder.objects.values_list('pk', flat=True))
+    user_ids = list(FTPUser.objects.values_list('pk', flat=True))
+
+    permission_sets = [
+        [(folder_id, rng.choice(['read', 'write'])) for folder_id in rng.sample(folder_ids, min(grants, len(folder_ids)))]
+        for _ in range(profiles)
+    ]
+    FolderAccess.objects.bulk_create(
+        (
+            FolderAccess(user_id=user_id, folder_id=folder_id, permission=permission)
+            for index, user_id in enumerate(user_ids)
+            for folder_id, permission in permission_sets[index % profiles]
+        ),
+        batch_size=5000,
+    )
+    bump_acl_revision()
+
+
+def time_proftpd_parse(proftpd, config, include, repeat):
+    """Return the best `proftpd -t` wall time in seconds, or an error string"""
+    with tempfile.TemporaryDirectory() as tmp:
+        users_conf = os.path.join(tmp, 'users.conf')
+        main_conf = os.path.join(tmp, 'proftpd.conf')
+        with open(users_conf, 'w') as f:
+            f.write(config)
+        with open(main_conf, 'w') as f:
+            for path in include:
+                f.write(f'Include {path}\n')
+            f.write(f'ServerType standalone\nPort 2121\nInclude {users_conf}\n')
+
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = subprocess.run([proftpd, '-t', '-c', main_conf], capture_output=True, text=True)
+            elapsed = time.perf_counter() - started
+            if result.returncode != 0:
+                return (result.stderr or result.stdout).strip().splitlines()[-1]
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--folders', type=int, default=300)
+    parser.add_argument('--grants', type=int, default=10, help='Folder permissions per user')
+    parser.add_argument('--profiles', type=int, default=200, help='Distinct permission sets')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--proftpd', default=shutil.which('proftpd'), help='proftpd binary (default: from PATH)')
+    parser.add_argument(
+        '--include', action='append', default=[], metavar='CONF',
+        help='Extra config to include before the generated file, e.g. a modules.conf loading mod_ifsession'
+    )
+    args = parser.parse_args()
+
+    setup_django()
+    from ftpmanager.config_generator import generate_proftpd_config
+
+    started = time.perf_counter()
+    seed(args.users, args.folders, args.grants, args.profiles, args.seed)
+    print(f'Seeded {args.users} users, {args.folders} folders, {args.grants} grants/user '
+          f'in {time.perf_counter() - started:.1f}s')
+    if not args.proftpd:
+        print('proftpd not found, skipping parse timing')
+
+    print(f'{"mode":<10} {"generate":>10} {"bytes":>12} {"lines":>9} {"proftpd -t":>12}')
+    for mode in ('directory', 'ifuser'):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            config = generate_proftpd_config(acl_mode=mode)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        parse = '-'
+        if args.proftpd:
+            parsed = time_proftpd_parse(args.proftpd, config, args.include, args.repeat)
+            parse = f'{parsed:.3f}s' if isinstance(parsed, float) else f'error: {parsed}'
+
+        print(f'{mode:<10} {best:>9.3f}s {len(config.encode()):>12} {config.count(chr(10)):>9} {parse:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+ACL Snapshot Benchmark
+
+Builds an AclSnapshot from synthetic grants and reports build time, memory
+and lookup latency, next to the same permissions as the nested dicts
+returned by effective_permissions() before the snapshot existed.
+
+Run from the project root:
+    python benchmarks/acl_snapshot.py --users 100000 --folders 10000 --grants 10
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proftpdcontrol.settings')
+
+import django  # noqa: E402
+
+
+def make_grants(users, folders, grants, seed_value):
+    """Yield (user_id, folder_id, permission) with grants folders per user"""
+    rng = random.Random(seed_value)
+    folder_ids = range(1, folders + 1)
+    for user_id in range(1, users + 1):
+        for folder_id in rng.sample(folder_ids, min(grants, folders)):
+            yield user_id, folder_id, 'write' if rng.random() < 0.3 else 'read'
+
+
+def measure(build):
+    """Return (result, seconds, bytes allocated and still held)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    held, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, held
+
+
+def time_lookups(function, arguments):
+    """Average microseconds per call"""
+    started = time.perf_counter()
+    for args in arguments:
+        function(*args)
+    return (time.perf_counter() - started) / len(arguments) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--folders', type=int, default=10000)
+    parser.add_argument('--grants', type=int, default=10, help='Folder permissions per user')
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--skip-dicts', action='store_true', help='Do not build the nested dict comparison')
+    args = parser.parse_args()
+
+    django.setup()
+    from ftpmanager.acl import AclSnapshot
+
+    grants = list(make_grants(args.users, args.folders, args.grants, args.seed))
+    print(f'{args.users} users, {args.folders} folders, {len(grants)} grants')
+
+    snapshot, elapsed, held = measure(lambda: AclSnapshot(grants))
+    print(f'snapshot: built in {elapsed:.2f}s, {held / 2**20:.1f} MiB held '
+          f'({snapshot.nbytes / 2**20:.1f} MiB in arrays)')
+    print(f'dense read+write bitsets would need {2 * args.users * args.folders / 8 / 2**20:.1f} MiB')
+
+    if not args.skip_dicts:
+        def build_dicts():
+            result = {}
+            for user_id, folder_id, permission in grants:
+                result.setdefault(user_id, {})[folder_id] = permission
+            return result
+        _dicts, elapsed, held = measure(build_dicts)
+        print(f'nested dicts: built in {elapsed:.2f}s, {held / 2**20:.1f} MiB held')
+
+    rng = random.Random(args.seed + 1)
+    user_args = [(rng.randint(1, args.users),) for _ in range(args.lookups)]
+    folder_args = [(rng.randint(1, args.folders), 'write') for _ in range(args.lookups)]
+    pair_args = [(rng.randint(1, args.users), rng.randint(1, args.folders)) for _ in range(args.lookups)]
+
+    print(f'{"lookup":<32} {"µs/call":>10}')
+    print(f'{"permission(user, folder)":<32} {time_lookups(snapshot.permission, pair_args):>10.2f}')
+    print(f'{"folders(user)":<32} {time_lookups(snapshot.folders, user_args):>10.2f}')
+    print(f'{"users(folder, write)":<32} {time_lookups(snapshot.users, folder_args):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Access Checks
+
+Answers "can user U run command C on path P" the way ProFTPD evaluates the
+generated configuration: the most specific managed folder containing the
+path decides, like the most specific <Directory> block, and the <Limit>
+blocks for the command's group apply there. Unsaved grants can be passed
+to AccessChecker.from_db() as resolved by resolve_grant(); what_if()
+evaluates other changes in a transaction that is rolled back.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .acl import AclSnapshot
+from .config_generator import collect_folder_acls, inherit_folder_settings
+from .models import FTPGroup, FTPUser, Folder, FolderAccess, FolderUsage, GroupFolderAccess, make_tree_path
+from .paths import FolderPathIndex
+
+
+# ProFTPD command groups, as used in the generated <Limit> blocks
+COMMAND_GROUPS = {
+    'READ': {'RETR', 'SIZE'},
+    'DIRS': {'CDUP', 'CWD', 'LIST', 'MDTM', 'MLSD', 'MLST', 'NLST', 'PWD', 'RNFR', 'STAT', 'XCUP', 'XCWD', 'XPWD'},
+    'WRITE': {'APPE', 'DELE', 'MKD', 'RMD', 'RNTO', 'STOR', 'STOU', 'XMKD', 'XRMD'},
+}
+GROUP_OF_COMMAND = {command: group for group, commands in COMMAND_GROUPS.items() for command in commands}
+
+# A folder over its hard quota only lets writers delete
+QUOTA_DELETE_COMMANDS = {'DELE', 'RMD', 'XRMD'}
+
+GRANT_PERMISSIONS = ('read', 'write', 'deny', 'none')
+
+AccessResult = namedtuple('AccessResult', 'allowed folder permission reason')
+
+
+def normalize_command(command):
+    """Return (command, group) for an FTP command or a group name, ValueError if unknown"""
+    command = command.upper()
+    if command in COMMAND_GROUPS:
+        # A group name stands for its typical command
+        command = {'READ': 'RETR', 'DIRS': 'LIST', 'WRITE': 'STOR'}[command]
+    if command not in GROUP_OF_COMMAND:
+        raise ValueError(f'Unknown FTP command: {command}')
+    return command, GROUP_OF_COMMAND[command]
+
+
+class AccessChecker:
+    """
+    Evaluates access from an ACL snapshot and the folder paths
+
+    Build one with AccessChecker.from_db() and reuse it for many checks;
+    path lookups are cached per directory.
+    """
+
+    def __init__(self, snapshot, folders, users, over_quota=(), unrestricted=()):
+        """
+        snapshot is an AclSnapshot, folders a list of Folder objects and
+        users maps usernames to (user_id, is_active). over_quota holds the
+        ids of folders whose uploads are disabled, unrestricted those that
+        get no rules because nobody can access them or a parent.
+        """
+        self.snapshot = snapshot
+        self.folders = {folder.pk: folder for folder in folders}
+        self.index = FolderPathIndex((folder.pk, folder.path) for folder in folders)
+        self.users = users
+        self.over_quota = set(over_quota)
+        self.unrestricted = set(unrestricted)
+
+    @classmethod
+    def from_db(cls, changes=()):
+        """
+        Build a checker for the stored permissions
+
+        changes optionally holds unsaved grants from resolve_grant(); they
+        are evaluated in memory, leaving the database and the cached
+        AclSnapshot alone.
+        """
+        usage = {u.folder_id: u for u in FolderUsage.objects.defer('dir_cache')}
+        acls = collect_folder_acls(changes)
+        inherited = inherit_folder_settings(acls, usage)
+        users = {
+            username: (pk, is_active)
+            for pk, username, is_active in FTPUser.objects.values_list('pk', 'username', 'is_active')
+        }
+        return cls(
+            AclSnapshot.build(changes=changes) if changes else AclSnapshot.current(),
+            [folder for folder, *_rules in acls],
+            users,
+            over_quota=[folder_id for folder_id, (_rates, over_quota, _reachable) in inherited.items() if over_quota],
+            unrestricted=[folder_id for folder_id, (_rates, _over_quota, reachable) in inherited.items() if not reachable],
+        )
+
+    def check(self, username, path, command='RETR'):
+        """Return an AccessResult for one command (ValueError if the command is unknown)"""
+        command, group = normalize_command(command)
+
+        if username not in self.users:
+            return AccessResult(False, None, None, 'unknown user')
+        user_id, is_active = self.users[username]
+        if not is_active:
+            return AccessResult(False, None, None, 'user is inactive and cannot log in')
+
+        folder_id = self.index.lookup(path)
+        if folder_id is None:
+            return AccessResult(True, None, None, 'not inside a managed folder, only filesystem permissions apply')
+        folder = self.folders[folder_id]
+        if folder_id in self.unrestricted:
+            return AccessResult(True, folder, None, f'no rules for {folder.path} since nobody has access, only filesystem permissions apply')
+        permission = self.snapshot.permission(user_id, folder_id)
+
+        if permission is None:
+            return AccessResult(False, folder, None, f'no access to {folder.path}')
+        if group != 'WRITE':
+            return AccessResult(True, folder, permission, f'{permission} access to {folder.path}')
+        if folder_id in self.over_quota and command not in QUOTA_DELETE_COMMANDS:
+            return AccessResult(False, folder, permission, f'{folder.path} is over its hard quota, uploads are disabled')
+        if permission != 'write':
+            return AccessResult(False, folder, permission, f'read-only access to {folder.path}')
+        return AccessResult(True, folder, permission, f'write access to {folder.path}')
+
+
+def parse_grant(spec):
+    """
+    Parse 'PRINCIPAL:FOLDER_PATH:PERMISSION' into a tuple
+
+    PRINCIPAL is a username or @group, PERMISSION one of read, write, deny
+    or none (remove the grant). Raises ValueError.
+    """
+    principal, separator, rest = spec.partition(':')
+    folder_path, separator2, permission = rest.rpartition(':')
+    if not (separator and separator2 and principal and folder_path):
+        raise ValueError(f'Expected PRINCIPAL:FOLDER_PATH:PERMISSION, got "{spec}"')
+    if permission not in GRANT_PERMISSIONS:
+        raise ValueError(f'Permission must be one of {", ".join(GRANT_PERMISSIONS)}, got "{permission}"')
+    return principal, folder_path, permission
+
+
+def resolve_grant(principal, folder_path, permission):
+    """Return (principal, folder_id, permission) for AccessChecker.from_db (DoesNotExist if unknown)"""
+    folder = Folder.objects.get(tree_path=make_tree_path(folder_path))
+    if principal.startswith('@'):
+        FTPGroup.objects.get(name=principal[1:])
+    else:
+        FTPUser.objects.get(username=principal)
+    return principal, folder.pk, permission
+
+
+def apply_grant(principal, folder_path, permission):
+    """Save a grant for a user or @group (DoesNotExist if either is unknown)"""
+    folder = Folder.objects.get(tree_path=make_tree_path(folder_path))
+    if principal.startswith('@'):
+        manager, lookup = GroupFolderAccess.objects, {'group': FTPGroup.objects.get(name=principal[1:])}
+    else:
+        manager, lookup = FolderAccess.objects, {'user': FTPUser.objects.get(username=principal)}
+
+    if permission == 'none':
+        for access in manager.filter(folder=folder, **lookup):
+            access.delete()
+    else:
+        manager.update_or_create(folder=folder, defaults={'permission': permission}, **lookup)
+
+
+@contextmanager
+def what_if():
+    """
+    Run a block against uncommitted changes that are rolled back afterwards
+
+        with what_if():
+            apply_grant('alice', '/srv/ftp/share', 'write')
+            checker = AccessChecker.from_db()
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
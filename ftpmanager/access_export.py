@@ -0,0 +1,135 @@
+"""
+Access Matrix Export
+
+Streams the effective access of every user to every folder, after group
+grants, inheritance and denials, as CSV or XLSX for audits. The 'rows'
+layout has one line per user and folder with access; the 'pivot' layout
+has one line per user and one column per folder.
+
+Users are read with a chunked iterator() (a server-side cursor where the
+database has one) and their permissions come from an AclSnapshot, so
+output starts right away and memory does not grow with the number of
+rows written. Active users use the cached snapshot; including inactive
+users resolves a separate one for the export.
+"""
+
+import csv
+from collections import namedtuple
+
+from .acl import AclSnapshot
+from .models import FTPUser, Folder, make_tree_path, subtree_filter
+from .xlsx import MAX_COLUMNS, iter_xlsx
+
+
+CHUNK_SIZE = 2000
+FORMATS = ['csv', 'xlsx']
+LAYOUTS = ['rows', 'pivot']
+PERMISSIONS = ['read', 'write']
+ACTIVE_CHOICES = ['yes', 'no', 'all']
+ROW_HEADER = ['username', 'active', 'folder', 'path', 'permission']
+PIVOT_CELLS = {'read': 'R', 'write': 'W'}
+
+AccessFilter = namedtuple('AccessFilter', 'folder user permission active', defaults=('', '', '', 'yes'))
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer in a generator"""
+
+    def write(self, value):
+        return value
+
+
+def filtered_folders(access_filter):
+    """[(id, name, path)] of the folders at or below the folder prefix, by path"""
+    folders = Folder.objects.order_by('tree_path')
+    if access_filter.folder:
+        folders = folders.filter(subtree_filter(make_tree_path(access_filter.folder)))
+    return list(folders.values_list('pk', 'name', 'path'))
+
+
+def filtered_users(access_filter):
+    """Chunked iterator of (id, username, is_active) by username"""
+    users = FTPUser.objects.order_by('username')
+    if access_filter.user:
+        users = users.filter(username__icontains=access_filter.user)
+    if access_filter.active != 'all':
+        users = users.filter(is_active=access_filter.active == 'yes')
+    return users.values_list('pk', 'username', 'is_active').iterator(chunk_size=CHUNK_SIZE)
+
+
+def snapshot_for(access_filter):
+    """The cached snapshot for active users, else one resolving inactive users as if active"""
+    if access_filter.active == 'yes':
+        return AclSnapshot.current()
+    return AclSnapshot.build(include_inactive=True)
+
+
+def access_rows(access_filter):
+    """Yield [username, active, folder, path, permission] for each user and folder with access"""
+    folders = filtered_folders(access_filter)
+    order = {folder_id: index for index, (folder_id, _name, _path) in enumerate(folders)}
+    snapshot = snapshot_for(access_filter)
+    for user_id, username, is_active in filtered_users(access_filter):
+        permissions = snapshot.user_permissions(user_id)
+        for folder_id in sorted(permissions.keys() & order.keys(), key=order.get):
+            permission = permissions[folder_id]
+            if access_filter.permission and permission != access_filter.permission:
+                continue
+            _id, name, path = folders[order[folder_id]]
+            yield [username, 'yes' if is_active else 'no', name, path, permission]
+
+
+def pivot_header(folders):
+    return ['username', 'active'] + [path for _id, _name, path in folders]
+
+
+def pivot_rows(access_filter, folders):
+    """Yield [username, active, R/W/'' per folder] for each user, with folders as from filtered_folders"""
+    snapshot = snapshot_for(access_filter)
+    for user_id, username, is_active in filtered_users(access_filter):
+        permissions = snapshot.user_permissions(user_id)
+        cells = [
+            PIVOT_CELLS[permissions[folder_id]]
+            if folder_id in permissions and access_filter.permission in ('', permissions[folder_id]) else ''
+            for folder_id, _name, _path in folders
+        ]
+        if access_filter.permission and not any(cells):
+            continue
+        yield [username, 'yes' if is_active else 'no'] + cells
+
+
+def export_access(access_filter, layout='rows', file_format='csv'):
+    """
+    Return an iterator over the export as chunks of bytes
+
+    Raises ValueError up front if a pivot has more folders than an XLSX
+    sheet has columns.
+    """
+    if layout == 'pivot':
+        folders = filtered_folders(access_filter)
+        header = pivot_header(folders)
+        rows = pivot_rows(access_filter, folders)
+    else:
+        header = ROW_HEADER
+        rows = access_rows(access_filter)
+
+    if file_format == 'xlsx':
+        if len(header) > MAX_COLUMNS:
+            raise ValueError(f'{len(header) - 2} folders do not fit in an XLSX sheet; narrow the folder filter or use CSV')
+        return iter_xlsx(header, rows, title='Access')
+    return csv_chunks(header, rows)
+
+
+def csv_chunks(header, rows):
+    """Yield CSV bytes, the header first and then rows in batches"""
+    writer = csv.writer(Echo())
+    # The header goes out before the permissions are resolved
+    yield writer.writerow(header).encode()
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= CHUNK_SIZE:
+            yield ''.join(batch).encode()
+            batch = []
+    if batch:
+        yield ''.join(batch).encode()
@@ -0,0 +1,274 @@
+"""
+Effective Folder Permissions
+
+A user's permission on a folder is the union of their direct FolderAccess
+grant and the GroupFolderAccess grants of the FTP groups they belong to.
+Write implies read, so the union is the strongest of the grants.
+
+Folders inherit the grants of their parent folder. For each user and each
+group the nearest grant wins, so a subfolder can narrow ('read') or revoke
+('deny') access given higher up the tree.
+
+AclSnapshot keeps the resolved permissions in memory for fast lookups and
+is rebuilt only when the AclRevision token changes.
+"""
+
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from operator import itemgetter
+
+from .models import AclRevision, FTPGroup, FTPUser, Folder, FolderAccess, GroupFolderAccess
+
+
+PERMISSION_RANK = {'read': 1, 'write': 2}
+PERMISSION_NAMES = {rank: name for name, rank in PERMISSION_RANK.items()}
+
+
+def merge_permission(current, permission):
+    """Return the stronger of two permissions (current may be None)"""
+    if current is None or PERMISSION_RANK[permission] > PERMISSION_RANK[current]:
+        return permission
+    return current
+
+
+def group_members(include_inactive=False):
+    """Return {group name: [usernames]} of active (or all) members, sorted"""
+    memberships = FTPGroup.members.through.objects.all()
+    if not include_inactive:
+        memberships = memberships.filter(ftpuser__is_active=True)
+    members = {}
+    for name, username in (
+        memberships
+        .order_by('ftpuser__username')
+        .values_list('ftpgroup__name', 'ftpuser__username')
+    ):
+        members.setdefault(name, []).append(username)
+    return members
+
+
+def resolve_folder_acls(include_inactive=False, changes=()):
+    """
+    Return [(folder, users, groups)] for every folder, parents first
+
+    users maps usernames of active users and groups maps group names to the
+    effective 'read' or 'write' permission on the folder after inheritance.
+    Denied principals are left out. A group with a member denied on the
+    folder is replaced by its other active members, since AllowGroup cannot
+    exclude individual members. Entries are in the order access was granted.
+    include_inactive resolves inactive users as if they were active.
+
+    changes holds unsaved (principal, folder_id, permission) grants applied
+    over the stored ones, principal being a username or @group and
+    permission 'none' removing a grant.
+    """
+    folders = list(Folder.objects.order_by('tree_path', 'pk'))
+    own = {folder.pk: ({}, {}) for folder in folders}
+    grants = FolderAccess.objects.all() if include_inactive else FolderAccess.objects.filter(user__is_active=True)
+    for folder_id, username, permission in (
+        grants
+        .order_by('pk')
+        .values_list('folder_id', 'user__username', 'permission')
+    ):
+        own[folder_id][0][username] = permission
+    for folder_id, name, permission in (
+        GroupFolderAccess.objects.order_by('pk').values_list('folder_id', 'group__name', 'permission')
+    ):
+        own[folder_id][1][name] = permission
+    if changes:
+        apply_changes(own, changes, include_inactive)
+
+    members = group_members(include_inactive)
+
+    inherited = {}
+    result = []
+    for folder in folders:
+        parent_users, parent_groups = inherited.get(folder.parent_id, ({}, {}))
+        own_users, own_groups = own[folder.pk]
+        user_grants = {**parent_users, **own_users}
+        group_grants = {**parent_groups, **own_groups}
+        inherited[folder.pk] = (user_grants, group_grants)
+
+        denied = {username for username, permission in user_grants.items() if permission == 'deny'}
+        users = {username: permission for username, permission in user_grants.items() if permission != 'deny'}
+        groups = {}
+        for name, permission in group_grants.items():
+            if permission == 'deny':
+                continue
+            if denied.intersection(members.get(name, ())):
+                for username in members[name]:
+                    if username not in denied:
+                        users[username] = merge_permission(users.get(username), permission)
+            else:
+                groups[name] = permission
+        result.append((folder, users, groups))
+    return result
+
+
+def apply_changes(own, changes, include_inactive=False):
+    """Apply unsaved (principal, folder_id, permission) grants to {folder_id: (users, groups)}"""
+    if not include_inactive:
+        active = set(FTPUser.objects.filter(is_active=True).values_list('username', flat=True))
+    for principal, folder_id, permission in changes:
+        if principal.startswith('@'):
+            target, name = own[folder_id][1], principal[1:]
+        elif include_inactive or principal in active:
+            target, name = own[folder_id][0], principal
+        else:
+            continue
+        if permission == 'none':
+            target.pop(name, None)
+        else:
+            target[name] = permission
+
+
+class _SparseRows:
+    """
+    Compressed sparse rows: for each key the sorted ids it is linked to
+
+    Row r holds ids[offsets[r]:offsets[r + 1]] with the matching
+    permission ranks in levels.
+    """
+
+    __slots__ = ('row_of', 'offsets', 'ids', 'levels')
+
+    def __init__(self, triples):
+        """triples is an iterable of (key, id, rank) sorted by key and id"""
+        self.row_of = {}
+        self.offsets = array('q', [0])
+        self.ids = array('q')
+        self.levels = bytearray()
+        for key, row in groupby(triples, key=itemgetter(0)):
+            self.row_of[key] = len(self.offsets) - 1
+            for _key, other, rank in row:
+                self.ids.append(other)
+                self.levels.append(rank)
+            self.offsets.append(len(self.ids))
+
+    def span(self, key):
+        row = self.row_of.get(key)
+        if row is None:
+            return 0, 0
+        return self.offsets[row], self.offsets[row + 1]
+
+    def select(self, key, minimum):
+        start, end = self.span(key)
+        ids, levels = self.ids, self.levels
+        return [ids[i] for i in range(start, end) if levels[i] >= minimum]
+
+    def rank(self, key, other):
+        start, end = self.span(key)
+        index = bisect_left(self.ids, other, start, end)
+        if index < end and self.ids[index] == other:
+            return self.levels[index]
+        return 0
+
+    @property
+    def nbytes(self):
+        return (
+            self.offsets.itemsize * len(self.offsets) + self.ids.itemsize * len(self.ids) + len(self.levels)
+        )
+
+
+class AclSnapshot:
+    """
+    Effective permissions of active users, indexed by user and by folder
+
+    Each grant is stored once per direction in sorted arrays, so "which
+    folders can user Y read" and "which users can write folder X" are a
+    slice of an array and a single permission is a binary search. A
+    snapshot is immutable; AclSnapshot.current() returns one matching the
+    current AclRevision token.
+    """
+
+    _current = None
+
+    def __init__(self, grants, token=None):
+        """grants is an iterable of (user_id, folder_id, permission)"""
+        triples = sorted((user_id, folder_id, PERMISSION_RANK[permission]) for user_id, folder_id, permission in grants)
+        self.token = token
+        self.by_user = _SparseRows(triples)
+        self.by_folder = _SparseRows(sorted((folder_id, user_id, rank) for user_id, folder_id, rank in triples))
+
+    def __len__(self):
+        return len(self.by_user.ids)
+
+    @classmethod
+    def build(cls, token=None, include_inactive=False, changes=()):
+        """Resolve permissions from the database (see resolve_folder_acls)"""
+        accounts = FTPUser.objects.all() if include_inactive else FTPUser.objects.filter(is_active=True)
+        user_pks = dict(accounts.values_list('username', 'pk'))
+        members = group_members(include_inactive)
+
+        ranks = {}
+        for folder, users, groups in resolve_folder_acls(include_inactive, changes):
+            grants = list(users.items())
+            for name, permission in groups.items():
+                grants.extend((username, permission) for username in members.get(name, ()))
+            for username, permission in grants:
+                key = (user_pks[username], folder.pk)
+                ranks[key] = max(ranks.get(key, 0), PERMISSION_RANK[permission])
+        return cls(((user_id, folder_id, PERMISSION_NAMES[rank]) for (user_id, folder_id), rank in ranks.items()), token)
+
+    @classmethod
+    def current(cls):
+        """Return the cached snapshot, rebuilding it if permissions changed"""
+        # Read the token first: changes made during the build bump it again
+        token = AclRevision.current_token()
+        snapshot = cls._current
+        if snapshot is None or snapshot.token != token:
+            snapshot = cls.build(token)
+            cls._current = snapshot
+        return snapshot
+
+    def permission(self, user_id, folder_id):
+        """Return 'read', 'write' or None"""
+        return PERMISSION_NAMES.get(self.by_user.rank(user_id, folder_id))
+
+    def folders(self, user_id, permission='read'):
+        """Ids of the folders a user has at least the given permission on"""
+        return self.by_user.select(user_id, PERMISSION_RANK[permission])
+
+    def users(self, folder_id, permission='read'):
+        """Ids of the users with at least the given permission on a folder"""
+        return self.by_folder.select(folder_id, PERMISSION_RANK[permission])
+
+    def user_permissions(self, user_id):
+        """Return {folder_id: permission} for one user"""
+        start, end = self.by_user.span(user_id)
+        ids, levels = self.by_user.ids, self.by_user.levels
+        return {ids[i]: PERMISSION_NAMES[levels[i]] for i in range(start, end)}
+
+    def as_dict(self, user_ids=None):
+        """Return {user_id: {folder_id: permission}}, optionally for some users only"""
+        if user_ids is None:
+            user_ids = self.by_user.row_of
+        return {user_id: self.user_permissions(user_id) for user_id in user_ids if user_id in self.by_user.row_of}
+
+    @property
+    def nbytes(self):
+        """Size of the arrays, excluding the two row dicts"""
+        return self.by_user.nbytes + self.by_folder.nbytes
+
+
+def effective_permissions(user_ids=None):
+    """
+    Return {user_id: {folder_id: permission}} for active users
+
+    user_ids optionally restricts the result to the given users.
+    """
+    return AclSnapshot.current().as_dict(user_ids)
+
+
+def group_permissions(user_id):
+    """Return {folder_id: (permission, [group names])} a user gets through groups"""
+    result = {}
+    for folder_id, permission, name in (
+        GroupFolderAccess.objects.filter(group__members=user_id)
+        .exclude(permission='deny')
+        .order_by('group__name')
+        .values_list('folder_id', 'permission', 'group__name')
+    ):
+        current, names = result.get(folder_id, (None, []))
+        result[folder_id] = (merge_permission(current, permission), names + [name])
+    return result
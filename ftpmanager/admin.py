@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils.html import format_html
-from .models import FTPUser, Folder, FolderAccess, UserProfile
+from .models import ApiToken, FTPGroup, FTPNode, FTPUser, Folder, FolderAccess, GroupFolderAccess, UserProfile
 
 
 # Customize admin site
@@ -32,14 +32,14 @@ admin.site.register(User, UserAdmin)
 
 @admin.register(FTPUser)
 class FTPUserAdmin(admin.ModelAdmin):
-    list_display = ['username', 'systemuser', 'is_active', 'created_at']
-    list_filter = ['is_active']
+    list_display = ['username', 'systemuser', 'node', 'is_active', 'created_at']
+    list_filter = ['is_active', 'node']
     search_fields = ['username', 'systemuser']
 
 
 @admin.register(Folder)
 class FolderAdmin(admin.ModelAdmin):
-    list_display = ['name', 'path', 'created_at']
+    list_display = ['name', 'path', 'parent', 'created_at']
     search_fields = ['name', 'path']
 
 
@@ -48,3 +48,37 @@ class FolderAccessAdmin(admin.ModelAdmin):
     list_display = ['user', 'folder', 'permission', 'created_at']
     list_filter = ['permission']
     search_fields = ['user__username', 'folder__name']
+
+
+@admin.register(FTPGroup)
+class FTPGroupAdmin(admin.ModelAdmin):
+    list_display = ['name', 'gid', 'created_at']
+    search_fields = ['name']
+    filter_horizontal = ['members']
+
+
+@admin.register(FTPNode)
+class FTPNodeAdmin(admin.ModelAdmin):
+    list_display = ['name', 'weight', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name']
+
+
+@admin.register(GroupFolderAccess)
+class GroupFolderAccessAdmin(admin.ModelAdmin):
+    list_display = ['group', 'folder', 'permission', 'created_at']
+    list_filter = ['permission']
+    search_fields = ['group__name', 'folder__name']
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    """Tokens are created with the api_token command, which shows the key once"""
+    list_display = ['name', 'user', 'prefix', 'is_active', 'created_at', 'last_used_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'user__username']
+    fields = ['name', 'user', 'prefix', 'is_active', 'created_at', 'last_used_at']
+    readonly_fields = ['name', 'user', 'prefix', 'created_at', 'last_used_at']
+
+    def has_add_permission(self, request):
+        return False
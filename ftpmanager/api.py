@@ -0,0 +1,641 @@
+"""
+JSON API
+
+Token-authenticated endpoints for provisioning FTP users, folders and
+access grants from other systems. Clients send "Authorization: Bearer
+<key>" with a key from the api_token command. Each resource has list,
+create, read, update (PATCH) and delete endpoints, plus a batch endpoint
+that upserts and deletes many records, matched by natural key (username,
+folder path, username and folder path), in one transaction with bulk
+queries and reports a result per item. A batch is applied completely or
+not at all.
+
+Writes may carry an Idempotency-Key header. The response of a successful
+write is stored with the key for a day and replayed when the same request
+is sent again with that key, so clients can retry after a timeout without
+applying a change twice.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import (
+    ApiToken, FTPNode, FTPUser, Folder, FolderAccess, IdempotencyKey, bump_acl_revision, deferred_acl_revision,
+    make_tree_path, subtree_filter,
+)
+
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_ITEMS = 10000
+BATCH_SIZE = 2000
+# bulk_update writes a CASE per field whose cost grows with the batch
+UPDATE_BATCH_SIZE = 500
+IDEMPOTENCY_TTL = timedelta(hours=24)
+LAST_USED_INTERVAL = timedelta(minutes=1)
+
+
+class ApiError(Exception):
+    """Returned to the client as {"error": message, **extra} with the status code"""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def error_response(message, status, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def authenticate(request):
+    """ApiToken for the request's bearer key, or None"""
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not key.strip():
+        return None
+    token = ApiToken.authenticate(key.strip())
+    now = timezone.now()
+    if token and (token.last_used_at is None or token.last_used_at < now - LAST_USED_INTERVAL):
+        ApiToken.objects.filter(pk=token.pk).update(last_used_at=now)
+    return token
+
+
+def read_json(request):
+    """Request body as a dict"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError as e:
+        raise ApiError(f'Request body is not valid JSON: {e}')
+    if not isinstance(data, dict):
+        raise ApiError('Request body must be a JSON object')
+    return data
+
+
+def request_hash(request):
+    return hashlib.sha256(b'\n'.join([request.method.encode(), request.path.encode(), request.body])).hexdigest()
+
+
+def replay(stored):
+    response = JsonResponse(stored.response, status=stored.status, safe=False)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def run_write(view, request, *args, **kwargs):
+    """
+    Run a write view in a transaction, rolled back unless it succeeds
+
+    With an Idempotency-Key header, a stored response for the key is
+    replayed instead, and a successful response is stored in the same
+    transaction as the changes it reports.
+    """
+    key = request.headers.get('Idempotency-Key', '')
+    if len(key) > 255:
+        raise ApiError('Idempotency-Key must be at most 255 characters')
+    digest = request_hash(request) if key else None
+    if key:
+        IdempotencyKey.objects.filter(created_at__lt=timezone.now() - IDEMPOTENCY_TTL).delete()
+        stored = IdempotencyKey.objects.filter(token=request.api_token, key=key).first()
+        if stored:
+            if stored.request_hash != digest:
+                raise ApiError('Idempotency-Key was already used for a different request', 422)
+            return replay(stored)
+
+    try:
+        with transaction.atomic():
+            response = view(request, *args, **kwargs)
+            if not 200 <= response.status_code < 300:
+                transaction.set_rollback(True)
+            elif key:
+                IdempotencyKey.objects.create(
+                    token=request.api_token, key=key, request_hash=digest,
+                    status=response.status_code, response=json.loads(response.content),
+                )
+    except IntegrityError:
+        # A concurrent request changed the same rows or used the same key first
+        stored = IdempotencyKey.objects.filter(token=request.api_token, key=key).first() if key else None
+        if stored is None:
+            raise ApiError('Conflicting concurrent change, retry the request', 409)
+        if stored.request_hash != digest:
+            raise ApiError('Idempotency-Key was already used for a different request', 422)
+        return replay(stored)
+    return response
+
+
+def api_view(*methods):
+    """Allow only methods, require a token, turn ApiError into JSON and run writes through run_write"""
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = error_response(f'Method {request.method} not allowed', 405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            request.api_token = authenticate(request)
+            if request.api_token is None:
+                response = error_response('Missing or invalid API token', 401)
+                response['WWW-Authenticate'] = 'Bearer'
+                return response
+            try:
+                if request.method == 'GET':
+                    return view(request, *args, **kwargs)
+                return run_write(view, request, *args, **kwargs)
+            except ApiError as e:
+                return error_response(str(e), e.status, **e.extra)
+        return wrapper
+    return decorator
+
+
+def add_error(errors, field, message):
+    errors.setdefault(field, []).append(message)
+
+
+def text_value(data, field, errors):
+    """data[field] as a non-empty string, else None with an error"""
+    value = data.get(field)
+    if not isinstance(value, str) or not value.strip():
+        add_error(errors, field, 'This field is required.')
+        return None
+    return value
+
+
+def type_error(field, value):
+    """Why value cannot be stored in the model field, or None; None values are left to model validation"""
+    if value is None:
+        return None
+    if isinstance(field, models.BooleanField):
+        return None if isinstance(value, bool) else 'Must be true or false.'
+    if isinstance(field, models.IntegerField):
+        return None if isinstance(value, int) and not isinstance(value, bool) else 'Must be an integer.'
+    if isinstance(field, (models.CharField, models.TextField)):
+        return None if isinstance(value, str) else 'Must be a string.'
+    return None
+
+
+class Resource:
+    """How the API reads, writes and matches one model"""
+    model = None
+    # Model fields taken from requests and returned as they are
+    fields = []
+    # Returned but ignored in requests, so responses can be sent back
+    read_only = {'id', 'created_at'}
+    # Fields assign() sets from looked up or derived values, not validated again per object
+    prevalidated = []
+
+    def queryset(self):
+        return self.model.objects.order_by('pk')
+
+    def filter(self, queryset, params):
+        return queryset
+
+    def serialize(self, obj):
+        return {'id': obj.pk, **{field: getattr(obj, field) for field in self.fields}, 'created_at': obj.created_at}
+
+    @property
+    def write_fields(self):
+        """Fields assign() may change, for change detection and bulk_update"""
+        return self.fields + self.prevalidated
+
+    def prepare(self, items):
+        """Look up what assign() needs for a list of request items, in bulk"""
+        return {}
+
+    def assign(self, obj, data, context):
+        """Set the values in data on obj; returns {field: [errors]}"""
+        errors = {}
+        for name, value in data.items():
+            if name in self.fields:
+                message = type_error(self.model._meta.get_field(name), value)
+                if message:
+                    add_error(errors, name, message)
+                else:
+                    setattr(obj, name, value)
+            elif name not in self.read_only:
+                add_error(errors, name, 'Unknown field.')
+        return errors
+
+    def item_key(self, data, errors):
+        """Natural key of a batch item, or None with errors"""
+        raise NotImplementedError
+
+    def existing(self, keys):
+        """{key: object} for the keys that exist"""
+        raise NotImplementedError
+
+    def after_write(self, created, updated):
+        """Called after a batch wrote objects with bulk queries"""
+
+
+class UserResource(Resource):
+    model = FTPUser
+    fields = [
+        'username', 'systemuser', 'is_active', 'quota_bytes', 'quota_files', 'quota_type',
+        'download_rate', 'upload_rate', 'max_clients', 'max_clients_per_host',
+    ]
+    read_only = {'id', 'has_password', 'created_at', 'updated_at'}
+    prevalidated = ['node']
+
+    @property
+    def write_fields(self):
+        return self.fields + ['password_hash', 'node']
+
+    def queryset(self):
+        return FTPUser.objects.select_related('node').order_by('pk')
+
+    def filter(self, queryset, params):
+        if params.get('username'):
+            queryset = queryset.filter(username__icontains=params['username'])
+        if params.get('active') in ('yes', 'no'):
+            queryset = queryset.filter(is_active=params['active'] == 'yes')
+        return queryset
+
+    def serialize(self, obj):
+        return {
+            'id': obj.pk,
+            **{field: getattr(obj, field) for field in self.fields},
+            'node': obj.node.name if obj.node_id else None,
+            'has_password': bool(obj.password_hash),
+            'created_at': obj.created_at,
+            'updated_at': obj.updated_at,
+        }
+
+    def prepare(self, items):
+        names = {item['node'] for item in items if isinstance(item.get('node'), str)}
+        return {'nodes': {node.name: node for node in FTPNode.objects.filter(name__in=names)}}
+
+    def assign(self, obj, data, context):
+        errors = super().assign(obj, {
+            name: value for name, value in data.items() if name not in ('password', 'password_hash', 'node')
+        }, context)
+        if 'password' in data:
+            if isinstance(data['password'], str) and data['password']:
+                obj.set_password(data['password'])
+            else:
+                add_error(errors, 'password', 'Must be a non-empty string.')
+        if 'password_hash' in data:
+            if isinstance(data['password_hash'], str):
+                obj.password_hash = data['password_hash']
+            else:
+                add_error(errors, 'password_hash', 'Must be a string.')
+        if 'node' in data:
+            if data['node'] is None:
+                obj.node = None
+            elif isinstance(data['node'], str) and data['node'] in context['nodes']:
+                obj.node = context['nodes'][data['node']]
+            else:
+                add_error(errors, 'node', f'Unknown node {data["node"]!r}.')
+        return errors
+
+    def item_key(self, data, errors):
+        return text_value(data, 'username', errors)
+
+    def existing(self, keys):
+        return {user.username: user for user in FTPUser.objects.filter(username__in=keys)}
+
+
+class FolderResource(Resource):
+    model = Folder
+    fields = ['name', 'path', 'description', 'quota_bytes', 'quota_files', 'quota_type', 'download_rate', 'upload_rate']
+    read_only = {'id', 'parent', 'created_at'}
+    prevalidated = ['tree_path']
+
+    def filter(self, queryset, params):
+        if params.get('path'):
+            queryset = queryset.filter(subtree_filter(make_tree_path(params['path'])))
+        if params.get('name'):
+            queryset = queryset.filter(name__icontains=params['name'])
+        return queryset
+
+    def serialize(self, obj):
+        return {'id': obj.pk, **{field: getattr(obj, field) for field in self.fields}, 'parent': obj.parent_id, 'created_at': obj.created_at}
+
+    def item_key(self, data, errors):
+        path = text_value(data, 'path', errors)
+        return make_tree_path(path) if path else None
+
+    def existing(self, keys):
+        return {folder.tree_path: folder for folder in Folder.objects.filter(tree_path__in=keys)}
+
+    def assign(self, obj, data, context):
+        path = obj.path
+        errors = super().assign(obj, data, context)
+        if 'path' not in errors and isinstance(data.get('path'), str) and not data['path'].startswith('/'):
+            add_error(errors, 'path', 'Must be an absolute path.')
+        elif isinstance(obj.path, str) and obj.path.strip():
+            if obj.pk and make_tree_path(obj.path) == obj.tree_path:
+                # The same path spelled differently, e.g. with a trailing slash
+                obj.path = path
+            # Folder.save() sets the tree path too, but batches skip it
+            obj.tree_path = make_tree_path(obj.path)
+        return errors
+
+    def after_write(self, created, updated):
+        if created or updated:
+            Folder.relink(['/'])
+
+
+class AccessResource(Resource):
+    model = FolderAccess
+    fields = ['permission']
+    prevalidated = ['user', 'folder']
+
+    def queryset(self):
+        return FolderAccess.objects.select_related('user', 'folder').order_by('pk')
+
+    def filter(self, queryset, params):
+        if params.get('user'):
+            queryset = queryset.filter(user__username=params['user'])
+        if params.get('folder'):
+            queryset = queryset.filter(folder__tree_path=make_tree_path(params['folder']))
+        if params.get('permission'):
+            queryset = queryset.filter(permission=params['permission'])
+        return queryset
+
+    def serialize(self, obj):
+        return {
+            'id': obj.pk,
+            'user': obj.user.username,
+            'folder': obj.folder.path,
+            'permission': obj.permission,
+            'created_at': obj.created_at,
+        }
+
+    def prepare(self, items):
+        usernames = {item['user'] for item in items if isinstance(item.get('user'), str)}
+        paths = {make_tree_path(item['folder']) for item in items if isinstance(item.get('folder'), str)}
+        return {
+            'users': dict(FTPUser.objects.filter(username__in=usernames).values_list('username', 'pk')),
+            'folders': dict(Folder.objects.filter(tree_path__in=paths).values_list('tree_path', 'pk')),
+        }
+
+    def assign(self, obj, data, context):
+        errors = super().assign(obj, {name: value for name, value in data.items() if name not in ('user', 'folder')}, context)
+        if 'user' in data:
+            if isinstance(data['user'], str):
+                obj.user_id = context['users'].get(data['user'])
+            if obj.user_id is None:
+                add_error(errors, 'user', f'Unknown user {data["user"]!r}.')
+        if 'folder' in data:
+            if isinstance(data['folder'], str):
+                obj.folder_id = context['folders'].get(make_tree_path(data['folder']))
+            if obj.folder_id is None:
+                add_error(errors, 'folder', f'Unknown folder {data["folder"]!r}.')
+        return errors
+
+    def item_key(self, data, errors):
+        username = text_value(data, 'user', errors)
+        path = text_value(data, 'folder', errors)
+        return (username, make_tree_path(path)) if username and path else None
+
+    def existing(self, keys):
+        grants = FolderAccess.objects.select_related('user', 'folder').filter(
+            user__username__in={username for username, _path in keys},
+            folder__tree_path__in={path for _username, path in keys},
+        )
+        found = {(grant.user.username, grant.folder.tree_path): grant for grant in grants}
+        return {key: found[key] for key in keys if key in found}
+
+
+USERS = UserResource()
+FOLDERS = FolderResource()
+ACCESS = AccessResource()
+
+
+def field_values(obj, fields):
+    return [getattr(obj, obj._meta.get_field(field).attname) for field in fields]
+
+
+def validation_errors(obj, errors, exclude, full=False):
+    """Validate obj like a ModelForm would and add the messages to errors"""
+    try:
+        if full:
+            obj.full_clean(exclude=list(errors) + exclude)
+        else:
+            obj.clean_fields(exclude=list(errors) + exclude)
+    except ValidationError as e:
+        for field, messages in e.message_dict.items():
+            errors.setdefault(field, []).extend(messages)
+    return errors
+
+
+def page(request, resource):
+    """One page of the filtered queryset"""
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+        limit = min(max(int(request.GET.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ApiError('Parameters "offset" and "limit" must be integers')
+    queryset = resource.filter(resource.queryset(), request.GET)
+    return JsonResponse({
+        'total': queryset.count(),
+        'offset': offset,
+        'results': [resource.serialize(obj) for obj in queryset[offset:offset + limit]],
+    })
+
+
+def save_one(resource, obj, data):
+    """Validate and save obj with the values in data"""
+    errors = resource.assign(obj, data, resource.prepare([data]))
+    if validation_errors(obj, errors, [], full=True):
+        raise ApiError('Invalid data', errors=errors)
+    obj.save()
+    return resource.serialize(resource.queryset().get(pk=obj.pk))
+
+
+def collection(request, resource):
+    if request.method == 'GET':
+        return page(request, resource)
+    return JsonResponse(save_one(resource, resource.model(), read_json(request)), status=201)
+
+
+def member(request, resource, pk):
+    obj = resource.queryset().filter(pk=pk).first()
+    if obj is None:
+        raise ApiError(f'No {resource.model._meta.verbose_name} with id {pk}', 404)
+    if request.method == 'GET':
+        return JsonResponse(resource.serialize(obj))
+    if request.method == 'PATCH':
+        return JsonResponse(save_one(resource, obj, read_json(request)))
+    obj.delete()
+    return JsonResponse({'id': pk, 'deleted': True})
+
+
+def batch_items(data, name):
+    items = data.get(name, [])
+    if not isinstance(items, list):
+        raise ApiError(f'"{name}" must be a list')
+    return items
+
+
+def batch(request, resource):
+    """
+    Upsert and delete a list of items each, matched by natural key
+
+    Every item is validated first; if any is invalid nothing is written and
+    the response is 400 with the errors per item. Otherwise the changes are
+    written with bulk_create, bulk_update and one delete query.
+    """
+    data = read_json(request)
+    unknown = data.keys() - {'upsert', 'delete'}
+    if unknown:
+        raise ApiError(f'Unknown key(s): {", ".join(sorted(unknown))}; expected "upsert" and "delete"')
+    upserts = batch_items(data, 'upsert')
+    deletes = batch_items(data, 'delete')
+    if len(upserts) + len(deletes) > MAX_BATCH_ITEMS:
+        raise ApiError(f'At most {MAX_BATCH_ITEMS} items per batch')
+
+    def keyed(items):
+        """[(result, item, key)], key None for invalid items"""
+        rows = []
+        seen = {}
+        for index, item in enumerate(items):
+            result = {'index': index}
+            errors = {}
+            key = resource.item_key(item, errors) if isinstance(item, dict) else None
+            if not isinstance(item, dict):
+                errors['item'] = ['Must be an object.']
+            elif key in seen:
+                add_error(errors, 'item', f'Same record as item {seen[key]}.')
+                key = None
+            elif key is not None:
+                seen[key] = index
+            if errors:
+                result.update(status='error', errors=errors)
+            rows.append((result, item, key))
+        return rows
+
+    upsert_rows = keyed(upserts)
+    delete_rows = keyed(deletes)
+    upsert_keys = {key for _result, _item, key in upsert_rows if key is not None}
+    for result, _item, key in delete_rows:
+        if key in upsert_keys:
+            result.update(status='error', errors={'item': ['Also listed in "upsert".']})
+    existing = resource.existing(
+        upsert_keys | {key for result, _item, key in delete_rows if key is not None and 'errors' not in result}
+    )
+    context = resource.prepare([item for result, item, _key in upsert_rows if 'errors' not in result])
+
+    created = []
+    # Changed objects by the fields that changed, so bulk_update only rewrites those
+    updated = {}
+    for result, item, key in upsert_rows:
+        if 'errors' in result:
+            continue
+        obj = existing.get(key)
+        before = field_values(obj, resource.write_fields) if obj else None
+        if obj is None:
+            obj = resource.model()
+        errors = resource.assign(obj, item, context)
+        if validation_errors(obj, errors, resource.prevalidated):
+            result.update(status='error', errors=errors)
+        elif before is None:
+            result['status'] = 'created'
+            created.append((result, obj))
+        else:
+            after = field_values(obj, resource.write_fields)
+            changed = tuple(field for field, old, new in zip(resource.write_fields, before, after) if old != new)
+            result.update(status='updated' if changed else 'unchanged', id=obj.pk)
+            if changed:
+                updated.setdefault(changed, []).append(obj)
+
+    deleted = []
+    for result, _item, key in delete_rows:
+        if 'errors' in result:
+            continue
+        obj = existing.get(key)
+        if obj is None:
+            result['status'] = 'not_found'
+        else:
+            result.update(status='deleted', id=obj.pk)
+            deleted.append(obj.pk)
+
+    results = {
+        'upsert': [result for result, _item, _key in upsert_rows],
+        'delete': [result for result, _item, _key in delete_rows],
+    }
+    failed = sum(1 for rows in results.values() for result in rows if result['status'] == 'error')
+    if failed:
+        return JsonResponse({'error': f'{failed} invalid item(s), nothing was changed', **results}, status=400)
+
+    new = [obj for _result, obj in created]
+    changed = [obj for objs in updated.values() for obj in objs]
+    auto_now = [field.name for field in resource.model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+    now = timezone.now()
+    for obj in changed:
+        for field in auto_now:
+            setattr(obj, field, now)
+    # Deletes still send signals per object; the ACL revision changes once
+    with deferred_acl_revision():
+        resource.model.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        for fields, objs in updated.items():
+            resource.model.objects.bulk_update(objs, list(fields) + auto_now, batch_size=UPDATE_BATCH_SIZE)
+        if deleted:
+            resource.model.objects.filter(pk__in=deleted).delete()
+        resource.after_write(new, changed)
+        if new or changed or deleted:
+            # bulk_create and bulk_update send no signals
+            bump_acl_revision()
+
+    if any(obj.pk is None for obj in new):
+        # Databases that do not return ids from bulk inserts
+        keys = [key for result, item, key in upsert_rows if result['status'] == 'created']
+        ids = resource.existing(keys)
+        for (result, obj), key in zip(created, keys):
+            obj.pk = ids[key].pk
+    for result, obj in created:
+        result['id'] = obj.pk
+    return JsonResponse(results)
+
+
+@api_view('GET', 'POST')
+def users(request):
+    return collection(request, USERS)
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+def user_detail(request, pk):
+    return member(request, USERS, pk)
+
+
+@api_view('POST')
+def users_batch(request):
+    return batch(request, USERS)
+
+
+@api_view('GET', 'POST')
+def folders(request):
+    return collection(request, FOLDERS)
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+def folder_detail(request, pk):
+    return member(request, FOLDERS, pk)
+
+
+@api_view('POST')
+def folders_batch(request):
+    return batch(request, FOLDERS)
+
+
+@api_view('GET', 'POST')
+def access(request):
+    return collection(request, ACCESS)
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+def access_detail(request, pk):
+    return member(request, ACCESS, pk)
+
+
+@api_view('POST')
+def access_batch(request):
+    return batch(request, ACCESS)
@@ -0,0 +1,297 @@
+"""
+Configuration Diff
+
+Compares the deployed files with freshly generated content and produces a
+unified diff, so the next deploy can be reviewed before it happens.
+
+Both sides are split into blocks (a section with its leading comments, or
+one passwd/group entry) and each block is hashed. Blocks with the same key
+and hash are skipped without a line-level diff, and only changed blocks are
+run through difflib. The deployed file is read once to hash it; the text of
+a changed block is read back from its byte range when the diff is written,
+so large deployed files are never held in memory.
+"""
+
+import difflib
+import hashlib
+import os
+from collections import Counter
+
+from django.conf import settings
+
+from .config_generator import (
+    generate_ftpgroup_file,
+    generate_ftpusers_file,
+    generate_proftpd_config,
+    generate_tuning_config,
+)
+
+
+# Deployed files as written by deploy_config with its default options:
+# (name, path relative to PROFTPD_CONFIG_DIR, kind)
+DEPLOYED_FILES = [
+    ('tuning', 'conf.d/00-tuning.conf', 'config'),
+    ('config', 'conf.d/users.conf', 'config'),
+    ('passwd', 'ftpd.passwd', 'passwd'),
+    ('group', 'ftpd.group', 'group'),
+]
+
+# What a block of each kind of file counts as in the summary
+UNITS = {'config': 'rule', 'passwd': 'user', 'group': 'group'}
+
+# Sections that grant or restrict access; other config blocks are settings
+RULE_SECTIONS = ('<Directory', '<IfUser')
+
+
+def config_blocks(lines):
+    """
+    Split configuration lines into (key, lines) blocks
+
+    A top-level section is one block together with the comments and blank
+    lines directly above it; other top-level lines are grouped up to the
+    next blank line.
+    The key is the opening tag, including those of enclosing <IfModule>
+    wrappers, so a block keeps its key when its contents change.
+    """
+    block = []
+    tags = []
+    depth = 0
+    for line in lines:
+        stripped = line.strip()
+        if depth == 0:
+            if not stripped:
+                # Blank lines end a block, or lead into the next one
+                block.append(line)
+                if any(part.strip() for part in block):
+                    yield block_key(block, tags), block
+                    block, tags = [], []
+                continue
+            if stripped.startswith('<') and not stripped.startswith('</') and not all(
+                    not part.strip() or part.lstrip().startswith('#') for part in block):
+                yield block_key(block, tags), block
+                block, tags = [], []
+
+        block.append(line)
+        if stripped.startswith('</'):
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                yield block_key(block, tags), block
+                block, tags = [], []
+        elif stripped.startswith('<'):
+            if not tags or tags[-1].startswith('<IfModule'):
+                tags.append(stripped)
+            depth += 1
+
+    if block:
+        yield block_key(block, tags), block
+
+
+def block_key(block, tags):
+    if tags:
+        return ' '.join(tags)
+    for line in block:
+        if line.strip():
+            return line.strip()
+    return ''
+
+
+def account_blocks(lines):
+    """Split passwd or group lines into one (name, [line]) block per entry"""
+    for line in lines:
+        yield line.split(':', 1)[0].rstrip('\n'), [line]
+
+
+SPLITTERS = {'config': config_blocks, 'passwd': account_blocks, 'group': account_blocks}
+
+
+def block_digest(lines):
+    """Hash of a block's lines; a missing newline at the end of the file is ignored"""
+    digest = hashlib.blake2b(digest_size=16)
+    for line in lines:
+        digest.update(line.rstrip('\n').encode('utf-8', 'surrogateescape'))
+        digest.update(b'\n')
+    return digest.digest()
+
+
+def unique_keys(blocks):
+    """Number repeated keys so every block has its own"""
+    seen = Counter()
+    for key, lines in blocks:
+        seen[key] += 1
+        yield (key if seen[key] == 1 else f'{key} #{seen[key]}'), lines
+
+
+def format_range(start, length):
+    """Line range of a hunk header, as difflib writes it (start is 0-based)"""
+    if length == 1:
+        return f'{start + 1}'
+    if not length:
+        return f'{start},0'
+    return f'{start + 1},{length}'
+
+
+def hunks(old, new, old_start, new_start, context=3):
+    """Yield unified diff hunk lines for two blocks at the given line offsets"""
+    old = [line.rstrip('\n') for line in old]
+    new = [line.rstrip('\n') for line in new]
+    for group in difflib.SequenceMatcher(None, old, new, autojunk=False).get_grouped_opcodes(context):
+        first, last = group[0], group[-1]
+        old_range = format_range(old_start + first[1], last[2] - first[1])
+        new_range = format_range(new_start + first[3], last[4] - first[3])
+        yield f'@@ -{old_range} +{new_range} @@'
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in old[i1:i2]:
+                    yield f' {line}'
+                continue
+            for line in old[i1:i2]:
+                yield f'-{line}'
+            for line in new[j1:j2]:
+                yield f'+{line}'
+
+
+class FileDiff:
+    """
+    Difference between a deployed file and its generated content
+
+    The deployed file is hashed block by block on construction; a missing
+    file counts as empty. summary has the added, removed and changed
+    counts of the file's unit, iter_lines() streams the unified diff.
+    """
+
+    def __init__(self, name, path, content, kind='config'):
+        self.name = name
+        self.path = path
+        self.kind = kind
+        self.unit = UNITS[kind]
+        self.exists = os.path.exists(path)
+
+        split = SPLITTERS[kind]
+        self.new_blocks = []  # (key, digest, start line, lines)
+        start = 0
+        for key, lines in unique_keys(split(content.splitlines(keepends=True))):
+            self.new_blocks.append((key, block_digest(lines), start, lines))
+            start += len(lines)
+
+        self.old_blocks = {}  # key -> (digest, start line, line count, byte offset, byte size)
+        if self.exists:
+            with open(path, 'rb') as f:
+                start = offset = 0
+                for key, lines in unique_keys(split(self.deployed_lines(f))):
+                    size = sum(len(line.encode('utf-8', 'surrogateescape')) for line in lines)
+                    self.old_blocks[key] = (block_digest(lines), start, len(lines), offset, size)
+                    start += len(lines)
+                    offset += size
+
+        new_digests = {key: digest for key, digest, _start, _lines in self.new_blocks}
+        self.added = [key for key in new_digests if key not in self.old_blocks]
+        self.removed = [key for key in self.old_blocks if key not in new_digests]
+        self.changed = [
+            key for key, digest in new_digests.items()
+            if key in self.old_blocks and self.old_blocks[key][0] != digest
+        ]
+
+    @staticmethod
+    def deployed_lines(f):
+        for raw in f:
+            yield raw.decode('utf-8', 'surrogateescape')
+
+    def counts(self, key):
+        """Whether a block is one of the file's units rather than a comment or setting"""
+        if self.kind != 'config':
+            return bool(key) and not key.startswith('#')
+        return key.startswith(RULE_SECTIONS) or ' <IfUser' in key or ' <Directory' in key
+
+    @property
+    def summary(self):
+        return {
+            'added': sum(1 for key in self.added if self.counts(key)),
+            'removed': sum(1 for key in self.removed if self.counts(key)),
+            'changed': sum(1 for key in self.changed if self.counts(key)),
+            'unit': self.unit,
+        }
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def iter_lines(self, context=3):
+        """Yield the unified diff, one line at a time without line endings"""
+        if not self.has_changes:
+            return
+        yield f'--- {self.path}' if self.exists else '--- /dev/null'
+        yield f'+++ {self.path} (generated)'
+
+        f = open(self.path, 'rb') if self.exists else None
+        try:
+            def old_lines(key):
+                _digest, _start, _count, offset, size = self.old_blocks[key]
+                f.seek(offset)
+                return f.read(size).decode('utf-8', 'surrogateescape').splitlines(keepends=True)
+
+            # Removed blocks are written where they stood in the deployed file
+            gone_keys = set(self.removed)
+            removed = [key for key in self.old_blocks if key in gone_keys]
+            old_position = 0
+            new_position = 0
+            for key, digest, new_start, lines in self.new_blocks:
+                old = self.old_blocks.get(key)
+                if old is not None:
+                    while removed and self.old_blocks[removed[0]][1] < old[1]:
+                        gone = removed.pop(0)
+                        yield from hunks(old_lines(gone), [], self.old_blocks[gone][1], new_start, context)
+                    old_position = old[1] + old[2]
+                    if old[0] != digest:
+                        yield from hunks(old_lines(key), lines, old[1], new_start, context)
+                else:
+                    yield from hunks([], lines, old_position, new_start, context)
+                new_position = new_start + len(lines)
+            for gone in removed:
+                yield from hunks(old_lines(gone), [], self.old_blocks[gone][1], new_position, context)
+        finally:
+            if f is not None:
+                f.close()
+
+
+def preview_diffs(config_dir=None):
+    """FileDiffs of all deployed files against the current database"""
+    config_dir = config_dir or settings.PROFTPD_CONFIG_DIR
+    return [preview_diff(name, config_dir) for name, _path, _kind in DEPLOYED_FILES]
+
+
+def preview_diff(name, config_dir=None):
+    """FileDiff of one of DEPLOYED_FILES by name (KeyError if unknown)"""
+    config_dir = config_dir or settings.PROFTPD_CONFIG_DIR
+    generators = {
+        'tuning': generate_tuning_config,
+        'config': generate_proftpd_config,
+        'passwd': generate_ftpusers_file,
+        'group': generate_ftpgroup_file,
+    }
+    path, kind = {n: (p, k) for n, p, k in DEPLOYED_FILES}[name]
+    return FileDiff(name, os.path.join(config_dir, path), generators[name](), kind)
+
+
+def plural(count, unit):
+    return f'{count} {unit}{"" if count == 1 else "s"}'
+
+
+def summarize(diffs):
+    """One-line summary like '+2 users, −1 rule, 3 rules changed'"""
+    totals = {}
+    for diff in diffs:
+        summary = diff.summary
+        total = totals.setdefault(summary['unit'], Counter())
+        total.update({key: summary[key] for key in ('added', 'removed', 'changed')})
+
+    parts = []
+    for unit, total in totals.items():
+        if total['added']:
+            parts.append(f'+{plural(total["added"], unit)}')
+        if total['removed']:
+            parts.append(f'−{plural(total["removed"], unit)}')
+        if total['changed']:
+            parts.append(f'{plural(total["changed"], unit)} changed')
+    if not parts and any(diff.has_changes for diff in diffs):
+        parts.append('settings changed')
+    return ', '.join(parts) or 'no changes'
@@ -1,83 +1,454 @@
 """
 ProFTPD Configuration Generator
 
-Generates users.conf and ftpd.passwd files based on database settings.
+Generates users.conf, ftpd.passwd and ftpd.group files based on database settings.
 """
 
-from .models import FTPUser, Folder, FolderAccess
+import re
 
+from django.conf import settings
+from django.db.models import Q
 
-def generate_proftpd_config():
+from .acl import effective_permissions, group_members, resolve_folder_acls
+from .models import FTPGroup, FTPUser, FolderUsage, GroupFolderAccess, ServerTuning
+
+
+DEFAULT_SQL_DB_PATH = '/etc/proftpd/ftpd.sqlite3'
+
+# Longest configuration line written; ProFTPD reads config lines into a
+# fixed-size buffer
+MAX_DIRECTIVE_LENGTH = 1024
+
+# Password hash written for users without one; no password crypts to it, so
+# they cannot log in
+LOCKED_PASSWORD = '!'
+
+
+def generate_sql_auth_config(db_path=DEFAULT_SQL_DB_PATH):
+    """Generate mod_sql directives for the SQLite users/groups database
+
+    Requires mod_sql.c and mod_sql_sqlite.c to be loaded (modules.conf).
+    Tables are maintained by ftpmanager.sql_backend.sync_sqlite_database().
+    """
+    return f'''# Virtual users authentication (mod_sql + mod_sql_sqlite)
+AuthOrder mod_sql.c
+SQLBackend sqlite3
+SQLConnectInfo {db_path}
+SQLAuthTypes Crypt
+SQLAuthenticate users groups
+SQLUserInfo users userid passwd uid gid homedir shell
+SQLGroupInfo groups groupname gid members
+'''
+
+
+def get_quota_users():
+    """Active users with an upload quota"""
+    return FTPUser.objects.filter(is_active=True).filter(
+        Q(quota_bytes__isnull=False) | Q(quota_files__isnull=False)
+    )
+
+
+def generate_quota_config(db_path=DEFAULT_SQL_DB_PATH, auth_backend='file'):
+    """Generate mod_quotatab directives for per-user upload quotas
+
+    Limits and tallies live in the quotalimits/quotatallies tables of the
+    SQLite database (mod_quotatab_sql). With the file auth backend mod_sql
+    is only used for the quota tables, so SQL authentication is turned off.
+    """
+    connection = ''
+    if auth_backend != 'sql':
+        connection = f'''  SQLBackend sqlite3
+  SQLConnectInfo {db_path}
+  SQLAuthenticate off
+'''
+
+    return f'''# Upload quotas (mod_quotatab + mod_quotatab_sql)
+<IfModule mod_quotatab_sql.c>
+{connection}  SQLNamedQuery get-quota-limit SELECT "name, quota_type, per_session, limit_type, bytes_in_avail, bytes_out_avail, bytes_xfer_avail, files_in_avail, files_out_avail, files_xfer_avail FROM quotalimits WHERE name = '%{{0}}' AND quota_type = '%{{1}}'"
+  SQLNamedQuery get-quota-tally SELECT "name, quota_type, bytes_in_used, bytes_out_used, bytes_xfer_used, files_in_used, files_out_used, files_xfer_used FROM quotatallies WHERE name = '%{{0}}' AND quota_type = '%{{1}}'"
+  SQLNamedQuery update-quota-tally UPDATE "bytes_in_used = bytes_in_used + %{{0}}, bytes_out_used = bytes_out_used + %{{1}}, bytes_xfer_used = bytes_xfer_used + %{{2}}, files_in_used = files_in_used + %{{3}}, files_out_used = files_out_used + %{{4}}, files_xfer_used = files_xfer_used + %{{5}} WHERE name = '%{{6}}' AND quota_type = '%{{7}}'" quotatallies
+  SQLNamedQuery insert-quota-tally INSERT "%{{0}}, %{{1}}, %{{2}}, %{{3}}, %{{4}}, %{{5}}, %{{6}}, %{{7}}" quotatallies
+  QuotaEngine on
+  QuotaShowQuotas on
+  QuotaLimitTable sql:/get-quota-limit
+  QuotaTallyTable sql:/get-quota-tally/update-quota-tally/insert-quota-tally
+</IfModule>
+'''
+
+
+def generate_transfer_rates(download_rate, upload_rate, indent):
+    """TransferRate lines (KB/s) for the given download/upload limits"""
+    lines = ''
+    if download_rate is not None:
+        lines += f"{indent}TransferRate RETR {download_rate}\n"
+    if upload_rate is not None:
+        lines += f"{indent}TransferRate STOR,STOU,APPE {upload_rate}\n"
+    return lines
+
+
+def generate_user_limits(user):
+    """Generate an <IfUser> block with a user's transfer rates and client limits
+
+    MaxConnectionsPerHost is checked when the connection is accepted, before
+    the user is known, so the per-user host limit uses MaxClientsPerHost,
+    which mod_ifsession can scope to the user at login.
+    """
+    lines = generate_transfer_rates(user.download_rate, user.upload_rate, '    ')
+    if user.max_clients is not None:
+        lines += f"    MaxClientsPerUser {user.max_clients}\n"
+    if user.max_clients_per_host is not None:
+        lines += f"    MaxClientsPerHost {user.max_clients_per_host}\n"
+
+    return f'''
+# Limits for user: {user.username}
+<IfModule mod_ifsession.c>
+  <IfUser {user.username}>
+{lines}  </IfUser>
+</IfModule>
+'''
+
+
+def collect_folder_acls(changes=()):
+    """
+    Return [(folder, read_users, write_users, read_groups, write_groups)]
+
+    One entry per folder, parents first, with the effective grants after
+    inheritance (see acl.resolve_folder_acls, which also explains changes).
+    Write implies read, so writers are also in read_users/read_groups.
+    Users and groups are in the order their access was granted.
+    """
+    acls = []
+    for folder, users, groups in resolve_folder_acls(changes=changes):
+        acls.append((
+            folder,
+            list(users),
+            [username for username, permission in users.items() if permission == 'write'],
+            list(groups),
+            [name for name, permission in groups.items() if permission == 'write'],
+        ))
+    return acls
+
+
+def node_folder_acls(acls, usernames):
+    """collect_folder_acls() entries with only the given users and the groups they are in"""
+    groups = {name for name, members in group_members().items() if not usernames.isdisjoint(members)}
+    return [
+        (
+            folder,
+            [name for name in read_users if name in usernames],
+            [name for name in write_users if name in usernames],
+            [name for name in read_groups if name in groups],
+            [name for name in write_groups if name in groups],
+        )
+        for folder, read_users, write_users, read_groups, write_groups in acls
+    ]
+
+
+def inherit_folder_settings(acls, usage):
+    """
+    Return {folder_id: (rates, over_quota, reachable)} after inheritance
+
+    rates is the (download, upload) pair, unset values falling back to the
+    parent folder's. A scan of a folder includes its subfolders, so a folder
+    below one at its hard quota is full as well. reachable tells whether
+    the folder or one of its parents grants any access.
+    """
+    settings_by_folder = {}
+    for folder, read_users, _write_users, read_groups, _write_groups in acls:
+        parent_rates, parent_over_quota, parent_reachable = settings_by_folder.get(
+            folder.parent_id, ((None, None), False, False)
+        )
+        rates = tuple(
+            own if own is not None else inherited
+            for own, inherited in zip((folder.download_rate, folder.upload_rate), parent_rates)
+        )
+        over_quota = parent_over_quota or folder.quota_status(usage.get(folder.pk)) == 'hard'
+        reachable = parent_reachable or bool(read_users or read_groups)
+        settings_by_folder[folder.pk] = (rates, over_quota, reachable)
+    return settings_by_folder
+
+
+def allow_lines(users, groups, indent):
+    """AllowUser for users and one AllowGroup per group
+
+    A comma-separated AllowGroup list would require membership in all of
+    the groups, so each group gets its own line. Long user lists are split
+    over several AllowUser lines to stay below MAX_DIRECTIVE_LENGTH.
+    """
+    lines = ''
+    line = ''
+    for username in users:
+        if line and len(line) + 1 + len(username) > MAX_DIRECTIVE_LENGTH:
+            lines += line + '\n'
+            line = ''
+        line = f'{line} {username}' if line else f'{indent}AllowUser {username}'
+    if line:
+        lines += line + '\n'
+    for name in groups:
+        lines += f'{indent}AllowGroup {name}\n'
+    return lines
+
+
+def ifuser_expressions(usernames):
+    """
+    Yield <IfUser> expressions matching the given users
+
+    A single user is matched by name, several by one regex. Regexes that
+    would exceed MAX_DIRECTIVE_LENGTH are split, repeating the section.
+    """
+    chunks = [[]]
+    length = len('<IfUser regex ^()$>')
+    for username in usernames:
+        name = re.escape(username)
+        if chunks[-1] and length + len(name) + 1 > MAX_DIRECTIVE_LENGTH:
+            chunks.append([])
+            length = len('<IfUser regex ^()$>')
+        chunks[-1].append(username)
+        length += len(name) + 1
+    for chunk in chunks:
+        if len(chunk) == 1:
+            yield chunk[0]
+        else:
+            yield f"regex ^({'|'.join(re.escape(name) for name in chunk)})$"
+
+
+def generate_ifuser_rules(acls, usage, usernames=None):
+    """
+    Generate access rules as <IfUser> sections
+
+    Every folder reachable by anyone, directly or through a parent, is
+    denied globally, and each set of users with identical folder
+    permissions gets one <IfUser> section granting them.
+    mod_ifsession merges only the sections matching the logged-in user, so
+    a session carries its own directories instead of every folder's
+    AllowUser list. Command group limits (READ, DIRS, WRITE) take
+    precedence over the global <Limit ALL>. usernames restricts the
+    sections to the users of one node.
+    """
+    config = '''
+# Access rules per user (mod_ifsession)
+# Managed folders are denied unless granted in an <IfUser> section below
+'''
+    inherited = inherit_folder_settings(acls, usage)
+    folders = {}
+    for folder, *_rules in acls:
+        rates, over_quota, reachable = inherited[folder.pk]
+        if not reachable:
+            continue
+        folders[folder.pk] = folder
+        config += f'''<Directory {folder.path}>
+'''
+        config += generate_transfer_rates(*rates, '  ')
+        config += '''  <Limit ALL>
+    DenyAll
+  </Limit>
+</Directory>
+'''
+
+    # Direct and group grants are merged per user
+    node_users = usernames
+    usernames = dict(FTPUser.objects.filter(is_active=True).values_list('pk', 'username'))
+    signatures = {}
+    for user_id, permissions in sorted(effective_permissions().items()):
+        if node_users is not None and usernames[user_id] not in node_users:
+            continue
+        signatures[usernames[user_id]] = [
+            (folders[folder_id], permission)
+            for folder_id, permission in sorted(permissions.items(), key=lambda item: folders[item[0]].name)
+        ]
+
+    groups = {}
+    for username, grants in signatures.items():
+        key = tuple((folder.pk, permission) for folder, permission in grants)
+        groups.setdefault(key, (grants, []))[1].append(username)
+
+    for grants, usernames in groups.values():
+        body = ''
+        for folder, permission in grants:
+            body += f'''  <Directory {folder.path}>
+    <Limit READ DIRS>
+      AllowAll
+    </Limit>
+'''
+            if permission == 'write' and inherited[folder.pk][1]:
+                body += '''    # Over hard quota: uploads disabled
+    <Limit DELE RMD XRMD>
+      AllowAll
+    </Limit>
+'''
+            elif permission == 'write':
+                body += '''    <Limit WRITE STOR DELE MKD RMD>
+      AllowAll
+    </Limit>
+'''
+            body += '''  </Directory>
+'''
+        for expression in ifuser_expressions(usernames):
+            config += f'''
+<IfUser {expression}>
+{body}</IfUser>
+'''
+
+    return config
+
+
+def generate_proftpd_config(auth_backend='file', sql_db_path=DEFAULT_SQL_DB_PATH, acl_mode='directory', usernames=None):
     """Generate ProFTPD user configuration file content
 
     This generates only user-specific settings to be included via:
     Include /etc/proftpd/conf.d/*.conf
 
     Server settings (ServerType, Port, etc.) should be in main proftpd.conf
+
+    auth_backend selects how virtual users are looked up: 'file' uses
+    ftpd.passwd via mod_auth_file, 'sql' uses the SQLite database at
+    sql_db_path via mod_sql.
+
+    acl_mode 'directory' emits one <Directory> block per folder with the
+    AllowUser lists; 'ifuser' emits per-user <IfUser> sections instead
+    (see generate_ifuser_rules).
+
+    usernames (a set) limits the output to the users of one node: only
+    they appear in AllowUser lines and per-user sections, and only groups
+    with one of them as a member in AllowGroup. Every folder keeps its
+    rules, so folders used only by other nodes' users stay denied.
     """
 
-    users = FTPUser.objects.filter(is_active=True).prefetch_related('folder_access__folder')
-    folders = Folder.objects.all()
+    users = FTPUser.objects.filter(is_active=True)
+
+    if auth_backend == 'sql':
+        auth_config = generate_sql_auth_config(sql_db_path)
+    else:
+        auth_config = '''# Virtual users authentication
+AuthUserFile /etc/proftpd/ftpd.passwd
+'''
+        if FTPGroup.objects.exists():
+            auth_config += '''AuthGroupFile /etc/proftpd/ftpd.group
+'''
+        auth_config += '''AuthOrder mod_auth_file.c
+'''
 
-    config = '''# ProFTPD User Configuration
+    config = f'''# ProFTPD User Configuration
 # Generated by ProFTPD Control Panel
 # DO NOT EDIT MANUALLY - changes will be overwritten
 #
 # Include this file in proftpd.conf:
 #   Include /etc/proftpd/conf.d/*.conf
 
-# Virtual users authentication
-AuthUserFile /etc/proftpd/ftpd.passwd
-AuthOrder mod_auth_file.c
-
+{auth_config}
 # Security settings for virtual users
 RequireValidShell off
 
 '''
 
-    # Generate directory access rules for each folder
-    for folder in folders:
-        access_rules = FolderAccess.objects.filter(folder=folder).select_related('user')
+    if get_quota_users().exists():
+        config += generate_quota_config(sql_db_path, auth_backend) + '\n'
 
-        if not access_rules.exists():
+    for user in users:
+        if user.has_limits() and (usernames is None or user.username in usernames):
+            config += generate_user_limits(user)
+
+    # mod_quotatab has no per-directory quotas: folders at their hard limit
+    # (as of the last usage scan) are made read-only instead
+    usage = {u.folder_id: u for u in FolderUsage.objects.defer('dir_cache')}
+
+    acls = collect_folder_acls()
+    if acl_mode == 'ifuser':
+        config += generate_ifuser_rules(acls, usage, usernames)
+        return config
+
+    # A <Directory> block applies to its subdirectories, so subfolders only
+    # get their own block where the effective rules differ from the parent's
+    inherited = inherit_folder_settings(acls, usage)
+    if usernames is not None:
+        acls = node_folder_acls(acls, usernames)
+    signatures = {}
+    for folder, read_users, write_users, read_groups, write_groups in acls:
+        rates, over_quota, reachable = inherited[folder.pk]
+        signature = (read_users, write_users, read_groups, write_groups, rates, over_quota)
+        signatures[folder.pk] = signature
+        if not reachable or signature == signatures.get(folder.parent_id):
             continue
 
-        read_users = []
-        write_users = []
-
-        for access in access_rules:
-            if not access.user.is_active:
-                continue
-            if access.permission == 'read':
-                read_users.append(access.user.username)
-            elif access.permission == 'write':
-                write_users.append(access.user.username)
-                read_users.append(access.user.username)  # write implies read
-
-        if read_users or write_users:
-            config += f'''
+        config += f'''
 # Access rules for: {folder.name}
 <Directory {folder.path}>
 '''
-            if read_users:
-                config += f'''  <Limit READ DIRS>
-    AllowUser {" ".join(read_users)}
-    DenyAll
+        config += generate_transfer_rates(*rates, '  ')
+        config += f'''  <Limit READ DIRS>
+{allow_lines(read_users, read_groups, '    ')}    DenyAll
   </Limit>
 '''
-            if write_users:
-                config += f'''  <Limit WRITE STOR DELE MKD RMD>
-    AllowUser {" ".join(write_users)}
+        if (write_users or write_groups) and over_quota:
+            # Deleting stays allowed so writers can free up space
+            config += f'''  # Over hard quota: uploads disabled
+  <Limit DELE RMD XRMD>
+{allow_lines(write_users, write_groups, '    ')}    DenyAll
+  </Limit>
+  <Limit STOR STOU APPE MKD XMKD RNTO>
     DenyAll
   </Limit>
 '''
-            else:
-                config += f'''  <Limit WRITE STOR DELE MKD RMD>
+        elif write_users or write_groups:
+            config += f'''  <Limit WRITE STOR DELE MKD RMD>
+{allow_lines(write_users, write_groups, '    ')}    DenyAll
+  </Limit>
+'''
+        else:
+            config += f'''  <Limit WRITE STOR DELE MKD RMD>
     DenyAll
   </Limit>
 '''
-            config += '</Directory>\n'
+        config += '</Directory>\n'
+
+    return config
+
+
+def get_scoreboard_file(tuning=None):
+    """ScoreboardFile path from ServerTuning, falling back to settings"""
+    tuning = tuning or ServerTuning.current()
+    return tuning.scoreboard_file or settings.PROFTPD_SCOREBOARD_FILE
+
+
+def generate_tuning_config(tuning=None):
+    """Generate conf.d/00-tuning.conf from the ServerTuning settings
+
+    The file sorts before users.conf so that per-user limits there can
+    override the server-wide defaults.
+    """
+    tuning = tuning or ServerTuning.current()
+
+    config = f'''# ProFTPD Server Tuning
+# Generated by ProFTPD Control Panel
+# DO NOT EDIT MANUALLY - changes will be overwritten
+# Preset: {tuning.get_preset_display()}
+
+# Connections
+MaxInstances {tuning.max_instances}
+MaxClientsPerHost {tuning.max_clients_per_host}
+
+# Timeouts (seconds)
+TimeoutLogin {tuning.timeout_login}
+TimeoutIdle {tuning.timeout_idle}
+TimeoutNoTransfer {tuning.timeout_no_transfer}
+TimeoutStalled {tuning.timeout_stalled}
+
+# Transfers
+UseSendfile {"on" if tuning.use_sendfile else "off"}
+'''
 
+    buffers = []
+    if tuning.socket_rcvbuf:
+        buffers.append(f"rcvbuf {tuning.socket_rcvbuf}")
+    if tuning.socket_sndbuf:
+        buffers.append(f"sndbuf {tuning.socket_sndbuf}")
+    if buffers:
+        config += f"SocketOptions {' '.join(buffers)}\n"
+
+    config += f'''
+# Read by the control panel for the live session view
+ScoreboardFile {get_scoreboard_file(tuning)}
+'''
     return config
 
 
@@ -102,32 +473,97 @@ def get_uid_gid(systemuser):
         return "1001", "1001"
 
 
-def generate_ftpusers_file():
+def iter_passwd_entries(usernames=None):
     """
-    Generate ftpd.passwd file for ProFTPD virtual users
+    Yield passwd fields for every active FTP user, or those in usernames
 
-    Format: username:password_hash:uid:gid:gecos:homedir:shell
+    Each entry is a tuple (username, password_hash, uid, gid, gecos, homedir, shell)
+    shared by the ftpd.passwd file and the mod_sql users table. Users without a
+    password get LOCKED_PASSWORD.
     """
     users = FTPUser.objects.filter(is_active=True)
-
-    lines = [
-        "# ProFTPD virtual users file",
-        "# Generated by ProFTPD Control Panel",
-        "# Format: username:password:uid:gid:gecos:homedir:shell",
-    ]
+    permissions = effective_permissions()
 
     shell = "/bin/false"
 
     for user in users:
+        if usernames is not None and user.username not in usernames:
+            continue
         # Get UID/GID from systemuser field
         uid, gid = get_uid_gid(user.systemuser)
 
         # Get first accessible folder as home dir, or /tmp if none
-        first_access = user.folder_access.first()
+        accessible = permissions.get(user.pk, {})
+        first_access = user.folder_access.filter(folder_id__in=accessible).first()
+        if first_access is None:
+            first_access = (
+                GroupFolderAccess.objects.filter(group__members=user, folder_id__in=accessible).order_by('pk').first()
+            )
         home_dir = first_access.folder.path if first_access else "/tmp"
 
-        line = f"{user.username}:{user.password_hash}:{uid}:{gid}:{user.username}:{home_dir}:{shell}"
-        lines.append(line)
+        yield (user.username, user.password_hash or LOCKED_PASSWORD, uid, gid, user.username, home_dir, shell)
+
+
+def activity_sort_key(entry, activity):
+    """
+    Sort key placing the most active users first in ftpd.passwd
+
+    Counts are bucketed by powers of two so that small day-to-day changes in
+    activity do not reorder the file; users within a bucket are sorted by
+    username so the output is stable between deploys.
+    """
+    username = entry[0]
+    return (-activity.get(username, 0).bit_length(), username)
+
+
+def generate_ftpusers_file(activity=None, usernames=None):
+    """
+    Generate ftpd.passwd file for ProFTPD virtual users
+
+    Format: username:password_hash:uid:gid:gecos:homedir:shell
+
+    mod_auth_file scans the file top to bottom on every login. If activity
+    (a mapping of username -> recent login/transfer count) is given, the most
+    active users are written first. usernames limits the file to the users
+    of one node.
+    """
+    lines = [
+        "# ProFTPD virtual users file",
+        "# Generated by ProFTPD Control Panel",
+        "# Format: username:password:uid:gid:gecos:homedir:shell",
+    ]
+
+    entries = iter_passwd_entries(usernames)
+    if activity is not None:
+        entries = sorted(entries, key=lambda entry: activity_sort_key(entry, activity))
+
+    for entry in entries:
+        lines.append(":".join(entry))
+
+    return "\n".join(lines)
+
+
+def generate_ftpgroup_file(usernames=None):
+    """
+    Generate ftpd.group file for ProFTPD virtual groups (AuthGroupFile)
+
+    Format: groupname:password:gid:member1,member2
+
+    Only active users, and only those in usernames if given, are listed as
+    members.
+    """
+    lines = [
+        "# ProFTPD virtual groups file",
+        "# Generated by ProFTPD Control Panel",
+        "# Format: groupname:password:gid:members",
+    ]
+
+    for group in FTPGroup.objects.prefetch_related('members'):
+        members = sorted(
+            user.username for user in group.members.all()
+            if user.is_active and (usernames is None or user.username in usernames)
+        )
+        lines.append(f"{group.name}:x:{group.gid}:{','.join(members)}")
 
     return "\n".join(lines)
 
@@ -136,8 +572,8 @@ def generate_user_config(user):
     """Generate config snippet for a specific user"""
     config = f"# Configuration for user: {user.username}\n"
 
+    labels = {'read': "Read Only", 'write': "Read & Write", 'deny': "No Access"}
     for access in user.folder_access.all():
-        perm_str = "Read & Write" if access.permission == 'write' else "Read Only"
-        config += f"# - {access.folder.path}: {perm_str}\n"
+        config += f"# - {access.folder.path}: {labels[access.permission]}\n"
 
     return config
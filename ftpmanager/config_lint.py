@@ -0,0 +1,202 @@
+"""
+Configuration Linter
+
+Validates generated users.conf, ftpd.passwd and ftpd.group content in
+process, before anything is written. It covers the mistakes the generator
+could make (unbalanced blocks, unknown <Limit> commands, duplicate
+<Directory> paths, malformed passwd/group entries, root UIDs, overlong
+lines) without needing a proftpd binary or the full server config.
+"""
+
+import re
+from collections import namedtuple
+
+from .config_generator import MAX_DIRECTIVE_LENGTH
+from .models import ACCOUNT_NAME_RE
+from .paths import normalize_path
+
+
+LintIssue = namedtuple('LintIssue', 'level filename line message')
+
+# Configuration sections the generated files may contain
+SECTIONS = {'Anonymous', 'Class', 'Directory', 'Global', 'IfClass', 'IfGroup', 'IfModule', 'IfUser', 'Limit', 'VirtualHost'}
+
+LIMIT_GROUPS = {'ALL', 'DIRS', 'LOGIN', 'READ', 'WRITE'}
+FTP_COMMANDS = {
+    'ABOR', 'ACCT', 'ALLO', 'APPE', 'AUTH', 'CCC', 'CDUP', 'CLNT', 'CWD', 'DELE', 'EPRT', 'EPSV', 'FEAT', 'HELP',
+    'HOST', 'LANG', 'LIST', 'MDTM', 'MFMT', 'MKD', 'MLSD', 'MLST', 'MODE', 'NLST', 'NOOP', 'OPTS', 'PASS', 'PASV',
+    'PBSZ', 'PORT', 'PROT', 'PWD', 'QUIT', 'REIN', 'REST', 'RETR', 'RMD', 'RNFR', 'RNTO', 'SITE', 'SITE_CHGRP',
+    'SITE_CHMOD', 'SITE_COPY', 'SITE_CPFR', 'SITE_CPTO', 'SITE_MKDIR', 'SITE_RMDIR', 'SITE_SYMLINK', 'SITE_UTIME',
+    'SIZE', 'SMNT', 'STAT', 'STOR', 'STOU', 'STRU', 'SYST', 'TYPE', 'USER', 'XCUP', 'XCWD', 'XMKD', 'XPWD', 'XRMD',
+}
+# Directives that only make sense inside a <Limit> section
+LIMIT_DIRECTIVES = {'AllowAll', 'AllowGroup', 'AllowUser', 'DenyAll', 'DenyGroup', 'DenyUser', 'Order'}
+
+SECTION_RE = re.compile(r'^<(/?)([A-Za-z]+)(?:\s+(.*?))?\s*>$')
+MAX_ID = 4294967294
+
+
+def lint_config(text, filename='users.conf'):
+    """Return the LintIssues of a ProFTPD configuration file"""
+    issues = []
+    stack = []  # (name, argument, line)
+    directories = {}  # (enclosing sections, normalized path) -> line
+
+    for number, raw in enumerate(text.split('\n'), 1):
+        if len(raw) > MAX_DIRECTIVE_LENGTH:
+            issues.append(LintIssue('error', filename, number, f'Line is {len(raw)} characters, longer than {MAX_DIRECTIVE_LENGTH}'))
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        match = SECTION_RE.match(line)
+        if line.startswith('<') and not match:
+            issues.append(LintIssue('error', filename, number, f'Malformed section tag: {line}'))
+            continue
+
+        if match is None:
+            directive = line.split(None, 1)[0]
+            if directive in LIMIT_DIRECTIVES and not any(name == 'Limit' for name, _arg, _line in stack):
+                issues.append(LintIssue('error', filename, number, f'{directive} outside of a <Limit> section'))
+            continue
+
+        closing, name, argument = match.group(1), match.group(2), (match.group(3) or '').strip()
+        if name not in SECTIONS:
+            issues.append(LintIssue('error', filename, number, f'Unknown section <{name}>'))
+            continue
+
+        if closing:
+            if not stack:
+                issues.append(LintIssue('error', filename, number, f'</{name}> without matching <{name}>'))
+            elif stack[-1][0] != name:
+                open_name, _arg, open_line = stack[-1]
+                issues.append(LintIssue('error', filename, number, f'</{name}> closes <{open_name}> opened on line {open_line}'))
+            else:
+                stack.pop()
+            continue
+
+        if not argument and name in ('Directory', 'Limit', 'IfModule', 'IfUser', 'IfGroup'):
+            issues.append(LintIssue('error', filename, number, f'<{name}> needs an argument'))
+        if name == 'Limit':
+            for command in argument.split():
+                if command.upper() not in FTP_COMMANDS | LIMIT_GROUPS:
+                    issues.append(LintIssue('error', filename, number, f'Unknown command in <Limit>: {command}'))
+        elif name == 'Directory' and argument:
+            issues.extend(check_directory(filename, number, argument, stack, directories))
+        stack.append((name, argument, number))
+
+    for name, _argument, number in stack:
+        issues.append(LintIssue('error', filename, number, f'<{name}> is never closed'))
+    return issues
+
+
+def check_directory(filename, number, path, stack, directories):
+    """Issues of a <Directory> tag; records it in directories"""
+    if any(name == 'Directory' for name, _arg, _line in stack):
+        return [LintIssue('error', filename, number, '<Directory> nested inside <Directory>')]
+    if not path.startswith(('/', '~')):
+        return [LintIssue('error', filename, number, f'<Directory> path must be absolute: {path}')]
+
+    context = tuple((name, argument) for name, argument, _line in stack)
+    key = (context, normalize_path(path) if path.startswith('/') else path)
+    if key in directories:
+        return [LintIssue('error', filename, number, f'<Directory {path}> duplicates line {directories[key]}')]
+    directories[key] = number
+    return []
+
+
+def lint_passwd(text, filename='ftpd.passwd'):
+    """Return the LintIssues of an AuthUserFile (passwd format)"""
+    issues = []
+    seen = {}
+    for number, line in enumerate(text.split('\n'), 1):
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split(':')
+        if len(fields) != 7:
+            issues.append(LintIssue('error', filename, number, f'Expected 7 fields, found {len(fields)}'))
+            continue
+        username, password, uid, gid, _gecos, home, shell = fields
+
+        issues.extend(check_account_name(filename, number, username, 'username', seen))
+        if not password or any(c.isspace() for c in password):
+            issues.append(LintIssue('error', filename, number, f'Empty or malformed password hash for {username}'))
+        issues.extend(check_id(filename, number, uid, 'UID', username))
+        issues.extend(check_id(filename, number, gid, 'GID', username))
+        if not home.startswith('/'):
+            issues.append(LintIssue('error', filename, number, f'Home directory of {username} is not absolute: {home}'))
+        if not shell.startswith('/'):
+            issues.append(LintIssue('error', filename, number, f'Shell of {username} is not absolute: {shell}'))
+    return issues
+
+
+def lint_group(text, filename='ftpd.group', usernames=None):
+    """Return the LintIssues of an AuthGroupFile; usernames enables member checks"""
+    issues = []
+    seen = {}
+    gids = {}
+    for number, line in enumerate(text.split('\n'), 1):
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split(':')
+        if len(fields) != 4:
+            issues.append(LintIssue('error', filename, number, f'Expected 4 fields, found {len(fields)}'))
+            continue
+        name, _password, gid, members = fields
+
+        issues.extend(check_account_name(filename, number, name, 'group name', seen))
+        id_issues = check_id(filename, number, gid, 'GID', name)
+        issues.extend(id_issues)
+        if not id_issues and gid in gids:
+            issues.append(LintIssue('error', filename, number, f'GID {gid} already used on line {gids[gid]}'))
+        gids.setdefault(gid, number)
+        if usernames is not None:
+            for member in filter(None, members.split(',')):
+                if member not in usernames:
+                    issues.append(LintIssue('warning', filename, number, f'Member {member} of {name} is not in the passwd file'))
+    return issues
+
+
+def check_account_name(filename, number, name, kind, seen):
+    issues = []
+    if not ACCOUNT_NAME_RE.match(name):
+        issues.append(LintIssue('error', filename, number, f'Invalid {kind}: {name!r}'))
+    elif name in seen:
+        issues.append(LintIssue('error', filename, number, f'Duplicate {kind} {name}, first on line {seen[name]}'))
+    seen.setdefault(name, number)
+    return issues
+
+
+def check_id(filename, number, value, kind, owner):
+    if not value.isdigit():
+        return [LintIssue('error', filename, number, f'{kind} of {owner} is not a number: {value!r}')]
+    if int(value) == 0:
+        return [LintIssue('error', filename, number, f'{kind} of {owner} is 0 (root)')]
+    if int(value) > MAX_ID:
+        return [LintIssue('error', filename, number, f'{kind} of {owner} is out of range: {value}')]
+    if int(value) < 100:
+        return [LintIssue('warning', filename, number, f'{kind} of {owner} is a system ID: {value}')]
+    return []
+
+
+def usernames_of(passwd_text):
+    """Usernames listed in passwd content"""
+    return {line.split(':', 1)[0] for line in passwd_text.split('\n') if line and not line.startswith('#')}
+
+
+def lint_files(config=None, passwd=None, group=None, tuning=None):
+    """Lint whichever generated files are given and return all issues"""
+    issues = []
+    if tuning is not None:
+        issues += lint_config(tuning, '00-tuning.conf')
+    if config is not None:
+        issues += lint_config(config)
+    if passwd is not None:
+        issues += lint_passwd(passwd)
+    if group is not None:
+        issues += lint_group(group, usernames=usernames_of(passwd) if passwd is not None else None)
+    return issues
+
+
+def format_issue(issue):
+    return f'{issue.filename}:{issue.line}: {issue.level}: {issue.message}'
@@ -0,0 +1,106 @@
+"""
+Config Preview
+
+Splits generated files into sections for the Generate Config page. The
+page renders a table of contents and loads single sections or pages of
+ftpd.passwd on demand, so a large configuration is never sent to the
+browser in one piece.
+"""
+
+import re
+from collections import namedtuple
+
+from .config_diff import config_blocks
+
+
+Section = namedtuple('Section', 'index key title start lines bytes users groups folders')
+PasswdEntry = namedtuple('PasswdEntry', 'line username uid gid home shell')
+
+IFUSER_RE = re.compile(r'^<IfUser\s+(.+?)\s*>$')
+DIRECTORY_RE = re.compile(r'^<Directory\s+(.+?)\s*>$')
+
+
+def config_sections(text):
+    """Return (sections, lines of each section) of a generated config"""
+    sections = []
+    bodies = []
+    start = 1
+    for index, (key, lines) in enumerate(config_blocks(text.splitlines(keepends=True))):
+        users, groups = section_principals(lines)
+        sections.append(Section(
+            index=index,
+            key=key,
+            title=section_title(key, lines),
+            start=start,
+            lines=len(lines),
+            bytes=sum(len(line.encode()) for line in lines),
+            users=users,
+            groups=groups,
+            folders=[match.group(1) for match in map(DIRECTORY_RE.match, (line.strip() for line in lines)) if match],
+        ))
+        bodies.append(lines)
+        start += len(lines)
+    return sections, bodies
+
+
+def section_title(key, lines):
+    """The first descriptive comment of a section, else its key"""
+    for line in lines:
+        comment = line.strip().lstrip('#').strip()
+        if line.strip().startswith('#') and comment:
+            return comment
+    return key
+
+
+def section_principals(lines):
+    """Sorted usernames and group names a section names"""
+    users = set()
+    groups = set()
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0] == 'AllowUser':
+            users.update(fields[1:])
+        elif fields[0] == 'AllowGroup':
+            groups.update(fields[1:])
+        match = IFUSER_RE.match(line.strip())
+        if match:
+            users.update(ifuser_names(match.group(1)))
+    return sorted(users), sorted(groups)
+
+
+def ifuser_names(argument):
+    """Usernames of an <IfUser> argument, a name or a generated 'regex ^(a|b)$'"""
+    if not argument.startswith('regex '):
+        return [argument]
+    expression = argument[len('regex '):].strip()
+    if expression.startswith('^(') and expression.endswith(')$'):
+        expression = expression[2:-2]
+    return [re.sub(r'\\(.)', r'\1', name) for name in expression.split('|')]
+
+
+def filter_sections(sections, user=None, folder=None):
+    """Sections that name the user and whose title or a <Directory> path contains folder"""
+    if user:
+        sections = [section for section in sections if user in section.users]
+    if folder:
+        folder = folder.lower()
+        sections = [
+            section for section in sections
+            if folder in section.title.lower() or any(folder in path.lower() for path in section.folders)
+        ]
+    return sections
+
+
+def passwd_entries(text, user=None):
+    """PasswdEntries of ftpd.passwd content, optionally where the username contains user"""
+    entries = []
+    for number, line in enumerate(text.split('\n'), 1):
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split(':')
+        if len(fields) != 7 or (user and user not in fields[0]):
+            continue
+        entries.append(PasswdEntry(number, fields[0], fields[2], fields[3], fields[5], fields[6]))
+    return entries
@@ -0,0 +1,137 @@
+"""
+Multi-Target Deployment
+
+Writes one generated file set to several ProFTPD nodes. Targets come from
+settings.PROFTPD_DEPLOY_TARGETS or a JSON targets file; each has its own
+config directory, reload strategy and snapshot store (its state). Targets
+are deployed in parallel on a thread pool, so a slow node does not hold
+up the others, and a result with timing is reported for each.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from .snapshots import SnapshotStore, write_atomic
+
+
+DeployTarget = namedtuple('DeployTarget', 'name config_dir reload snapshot_dir node sql_db_path', defaults=(None,))
+TargetResult = namedtuple('TargetResult', 'target ok changed written revision seconds error')
+
+RELOAD_COMMANDS = {
+    'none': None,
+    'reload': ['systemctl', 'reload', 'proftpd'],
+    'restart': ['systemctl', 'restart', 'proftpd'],
+}
+
+
+def parse_targets(definitions):
+    """
+    DeployTargets from a list of dicts
+
+    Each needs "name" and "config_dir"; "reload" is none (default),
+    reload, restart or a command as a list of arguments, and
+    "snapshot_dir" defaults to "snapshots" inside config_dir. A target with
+    a "node" (an FTPNode name) gets only that node's users. "sql_db_path" is
+    the SQLite database as the target's ProFTPD opens it, for when that
+    differs from the synced file inside config_dir (e.g. a mounted
+    directory). Raises ValueError for malformed definitions.
+    """
+    targets = []
+    names = set()
+    for definition in definitions:
+        if not isinstance(definition, dict) or not definition.get('name') or not definition.get('config_dir'):
+            raise ValueError(f'Target needs a "name" and a "config_dir": {definition!r}')
+        name = definition['name']
+        if name in names:
+            raise ValueError(f'Duplicate target name: {name}')
+        names.add(name)
+        reload = definition.get('reload', 'none')
+        if isinstance(reload, list):
+            valid = bool(reload) and all(isinstance(argument, str) for argument in reload)
+        else:
+            valid = reload in RELOAD_COMMANDS
+        if not valid:
+            raise ValueError(f'Target {name}: reload must be one of {", ".join(RELOAD_COMMANDS)} or a command list')
+        sql_db_path = definition.get('sql_db_path')
+        if sql_db_path is not None and not (isinstance(sql_db_path, str) and sql_db_path.startswith('/')):
+            raise ValueError(f'Target {name}: sql_db_path must be an absolute path')
+        targets.append(DeployTarget(
+            name=name,
+            config_dir=definition['config_dir'],
+            reload=reload,
+            snapshot_dir=definition.get('snapshot_dir', 'snapshots'),
+            node=definition.get('node'),
+            sql_db_path=sql_db_path,
+        ))
+    return targets
+
+
+def load_targets(path=None):
+    """Targets from a JSON file (a list, or {"targets": [...]}) or from settings"""
+    if path is None:
+        return parse_targets(getattr(settings, 'PROFTPD_DEPLOY_TARGETS', []))
+    with open(path) as f:
+        data = json.load(f)
+    return parse_targets(data['targets'] if isinstance(data, dict) else data)
+
+
+def file_sha256(path):
+    """sha256 hex digest of a file, None if it doesn't exist"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def deploy_to_target(target, files, acl_revision=None, force=False):
+    """
+    Write files ({relative path: (content, mode)}) to one target
+
+    Changed files are replaced atomically, the set is recorded in the
+    target's snapshot store and, if anything changed, the target's reload
+    command runs. Errors are returned in the result, not raised.
+    """
+    started = time.perf_counter()
+    written = []
+    revision = None
+    try:
+        for relpath, (content, mode) in sorted(files.items()):
+            path = os.path.join(target.config_dir, relpath)
+            data = content.encode()
+            if force or file_sha256(path) != hashlib.sha256(data).hexdigest():
+                os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+                write_atomic(path, data, mode)
+                written.append(relpath)
+
+        store = SnapshotStore(os.path.join(target.config_dir, target.snapshot_dir))
+        revision = store.record(files, acl_revision=acl_revision)['rev']
+
+        command = RELOAD_COMMANDS.get(target.reload) if isinstance(target.reload, str) else target.reload
+        if written and command:
+            result = subprocess.run(command, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise OSError(f'{" ".join(command)} failed: {result.stderr.strip() or result.returncode}')
+    except OSError as e:
+        return TargetResult(target, False, bool(written), written, revision, time.perf_counter() - started, str(e))
+    return TargetResult(target, True, bool(written), written, revision, time.perf_counter() - started, None)
+
+
+def deploy_parallel(jobs, acl_revision=None, force=False, workers=None):
+    """Deploy (target, files) jobs on a thread pool and yield TargetResults as they finish"""
+    if not jobs:
+        return
+    with ThreadPoolExecutor(max_workers=workers or min(len(jobs), 8)) as pool:
+        futures = [pool.submit(deploy_to_target, target, files, acl_revision, force) for target, files in jobs]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,435 @@
+"""
+Directory Sync
+
+Keeps FTP users and group memberships in line with an export of an
+external directory: an LDIF file as written by ldapsearch or slapcat, or a
+CSV file. The export is compared with the database by username and only
+the differences are written, with bulk queries in batches: new users are
+created, users whose password hash, system user or state differ are
+updated, and users missing from the export are deactivated, never
+deleted. Passwords given as crypt hashes are compared as they are; plain
+text passwords are only hashed when they no longer match the stored hash.
+
+Syncing an export that has not changed writes nothing, so the generated
+files and the ACL revision stay the same and a following deploy_config
+finds no changes.
+"""
+
+import base64
+import csv
+import re
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+from passlib.hash import sha512_crypt
+
+from .models import ACCOUNT_NAME_RE, FTPGroup, FTPUser, bump_acl_revision
+
+
+BATCH_SIZE = 2000
+
+DirectoryUser = namedtuple('DirectoryUser', 'username password_hash password systemuser active line')
+
+CRYPT_RE = re.compile(r'^[!*]*\$[0-9a-z]+\$')
+GROUP_CLASSES = {'posixgroup', 'groupofnames', 'groupofuniquenames'}
+# Attributes that mark an LDAP account as locked when present (and not "false")
+LOCK_ATTRIBUTES = ['nsaccountlock', 'pwdaccountlockedtime']
+CSV_COLUMNS = {'username', 'password_hash', 'password', 'systemuser', 'groups', 'active'}
+TRUE_VALUES = {'1', 'yes', 'true', 'y'}
+FALSE_VALUES = {'0', 'no', 'false', 'n'}
+LIST_SEPARATOR_RE = re.compile(r'[;,\s]+')
+
+
+class DirectorySource:
+    """Users and group memberships read from an export"""
+
+    def __init__(self):
+        self.users = {}
+        # {group name: set of usernames}, None if the export has no group data
+        self.groups = None
+        self.warnings = []
+
+    def add_user(self, user, kind):
+        """Add user unless its name is invalid or taken; returns whether it was added"""
+        if not ACCOUNT_NAME_RE.match(user.username):
+            self.warnings.append(f'{kind} line {user.line}: invalid username {user.username!r}, skipped')
+            return False
+        if user.username in self.users:
+            self.warnings.append(f'{kind} line {user.line}: duplicate user {user.username}')
+            return False
+        self.users[user.username] = user
+        return True
+
+    def add_member(self, group, username):
+        if self.groups is None:
+            self.groups = {}
+        self.groups.setdefault(group, set()).add(username)
+
+
+def password_fields(value):
+    """(password_hash, password) of a userPassword value; both None for schemes ProFTPD cannot check"""
+    if value.upper().startswith('{CRYPT}'):
+        return value[7:], None
+    if value.startswith('{'):
+        return None, None
+    if CRYPT_RE.match(value):
+        return value, None
+    return None, value
+
+
+def ldif_records(lines):
+    """Yield (line number, [unfolded attribute lines]) for each LDIF record"""
+    record = []
+    start = None
+    in_comment = False
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line.startswith(' '):
+            # Continuation of the previous line
+            if record and not in_comment:
+                record[-1] += line[1:]
+            continue
+        in_comment = line.startswith('#')
+        if in_comment:
+            continue
+        if not line.strip():
+            if record:
+                yield start, record
+            record, start = [], None
+            continue
+        record.append(line)
+        start = start or number
+    if record:
+        yield start, record
+
+
+def ldif_entries(lines, warnings):
+    """Yield (line number, {lowercase attribute: [values]}) for each LDIF entry"""
+    for number, record in ldif_records(lines):
+        entry = {}
+        for line in record:
+            name, separator, value = line.partition(':')
+            if not separator:
+                warnings.append(f'ldif line {number}: "{line[:40]}" is not an attribute')
+                continue
+            name = name.split(';')[0].strip().lower()
+            if value.startswith(':'):
+                try:
+                    value = base64.b64decode(value[1:].strip(), validate=True).decode('utf-8')
+                except (ValueError, UnicodeDecodeError):
+                    warnings.append(f'ldif line {number}: {name} is not valid base64 UTF-8')
+                    continue
+            elif value.startswith('<'):
+                warnings.append(f'ldif line {number}: {name} refers to a URL, which is not read')
+                continue
+            else:
+                value = value.lstrip(' ')
+            entry.setdefault(name, []).append(value)
+        if set(entry) <= {'version'}:
+            continue
+        if 'changetype' in entry:
+            warnings.append(f'ldif line {number}: change records are not supported, entry skipped')
+            continue
+        yield number, entry
+
+
+def normalize_dn(dn):
+    return ','.join(part.strip().lower().replace(' = ', '=') for part in dn.split(','))
+
+
+def first_rdn(dn):
+    """(attribute, value) of the first component of a DN"""
+    attribute, _, value = dn.split(',')[0].partition('=')
+    return attribute.strip().lower(), value.strip()
+
+
+def read_ldif(lines):
+    """Parse an LDIF export into a DirectorySource"""
+    source = DirectorySource()
+    usernames_by_dn = {}
+    group_members = []
+    for number, entry in ldif_entries(lines, source.warnings):
+        classes = {value.lower() for value in entry.get('objectclass', [])}
+        if classes & GROUP_CLASSES:
+            if 'cn' not in entry:
+                source.warnings.append(f'ldif line {number}: group without cn')
+                continue
+            name = entry['cn'][0]
+            if source.groups is None:
+                source.groups = {}
+            source.groups.setdefault(name, set())
+            group_members.extend((name, username, number) for username in entry.get('memberuid', []))
+            group_members.extend(
+                (name, ('dn', dn), number) for dn in entry.get('member', []) + entry.get('uniquemember', [])
+            )
+        elif 'uid' in entry:
+            username = entry['uid'][0]
+            password_hash = password = None
+            if 'userpassword' in entry:
+                password_hash, password = password_fields(entry['userpassword'][0])
+                if password_hash is None and password is None:
+                    source.warnings.append(
+                        f'ldif line {number}: password scheme of {username} cannot be used by ProFTPD, password not synced'
+                    )
+            locked = any(
+                entry.get(attribute) and entry[attribute][0].lower() != 'false' for attribute in LOCK_ATTRIBUTES
+            )
+            uid_number = entry.get('uidnumber', [None])[0]
+            if not source.add_user(DirectoryUser(username, password_hash, password, uid_number, not locked, number), 'ldif'):
+                continue
+            if 'dn' in entry:
+                usernames_by_dn[normalize_dn(entry['dn'][0])] = username
+            for dn in entry.get('memberof', []):
+                source.add_member(first_rdn(dn)[1], username)
+
+    for group, member, number in group_members:
+        if isinstance(member, tuple):
+            dn = member[1]
+            username = usernames_by_dn.get(normalize_dn(dn))
+            if username is None:
+                attribute, value = first_rdn(dn)
+                username = value if attribute == 'uid' else None
+            if username is None:
+                source.warnings.append(f'ldif line {number}: member {dn} of {group} is not a user in the export')
+                continue
+            member = username
+        source.add_member(group, member)
+    return source
+
+
+def parse_flag(value):
+    """True/False for yes/no style values, None if not recognized"""
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return None
+
+
+def read_csv(lines):
+    """
+    Parse a CSV export with a header row into a DirectorySource
+
+    Columns: username (required), password_hash, password, systemuser,
+    groups (separated by ";", "," or spaces) and active (yes/no).
+    """
+    source = DirectorySource()
+    reader = csv.DictReader(lines)
+    header = {name.strip().lower() for name in reader.fieldnames or []}
+    if 'username' not in header:
+        raise ValueError('CSV header has no "username" column')
+    unknown = header - CSV_COLUMNS
+    if unknown:
+        source.warnings.append(f'csv: ignoring unknown column(s) {", ".join(sorted(unknown))}')
+    if 'groups' in header:
+        source.groups = {}
+
+    for row in reader:
+        row = {(name or '').strip().lower(): (value or '').strip() for name, value in row.items() if name}
+        number = reader.line_num
+        username = row.get('username', '')
+        if not username:
+            source.warnings.append(f'csv line {number}: no username')
+            continue
+        active = parse_flag(row['active']) if row.get('active') else True
+        if active is None:
+            source.warnings.append(f'csv line {number}: active must be yes or no, {username} skipped')
+            continue
+        password_hash = row.get('password_hash') or None
+        if password_hash and password_hash.upper().startswith('{CRYPT}'):
+            password_hash = password_hash[7:]
+        if not source.add_user(DirectoryUser(
+            username, password_hash, row.get('password') or None, row.get('systemuser') or None, active, number,
+        ), 'csv'):
+            continue
+        for group in LIST_SEPARATOR_RE.split(row.get('groups', '')):
+            if group:
+                source.add_member(group, username)
+    return source
+
+
+def password_matches(password, password_hash):
+    """Whether a plain text password matches a stored SHA-512 crypt hash"""
+    if not password_hash or not sha512_crypt.identify(password_hash):
+        return False
+    try:
+        return sha512_crypt.verify(password, password_hash)
+    except ValueError:
+        return False
+
+
+class SyncPlan:
+    """Changes that bring users and memberships in line with a DirectorySource"""
+
+    def __init__(self):
+        self.new_users = []
+        # (FTPUser with the new values, [changed field names])
+        self.changed_users = []
+        self.deactivated_users = []
+        self.unchanged_users = 0
+        self.new_members = []
+        self.removed_members = []
+        self.warnings = []
+
+    @property
+    def has_changes(self):
+        return any((self.new_users, self.changed_users, self.deactivated_users, self.new_members, self.removed_members))
+
+    def diff_lines(self):
+        """Yield the changes as '+' (new), '~' (changed) and '-' (deactivated or removed) lines"""
+        for user in self.new_users:
+            state = '' if user.is_active else ', inactive'
+            yield f'+ user {user.username} (uid {user.systemuser}{state})'
+        for user, fields in self.changed_users:
+            yield f'~ user {user.username}: {", ".join(field.replace("_", " ") for field in fields)}'
+        for _pk, username in self.deactivated_users:
+            yield f'- user {username} (deactivated)'
+        for group, username in self.new_members:
+            yield f'+ member {group} {username}'
+        for group, username in self.removed_members:
+            yield f'- member {group} {username}'
+
+    def summary(self):
+        return (
+            f'Users: {len(self.new_users)} new, {len(self.changed_users)} changed, '
+            f'{len(self.deactivated_users)} deactivated, {self.unchanged_users} unchanged. '
+            f'Memberships: {len(self.new_members)} added, {len(self.removed_members)} removed.'
+        )
+
+
+def plan_user(plan, user, existing):
+    """
+    Add the change for one exported user to plan; existing is (pk, hash, systemuser, active) or None
+
+    Users without a usable password are not activated: new ones are created
+    inactive and inactive ones stay inactive, with a warning either way.
+    """
+    if existing is None:
+        password_hash = user.password_hash or ''
+        if user.password_hash is None and user.password:
+            password_hash = sha512_crypt.hash(user.password)
+        new = FTPUser(username=user.username, password_hash=password_hash, is_active=user.active)
+        if user.systemuser:
+            new.systemuser = user.systemuser
+        if user.active and not password_hash:
+            new.is_active = False
+            plan.warnings.append(f'user {user.username} has no usable password; created inactive')
+        plan.new_users.append(new)
+        return
+
+    pk, password_hash, systemuser, is_active = existing
+    changed = FTPUser(pk=pk, username=user.username, password_hash=password_hash, systemuser=systemuser, is_active=is_active)
+    fields = []
+    if user.password_hash is not None:
+        if user.password_hash != password_hash:
+            changed.password_hash = user.password_hash
+            fields.append('password_hash')
+    elif user.password and not password_matches(user.password, password_hash):
+        changed.password_hash = sha512_crypt.hash(user.password)
+        fields.append('password_hash')
+    if user.systemuser and user.systemuser != systemuser:
+        changed.systemuser = user.systemuser
+        fields.append('systemuser')
+    active = user.active
+    if active and not is_active and not changed.password_hash:
+        active = False
+        plan.warnings.append(f'user {user.username} has no usable password; left inactive')
+    if active != is_active:
+        changed.is_active = active
+        fields.append('is_active')
+    if fields:
+        plan.changed_users.append((changed, fields))
+    else:
+        plan.unchanged_users += 1
+
+
+def plan_sync(source, deactivate_missing=True, managed_groups=()):
+    """
+    Compare a DirectorySource with the database and return a SyncPlan
+
+    Memberships are synced for the existing groups the export mentions and
+    for managed_groups; members of other groups are left alone.
+    """
+    plan = SyncPlan()
+    plan.warnings.extend(source.warnings)
+    existing = {
+        username: (pk, password_hash, systemuser, is_active)
+        for pk, username, password_hash, systemuser, is_active in FTPUser.objects.values_list(
+            'pk', 'username', 'password_hash', 'systemuser', 'is_active',
+        ).iterator(chunk_size=BATCH_SIZE)
+    }
+
+    for user in source.users.values():
+        plan_user(plan, user, existing.get(user.username))
+    if deactivate_missing:
+        plan.deactivated_users = sorted(
+            (pk, username) for username, (pk, _hash, _systemuser, is_active) in existing.items()
+            if is_active and username not in source.users
+        )
+
+    groups = source.groups or {}
+    known_groups = set(FTPGroup.objects.values_list('name', flat=True))
+    for name in sorted(groups.keys() - known_groups):
+        plan.warnings.append(f'group {name} does not exist in the panel, its members are not synced')
+    managed = (groups.keys() | set(managed_groups)) & known_groups
+    desired = set()
+    for name in managed:
+        for username in groups.get(name, ()):
+            if username in source.users:
+                desired.add((name, username))
+            else:
+                plan.warnings.append(f'member {username} of {name} is not a user in the export')
+    current = set(
+        FTPGroup.members.through.objects.filter(ftpgroup__name__in=managed)
+        .values_list('ftpgroup__name', 'ftpuser__username')
+    )
+    plan.new_members = sorted(desired - current)
+    plan.removed_members = sorted(current - desired)
+    return plan
+
+
+@transaction.atomic
+def apply_sync(plan):
+    """Write a SyncPlan to the database and return the number of rows written"""
+    now = timezone.now()
+    written = 0
+    FTPUser.objects.bulk_create(plan.new_users, batch_size=BATCH_SIZE)
+    written += len(plan.new_users)
+
+    # One bulk_update per set of changed fields, so unchanged columns are not rewritten
+    by_fields = {}
+    for user, fields in plan.changed_users:
+        user.updated_at = now
+        by_fields.setdefault(tuple(fields), []).append(user)
+    for fields, users in by_fields.items():
+        FTPUser.objects.bulk_update(users, list(fields) + ['updated_at'], batch_size=BATCH_SIZE)
+        written += len(users)
+
+    ids = [pk for pk, _username in plan.deactivated_users]
+    for start in range(0, len(ids), BATCH_SIZE):
+        written += FTPUser.objects.filter(pk__in=ids[start:start + BATCH_SIZE]).update(is_active=False, updated_at=now)
+
+    if plan.new_members or plan.removed_members:
+        usernames = {username for _group, username in plan.new_members + plan.removed_members}
+        user_ids = dict(FTPUser.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        group_ids = dict(FTPGroup.objects.values_list('name', 'pk'))
+        Membership = FTPGroup.members.through
+        Membership.objects.bulk_create(
+            [Membership(ftpgroup_id=group_ids[group], ftpuser_id=user_ids[username]) for group, username in plan.new_members],
+            batch_size=BATCH_SIZE,
+        )
+        written += len(plan.new_members)
+        removed = {}
+        for group, username in plan.removed_members:
+            removed.setdefault(group_ids[group], []).append(user_ids[username])
+        for group_id, members in removed.items():
+            for start in range(0, len(members), BATCH_SIZE):
+                written += Membership.objects.filter(
+                    ftpgroup_id=group_id, ftpuser_id__in=members[start:start + BATCH_SIZE],
+                ).delete()[0]
+
+    if written:
+        bump_acl_revision()
+    return written
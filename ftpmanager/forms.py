@@ -1,8 +1,20 @@
 from django import forms
-from .models import FTPUser, Folder, FolderAccess, UserProfile
+from .models import QUOTA_TYPE_CHOICES, FTPGroup, FTPUser, Folder, FolderAccess, ServerTuning, UserProfile
 
 
-class FTPUserForm(forms.ModelForm):
+class QuotaFormMixin(forms.Form):
+    """Optional quota_type, defaulting to a hard limit"""
+    quota_type = forms.ChoiceField(
+        choices=QUOTA_TYPE_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def clean_quota_type(self):
+        return self.cleaned_data.get('quota_type') or 'hard'
+
+
+class FTPUserForm(QuotaFormMixin, forms.ModelForm):
     password = forms.CharField(
         widget=forms.PasswordInput(attrs={'class': 'form-control'}),
         required=False,
@@ -11,11 +23,20 @@ class FTPUserForm(forms.ModelForm):
 
     class Meta:
         model = FTPUser
-        fields = ['username', 'systemuser', 'is_active']
+        fields = [
+            'username', 'systemuser', 'is_active', 'quota_bytes', 'quota_files', 'quota_type',
+            'download_rate', 'upload_rate', 'max_clients', 'max_clients_per_host',
+        ]
         widgets = {
             'username': forms.TextInput(attrs={'class': 'form-control'}),
             'systemuser': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'username or UID (e.g. www-data or 1001)'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'quota_bytes': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+            'quota_files': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+            'download_rate': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+            'upload_rate': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+            'max_clients': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'default'}),
+            'max_clients_per_host': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'default'}),
         }
 
     def save(self, commit=True):
@@ -28,14 +49,30 @@ class FTPUserForm(forms.ModelForm):
         return user
 
 
-class FolderForm(forms.ModelForm):
+class FolderForm(QuotaFormMixin, forms.ModelForm):
     class Meta:
         model = Folder
-        fields = ['name', 'path', 'description']
+        fields = ['name', 'path', 'description', 'quota_bytes', 'quota_files', 'quota_type', 'download_rate', 'upload_rate']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'path': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '/path/to/folder'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+            'quota_bytes': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+            'quota_files': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+            'download_rate': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+            'upload_rate': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'unlimited'}),
+        }
+
+
+class FTPGroupForm(forms.ModelForm):
+    class Meta:
+        model = FTPGroup
+        fields = ['name', 'gid', 'members', 'description']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'gid': forms.NumberInput(attrs={'class': 'form-control'}),
+            'members': forms.SelectMultiple(attrs={'class': 'form-select', 'size': 12}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
 
 
@@ -77,3 +114,26 @@ class UserProfileForm(forms.ModelForm):
             'basedir': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '/main/'}),
             'exclude_dirs': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '/keys/,.ssh'}),
         }
+
+
+class ServerTuningForm(forms.ModelForm):
+    """Form for the server-wide performance settings"""
+    class Meta:
+        model = ServerTuning
+        fields = [
+            'max_instances', 'max_clients_per_host',
+            'timeout_login', 'timeout_idle', 'timeout_no_transfer', 'timeout_stalled',
+            'use_sendfile', 'socket_rcvbuf', 'socket_sndbuf', 'scoreboard_file',
+        ]
+        widgets = {
+            'max_instances': forms.NumberInput(attrs={'class': 'form-control'}),
+            'max_clients_per_host': forms.NumberInput(attrs={'class': 'form-control'}),
+            'timeout_login': forms.NumberInput(attrs={'class': 'form-control'}),
+            'timeout_idle': forms.NumberInput(attrs={'class': 'form-control'}),
+            'timeout_no_transfer': forms.NumberInput(attrs={'class': 'form-control'}),
+            'timeout_stalled': forms.NumberInput(attrs={'class': 'form-control'}),
+            'use_sendfile': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'socket_rcvbuf': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'kernel default'}),
+            'socket_sndbuf': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'kernel default'}),
+            'scoreboard_file': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '/var/run/proftpd/proftpd.scoreboard'}),
+        }
@@ -0,0 +1,241 @@
+"""
+ProFTPD Log Ingestion
+
+Incrementally reads ProFTPD log files from a persisted byte offset and folds
+the parsed records into aggregate tables, in fixed-size batches so memory
+stays bounded for multi-GB backfills.
+"""
+
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from .logparse import TRANSFER_DIRECTIONS, parse_auth_line, parse_xferlog_line
+from .models import AuthStat, FTPUser, FolderAccess, LogCursor, TrafficRollup
+from .paths import FolderPathIndex
+
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def find_rotated_log(path, inode):
+    """Find the rotated copy of path that still has the given inode"""
+    for candidate in (f'{path}.1', f'{path}.0', f'{path}-old'):
+        try:
+            if os.stat(candidate).st_ino == inode:
+                return candidate
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _read_batches(cursor, path, batch_size):
+    """Yield lists of complete lines from path, advancing cursor.offset"""
+    with open(path, 'rb') as f:
+        f.seek(cursor.offset)
+        done = False
+        while not done:
+            lines = []
+            while len(lines) < batch_size:
+                line = f.readline()
+                # A partial last line is still being written, read it next time
+                if not line.endswith(b'\n'):
+                    done = True
+                    break
+                lines.append(line.decode('utf-8', 'replace'))
+                cursor.offset += len(line)
+            if lines:
+                yield lines
+
+
+def tail_log(cursor, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield batches of new lines of cursor.path since the last run
+
+    The cursor's offset and inode are updated in memory as batches are
+    produced; the caller saves the cursor after each batch is processed.
+    If the file was rotated, the rest of the old file is read first (when
+    it can still be found next to the new one); if it was truncated,
+    reading restarts from the beginning.
+    """
+    stat = os.stat(cursor.path)
+
+    if cursor.inode and cursor.inode != stat.st_ino:
+        rotated = find_rotated_log(cursor.path, cursor.inode)
+        if rotated:
+            yield from _read_batches(cursor, rotated, batch_size)
+        cursor.offset = 0
+    elif stat.st_size < cursor.offset:
+        cursor.offset = 0
+
+    cursor.inode = stat.st_ino
+    yield from _read_batches(cursor, cursor.path, batch_size)
+
+
+def ingest_log(path, process_batch, batch_size=DEFAULT_BATCH_SIZE, from_start=False):
+    """
+    Feed new lines of a log file to process_batch(lines) in batches
+
+    Each batch and the cursor advance are committed together, so an
+    interrupted run resumes exactly where the last committed batch ended.
+    Returns the number of lines read.
+    """
+    cursor, _created = LogCursor.objects.get_or_create(path=path)
+    if from_start:
+        cursor.inode = 0
+        cursor.offset = 0
+
+    lines_read = 0
+    for lines in tail_log(cursor, batch_size):
+        with transaction.atomic():
+            process_batch(lines)
+            cursor.save()
+        lines_read += len(lines)
+
+    cursor.save()
+    return lines_read
+
+
+class TrafficAggregator:
+    """Fold xferlog lines into hourly TrafficRollup rows"""
+
+    def __init__(self):
+        self.users = dict(FTPUser.objects.values_list('username', 'id'))
+        # Home directory (chroot with DefaultRoot ~) is the first accessible folder
+        self.homes = dict(FolderAccess.objects.order_by('-pk').values_list('user_id', 'folder__path'))
+        self.folders = FolderPathIndex.from_db()
+        self.skipped = 0
+
+    def folder_for(self, record, user_id):
+        """Map a transferred file to a folder, also trying chroot-relative paths"""
+        folder_id = self.folders.lookup_file(record.filename)
+        if folder_id is None and user_id in self.homes:
+            folder_id = self.folders.lookup_file(self.homes[user_id] + record.filename)
+        return folder_id
+
+    def aggregate(self, lines):
+        """Return {(hour, user_id, folder_id, direction): [bytes, files]} for lines"""
+        totals = {}
+        for line in lines:
+            record = parse_xferlog_line(line)
+            user_id = self.users.get(record.username) if record and record.direction in TRANSFER_DIRECTIONS else None
+            if user_id is None:
+                self.skipped += 1
+                continue
+
+            hour = timezone.make_aware(record.timestamp.replace(minute=0, second=0))
+            key = (hour, user_id, self.folder_for(record, user_id), record.direction)
+            entry = totals.setdefault(key, [0, 0])
+            entry[0] += record.size
+            if record.completed:
+                entry[1] += 1
+        return totals
+
+    def process_batch(self, lines):
+        """Add the totals of a batch of lines to the rollup table"""
+        totals = self.aggregate(lines)
+        if not totals:
+            return
+
+        hours = {key[0] for key in totals}
+        user_ids = {key[1] for key in totals}
+        existing = {
+            (rollup.hour, rollup.user_id, rollup.folder_id, rollup.direction): rollup
+            for rollup in TrafficRollup.objects.filter(hour__in=hours, user_id__in=user_ids)
+        }
+
+        to_create = []
+        to_update = []
+        for key, (size, files) in totals.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                hour, user_id, folder_id, direction = key
+                to_create.append(TrafficRollup(
+                    hour=hour, user_id=user_id, folder_id=folder_id,
+                    direction=direction, bytes=size, files=files,
+                ))
+            else:
+                rollup.bytes += size
+                rollup.files += files
+                to_update.append(rollup)
+
+        TrafficRollup.objects.bulk_create(to_create)
+        TrafficRollup.objects.bulk_update(to_update, ['bytes', 'files'])
+
+
+def ingest_xferlog(path, batch_size=DEFAULT_BATCH_SIZE, from_start=False):
+    """
+    Ingest new xferlog lines into hourly traffic rollups
+
+    Returns (lines_read, lines_skipped); skipped lines are malformed,
+    belong to users unknown to the panel or record deletions, which are not
+    traffic.
+    """
+    aggregator = TrafficAggregator()
+    lines_read = ingest_log(path, aggregator.process_batch, batch_size, from_start)
+    return lines_read, aggregator.skipped
+
+
+class AuthAggregator:
+    """Fold SystemLog login lines into hourly AuthStat rows"""
+
+    def __init__(self):
+        self.users = dict(FTPUser.objects.values_list('username', 'id'))
+        self.skipped = 0
+
+    def aggregate(self, lines):
+        """Return {(hour, username, client_ip): [successes, failures]} for lines"""
+        totals = {}
+        for line in lines:
+            event = parse_auth_line(line)
+            if event is None:
+                self.skipped += 1
+                continue
+
+            hour = timezone.make_aware(event.timestamp.replace(minute=0, second=0))
+            entry = totals.setdefault((hour, event.username, event.client_ip), [0, 0])
+            entry[0 if event.success else 1] += 1
+        return totals
+
+    def process_batch(self, lines):
+        """Add the counters of a batch of lines to the AuthStat table"""
+        totals = self.aggregate(lines)
+        if not totals:
+            return
+
+        hours = {key[0] for key in totals}
+        usernames = {key[1] for key in totals}
+        existing = {
+            (stat.hour, stat.username, stat.client_ip): stat
+            for stat in AuthStat.objects.filter(hour__in=hours, username__in=usernames)
+        }
+
+        to_create = []
+        to_update = []
+        for key, (successes, failures) in totals.items():
+            stat = existing.get(key)
+            if stat is None:
+                hour, username, client_ip = key
+                to_create.append(AuthStat(
+                    hour=hour, username=username, user_id=self.users.get(username),
+                    client_ip=client_ip, successes=successes, failures=failures,
+                ))
+            else:
+                stat.successes += successes
+                stat.failures += failures
+                to_update.append(stat)
+
+        AuthStat.objects.bulk_create(to_create)
+        AuthStat.objects.bulk_update(to_update, ['successes', 'failures'])
+
+
+def ingest_authlog(path, batch_size=DEFAULT_BATCH_SIZE, from_start=False):
+    """
+    Ingest new SystemLog login lines into hourly per-user/per-IP counters
+
+    Returns (lines_read, lines_skipped); skipped lines are not login events.
+    """
+    aggregator = AuthAggregator()
+    lines_read = ingest_log(path, aggregator.process_batch, batch_size, from_start)
+    return lines_read, aggregator.skipped
@@ -0,0 +1,126 @@
+"""
+ProFTPD Log Parsing
+
+Parsers for the TransferLog (xferlog format) and SystemLog written by the
+ProFTPD configuration in contrib/proftpd.conf.
+"""
+
+import gzip
+import re
+from collections import Counter, namedtuple
+from datetime import datetime
+
+
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+
+XferRecord = namedtuple('XferRecord', [
+    'timestamp', 'remote_host', 'size', 'filename', 'direction', 'username', 'completed',
+])
+
+# xferlog directions: incoming (upload), outgoing (download) and deleted
+XFER_DIRECTIONS = ('i', 'o', 'd')
+TRANSFER_DIRECTIONS = ('i', 'o')
+
+AuthEvent = namedtuple('AuthEvent', ['timestamp', 'client_ip', 'username', 'success'])
+
+# 2026-10-19 12:00:00,123 host proftpd[1234] server (client[1.2.3.4]): USER alice: Login successful.
+AUTH_LINE_RE = re.compile(
+    r'^(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:,\d+)? \S+ proftpd\[\d+\] \S+ '
+    r'\((?P<client>[^\[\)]*)\[(?P<ip>[^\]]+)\]\): '
+    r'USER (?P<username>\S+?)(?P<failed> \(Login failed\))?: (?P<detail>.*)$'
+)
+
+
+def parse_xferlog_line(line):
+    """
+    Parse one xferlog line, return an XferRecord or None if malformed
+
+    Format: current-time transfer-time remote-host file-size filename
+    transfer-type special-action-flag direction access-mode username
+    service-name authentication-method authenticated-user-id completion-status
+
+    The filename may contain spaces, so fixed fields are taken from both ends.
+    Deletions are records with direction 'd'; they are not transfers.
+    """
+    parts = line.split()
+    if len(parts) < 18 or parts[-7] not in XFER_DIRECTIONS:
+        return None
+
+    try:
+        hour, minute, second = parts[3].split(':')
+        timestamp = datetime(
+            int(parts[4]), MONTHS[parts[1]], int(parts[2]),
+            int(hour), int(minute), int(second),
+        )
+        size = int(parts[7])
+    except (KeyError, ValueError):
+        return None
+
+    return XferRecord(
+        timestamp=timestamp,
+        remote_host=parts[6],
+        size=size,
+        filename=' '.join(parts[8:-9]),
+        direction=parts[-7],
+        username=parts[-5],
+        completed=parts[-1] == 'c',
+    )
+
+
+def parse_auth_line(line):
+    """Parse a SystemLog USER line, return an AuthEvent or None for other lines"""
+    match = AUTH_LINE_RE.match(line.rstrip('\n'))
+    if not match:
+        return None
+
+    detail = match.group('detail')
+    success = not match.group('failed') and detail.startswith('Login successful')
+    if not success and not match.group('failed') and not detail.lower().startswith('no such user'):
+        return None
+
+    try:
+        timestamp = datetime.strptime(match.group('timestamp'), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+    return AuthEvent(
+        timestamp=timestamp,
+        client_ip=match.group('ip'),
+        username=match.group('username'),
+        success=success,
+    )
+
+
+def open_log(path):
+    """Open a log file for text reading, transparently handling rotated .gz files"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', errors='replace')
+    return open(path, 'r', errors='replace')
+
+
+def count_user_activity(paths, since=None):
+    """
+    Count recent activity per username from TransferLog and SystemLog files
+
+    Every transfer in an xferlog file and every successful login in a
+    SystemLog file counts once. Entries older than since (naive local
+    datetime) are ignored. Returns a Counter of username -> count.
+    """
+    activity = Counter()
+
+    for path in paths:
+        with open_log(path) as f:
+            for line in f:
+                record = parse_xferlog_line(line)
+                if record is None:
+                    record = parse_auth_line(line)
+                    if record is None or not record.success:
+                        continue
+                if since is not None and record.timestamp < since:
+                    continue
+                activity[record.username] += 1
+
+    return activity
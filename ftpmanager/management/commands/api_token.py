@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.models import ApiToken
+
+
+class Command(BaseCommand):
+    help = 'Create, list and revoke tokens for the JSON API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['create', 'list', 'revoke'])
+        parser.add_argument('name', nargs='?', help='Token name (create, revoke)')
+        parser.add_argument(
+            '--user',
+            help='Panel login the token acts for (create; default: the first superuser)'
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action == 'list':
+            for token in ApiToken.objects.select_related('user').order_by('name'):
+                last_used = token.last_used_at.isoformat(timespec='seconds') if token.last_used_at else 'never'
+                state = 'active' if token.is_active else 'revoked'
+                self.stdout.write(f'{token.name}\t{token.prefix}...\t{token.user.username}\t{state}\tlast used {last_used}')
+            return
+
+        if not options['name']:
+            raise CommandError(f'A token name is required to {action} a token.')
+        if action == 'revoke':
+            if not ApiToken.objects.filter(name=options['name']).update(is_active=False):
+                raise CommandError(f'No token named "{options["name"]}".')
+            self.stdout.write(self.style.SUCCESS(f'Revoked token "{options["name"]}".'))
+            return
+
+        if ApiToken.objects.filter(name=options['name']).exists():
+            raise CommandError(f'A token named "{options["name"]}" already exists.')
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'No panel login "{options["user"]}".')
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('pk').first()
+            if user is None:
+                raise CommandError('No superuser exists; pass --user.')
+        _token, key = ApiToken.create_token(options['name'], user)
+        self.stdout.write(self.style.SUCCESS(f'Created token "{options["name"]}" for {user.username}.'))
+        self.stdout.write('Store this key now, it is not shown again:')
+        self.stdout.write(key)
@@ -0,0 +1,121 @@
+import sys
+import time
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.access_check import AccessChecker, apply_grant, normalize_command, parse_grant, what_if
+from ftpmanager.models import FTPUser
+
+
+class Command(BaseCommand):
+    help = 'Check whether a user may run an FTP command on a path, as the generated config would decide'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', nargs='?', help='FTP username')
+        parser.add_argument('path', nargs='?', help='Path of a file or directory')
+        parser.add_argument(
+            'ftp_command',
+            nargs='?',
+            default='RETR',
+            help='FTP command (RETR, STOR, DELE, LIST, ...) or group (READ, DIRS, WRITE), default: RETR'
+        )
+        parser.add_argument(
+            '--batch',
+            metavar='FILE',
+            help='Read "username path [command]" lines from FILE ("-" for stdin) and print one result per line'
+        )
+        parser.add_argument(
+            '--grant',
+            action='append',
+            default=[],
+            metavar='PRINCIPAL:FOLDER:PERMISSION',
+            help='What-if: evaluate with this unsaved grant, e.g. alice:/srv/ftp/share:write or @staff:/srv/ftp:deny '
+                 '(permission read, write, deny or none; repeatable)'
+        )
+        parser.add_argument(
+            '--deactivate',
+            action='append',
+            default=[],
+            metavar='USERNAME',
+            help='What-if: evaluate with this user deactivated (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        checks = self.read_checks(options)
+        try:
+            changes = [parse_grant(spec) for spec in options['grant']]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        before = AccessChecker.from_db()
+        after = None
+        if changes or options['deactivate']:
+            with what_if():
+                self.apply_changes(changes, options['deactivate'])
+                after = AccessChecker.from_db()
+
+        started = time.perf_counter()
+        lines = []
+        denied = 0
+        for username, path, command in checks:
+            result = before.check(username, path, command)
+            if after is None:
+                denied += not result.allowed
+                lines.append(f'{self.verdict(result)}\t{username}\t{command}\t{path}\t{result.reason}')
+            else:
+                changed = after.check(username, path, command)
+                denied += not changed.allowed
+                lines.append(
+                    f'{self.verdict(result)} -> {self.verdict(changed)}\t{username}\t{command}\t{path}\t{changed.reason}'
+                )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write('\n'.join(lines))
+        if options['batch']:
+            rate = len(checks) / elapsed if elapsed else float('inf')
+            self.stderr.write(f'Checked {len(checks)} in {elapsed:.3f}s ({rate:.0f}/s), {denied} denied.')
+
+    def read_checks(self, options):
+        if options['batch']:
+            stream = sys.stdin if options['batch'] == '-' else self.open_batch(options['batch'])
+            checks = []
+            for number, line in enumerate(stream, 1):
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                if len(fields) not in (2, 3):
+                    raise CommandError(f'Line {number}: expected "username path [command]"')
+                checks.append(self.validated(*fields))
+            return checks
+
+        if not options['username'] or not options['path']:
+            raise CommandError('Give a username and a path, or --batch FILE.')
+        return [self.validated(options['username'], options['path'], options['ftp_command'])]
+
+    def open_batch(self, path):
+        try:
+            with open(path) as f:
+                return f.readlines()
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+    def validated(self, username, path, command='RETR'):
+        try:
+            command, _group = normalize_command(command)
+        except ValueError as e:
+            raise CommandError(str(e))
+        return username, path, command
+
+    def apply_changes(self, changes, deactivate):
+        try:
+            for principal, folder_path, permission in changes:
+                apply_grant(principal, folder_path, permission)
+            for username in deactivate:
+                user = FTPUser.objects.get(username=username)
+                user.is_active = False
+                user.save()
+        except ObjectDoesNotExist as e:
+            raise CommandError(f'What-if change refers to an unknown user, group or folder: {e}')
+
+    def verdict(self, result):
+        return 'ALLOW' if result.allowed else 'DENY'
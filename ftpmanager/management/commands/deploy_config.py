@@ -1,7 +1,25 @@
+import hashlib
 import os
 import subprocess
+import time
+from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand, CommandError
-from ftpmanager.config_generator import generate_proftpd_config, generate_ftpusers_file
+from ftpmanager.config_generator import (
+    generate_proftpd_config,
+    generate_ftpusers_file,
+    generate_ftpgroup_file,
+    generate_tuning_config,
+    get_quota_users,
+)
+from ftpmanager.config_diff import FileDiff, summarize
+from ftpmanager.config_lint import format_issue, lint_files
+from ftpmanager.deploy import deploy_parallel, load_targets
+from ftpmanager.logparse import count_user_activity
+from ftpmanager.models import AclRevision
+from ftpmanager.sharding import active_nodes, assign_users, users_of
+from ftpmanager.snapshots import SnapshotError, SnapshotStore
+from ftpmanager.sql_backend import group_name_conflicts, sync_sqlite_database, has_changes
+from ftpmanager.usage import scan_folders
 
 
 class Command(BaseCommand):
@@ -18,11 +36,55 @@ class Command(BaseCommand):
             default='conf.d/users.conf',
             help='Config file path relative to config-dir (default: conf.d/users.conf)'
         )
+        parser.add_argument(
+            '--tuning-file',
+            default='conf.d/00-tuning.conf',
+            help='Server tuning file path relative to config-dir (default: conf.d/00-tuning.conf)'
+        )
         parser.add_argument(
             '--passwd-file',
             default='ftpd.passwd',
             help='Password file path relative to config-dir (default: ftpd.passwd)'
         )
+        parser.add_argument(
+            '--group-file',
+            default='ftpd.group',
+            help='Group file path relative to config-dir (default: ftpd.group)'
+        )
+        parser.add_argument(
+            '--auth-backend',
+            choices=['file', 'sql'],
+            default='file',
+            help='Virtual user backend: "file" writes ftpd.passwd, "sql" syncs an SQLite database for mod_sql (default: file)'
+        )
+        parser.add_argument(
+            '--sql-db',
+            default='ftpd.sqlite3',
+            help='SQLite database path relative to config-dir for --auth-backend sql (default: ftpd.sqlite3)'
+        )
+        parser.add_argument(
+            '--acl-mode',
+            choices=['directory', 'ifuser'],
+            default='directory',
+            help='Folder rules as global <Directory> blocks or per-user <IfUser> sections (needs mod_ifsession) (default: directory)'
+        )
+        parser.add_argument(
+            '--order-by-log',
+            action='append',
+            metavar='LOGFILE',
+            help='Order ftpd.passwd by recent activity parsed from a TransferLog/SystemLog file (repeatable)'
+        )
+        parser.add_argument(
+            '--log-days',
+            type=int,
+            default=30,
+            help='Only count log entries from the last N days for --order-by-log (default: 30)'
+        )
+        parser.add_argument(
+            '--scan-usage',
+            action='store_true',
+            help='Scan folder disk usage first, without cached results (for folder quotas and initial user quota tallies)'
+        )
         parser.add_argument(
             '--restart',
             action='store_true',
@@ -31,7 +93,56 @@ class Command(BaseCommand):
         parser.add_argument(
             '--test',
             action='store_true',
-            help='Test ProFTPD configuration after deploying'
+            help='Also run "proftpd -t" on the full server configuration after deploying'
+        )
+        parser.add_argument(
+            '--skip-lint',
+            action='store_true',
+            help='Write files even if the built-in validation finds errors'
+        )
+        parser.add_argument(
+            '--target',
+            action='append',
+            default=[],
+            metavar='NAME',
+            help='Deploy to this target from PROFTPD_DEPLOY_TARGETS or --targets-file instead of --config-dir (repeatable)'
+        )
+        parser.add_argument(
+            '--all-targets',
+            action='store_true',
+            help='Deploy to every defined target'
+        )
+        parser.add_argument(
+            '--targets-file',
+            metavar='FILE',
+            help='JSON file defining the targets (name, config_dir, reload) instead of PROFTPD_DEPLOY_TARGETS'
+        )
+        parser.add_argument(
+            '--parallel',
+            type=int,
+            default=8,
+            help='Number of targets deployed at the same time (default: 8)'
+        )
+        parser.add_argument(
+            '--snapshot-dir',
+            default='snapshots',
+            help='Store of deployed file sets, relative to config-dir (default: snapshots)'
+        )
+        parser.add_argument(
+            '--list-snapshots',
+            action='store_true',
+            help='List the recorded snapshot revisions and exit'
+        )
+        parser.add_argument(
+            '--rollback',
+            type=int,
+            metavar='REV',
+            help='Restore the files of snapshot revision REV without generating anything'
+        )
+        parser.add_argument(
+            '--diff',
+            action='store_true',
+            help='Show a unified diff against the deployed files and exit without writing'
         )
         parser.add_argument(
             '--dry-run',
@@ -44,15 +155,18 @@ class Command(BaseCommand):
             help='Force write even if content unchanged'
         )
 
-    def read_file(self, path):
-        """Read file content, return None if file doesn't exist"""
+    def file_digest(self, path):
+        """Return the sha256 hex digest of a file, None if it doesn't exist"""
+        digest = hashlib.sha256()
         try:
-            with open(path, 'r') as f:
-                return f.read()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    digest.update(chunk)
         except FileNotFoundError:
             return None
         except PermissionError:
             raise CommandError(f'Permission denied reading {path}. Run with sudo.')
+        return digest.hexdigest()
 
     def write_file(self, path, content, mode):
         """Write content to file and set permissions"""
@@ -69,56 +183,351 @@ class Command(BaseCommand):
         except PermissionError:
             raise CommandError(f'Permission denied writing to {path}. Run with sudo.')
 
+    def sync_sql_database(self, db_path, dry_run, auth=True):
+        """Upsert changed users/groups and quota rows into the mod_sql database"""
+        try:
+            if not dry_run:
+                os.makedirs(os.path.dirname(db_path), mode=0o755, exist_ok=True)
+            result = sync_sqlite_database(db_path, dry_run=dry_run, auth=auth)
+            if not dry_run:
+                os.chmod(db_path, 0o600)
+        except PermissionError:
+            raise CommandError(f'Permission denied writing to {db_path}. Run with sudo.')
+
+        for table, counts in result.items():
+            self.stdout.write(
+                f'SQL {table}: {counts["added"]} added, {counts["updated"]} updated, {counts["removed"]} removed'
+            )
+        return has_changes(result)
+
+    def lint(self, artifacts, skip_lint, sql_groups=False):
+        """Validate generated content, and with sql_groups the SQL groups table, before anything is written"""
+        contents = {label.lower(): content for label, _path, content, _mode in artifacts}
+        issues = lint_files(**contents)
+        errors = [issue for issue in issues if issue.level == 'error']
+        for issue in issues:
+            style = self.style.ERROR if issue.level == 'error' else self.style.WARNING
+            self.stdout.write(style(format_issue(issue)))
+        if sql_groups:
+            for message in group_name_conflicts():
+                self.stdout.write(self.style.ERROR(f'groups table: error: {message}'))
+                errors.append(message)
+        if errors and not skip_lint:
+            raise CommandError(f'Generated configuration failed validation with {len(errors)} error(s); nothing was written.')
+
+    def show_diff(self, artifacts):
+        """Print a unified diff of each artifact against the deployed file"""
+        kinds = {'Passwd': 'passwd', 'Group': 'group'}
+        diffs = []
+        for label, path, content, _mode in artifacts:
+            try:
+                diff = FileDiff(label.lower(), path, content, kinds.get(label, 'config'))
+                for line in diff.iter_lines():
+                    self.stdout.write(line)
+            except PermissionError:
+                raise CommandError(f'Permission denied reading {path}. Run with sudo.')
+            diffs.append(diff)
+        self.stdout.write(self.style.SUCCESS(f'Next deploy: {summarize(diffs)}'))
+
+    def load_activity(self, options):
+        """Count recent per-user activity from the --order-by-log files"""
+        if not options['order_by_log']:
+            return None
+
+        since = datetime.now() - timedelta(days=options['log_days'])
+        try:
+            activity = count_user_activity(options['order_by_log'], since=since)
+        except FileNotFoundError as e:
+            raise CommandError(f'Log file not found: {e.filename}')
+        except PermissionError as e:
+            raise CommandError(f'Permission denied reading {e.filename}. Run with sudo.')
+
+        self.stdout.write(f'Ordering passwd by activity of {len(activity)} users from logs')
+        return activity
+
     def handle(self, *args, **options):
         config_dir = options['config_dir']
         config_path = os.path.join(config_dir, options['config_file'])
+        tuning_path = os.path.join(config_dir, options['tuning_file'])
         passwd_path = os.path.join(config_dir, options['passwd_file'])
+        group_path = os.path.join(config_dir, options['group_file'])
+        sql_db_path = os.path.join(config_dir, options['sql_db'])
+        use_sql = options['auth_backend'] == 'sql'
         dry_run = options['dry_run']
         force = options['force']
+        store = SnapshotStore(os.path.join(config_dir, options['snapshot_dir']))
+
+        if options['list_snapshots']:
+            self.list_snapshots(store)
+            return
+        if options['rollback'] is not None:
+            files_changed = self.rollback(store, config_dir, options['rollback'], dry_run)
+            if not dry_run:
+                self.test_and_restart(options, files_changed)
+            return
 
-        # Generate configs
+        if options['scan_usage']:
+            # Quotas need exact totals; cached directory results miss files
+            # that grew in place
+            self.stdout.write('Scanning folder usage...')
+            scan_folders(full=True)
+        # Quota tables live in the SQLite database even with ftpd.passwd
+        use_quota_db = not use_sql and get_quota_users().exists()
+
+        # Generate configs as (label, path, content, mode)
         self.stdout.write('Generating configuration files...')
-        config_content = generate_proftpd_config()
-        passwd_content = generate_ftpusers_file()
+        paths = (tuning_path, config_path, passwd_path, group_path, sql_db_path)
+        activity = self.load_activity(options)
+        artifacts = self.generate_artifacts(options, paths, activity)
+        self.lint(artifacts, options['skip_lint'], sql_groups=use_sql)
+
+        targets = self.select_targets(options)
+        if targets is not None:
+            sql_db = options['sql_db'] if use_sql or use_quota_db else None
+            node_artifacts = self.generate_node_artifacts(targets, options, paths, activity)
+            target_artifacts = self.generate_target_artifacts(targets, artifacts, node_artifacts, options, sql_db)
+            self.deploy_targets(targets, target_artifacts, config_dir, options, sql_db=sql_db)
+            return
+
+        if options['diff']:
+            self.show_diff(artifacts)
+            return
 
         if dry_run:
             self.stdout.write(self.style.WARNING('\n=== DRY RUN MODE ===\n'))
-            self.stdout.write(f'Would write config to: {config_path}')
-            self.stdout.write(f'Would write passwd to: {passwd_path}')
-            self.stdout.write('\n--- Config content ---')
-            self.stdout.write(config_content)
-            self.stdout.write('\n--- Passwd content ---')
-            self.stdout.write(passwd_content)
+            for label, path, _content, _mode in artifacts:
+                self.stdout.write(f'Would write {label.lower()} to: {path}')
+            if use_sql or use_quota_db:
+                self.stdout.write(f'Would sync SQL database: {sql_db_path}')
+                self.sync_sql_database(sql_db_path, dry_run=True, auth=use_sql)
+            for label, _path, content, _mode in artifacts:
+                self.stdout.write(f'\n--- {label} content ---')
+                self.stdout.write(content)
             return
 
-        # Read existing files
-        existing_config = self.read_file(config_path)
-        existing_passwd = self.read_file(passwd_path)
-
         # Track changes
         files_changed = False
 
-        # Compare and write config file
-        if force or existing_config != config_content:
-            self.stdout.write(f'Writing config to: {config_path}')
-            self.write_file(config_path, config_content, 0o644)
-            files_changed = True
-        else:
-            self.stdout.write(f'Config unchanged: {config_path}')
+        # Compare by hash and write changed files
+        for label, path, content, mode in artifacts:
+            if force or self.file_digest(path) != hashlib.sha256(content.encode()).hexdigest():
+                self.stdout.write(f'Writing {label.lower()} to: {path}')
+                self.write_file(path, content, mode)
+                files_changed = True
+            else:
+                self.stdout.write(f'{label} unchanged: {path}')
 
-        # Compare and write passwd file
-        if force or existing_passwd != passwd_content:
-            self.stdout.write(f'Writing passwd to: {passwd_path}')
-            self.write_file(passwd_path, passwd_content, 0o600)
-            files_changed = True
-        else:
-            self.stdout.write(f'Passwd unchanged: {passwd_path}')
+        if use_sql or use_quota_db:
+            # Upsert only changed rows instead of rewriting a file. mod_sql
+            # queries the database on every login, so no restart is needed.
+            self.stdout.write(f'Syncing SQL database: {sql_db_path}')
+            if not self.sync_sql_database(sql_db_path, dry_run=False, auth=use_sql):
+                self.stdout.write(f'SQL database unchanged: {sql_db_path}')
 
         if files_changed:
             self.stdout.write(self.style.SUCCESS('Configuration files updated.'))
         else:
             self.stdout.write(self.style.SUCCESS('No changes detected.'))
 
+        self.record_snapshot(store, config_dir, artifacts)
+        self.test_and_restart(options, files_changed)
+
+    def generate_artifacts(self, options, paths, activity=None, usernames=None):
+        """Generated files as (label, path, content, mode), for one node if usernames is given"""
+        tuning_path, config_path, passwd_path, group_path, sql_db_path = paths
+        artifacts = [
+            ('Tuning', tuning_path, generate_tuning_config(), 0o644),
+            ('Config', config_path, self.generate_config(options, sql_db_path, usernames), 0o644),
+        ]
+        if options['auth_backend'] != 'sql':
+            artifacts.append(('Passwd', passwd_path, generate_ftpusers_file(activity=activity, usernames=usernames), 0o600))
+            artifacts.append(('Group', group_path, generate_ftpgroup_file(usernames=usernames), 0o644))
+        return artifacts
+
+    def generate_config(self, options, sql_db_path, usernames=None):
+        return generate_proftpd_config(
+            auth_backend=options['auth_backend'], sql_db_path=sql_db_path, acl_mode=options['acl_mode'],
+            usernames=usernames,
+        )
+
+    def generate_node_artifacts(self, targets, options, paths, activity):
+        """{node name: (usernames, artifacts)} for targets serving a shard of the users"""
+        nodes = sorted({target.node for target in targets if target.node})
+        if not nodes:
+            return {}
+        assignment, _pinned = assign_users()
+        unknown = [node for node in nodes if node not in active_nodes()]
+        if unknown:
+            raise CommandError(f'Targets refer to unknown or inactive node(s): {", ".join(unknown)}')
+
+        node_artifacts = {}
+        for node in nodes:
+            usernames = users_of(assignment, node)
+            self.stdout.write(f'Generating files for node {node} ({len(usernames)} users)...')
+            node_artifacts[node] = (usernames, self.generate_artifacts(options, paths, activity, usernames))
+            self.lint(node_artifacts[node][1], options['skip_lint'])
+        return node_artifacts
+
+    def generate_target_artifacts(self, targets, artifacts, node_artifacts, options, sql_db=None):
+        """
+        {target name: artifacts}
+
+        With the SQL database each target's config connects to its own
+        database: the target's sql_db_path, or sql_db inside its config_dir
+        where the database is synced. Only the config is generated again for
+        that, once per node and database path.
+        """
+        configs = {}
+        target_artifacts = {}
+        for target in targets:
+            usernames, files = node_artifacts[target.node] if target.node else (None, artifacts)
+            if sql_db:
+                sql_db_path = target.sql_db_path or os.path.join(target.config_dir, sql_db)
+                key = (target.node, sql_db_path)
+                if key not in configs:
+                    configs[key] = self.generate_config(options, sql_db_path, usernames)
+                files = [
+                    (label, path, configs[key] if label == 'Config' else content, mode)
+                    for label, path, content, mode in files
+                ]
+            target_artifacts[target.name] = files
+        return target_artifacts
+
+    def select_targets(self, options):
+        """The targets to deploy to, or None for the single --config-dir"""
+        if not (options['target'] or options['all_targets'] or options['targets_file']):
+            return None
+        try:
+            targets = load_targets(options['targets_file'])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Cannot load deploy targets: {e}')
+
+        if options['target']:
+            by_name = {target.name: target for target in targets}
+            unknown = [name for name in options['target'] if name not in by_name]
+            if unknown:
+                raise CommandError(f'Unknown deploy target(s): {", ".join(unknown)}')
+            targets = [by_name[name] for name in options['target']]
+        if not targets:
+            raise CommandError('No deploy targets defined.')
+        return targets
+
+    def deploy_targets(self, targets, artifacts, config_dir, options, sql_db=None):
+        """Write the generated files ({target name: artifacts}) to all targets in parallel and report each"""
+        # Artifact paths are relative to --config-dir within every target
+        def target_artifacts(target):
+            return [
+                (label, os.path.relpath(path, config_dir), content, mode)
+                for label, path, content, mode in artifacts[target.name]
+            ]
+
+        if options['diff'] or options['dry_run']:
+            for target in targets:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'Target {target.name}: {target.config_dir}'))
+                relative_artifacts = target_artifacts(target)
+                if options['diff']:
+                    self.show_diff([
+                        (label, os.path.join(target.config_dir, relpath), content, mode)
+                        for label, relpath, content, mode in relative_artifacts
+                    ])
+                else:
+                    for label, relpath, _content, _mode in relative_artifacts:
+                        self.stdout.write(f'Would write {label.lower()} to: {os.path.join(target.config_dir, relpath)}')
+            return
+
+        jobs = [
+            (target, {relpath: (content, mode) for _label, relpath, content, mode in target_artifacts(target)})
+            for target in targets
+        ]
+
+        started = time.perf_counter()
+        failed = []
+        results = deploy_parallel(
+            jobs, acl_revision=AclRevision.current_token(), force=options['force'], workers=options['parallel'],
+        )
+        for result in results:
+            state = f'changed ({len(result.written)} file{"s" if len(result.written) != 1 else ""})' if result.changed else 'unchanged'
+            line = f'{result.target.name}\t{"OK" if result.ok else "FAILED"}\t{state}\trev {result.revision or "-"}\t{result.seconds * 1000:.0f} ms'
+            if result.ok:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(self.style.ERROR(f'{line}\t{result.error}'))
+                failed.append(result.target.name)
+        self.stdout.write(f'Deployed to {len(targets) - len(failed)} of {len(targets)} targets in {time.perf_counter() - started:.2f}s')
+
+        if sql_db:
+            # The ORM stays on this thread; mod_sql reads the database per
+            # login, so no reload is needed after syncing
+            for target in targets:
+                if target.name not in failed:
+                    self.stdout.write(f'Syncing SQL database of {target.name}')
+                    self.sync_sql_database(os.path.join(target.config_dir, sql_db), dry_run=False, auth=options['auth_backend'] == 'sql')
+
+        if failed:
+            raise CommandError(f'Deploy failed on: {", ".join(failed)}')
+
+    def record_snapshot(self, store, config_dir, artifacts):
+        """Record the deployed set in the snapshot store"""
+        files = {
+            os.path.relpath(path, config_dir): (content, mode)
+            for _label, path, content, mode in artifacts
+        }
+        latest = store.latest()
+        try:
+            revision = store.record(files, acl_revision=AclRevision.current_token())
+        except PermissionError:
+            raise CommandError(f'Permission denied writing to {store.root}. Run with sudo.')
+        if latest is None or revision['rev'] != latest['rev']:
+            self.stdout.write(f'Recorded snapshot revision {revision["rev"]}')
+
+    def list_snapshots(self, store):
+        revisions = store.revisions()
+        if not revisions:
+            self.stdout.write(f'No snapshots in {store.root}')
+        for revision in revisions:
+            note = f' (rollback to {revision["rollback_of"]})' if 'rollback_of' in revision else ''
+            self.stdout.write(
+                f'{revision["rev"]}\t{revision["created_at"]}\t{len(revision["files"])} files\t'
+                f'acl {revision["acl_revision"] or "-"}{note}'
+            )
+
+    def rollback(self, store, config_dir, rev, dry_run):
+        """Restore a recorded set; returns whether any file changed"""
+        try:
+            revision = store.get(rev)
+        except SnapshotError as e:
+            raise CommandError(str(e))
+
+        changed = [
+            relpath for relpath, entry in sorted(revision['files'].items())
+            if self.file_digest(os.path.join(config_dir, relpath)) != entry['sha256']
+        ]
+        for relpath in changed:
+            verb = 'Would restore' if dry_run else 'Restoring'
+            self.stdout.write(f'{verb} {os.path.join(config_dir, relpath)} from revision {rev}')
+        if dry_run or not changed:
+            if not changed:
+                self.stdout.write(self.style.SUCCESS(f'Deployed files already match revision {rev}.'))
+            return False
+
+        try:
+            store.restore(rev, config_dir)
+            store.record(
+                {relpath: (store.read(entry['sha256']), entry['mode']) for relpath, entry in revision['files'].items()},
+                acl_revision=revision['acl_revision'],
+                rollback_of=rev,
+            )
+        except SnapshotError as e:
+            raise CommandError(f'{e}; nothing was restored.')
+        except PermissionError as e:
+            raise CommandError(f'Permission denied writing to {e.filename}. Run with sudo.')
+        self.stdout.write(self.style.SUCCESS(f'Restored revision {rev}.'))
+        self.stdout.write(self.style.WARNING(
+            'The database was not changed; the next deploy regenerates the files from it.'
+        ))
+        return True
+
+    def test_and_restart(self, options, files_changed):
         # Test configuration (always if requested)
         if options['test']:
             self.stdout.write('Testing ProFTPD configuration...')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.access_export import ACTIVE_CHOICES, FORMATS, LAYOUTS, PERMISSIONS, AccessFilter, export_access
+
+
+class Command(BaseCommand):
+    help = 'Export the effective access matrix (who can access which folder) as CSV or XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            metavar='FILE',
+            help='File to write (default: stdout)'
+        )
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format (default: csv)')
+        parser.add_argument(
+            '--layout',
+            choices=LAYOUTS,
+            default='rows',
+            help='One row per user and folder, or one row per user with a column per folder (default: rows)'
+        )
+        parser.add_argument('--folder', default='', metavar='PATH', help='Only folders at or below PATH')
+        parser.add_argument('--user', default='', help='Only users whose name contains USER')
+        parser.add_argument('--permission', choices=PERMISSIONS, default='', help='Only grants with this permission')
+        parser.add_argument(
+            '--active',
+            choices=ACTIVE_CHOICES,
+            default='yes',
+            help='Active, inactive or all users; inactive users are listed with the access they would have (default: yes)'
+        )
+
+    def handle(self, *args, **options):
+        if options['format'] == 'xlsx' and not options['output']:
+            raise CommandError('XLSX output needs --output.')
+        access_filter = AccessFilter(
+            folder=options['folder'], user=options['user'], permission=options['permission'], active=options['active'],
+        )
+        try:
+            chunks = export_access(access_filter, layout=options['layout'], file_format=options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        try:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except PermissionError as e:
+            raise CommandError(f'Permission denied: {e}. Run with sudo.')
+        self.stderr.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
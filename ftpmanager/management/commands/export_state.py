@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.state_backup import export_state
+
+
+class Command(BaseCommand):
+    help = 'Export users, folders, groups, access rows and profiles as JSONL files with a checksum manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory to write the backup to (created if missing)')
+        parser.add_argument(
+            '--compress',
+            action='store_true',
+            help='gzip the table files'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            manifest = export_state(options['directory'], compress=options['compress'])
+        except PermissionError as e:
+            raise CommandError(f'Permission denied: {e}. Run with sudo.')
+
+        for name, entry in manifest['tables'].items():
+            self.stdout.write(f'{name}\t{entry["rows"]} rows\t{entry["file"]}')
+        total = sum(entry['rows'] for entry in manifest['tables'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {total} rows to {options["directory"]} in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,78 @@
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.proftpd_import import apply_import, plan_import
+
+
+class Command(BaseCommand):
+    help = 'Import users, groups, folders and permissions from existing ProFTPD files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--passwd-file',
+            metavar='FILE',
+            help='AuthUserFile to import users and their password hashes from (e.g. /etc/proftpd/ftpd.passwd)'
+        )
+        parser.add_argument(
+            '--group-file',
+            metavar='FILE',
+            help='AuthGroupFile to import groups and memberships from (e.g. /etc/proftpd/ftpd.group)'
+        )
+        parser.add_argument(
+            '--config-file',
+            metavar='FILE',
+            help='Config with <Directory>/<Limit> rules to import folders and permissions from'
+        )
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Also overwrite password hashes, UIDs and permissions that differ from the files'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be imported without changing the database'
+        )
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('passwd_file', 'group_file', 'config_file')):
+            raise CommandError('Give at least one of --passwd-file, --group-file and --config-file.')
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            files = {}
+            for name in ('passwd_file', 'group_file', 'config_file'):
+                if options[name]:
+                    try:
+                        files[name] = stack.enter_context(open(options[name], encoding='utf-8', errors='replace'))
+                    except PermissionError:
+                        raise CommandError(f'Permission denied reading {options[name]}. Run with sudo.')
+                    except OSError as e:
+                        raise CommandError(f'Cannot read {options[name]}: {e.strerror}')
+            plan = plan_import(
+                passwd_lines=files.get('passwd_file'),
+                group_lines=files.get('group_file'),
+                config_lines=files.get('config_file'),
+            )
+
+        for warning in plan.warnings:
+            self.stderr.write(self.style.WARNING(warning))
+
+        if options['dry_run']:
+            for line in plan.diff_lines():
+                self.stdout.write(line)
+            self.stdout.write(plan.summary())
+            self.stdout.write(self.style.WARNING('Dry run - the database was not changed.'))
+            return
+
+        if not plan.has_changes:
+            self.stdout.write(plan.summary())
+            self.stdout.write(self.style.SUCCESS('Nothing to import.'))
+            return
+
+        written = apply_import(plan, update=options['update'])
+        self.stdout.write(plan.summary())
+        if (plan.changed_users or plan.changed_access) and not options['update']:
+            self.stdout.write('Objects that differ were kept; use --update to overwrite them.')
+        self.stdout.write(self.style.SUCCESS(f'Imported {written} objects in {time.perf_counter() - started:.1f}s.'))
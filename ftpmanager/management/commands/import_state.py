@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.state_backup import StateBackupError, import_state, verify_backup
+
+
+class Command(BaseCommand):
+    help = 'Restore a backup written by export_state into a freshly migrated database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Backup directory containing manifest.json')
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only check the files against the manifest, without restoring'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['verify']:
+                manifest = verify_backup(options['directory'])
+                total = sum(entry['rows'] for entry in manifest['tables'].values())
+                self.stdout.write(self.style.SUCCESS(
+                    f'Backup from {manifest["created_at"]} is intact ({total} rows).'
+                ))
+                return
+            counts = import_state(options['directory'])
+        except StateBackupError as e:
+            raise CommandError(str(e))
+        except PermissionError as e:
+            raise CommandError(f'Permission denied: {e}. Run with sudo.')
+
+        for name, rows in counts.items():
+            self.stdout.write(f'{name}\t{rows} rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'Restored {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s.'
+        ))
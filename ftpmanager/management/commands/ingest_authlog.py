@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.log_ingest import DEFAULT_BATCH_SIZE, ingest_authlog
+
+
+class Command(BaseCommand):
+    help = 'Ingest new ProFTPD SystemLog login lines into hourly per-user and per-IP counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log',
+            default='/var/log/proftpd/proftpd.log',
+            help='SystemLog path (default: /var/log/proftpd/proftpd.log)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Lines parsed and committed per batch (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--from-start',
+            action='store_true',
+            help='Ignore the saved offset and read the whole file (counters are added to, not replaced)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['log']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        try:
+            lines_read, skipped = ingest_authlog(path, options['batch_size'], options['from_start'])
+        except FileNotFoundError:
+            raise CommandError(f'Log file not found: {path}')
+        except PermissionError:
+            raise CommandError(f'Permission denied reading {path}. Run with sudo.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingested {lines_read} lines from {path} ({skipped} skipped).'
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+from ftpmanager.models import Folder
+from ftpmanager.usage import scan_folders
+
+
+class Command(BaseCommand):
+    help = 'Scan disk usage of all folders and store the results for the folder list'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of folders scanned in parallel (default: 4)'
+        )
+        parser.add_argument(
+            '--max-dirs-per-second',
+            type=float,
+            default=0,
+            help='Throttle directory listings across all workers, 0 for unlimited (default: 0)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore cached results of unchanged directories and list every directory'
+        )
+        parser.add_argument(
+            '--folder',
+            action='append',
+            metavar='PATH',
+            help='Only scan the folder with this path (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        folders = Folder.objects.all()
+        if options['folder']:
+            folders = folders.filter(path__in=options['folder'])
+            missing = set(options['folder']) - set(folders.values_list('path', flat=True))
+            if missing:
+                raise CommandError(f'Unknown folder: {", ".join(sorted(missing))}')
+
+        results = scan_folders(
+            folders,
+            workers=options['workers'],
+            max_dirs_per_second=options['max_dirs_per_second'],
+            full=options['full'],
+        )
+
+        for usage in results:
+            if usage.error:
+                self.stdout.write(self.style.WARNING(f'{usage.folder.path}: {usage.error}'))
+            else:
+                self.stdout.write(
+                    f'{usage.folder.path}: {filesizeformat(usage.bytes)} in {usage.files} files '
+                    f'({usage.scan_seconds:.2f}s)'
+                )
+        self.stdout.write(self.style.SUCCESS(f'Scanned {len(results)} folders.'))
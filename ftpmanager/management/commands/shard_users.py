@@ -0,0 +1,137 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.config_generator import generate_ftpgroup_file, generate_ftpusers_file, generate_proftpd_config
+from ftpmanager.config_lint import format_issue, lint_files
+from ftpmanager.sharding import active_nodes, assign_users, load_report, moved_users, users_of
+from ftpmanager.snapshots import write_atomic
+
+
+class Command(BaseCommand):
+    help = 'Show how FTP users are spread over the ProFTPD nodes and write per-node files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assignments',
+            action='store_true',
+            help='Print "username<TAB>node" for every active user instead of the load report'
+        )
+        parser.add_argument(
+            '--add-node',
+            action='append',
+            default=[],
+            metavar='NAME[:WEIGHT]',
+            help='What-if: report the layout with this node added (repeatable)'
+        )
+        parser.add_argument(
+            '--remove-node',
+            action='append',
+            default=[],
+            metavar='NAME',
+            help='What-if: report the layout with this node removed (repeatable)'
+        )
+        parser.add_argument(
+            '--output-dir',
+            metavar='DIR',
+            help='Write conf.d/users.conf, ftpd.passwd and ftpd.group for each node to DIR/<node>/'
+        )
+        parser.add_argument(
+            '--acl-mode',
+            choices=['directory', 'ifuser'],
+            default='directory',
+            help='Folder rules as global <Directory> blocks or per-user <IfUser> sections (default: directory)'
+        )
+        parser.add_argument(
+            '--skip-lint',
+            action='store_true',
+            help='Write node files even if the built-in validation finds errors'
+        )
+
+    def handle(self, *args, **options):
+        nodes = active_nodes()
+        if not nodes:
+            raise CommandError('No active FTP nodes are defined.')
+        assignment, pinned = assign_users(nodes)
+
+        if options['add_node'] or options['remove_node']:
+            if options['output_dir']:
+                raise CommandError('--output-dir cannot be combined with --add-node or --remove-node.')
+            changed = self.what_if_nodes(nodes, options['add_node'], options['remove_node'])
+            after, after_pinned = assign_users(changed)
+            moved = moved_users(assignment, after)
+            share = len(moved) / len(assignment) if assignment else 0.0
+            self.stdout.write(f'{len(moved)} of {len(assignment)} users would move ({share:.1%}).')
+            assignment, pinned, nodes = after, after_pinned, changed
+
+        if options['assignments']:
+            for username, node in sorted(assignment.items()):
+                self.stdout.write(f'{username}\t{node}')
+        else:
+            self.print_report(load_report(assignment, pinned, nodes))
+
+        if options['output_dir']:
+            self.write_node_files(options['output_dir'], assignment, nodes, options['acl_mode'], options['skip_lint'])
+
+    def what_if_nodes(self, nodes, add, remove):
+        """{name: weight} after adding and removing nodes"""
+        changed = dict(nodes)
+        for spec in add:
+            name, _, weight = spec.partition(':')
+            try:
+                weight = int(weight) if weight else 1
+            except ValueError:
+                raise CommandError(f'Invalid node weight: {spec}')
+            if not name or weight < 1:
+                raise CommandError(f'Invalid node: {spec}')
+            changed[name] = weight
+        for name in remove:
+            if name not in changed:
+                raise CommandError(f'Unknown node: {name}')
+            del changed[name]
+        if not changed:
+            raise CommandError('At least one node must remain.')
+        return changed
+
+    def print_report(self, report):
+        self.stdout.write(f'{"Node":<20} {"Weight":>6} {"Users":>7} {"Pinned":>7} {"Share":>7} {"Expected":>8}')
+        for row in report:
+            self.stdout.write(
+                f'{row["node"]:<20} {row["weight"]:>6} {row["users"]:>7} {row["pinned"]:>7} '
+                f'{row["share"]:>7.1%} {row["expected"]:>8.1%}'
+            )
+
+    def write_node_files(self, output_dir, assignment, nodes, acl_mode, skip_lint=False):
+        """Validate, then write each node's users.conf, ftpd.passwd and ftpd.group below output_dir"""
+        node_files = {}
+        for node in sorted(nodes):
+            usernames = users_of(assignment, node)
+            config = generate_proftpd_config(acl_mode=acl_mode, usernames=usernames)
+            passwd = generate_ftpusers_file(usernames=usernames)
+            group = generate_ftpgroup_file(usernames=usernames)
+            self.lint(node, lint_files(config=config, passwd=passwd, group=group), skip_lint)
+            node_files[node] = (usernames, [
+                (os.path.join('conf.d', 'users.conf'), config, 0o644),
+                ('ftpd.passwd', passwd, 0o600),
+                ('ftpd.group', group, 0o644),
+            ])
+
+        for node, (usernames, files) in node_files.items():
+            try:
+                for relpath, content, mode in files:
+                    path = os.path.join(output_dir, node, relpath)
+                    os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+                    write_atomic(path, content.encode(), mode)
+            except PermissionError as e:
+                raise CommandError(f'Permission denied: {e}. Run with sudo.')
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(usernames)} users for {node} to {os.path.join(output_dir, node)}'))
+
+    def lint(self, node, issues, skip_lint):
+        """Report a node's lint issues, failing on errors unless skip_lint (like deploy_config)"""
+        errors = [issue for issue in issues if issue.level == 'error']
+        for issue in issues:
+            style = self.style.ERROR if issue.level == 'error' else self.style.WARNING
+            self.stdout.write(style(f'{node}: {format_issue(issue)}'))
+        if errors and not skip_lint:
+            raise CommandError(
+                f'Generated files for {node} failed validation with {len(errors)} error(s); nothing was written.'
+            )
@@ -0,0 +1,80 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ftpmanager.directory_sync import apply_sync, plan_sync, read_csv, read_ldif
+
+
+FORMATS_BY_EXTENSION = {'.ldif': 'ldif', '.ldf': 'ldif', '.csv': 'csv'}
+
+
+class Command(BaseCommand):
+    help = 'Sync FTP users and group memberships with an LDIF or CSV export of a directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='LDIF or CSV file exported from the directory')
+        parser.add_argument(
+            '--format',
+            choices=['ldif', 'csv'],
+            help='Format of the source (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--group',
+            action='append',
+            default=[],
+            metavar='NAME',
+            help='Also sync the members of this group when the export does not mention it, '
+                 'which removes them all (repeatable)'
+        )
+        parser.add_argument(
+            '--keep-missing',
+            action='store_true',
+            help='Leave users that are not in the export active instead of deactivating them'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would change without changing the database'
+        )
+
+    def handle(self, *args, **options):
+        path = options['source']
+        file_format = options['format'] or FORMATS_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+        if file_format is None:
+            raise CommandError(f'Cannot tell the format of {path} from its extension; pass --format.')
+
+        started = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8', errors='replace', newline='' if file_format == 'csv' else None) as f:
+                source = read_ldif(f) if file_format == 'ldif' else read_csv(f)
+        except PermissionError:
+            raise CommandError(f'Permission denied reading {path}. Run with sudo.')
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e.strerror}')
+        except ValueError as e:
+            raise CommandError(f'{path}: {e}')
+
+        if not source.users and not options['keep_missing']:
+            raise CommandError(f'{path} has no users; refusing to deactivate every user. Use --keep-missing to sync anyway.')
+
+        plan = plan_sync(source, deactivate_missing=not options['keep_missing'], managed_groups=options['group'])
+        for warning in plan.warnings:
+            self.stderr.write(self.style.WARNING(warning))
+
+        if options['dry_run']:
+            for line in plan.diff_lines():
+                self.stdout.write(line)
+            self.stdout.write(plan.summary())
+            self.stdout.write(self.style.WARNING('Dry run - the database was not changed.'))
+            return
+
+        if not plan.has_changes:
+            self.stdout.write(plan.summary())
+            self.stdout.write(self.style.SUCCESS('Already in sync, nothing written.'))
+            return
+
+        written = apply_sync(plan)
+        self.stdout.write(plan.summary())
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced {written} rows in {time.perf_counter() - started:.1f}s. Run deploy_config to apply the changes.'
+        ))
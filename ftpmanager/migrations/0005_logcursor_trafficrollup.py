@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0004_userprofile_systemuser_regexp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True)),
+                ('inode', models.BigIntegerField(default=0)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrafficRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('direction', models.CharField(choices=[('i', 'Upload'), ('o', 'Download')], max_length=1)),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('files', models.IntegerField(default=0)),
+                ('folder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='traffic', to='ftpmanager.folder')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='traffic', to='ftpmanager.ftpuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='ftpmanager__hour_1de873_idx'), models.Index(fields=['folder', 'hour'], name='ftpmanager__folder__a2e80a_idx')],
+                'unique_together': {('hour', 'user', 'folder', 'direction')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0005_logcursor_trafficrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('username', models.CharField(max_length=100)),
+                ('client_ip', models.GenericIPAddressField()),
+                ('successes', models.IntegerField(default=0)),
+                ('failures', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='auth_stats', to='ftpmanager.ftpuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='ftpmanager__hour_0d49e3_idx'), models.Index(fields=['username', 'hour'], name='ftpmanager__usernam_46b556_idx'), models.Index(fields=['client_ip', 'hour'], name='ftpmanager__client__69a8cb_idx')],
+                'unique_together': {('hour', 'username', 'client_ip')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0006_authstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolderUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('files', models.BigIntegerField(default=0)),
+                ('scanned_at', models.DateTimeField()),
+                ('scan_seconds', models.FloatField(default=0)),
+                ('error', models.CharField(blank=True, max_length=500)),
+                ('dir_cache', models.JSONField(blank=True, default=dict)),
+                ('folder', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='ftpmanager.folder')),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0007_folderusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='quota_bytes',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Size limit in bytes, empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='quota_files',
+            field=models.PositiveBigIntegerField(blank=True, help_text='File count limit, empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='quota_type',
+            field=models.CharField(choices=[('soft', 'Soft (last upload may exceed)'), ('hard', 'Hard (upload exceeding the limit is removed)')], default='hard', max_length=4),
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='quota_bytes',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Upload limit in bytes (mod_quotatab), empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='quota_files',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Upload limit in files (mod_quotatab), empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='quota_type',
+            field=models.CharField(choices=[('soft', 'Soft (last upload may exceed)'), ('hard', 'Hard (upload exceeding the limit is removed)')], default='hard', max_length=4),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0008_quotas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='download_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Download TransferRate in KB/s, empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='upload_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Upload TransferRate in KB/s, empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='download_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Download TransferRate in KB/s, empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='max_clients',
+            field=models.PositiveIntegerField(blank=True, help_text='MaxClientsPerUser, empty for the server default', null=True),
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='max_clients_per_host',
+            field=models.PositiveIntegerField(blank=True, help_text='MaxClientsPerHost for this user, empty for the server default', null=True),
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='upload_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Upload TransferRate in KB/s, empty for unlimited', null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:17
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0009_transfer_limits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServerTuning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preset', models.CharField(choices=[('custom', 'Custom'), ('small_nas', 'Small NAS'), ('busy_ingest', 'Busy ingest host'), ('many_idle', 'Many idle clients')], default='custom', editable=False, max_length=20)),
+                ('max_instances', models.PositiveIntegerField(default=30, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10000)])),
+                ('max_clients_per_host', models.PositiveIntegerField(default=8, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10000)])),
+                ('timeout_login', models.PositiveIntegerField(default=300, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(86400)])),
+                ('timeout_idle', models.PositiveIntegerField(default=600, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(86400)])),
+                ('timeout_no_transfer', models.PositiveIntegerField(default=900, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(86400)])),
+                ('timeout_stalled', models.PositiveIntegerField(default=300, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(86400)])),
+                ('use_sendfile', models.BooleanField(default=True)),
+                ('socket_rcvbuf', models.PositiveIntegerField(blank=True, help_text='Socket receive buffer in bytes, empty for the kernel default', null=True, validators=[django.core.validators.MinValueValidator(4096), django.core.validators.MaxValueValidator(16777216)])),
+                ('socket_sndbuf', models.PositiveIntegerField(blank=True, help_text='Socket send buffer in bytes, empty for the kernel default', null=True, validators=[django.core.validators.MinValueValidator(4096), django.core.validators.MaxValueValidator(16777216)])),
+                ('scoreboard_file', models.CharField(blank=True, help_text='Empty uses PROFTPD_SCOREBOARD_FILE from settings', max_length=500)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
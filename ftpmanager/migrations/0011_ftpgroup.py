@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:22
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0010_servertuning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FTPGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, validators=[django.core.validators.RegexValidator('^[A-Za-z0-9][A-Za-z0-9._-]*$', 'Letters, digits, ".", "_" and "-" only.')])),
+                ('gid', models.PositiveIntegerField(help_text='Numeric group ID written to ftpd.group', unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('members', models.ManyToManyField(blank=True, related_name='ftp_groups', to='ftpmanager.ftpuser')),
+            ],
+            options={
+                'verbose_name': 'FTP Group',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupFolderAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.CharField(choices=[('read', 'Read Only'), ('write', 'Read & Write')], default='read', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('folder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_access', to='ftpmanager.folder')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='folder_access', to='ftpmanager.ftpgroup')),
+            ],
+            options={
+                'verbose_name': 'Group Folder Access',
+                'verbose_name_plural': 'Group Folder Access',
+                'unique_together': {('group', 'folder')},
+            },
+        ),
+    ]
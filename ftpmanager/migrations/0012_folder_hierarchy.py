@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from ftpmanager.paths import normalize_path
+
+
+def backfill_tree(apps, schema_editor):
+    """Set tree_path and the nearest managed ancestor of existing folders"""
+    Folder = apps.get_model('ftpmanager', 'Folder')
+    folders = list(Folder.objects.all())
+    for folder in folders:
+        path = normalize_path(folder.path)
+        folder.tree_path = path if path == '/' else path + '/'
+    by_tree_path = {folder.tree_path: folder.pk for folder in folders}
+    for folder in folders:
+        folder.parent_id = None
+        tree_path = folder.tree_path
+        while tree_path != '/':
+            tree_path = tree_path[:tree_path.rstrip('/').rindex('/') + 1]
+            if tree_path in by_tree_path:
+                folder.parent_id = by_tree_path[tree_path]
+                break
+    Folder.objects.bulk_update(folders, ['tree_path', 'parent'])
+
+
+def preserve_replaced_acls(apps, schema_editor):
+    """
+    Keep the access of subfolders that had rules of their own
+
+    Before folders inherited grants, a subfolder's own <Directory> rules
+    replaced its parent's (folders without rules fell back to the parent's
+    block). Grantees that a subfolder with its own rules would now inherit
+    get an explicit 'deny' there, or the permission their groups gave them
+    on it, so nobody gains access by the upgrade.
+    """
+    Folder = apps.get_model('ftpmanager', 'Folder')
+    FolderAccess = apps.get_model('ftpmanager', 'FolderAccess')
+    GroupFolderAccess = apps.get_model('ftpmanager', 'GroupFolderAccess')
+    Membership = apps.get_model('ftpmanager', 'FTPGroup').members.through
+    rank = {'read': 1, 'write': 2}
+
+    own_users = {}
+    for folder_id, user_id, permission in FolderAccess.objects.values_list('folder_id', 'user_id', 'permission'):
+        own_users.setdefault(folder_id, {})[user_id] = permission
+    own_groups = {}
+    for folder_id, group_id, permission in GroupFolderAccess.objects.values_list('folder_id', 'group_id', 'permission'):
+        own_groups.setdefault(folder_id, {})[group_id] = permission
+    # The old generator only wrote rules for active users and groups
+    ruled = set(FolderAccess.objects.filter(user__is_active=True).values_list('folder_id', flat=True)) | set(own_groups)
+    groups_of = {}
+    for group_id, user_id in Membership.objects.values_list('ftpgroup_id', 'ftpuser_id'):
+        groups_of.setdefault(user_id, []).append(group_id)
+
+    new_user_rows = []
+    new_group_rows = []
+    inherited = {}
+    for folder in Folder.objects.order_by('tree_path', 'pk'):
+        users = own_users.setdefault(folder.pk, {})
+        groups = own_groups.setdefault(folder.pk, {})
+        parent_users, parent_groups = inherited.get(folder.parent_id, ({}, {}))
+        if folder.parent_id and folder.pk in ruled:
+            for user_id, permission in parent_users.items():
+                if user_id in users or permission == 'deny':
+                    continue
+                via_groups = [groups[group_id] for group_id in groups_of.get(user_id, ()) if groups.get(group_id) in rank]
+                users[user_id] = max(via_groups, key=rank.get) if via_groups else 'deny'
+                new_user_rows.append(FolderAccess(folder_id=folder.pk, user_id=user_id, permission=users[user_id]))
+            for group_id, permission in parent_groups.items():
+                if group_id not in groups and permission != 'deny':
+                    groups[group_id] = 'deny'
+                    new_group_rows.append(GroupFolderAccess(folder_id=folder.pk, group_id=group_id, permission='deny'))
+        inherited[folder.pk] = ({**parent_users, **users}, {**parent_groups, **groups})
+
+    FolderAccess.objects.bulk_create(new_user_rows, batch_size=2000)
+    GroupFolderAccess.objects.bulk_create(new_group_rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0011_ftpgroup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='parent',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='ftpmanager.folder'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='tree_path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=502),
+        ),
+        migrations.AlterField(
+            model_name='folderaccess',
+            name='permission',
+            field=models.CharField(choices=[('read', 'Read Only'), ('write', 'Read & Write'), ('deny', 'No Access (overrides inherited access)')], default='read', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='groupfolderaccess',
+            name='permission',
+            field=models.CharField(choices=[('read', 'Read Only'), ('write', 'Read & Write'), ('deny', 'No Access (overrides inherited access)')], default='read', max_length=10),
+        ),
+        migrations.RunPython(backfill_tree, migrations.RunPython.noop),
+        migrations.RunPython(preserve_replaced_acls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0012_folder_hierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AclRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32)),
+                ('changed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
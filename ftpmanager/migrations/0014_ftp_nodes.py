@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:58
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0013_acl_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FTPNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, validators=[django.core.validators.RegexValidator('^[A-Za-z0-9][A-Za-z0-9._-]*$', 'Letters, digits, ".", "_" and "-" only.')])),
+                ('weight', models.PositiveIntegerField(default=1, help_text='Relative share of users assigned by hashing')),
+                ('is_active', models.BooleanField(default=True, help_text='Inactive nodes get no users; users pinned to them are assigned by hashing')),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'FTP Node',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ftpuser',
+            name='node',
+            field=models.ForeignKey(blank=True, help_text='Pin to this node instead of assigning by consistent hashing', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pinned_users', to='ftpmanager.ftpnode'),
+        ),
+    ]
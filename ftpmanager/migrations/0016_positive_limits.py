@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:49
+
+import django.core.validators
+from django.db import migrations, models
+
+
+LIMIT_FIELDS = {
+    'FTPUser': ['download_rate', 'upload_rate', 'max_clients', 'max_clients_per_host'],
+    'Folder': ['download_rate', 'upload_rate'],
+}
+
+
+def clear_zero_limits(apps, schema_editor):
+    """Reset limits saved as 0, which ProFTPD rejects, to empty (the server default)"""
+    for model_name, fields in LIMIT_FIELDS.items():
+        model = apps.get_model('ftpmanager', model_name)
+        for field in fields:
+            model.objects.filter(**{field: 0}).update(**{field: None})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0015_api_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_zero_limits, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='folder',
+            name='download_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Download TransferRate in KB/s, empty for unlimited', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='folder',
+            name='upload_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Upload TransferRate in KB/s, empty for unlimited', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='ftpuser',
+            name='download_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Download TransferRate in KB/s, empty for unlimited', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='ftpuser',
+            name='max_clients',
+            field=models.PositiveIntegerField(blank=True, help_text='MaxClientsPerUser, empty for the server default', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='ftpuser',
+            name='max_clients_per_host',
+            field=models.PositiveIntegerField(blank=True, help_text='MaxClientsPerHost for this user, empty for the server default', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='ftpuser',
+            name='upload_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Upload TransferRate in KB/s, empty for unlimited', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:02
+
+import django.core.validators
+import re
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ftpmanager', '0016_positive_limits'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ftpuser',
+            name='username',
+            field=models.CharField(max_length=100, unique=True, validators=[django.core.validators.RegexValidator(re.compile('^[A-Za-z0-9._][A-Za-z0-9._@-]*$'), 'Letters, digits, ".", "_", "@" and "-" only, not starting with "@" or "-".')]),
+        ),
+    ]
@@ -1,9 +1,22 @@
+import hashlib
+import os
+import re
+import secrets
+import threading
+import uuid
+from contextlib import contextmanager
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from passlib.hash import sha512_crypt
 
+from .paths import normalize_path
+
 
 class UserProfile(models.Model):
     """Extended profile for Django users with directory settings"""
@@ -36,14 +49,45 @@ def save_user_profile(sender, instance, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
+QUOTA_TYPE_CHOICES = [
+    ('soft', 'Soft (last upload may exceed)'),
+    ('hard', 'Hard (upload exceeding the limit is removed)'),
+]
+
+
+# User and group names that can be written to ftpd.passwd and ftpd.group
+ACCOUNT_NAME_RE = re.compile(r'^[A-Za-z0-9._][A-Za-z0-9._@-]*$')
+
+
 class FTPUser(models.Model):
-    username = models.CharField(max_length=100, unique=True)
+    username = models.CharField(max_length=100, unique=True, validators=[
+        RegexValidator(ACCOUNT_NAME_RE, 'Letters, digits, ".", "_", "@" and "-" only, not starting with "@" or "-".')
+    ])
     password_hash = models.CharField(max_length=255, blank=True)
     systemuser = models.CharField(max_length=100, default='1001', help_text='System username or UID for file ownership')
     is_active = models.BooleanField(default=True)
+    quota_bytes = models.PositiveBigIntegerField(null=True, blank=True, help_text='Upload limit in bytes (mod_quotatab), empty for unlimited')
+    quota_files = models.PositiveBigIntegerField(null=True, blank=True, help_text='Upload limit in files (mod_quotatab), empty for unlimited')
+    quota_type = models.CharField(max_length=4, choices=QUOTA_TYPE_CHOICES, default='hard')
+    download_rate = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='Download TransferRate in KB/s, empty for unlimited')
+    upload_rate = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='Upload TransferRate in KB/s, empty for unlimited')
+    max_clients = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='MaxClientsPerUser, empty for the server default')
+    max_clients_per_host = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='MaxClientsPerHost for this user, empty for the server default')
+    node = models.ForeignKey(
+        'FTPNode', null=True, blank=True, on_delete=models.SET_NULL, related_name='pinned_users',
+        help_text='Pin to this node instead of assigning by consistent hashing',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def has_quota(self):
+        return self.quota_bytes is not None or self.quota_files is not None
+
+    def has_limits(self):
+        return any(value is not None for value in (
+            self.download_rate, self.upload_rate, self.max_clients, self.max_clients_per_host
+        ))
+
     def set_password(self, raw_password):
         """Generate SHA-512 crypt hash for ProFTPD compatibility"""
         self.password_hash = sha512_crypt.hash(raw_password)
@@ -56,23 +100,134 @@ class FTPUser(models.Model):
         verbose_name_plural = "FTP Users"
 
 
+def make_tree_path(path):
+    """Materialized path of a folder: normalized path with a trailing slash"""
+    path = normalize_path(path)
+    return path if path == '/' else path + '/'
+
+
+def tree_path_prefixes(tree_path):
+    """Tree paths of all possible ancestors, root first, excluding tree_path itself"""
+    if tree_path == '/':
+        return []
+    parts = tree_path.strip('/').split('/')
+    return ['/'] + ['/' + '/'.join(parts[:i]) + '/' for i in range(1, len(parts))]
+
+
+def subtree_filter(tree_path, include_self=True):
+    """
+    Q matching folders at or below tree_path
+
+    Every tree path below '/a/' sorts between '/a/' and '/a0' ('0' follows
+    '/'), so this is an index range scan instead of a LIKE query.
+    """
+    upper = tree_path[:-1] + '0'
+    lookup = 'tree_path__gte' if include_self else 'tree_path__gt'
+    return Q(**{lookup: tree_path, 'tree_path__lt': upper})
+
+
 class Folder(models.Model):
     name = models.CharField(max_length=200)
     path = models.CharField(max_length=500, unique=True)
+    # Nearest managed ancestor by path, maintained on save/delete
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='children')
+    tree_path = models.CharField(max_length=502, db_index=True, editable=False, default='')
     description = models.TextField(blank=True)
+    quota_bytes = models.PositiveBigIntegerField(null=True, blank=True, help_text='Size limit in bytes, empty for unlimited')
+    quota_files = models.PositiveBigIntegerField(null=True, blank=True, help_text='File count limit, empty for unlimited')
+    quota_type = models.CharField(max_length=4, choices=QUOTA_TYPE_CHOICES, default='hard')
+    download_rate = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='Download TransferRate in KB/s, empty for unlimited')
+    upload_rate = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)], help_text='Upload TransferRate in KB/s, empty for unlimited')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.name} ({self.path})"
 
+    def clean(self):
+        if self.path and Folder.objects.filter(tree_path=make_tree_path(self.path)).exclude(pk=self.pk).exists():
+            raise ValidationError({'path': 'Another folder already has this path.'})
+
+    def save(self, *args, **kwargs):
+        old_tree_path = None
+        if self.pk:
+            old_tree_path = Folder.objects.filter(pk=self.pk).values_list('tree_path', flat=True).first()
+        self.tree_path = make_tree_path(self.path)
+        super().save(*args, **kwargs)
+        if old_tree_path != self.tree_path:
+            Folder.relink([self.tree_path] + ([old_tree_path] if old_tree_path else []))
+            self.refresh_from_db(fields=['parent'])
+
+    @classmethod
+    def relink(cls, tree_paths):
+        """Recompute the parent of every folder at or below the given tree paths"""
+        condition = Q()
+        for tree_path in tree_paths:
+            condition |= subtree_filter(tree_path)
+        affected = list(cls.objects.filter(condition).only('pk', 'tree_path', 'parent_id'))
+
+        prefixes = {prefix for folder in affected for prefix in tree_path_prefixes(folder.tree_path)}
+        known = dict(cls.objects.filter(tree_path__in=prefixes).values_list('tree_path', 'pk'))
+
+        changed = []
+        for folder in affected:
+            parent_id = next(
+                (known[prefix] for prefix in reversed(tree_path_prefixes(folder.tree_path)) if prefix in known),
+                None,
+            )
+            if folder.parent_id != parent_id:
+                folder.parent_id = parent_id
+                changed.append(folder)
+        if changed:
+            cls.objects.bulk_update(changed, ['parent'])
+            bump_acl_revision()
+
+    def ancestors(self):
+        """Managed folders above this one, nearest last"""
+        return Folder.objects.filter(tree_path__in=tree_path_prefixes(self.tree_path)).order_by('tree_path')
+
+    def descendants(self):
+        """Managed folders below this one, in tree order"""
+        return Folder.objects.filter(subtree_filter(self.tree_path, include_self=False)).order_by('tree_path')
+
+    def has_quota(self):
+        return self.quota_bytes is not None or self.quota_files is not None
+
+    def quota_status(self, usage):
+        """Return 'ok', 'soft' or 'hard' for a FolderUsage (or None if not scanned)
+
+        'hard' means a hard limit is reached and uploads are blocked; 'soft'
+        means a soft limit is exceeded, which is only reported.
+        """
+        if usage is None or not self.has_quota():
+            return 'ok'
+        exceeded = (
+            (self.quota_bytes is not None and usage.bytes >= self.quota_bytes)
+            or (self.quota_files is not None and usage.files >= self.quota_files)
+        )
+        if not exceeded:
+            return 'ok'
+        return self.quota_type
+
+    @property
+    def current_quota_status(self):
+        """quota_status() for the stored FolderUsage, for templates"""
+        return self.quota_status(getattr(self, 'usage', None))
+
     class Meta:
         ordering = ['name']
 
 
+@receiver(post_delete, sender=Folder)
+def relink_folder_children(sender, instance, **kwargs):
+    """Attach the children of a deleted folder to its nearest remaining ancestor"""
+    Folder.relink([instance.tree_path])
+
+
 class FolderAccess(models.Model):
     PERMISSION_CHOICES = [
         ('read', 'Read Only'),
         ('write', 'Read & Write'),
+        ('deny', 'No Access (overrides inherited access)'),
     ]
 
     user = models.ForeignKey(FTPUser, on_delete=models.CASCADE, related_name='folder_access')
@@ -87,3 +242,423 @@ class FolderAccess(models.Model):
         verbose_name = "Folder Access"
         verbose_name_plural = "Folder Access"
         unique_together = ['user', 'folder']
+
+
+class FTPGroup(models.Model):
+    """Virtual group written to ftpd.group (AuthGroupFile) and used in AllowGroup"""
+    name = models.CharField(max_length=100, unique=True, validators=[
+        RegexValidator(r'^[A-Za-z0-9][A-Za-z0-9._-]*$', 'Letters, digits, ".", "_" and "-" only.')
+    ])
+    gid = models.PositiveIntegerField(unique=True, help_text='Numeric group ID written to ftpd.group')
+    members = models.ManyToManyField(FTPUser, blank=True, related_name='ftp_groups')
+    description = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "FTP Group"
+        ordering = ['name']
+
+
+class FTPNode(models.Model):
+    """ProFTPD server serving a share of the users (see ftpmanager.sharding)"""
+    name = models.CharField(max_length=100, unique=True, validators=[
+        RegexValidator(r'^[A-Za-z0-9][A-Za-z0-9._-]*$', 'Letters, digits, ".", "_" and "-" only.')
+    ])
+    weight = models.PositiveIntegerField(default=1, help_text='Relative share of users assigned by hashing')
+    is_active = models.BooleanField(default=True, help_text='Inactive nodes get no users; users pinned to them are assigned by hashing')
+    description = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "FTP Node"
+        ordering = ['name']
+
+
+class GroupFolderAccess(models.Model):
+    """Folder permission granted to every member of an FTPGroup"""
+    group = models.ForeignKey(FTPGroup, on_delete=models.CASCADE, related_name='folder_access')
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name='group_access')
+    permission = models.CharField(max_length=10, choices=FolderAccess.PERMISSION_CHOICES, default='read')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"@{self.group.name} -> {self.folder.name} ({self.permission})"
+
+    class Meta:
+        verbose_name = "Group Folder Access"
+        verbose_name_plural = "Group Folder Access"
+        unique_together = ['group', 'folder']
+
+
+class AclRevision(models.Model):
+    """Token that changes whenever effective folder permissions may have changed
+
+    There is a single row (pk=1). In-memory ACL snapshots compare its token
+    to decide whether they are stale; a random token (rather than a
+    counter) can never repeat after a rolled back transaction.
+    """
+    token = models.CharField(max_length=32)
+    changed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.token
+
+    @classmethod
+    def current_token(cls):
+        """Current token, or None if permissions never changed"""
+        return cls.objects.filter(pk=1).values_list('token', flat=True).first()
+
+
+_deferred_acl = threading.local()
+
+
+def bump_acl_revision():
+    """
+    Invalidate ACL snapshots
+
+    Called from signals on every model that affects permissions; code that
+    bypasses signals (bulk_create, QuerySet.update) must call it itself.
+    """
+    if getattr(_deferred_acl, 'depth', 0):
+        _deferred_acl.pending = True
+        return
+    token = uuid.uuid4().hex
+    if not AclRevision.objects.filter(pk=1).update(token=token):
+        AclRevision.objects.update_or_create(pk=1, defaults={'token': token})
+
+
+@contextmanager
+def deferred_acl_revision():
+    """
+    Bump the ACL revision once when the block ends instead of on every change
+
+    For code that saves or deletes many objects through the ORM, where the
+    signals would otherwise write a new token per object.
+    """
+    depth = getattr(_deferred_acl, 'depth', 0)
+    if not depth:
+        _deferred_acl.pending = False
+    _deferred_acl.depth = depth + 1
+    try:
+        yield
+    finally:
+        _deferred_acl.depth = depth
+    if not depth and _deferred_acl.pending:
+        bump_acl_revision()
+
+
+@receiver(post_save, sender=FTPUser)
+@receiver(post_delete, sender=FTPUser)
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+@receiver(post_save, sender=FolderAccess)
+@receiver(post_delete, sender=FolderAccess)
+@receiver(post_save, sender=FTPGroup)
+@receiver(post_delete, sender=FTPGroup)
+@receiver(post_save, sender=GroupFolderAccess)
+@receiver(post_delete, sender=GroupFolderAccess)
+def acl_changed(sender, **kwargs):
+    bump_acl_revision()
+
+
+@receiver(m2m_changed, sender=FTPGroup.members.through)
+def acl_members_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_acl_revision()
+
+
+class ApiToken(models.Model):
+    """Bearer token for the JSON API (ftpmanager.api), acting for a panel login
+
+    Only a sha256 of the key is stored; the key itself is shown once when
+    the token is created.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    prefix = models.CharField(max_length=8, editable=False, help_text='First characters of the key, to tell tokens apart')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return f"{self.name} ({self.prefix}...)"
+
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def create_token(cls, name, user):
+        """Create a token and return (token, key)"""
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(name=name, user=user, key_hash=cls.hash_key(key), prefix=key[:8])
+        return token, key
+
+    @classmethod
+    def authenticate(cls, key):
+        """Active token with this key whose login is active, or None"""
+        return cls.objects.select_related('user').filter(
+            key_hash=cls.hash_key(key), is_active=True, user__is_active=True,
+        ).first()
+
+    class Meta:
+        verbose_name = "API Token"
+
+
+class IdempotencyKey(models.Model):
+    """Response to an API write, replayed when the request is retried with the same Idempotency-Key"""
+    token = models.ForeignKey(ApiToken, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.token.name}: {self.key}"
+
+    class Meta:
+        unique_together = ['token', 'key']
+
+
+class LogCursor(models.Model):
+    """Read position of an ingested log file, survives rotation via inode"""
+    path = models.CharField(max_length=500, unique=True)
+    inode = models.BigIntegerField(default=0)
+    offset = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path} @ {self.offset}"
+
+
+class TrafficRollupQuerySet(models.QuerySet):
+    def since(self, start):
+        return self.filter(hour__gte=start)
+
+    def totals(self):
+        """Return overall {'in': bytes, 'out': bytes, 'files': count}"""
+        totals = self.filter(direction__in=['i', 'o']).aggregate(
+            uploaded=models.Sum('bytes', filter=models.Q(direction='i')),
+            downloaded=models.Sum('bytes', filter=models.Q(direction='o')),
+            files=models.Sum('files'),
+        )
+        return {'in': totals['uploaded'] or 0, 'out': totals['downloaded'] or 0, 'files': totals['files'] or 0}
+
+    def totals_by(self, field):
+        """Return {field value: {'in': bytes, 'out': bytes, 'files': count}}"""
+        totals = {}
+        rows = self.filter(direction__in=['i', 'o']).values(field, 'direction').annotate(
+            total_bytes=models.Sum('bytes'), total_files=models.Sum('files'),
+        )
+        for row in rows:
+            entry = totals.setdefault(row[field], {'in': 0, 'out': 0, 'files': 0})
+            entry['in' if row['direction'] == 'i' else 'out'] += row['total_bytes']
+            entry['files'] += row['total_files']
+        return totals
+
+
+class TrafficRollup(models.Model):
+    """Hourly transfer totals per user and folder, built by ingest_xferlog"""
+    DIRECTION_CHOICES = [
+        ('i', 'Upload'),
+        ('o', 'Download'),
+    ]
+
+    hour = models.DateTimeField()
+    user = models.ForeignKey(FTPUser, on_delete=models.CASCADE, related_name='traffic')
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, null=True, blank=True, related_name='traffic')
+    direction = models.CharField(max_length=1, choices=DIRECTION_CHOICES)
+    bytes = models.BigIntegerField(default=0)
+    files = models.IntegerField(default=0)
+
+    objects = TrafficRollupQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.user.username} {self.get_direction_display()} {self.bytes} bytes @ {self.hour}"
+
+    class Meta:
+        unique_together = ['hour', 'user', 'folder', 'direction']
+        indexes = [
+            models.Index(fields=['hour']),
+            models.Index(fields=['folder', 'hour']),
+        ]
+
+
+class AuthStatQuerySet(models.QuerySet):
+    def since(self, start):
+        return self.filter(hour__gte=start)
+
+    def totals_by(self, field):
+        """Return {field value: {'successes': count, 'failures': count}}"""
+        rows = self.values(field).annotate(
+            total_successes=models.Sum('successes'), total_failures=models.Sum('failures'),
+        )
+        return {
+            row[field]: {'successes': row['total_successes'], 'failures': row['total_failures']}
+            for row in rows
+        }
+
+    def top_failures(self, field, limit=10):
+        """Return the field values with the most failed logins, most first"""
+        return list(
+            self.values(field)
+            .annotate(total_failures=models.Sum('failures'), total_successes=models.Sum('successes'))
+            .filter(total_failures__gt=0)
+            .order_by('-total_failures', field)[:limit]
+        )
+
+
+class AuthStat(models.Model):
+    """Hourly login counters per username and client IP, built by ingest_authlog"""
+    hour = models.DateTimeField()
+    username = models.CharField(max_length=100)
+    user = models.ForeignKey(FTPUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='auth_stats')
+    client_ip = models.GenericIPAddressField()
+    successes = models.IntegerField(default=0)
+    failures = models.IntegerField(default=0)
+
+    objects = AuthStatQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.username}@{self.client_ip} {self.successes}/{self.failures} @ {self.hour}"
+
+    class Meta:
+        unique_together = ['hour', 'username', 'client_ip']
+        indexes = [
+            models.Index(fields=['hour']),
+            models.Index(fields=['username', 'hour']),
+            models.Index(fields=['client_ip', 'hour']),
+        ]
+
+
+class FolderUsage(models.Model):
+    """Disk usage of a folder from the last scan_usage run"""
+    folder = models.OneToOneField(Folder, on_delete=models.CASCADE, related_name='usage')
+    bytes = models.BigIntegerField(default=0)
+    files = models.BigIntegerField(default=0)
+    scanned_at = models.DateTimeField()
+    scan_seconds = models.FloatField(default=0)
+    error = models.CharField(max_length=500, blank=True)
+    # Per-directory scan results keyed by path relative to the folder:
+    # [mtime_ns, own bytes, own files, [subdirectory names]]
+    dir_cache = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.folder.path}: {self.bytes} bytes in {self.files} files"
+
+
+# Directive values per preset, keyed by ServerTuning field name
+TUNING_PRESETS = {
+    'small_nas': {
+        'label': 'Small NAS',
+        'max_instances': 10,
+        'max_clients_per_host': 4,
+        'timeout_login': 300,
+        'timeout_idle': 300,
+        'timeout_no_transfer': 600,
+        'timeout_stalled': 300,
+        'use_sendfile': True,
+        'socket_rcvbuf': None,
+        'socket_sndbuf': None,
+    },
+    'busy_ingest': {
+        'label': 'Busy ingest host',
+        'max_instances': 100,
+        'max_clients_per_host': 16,
+        'timeout_login': 120,
+        'timeout_idle': 300,
+        'timeout_no_transfer': 600,
+        'timeout_stalled': 120,
+        'use_sendfile': True,
+        'socket_rcvbuf': 1048576,
+        'socket_sndbuf': 262144,
+    },
+    'many_idle': {
+        'label': 'Many idle clients',
+        'max_instances': 500,
+        'max_clients_per_host': 8,
+        'timeout_login': 60,
+        'timeout_idle': 1800,
+        'timeout_no_transfer': 3600,
+        'timeout_stalled': 600,
+        'use_sendfile': True,
+        'socket_rcvbuf': None,
+        'socket_sndbuf': None,
+    },
+}
+
+TUNING_PRESET_CHOICES = [('custom', 'Custom')] + [
+    (key, preset['label']) for key, preset in TUNING_PRESETS.items()
+]
+
+TIMEOUT_VALIDATORS = [MinValueValidator(1), MaxValueValidator(86400)]
+SOCKET_BUFFER_VALIDATORS = [MinValueValidator(4096), MaxValueValidator(16777216)]
+
+
+class ServerTuning(models.Model):
+    """Server-wide performance settings, generated into conf.d/00-tuning.conf
+
+    There is a single row (pk=1); use ServerTuning.load() to edit it and
+    ServerTuning.current() to read it without creating it.
+    """
+    preset = models.CharField(max_length=20, choices=TUNING_PRESET_CHOICES, default='custom', editable=False)
+    max_instances = models.PositiveIntegerField(default=30, validators=[MinValueValidator(1), MaxValueValidator(10000)])
+    max_clients_per_host = models.PositiveIntegerField(default=8, validators=[MinValueValidator(1), MaxValueValidator(10000)])
+    timeout_login = models.PositiveIntegerField(default=300, validators=TIMEOUT_VALIDATORS)
+    timeout_idle = models.PositiveIntegerField(default=600, validators=TIMEOUT_VALIDATORS)
+    timeout_no_transfer = models.PositiveIntegerField(default=900, validators=TIMEOUT_VALIDATORS)
+    timeout_stalled = models.PositiveIntegerField(default=300, validators=TIMEOUT_VALIDATORS)
+    use_sendfile = models.BooleanField(default=True)
+    socket_rcvbuf = models.PositiveIntegerField(null=True, blank=True, validators=SOCKET_BUFFER_VALIDATORS, help_text='Socket receive buffer in bytes, empty for the kernel default')
+    socket_sndbuf = models.PositiveIntegerField(null=True, blank=True, validators=SOCKET_BUFFER_VALIDATORS, help_text='Socket send buffer in bytes, empty for the kernel default')
+    scoreboard_file = models.CharField(max_length=500, blank=True, help_text='Empty uses PROFTPD_SCOREBOARD_FILE from settings')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Server tuning ({self.get_preset_display()})"
+
+    def clean(self):
+        errors = {}
+        if self.max_clients_per_host and self.max_instances and self.max_clients_per_host > self.max_instances:
+            errors['max_clients_per_host'] = 'Cannot be larger than the maximum number of instances.'
+        if self.scoreboard_file and not os.path.isabs(self.scoreboard_file):
+            errors['scoreboard_file'] = 'Must be an absolute path.'
+        if self.scoreboard_file and any(c.isspace() for c in self.scoreboard_file):
+            errors['scoreboard_file'] = 'Must not contain whitespace.'
+        if errors:
+            raise ValidationError(errors)
+
+    def save(self, *args, **kwargs):
+        self.pk = 1
+        self.preset = self.matching_preset()
+        super().save(*args, **kwargs)
+
+    def matching_preset(self):
+        """Return the preset whose values all match, or 'custom'"""
+        for key, preset in TUNING_PRESETS.items():
+            if all(getattr(self, field) == value for field, value in preset.items() if field != 'label'):
+                return key
+        return 'custom'
+
+    def apply_preset(self, key):
+        """Set all fields from a named preset (KeyError if unknown)"""
+        for field, value in TUNING_PRESETS[key].items():
+            if field != 'label':
+                setattr(self, field, value)
+
+    @classmethod
+    def load(cls):
+        tuning, _created = cls.objects.get_or_create(pk=1)
+        return tuning
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).first() or cls(pk=1)
@@ -0,0 +1,60 @@
+"""
+Folder Path Lookup
+
+Maps filesystem paths to managed folders by longest matching prefix, the
+same way ProFTPD picks the most specific <Directory> block for a path.
+"""
+
+import posixpath
+
+
+def normalize_path(path):
+    """Normalize a path for prefix comparison: absolute, no trailing slash"""
+    return posixpath.normpath('/' + path.lstrip('/'))
+
+
+class FolderPathIndex:
+    """Longest-prefix lookup of folder ids by path
+
+    Matching is per path component, so /data/test matches /data/test/a.txt
+    but not /data/testing. Lookups walk up the parent directories, so the
+    cost depends on path depth rather than on the number of folders.
+    """
+
+    CACHE_SIZE = 100000
+
+    def __init__(self, folders):
+        """folders is an iterable of (id, path) pairs"""
+        self.folders = {normalize_path(path): folder_id for folder_id, path in folders}
+        self._cache = {}
+
+    @classmethod
+    def from_db(cls):
+        from .models import Folder
+        return cls(Folder.objects.values_list('id', 'path'))
+
+    def _lookup(self, path):
+        while True:
+            if path in self.folders:
+                return self.folders[path]
+            if path == '/':
+                return None
+            path = posixpath.dirname(path)
+
+    def lookup(self, path):
+        """Return the id of the most specific folder containing path, or None"""
+        path = normalize_path(path)
+        try:
+            return self._cache[path]
+        except KeyError:
+            pass
+
+        folder_id = self._lookup(path)
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[path] = folder_id
+        return folder_id
+
+    def lookup_file(self, filename):
+        """Return the folder id for a file, caching per directory"""
+        return self.lookup(posixpath.dirname(normalize_path(filename)))
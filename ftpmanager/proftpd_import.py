@@ -0,0 +1,409 @@
+"""
+ProFTPD Import
+
+Reads an existing hand-maintained install into the database: users and
+their crypt hashes from an AuthUserFile (ftpd.passwd), groups from an
+AuthGroupFile, and folders and permissions from the <Directory>, <Limit>,
+AllowUser and AllowGroup rules of a config file, including the per-user
+<IfUser> sections written by the 'ifuser' ACL mode.
+
+Files are parsed line by line, compared with the database as a plan of
+changes and written with bulk_create/bulk_update in batches. Importing the
+same files again changes nothing; objects that are not in the files are
+left alone.
+"""
+
+import posixpath
+import re
+from collections import namedtuple
+
+from django.db import transaction
+
+from .acl import merge_permission
+from .config_preview import ifuser_names
+from .models import (
+    ACCOUNT_NAME_RE, FTPGroup, FTPUser, Folder, FolderAccess, GroupFolderAccess, bump_acl_revision, make_tree_path,
+)
+from .paths import normalize_path
+
+
+BATCH_SIZE = 2000
+
+PasswdRecord = namedtuple('PasswdRecord', 'username password_hash uid gid home line')
+GroupRecord = namedtuple('GroupRecord', 'name gid members line')
+
+READ_COMMANDS = {'ALL', 'READ', 'DIRS', 'RETR', 'LIST', 'NLST', 'MLSD', 'MLST', 'STAT', 'CWD', 'XCWD'}
+WRITE_COMMANDS = {
+    'ALL', 'WRITE', 'STOR', 'STOU', 'APPE', 'DELE', 'MKD', 'XMKD', 'RMD', 'XRMD', 'RNFR', 'RNTO', 'SITE_CHMOD',
+}
+SECTION_RE = re.compile(r'^<\s*(/?)\s*([A-Za-z]+)\s*(.*?)\s*>$')
+LOCKED_PREFIXES = ('!', '*')
+
+
+def logical_lines(lines):
+    """Yield (line number, stripped line) joining backslash continuations, without comments and blanks"""
+    pending = ''
+    start = None
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line.endswith('\\'):
+            pending += line[:-1] + ' '
+            start = start or number
+            continue
+        line = pending + line
+        number, pending, start = start or number, '', None
+        if line and not line.startswith('#'):
+            yield number, line
+
+
+def parse_passwd(lines, warnings):
+    """Yield PasswdRecords of ftpd.passwd lines; malformed lines are added to warnings"""
+    for number, line in logical_lines(lines):
+        fields = line.split(':')
+        if len(fields) != 7 or not fields[0] or not fields[2].isdigit():
+            warnings.append(f'passwd line {number}: not a "user:hash:uid:gid:gecos:home:shell" entry')
+            continue
+        if not ACCOUNT_NAME_RE.match(fields[0]):
+            warnings.append(f'passwd line {number}: invalid username {fields[0]!r}, skipped')
+            continue
+        yield PasswdRecord(fields[0], fields[1], fields[2], fields[3], fields[5], number)
+
+
+def parse_group(lines, warnings):
+    """Yield GroupRecords of ftpd.group lines; malformed lines are added to warnings"""
+    for number, line in logical_lines(lines):
+        fields = line.split(':')
+        if len(fields) != 4 or not fields[0] or not fields[2].isdigit():
+            warnings.append(f'group line {number}: not a "group:password:gid:members" entry')
+            continue
+        yield GroupRecord(fields[0], int(fields[2]), [name for name in fields[3].split(',') if name], number)
+
+
+def directory_path(argument):
+    """Normalized folder path of a <Directory> argument, None for globs and ~ paths"""
+    path = argument.strip('"')
+    if path.endswith('/*'):
+        path = path[:-2]
+    if not path.startswith('/') or any(char in path for char in '*?[~'):
+        return None
+    return normalize_path(path)
+
+
+class ConfigRules:
+    """Folder permissions collected from a config file"""
+
+    def __init__(self):
+        # {path: ({username: permission}, {group: permission})}
+        self.folders = {}
+        self.warnings = []
+
+    def folder(self, path):
+        return self.folders.setdefault(path, ({}, {}))
+
+    def grant(self, path, principals, permission):
+        users, groups = self.folder(path)
+        for kind, name in principals:
+            grants = users if kind == 'user' else groups
+            grants[name] = merge_permission(grants.get(name), permission)
+
+    def with_denials(self):
+        """
+        {path: (users, groups)} with 'deny' grants added
+
+        A <Directory> block replaces the rules of the block above it, while
+        folder grants in the database are inherited and merged, so whoever
+        is allowed on the nearest imported parent but not on a folder is
+        denied there.
+        """
+        result = {}
+        for path in sorted(self.folders, key=make_tree_path):
+            users, groups = ({**grants} for grants in self.folders[path])
+            parent = posixpath.dirname(path)
+            while parent not in self.folders and parent != '/':
+                parent = posixpath.dirname(parent)
+            if parent in self.folders and parent != path:
+                parent_users, parent_groups = self.folders[parent]
+                users.update((name, 'deny') for name in parent_users.keys() - users.keys())
+                groups.update((name, 'deny') for name in parent_groups.keys() - groups.keys())
+            result[path] = (users, groups)
+        return result
+
+
+def parse_config(lines):
+    """
+    Return ConfigRules of a users.conf
+
+    Inside a <Directory>, AllowUser/AllowGroup in a <Limit> of read
+    commands (READ, DIRS, RETR, ...) grant 'read' and in one of write
+    commands (WRITE, STOR, DELE, ...) 'write'. Inside an <IfUser> section
+    AllowAll grants the section's users. Rules that cannot be expressed as
+    folder permissions are reported in warnings.
+    """
+    rules = ConfigRules()
+    stack = []
+    directory = None
+    ifuser = None
+    limit = None
+
+    for number, line in logical_lines(lines):
+        match = SECTION_RE.match(line)
+        if match:
+            closing, tag, argument = match.group(1), match.group(2).lower(), match.group(3)
+            if closing:
+                if not stack or stack[-1] != tag:
+                    rules.warnings.append(f'config line {number}: unexpected </{match.group(2)}>')
+                    continue
+                stack.pop()
+                if tag == 'directory':
+                    directory = None
+                elif tag == 'ifuser':
+                    ifuser = None
+                elif tag == 'limit':
+                    limit = None
+                continue
+            stack.append(tag)
+            if tag == 'directory':
+                directory = directory_path(argument)
+                if directory is None:
+                    rules.warnings.append(f'config line {number}: <Directory {argument}> is not a plain path, skipped')
+                else:
+                    rules.folder(directory)
+            elif tag == 'ifuser':
+                ifuser = [('user', name) for name in ifuser_names(argument)]
+            elif tag == 'limit':
+                commands = {command.upper() for command in argument.replace(',', ' ').split()}
+                limit = 'write' if commands & WRITE_COMMANDS else 'read' if commands & READ_COMMANDS else None
+            continue
+
+        if directory is None or limit is None:
+            continue
+        directive, _, argument = line.partition(' ')
+        directive = directive.lower()
+        if directive == 'allowuser':
+            names = argument.replace(',', ' ').split()
+            if any(name.startswith('!') for name in names):
+                rules.warnings.append(f'config line {number}: negated AllowUser is not imported')
+                names = [name for name in names if not name.startswith('!')]
+            rules.grant(directory, [('user', name) for name in names], limit)
+        elif directive == 'allowgroup':
+            if ',' in argument or argument.startswith('!'):
+                # Comma-separated groups must all match, which grants cannot express
+                rules.warnings.append(f'config line {number}: AllowGroup {argument.strip()} is not imported')
+                continue
+            rules.grant(directory, [('group', name) for name in argument.split()], limit)
+        elif directive == 'allowall':
+            if ifuser:
+                rules.grant(directory, ifuser, limit)
+            else:
+                rules.warnings.append(f'config line {number}: AllowAll for everyone in {directory} is not imported')
+
+    if stack:
+        rules.warnings.append(f'config: <{stack[-1]}> is not closed')
+    return rules
+
+
+class ImportPlan:
+    """Changes that bring the database in line with parsed ProFTPD files"""
+
+    def __init__(self):
+        self.new_users = []
+        self.changed_users = []
+        self.unchanged_users = 0
+        self.new_groups = []
+        self.new_members = []
+        self.new_folders = []
+        self.new_access = []
+        self.changed_access = []
+        self.unchanged_access = 0
+        self.warnings = []
+
+    @property
+    def has_changes(self):
+        return any((
+            self.new_users, self.changed_users, self.new_groups, self.new_members,
+            self.new_folders, self.new_access, self.changed_access,
+        ))
+
+    def diff_lines(self):
+        """Yield the changes as '+' (new) and '~' (changed) lines"""
+        for user in self.new_users:
+            state = '' if user.is_active else ', locked'
+            yield f'+ user {user.username} (uid {user.systemuser}{state})'
+        for user, fields in self.changed_users:
+            yield f'~ user {user.username}: {", ".join(fields)} differ'
+        for group in self.new_groups:
+            yield f'+ group {group.name} (gid {group.gid})'
+        for group, username in self.new_members:
+            yield f'+ member {group} {username}'
+        for folder in self.new_folders:
+            yield f'+ folder {folder.path}'
+        for kind, name, path, permission in self.new_access:
+            principal = f'@{name}' if kind == 'group' else name
+            yield f'+ access {principal} {path} {permission}'
+        for kind, name, path, old, permission in self.changed_access:
+            principal = f'@{name}' if kind == 'group' else name
+            yield f'~ access {principal} {path} {old} -> {permission}'
+
+    def summary(self):
+        return (
+            f'Users: {len(self.new_users)} new, {len(self.changed_users)} differ, {self.unchanged_users} unchanged. '
+            f'Groups: {len(self.new_groups)} new, {len(self.new_members)} memberships. '
+            f'Folders: {len(self.new_folders)} new. '
+            f'Access: {len(self.new_access)} new, {len(self.changed_access)} differ, {self.unchanged_access} unchanged.'
+        )
+
+
+def plan_import(passwd_lines=None, group_lines=None, config_lines=None):
+    """Compare parsed files with the database and return an ImportPlan"""
+    plan = ImportPlan()
+    existing_users = {
+        username: (password_hash, systemuser)
+        for username, password_hash, systemuser in FTPUser.objects.values_list('username', 'password_hash', 'systemuser')
+    }
+
+    seen = set()
+    for record in parse_passwd(passwd_lines or [], plan.warnings):
+        if record.username in seen:
+            plan.warnings.append(f'passwd line {record.line}: duplicate user {record.username}')
+            continue
+        seen.add(record.username)
+        if record.username not in existing_users:
+            plan.new_users.append(FTPUser(
+                username=record.username,
+                password_hash=record.password_hash,
+                systemuser=record.uid,
+                is_active=not record.password_hash.startswith(LOCKED_PREFIXES),
+            ))
+            continue
+        password_hash, systemuser = existing_users[record.username]
+        fields = []
+        if password_hash != record.password_hash:
+            fields.append('password hash')
+        if systemuser.isdigit() and systemuser != record.uid:
+            fields.append('uid')
+        if fields:
+            plan.changed_users.append((FTPUser(username=record.username, password_hash=record.password_hash, systemuser=record.uid), fields))
+        else:
+            plan.unchanged_users += 1
+
+    known_users = seen | existing_users.keys()
+    existing_groups = set(FTPGroup.objects.values_list('name', flat=True))
+    used_gids = set(FTPGroup.objects.values_list('gid', flat=True))
+    members = set(FTPGroup.members.through.objects.values_list('ftpgroup__name', 'ftpuser__username'))
+    known_groups = set(existing_groups)
+    for record in parse_group(group_lines or [], plan.warnings):
+        if record.name not in known_groups:
+            if record.gid in used_gids:
+                plan.warnings.append(f'group line {record.line}: gid {record.gid} of {record.name} is already used')
+                continue
+            plan.new_groups.append(FTPGroup(name=record.name, gid=record.gid))
+            known_groups.add(record.name)
+            used_gids.add(record.gid)
+        for username in record.members:
+            if username not in known_users:
+                plan.warnings.append(f'group line {record.line}: unknown member {username}')
+            elif (record.name, username) not in members:
+                plan.new_members.append((record.name, username))
+                members.add((record.name, username))
+
+    rules = parse_config(config_lines or [])
+    plan.warnings.extend(rules.warnings)
+    existing_folders = set(Folder.objects.values_list('tree_path', flat=True))
+    user_access = {
+        (username, tree_path): permission
+        for username, tree_path, permission in FolderAccess.objects.values_list('user__username', 'folder__tree_path', 'permission')
+    }
+    group_access = {
+        (name, tree_path): permission
+        for name, tree_path, permission in GroupFolderAccess.objects.values_list('group__name', 'folder__tree_path', 'permission')
+    }
+
+    unknown = set()
+    for path, (users, groups) in rules.with_denials().items():
+        tree_path = make_tree_path(path)
+        if tree_path not in existing_folders:
+            plan.new_folders.append(Folder(name=posixpath.basename(path) or path, path=path, tree_path=tree_path))
+            existing_folders.add(tree_path)
+        for kind, grants, known, access in (
+            ('user', users, known_users, user_access),
+            ('group', groups, known_groups, group_access),
+        ):
+            for name, permission in grants.items():
+                if name not in known:
+                    unknown.add((kind, name))
+                    continue
+                old = access.get((name, tree_path))
+                if old is None:
+                    plan.new_access.append((kind, name, path, permission))
+                elif old != permission:
+                    plan.changed_access.append((kind, name, path, old, permission))
+                else:
+                    plan.unchanged_access += 1
+    for kind, name in sorted(unknown):
+        plan.warnings.append(f'config: unknown {kind} {name}, its rules are not imported')
+    return plan
+
+
+@transaction.atomic
+def apply_import(plan, update=False):
+    """
+    Write an ImportPlan to the database
+
+    New objects are always created; users and grants that differ are only
+    changed with update. Returns the number of objects written.
+    """
+    written = 0
+    FTPUser.objects.bulk_create(plan.new_users, batch_size=BATCH_SIZE)
+    written += len(plan.new_users)
+    if update and plan.changed_users:
+        users = {user.username: user for user, _fields in plan.changed_users}
+        changed = list(FTPUser.objects.filter(username__in=users).only('pk', 'username', 'password_hash', 'systemuser'))
+        for user in changed:
+            user.password_hash = users[user.username].password_hash
+            if user.systemuser.isdigit():
+                user.systemuser = users[user.username].systemuser
+        FTPUser.objects.bulk_update(changed, ['password_hash', 'systemuser'], batch_size=BATCH_SIZE)
+        written += len(changed)
+
+    FTPGroup.objects.bulk_create(plan.new_groups, batch_size=BATCH_SIZE)
+    written += len(plan.new_groups)
+
+    Folder.objects.bulk_create(plan.new_folders, batch_size=BATCH_SIZE)
+    written += len(plan.new_folders)
+    if plan.new_folders:
+        # bulk_create skips Folder.save(), which links parents
+        Folder.relink(['/'])
+
+    user_ids = dict(FTPUser.objects.values_list('username', 'pk'))
+    group_ids = dict(FTPGroup.objects.values_list('name', 'pk'))
+    folder_ids = dict(Folder.objects.values_list('tree_path', 'pk'))
+    FTPGroup.members.through.objects.bulk_create(
+        [FTPGroup.members.through(ftpgroup_id=group_ids[group], ftpuser_id=user_ids[username]) for group, username in plan.new_members],
+        batch_size=BATCH_SIZE,
+    )
+    written += len(plan.new_members)
+
+    user_grants = []
+    group_grants = []
+    for kind, name, path, permission in plan.new_access:
+        folder_id = folder_ids[make_tree_path(path)]
+        if kind == 'user':
+            user_grants.append(FolderAccess(user_id=user_ids[name], folder_id=folder_id, permission=permission))
+        else:
+            group_grants.append(GroupFolderAccess(group_id=group_ids[name], folder_id=folder_id, permission=permission))
+    FolderAccess.objects.bulk_create(user_grants, batch_size=BATCH_SIZE)
+    GroupFolderAccess.objects.bulk_create(group_grants, batch_size=BATCH_SIZE)
+    written += len(user_grants) + len(group_grants)
+
+    if update:
+        for kind, name, path, _old, permission in plan.changed_access:
+            folder_id = folder_ids[make_tree_path(path)]
+            if kind == 'user':
+                FolderAccess.objects.filter(user_id=user_ids[name], folder_id=folder_id).update(permission=permission)
+            else:
+                GroupFolderAccess.objects.filter(group_id=group_ids[name], folder_id=folder_id).update(permission=permission)
+            written += 1
+
+    if written:
+        bump_acl_revision()
+    return written
@@ -0,0 +1,159 @@
+"""
+ProFTPD Scoreboard Reader
+
+Decodes the ScoreboardFile that ProFTPD keeps with one fixed-size record per
+connection (the data behind ftpwho), without running any external command.
+
+The record layout follows pr_scoreboard_header_t / pr_scoreboard_entry_t
+from ProFTPD's include/scoreboard.h for a 64-bit Linux build with IPv6 and
+the default PR_TUNABLE_SCOREBOARD_BUFFER_SIZE of 80.
+"""
+
+import mmap
+import os
+import struct
+
+from django.conf import settings
+
+
+DEFAULT_SCOREBOARD_FILE = '/var/run/proftpd/proftpd.scoreboard'
+
+SCOREBOARD_MAGIC = 0xdeadbeef
+SCOREBOARD_VERSION = 0x01040003
+
+# int sch_magic, int sch_version, pid_t sch_pid, time_t sch_uptime
+HEADER_FORMAT = '@IIiq'
+
+ENTRY_FIELDS = [
+    ('pid', 'i'),
+    ('uid', 'I'),
+    ('gid', 'I'),
+    ('user', '32s'),
+    ('server_port', 'i'),
+    ('server_addr', '80s'),
+    ('server_label', '32s'),
+    ('client_addr', '46s'),
+    ('client_name', '80s'),
+    ('user_class', '32s'),
+    ('protocol', '32s'),
+    ('cwd', '80s'),
+    ('command', '65s'),
+    ('argument', '80s'),
+    ('idle_since', 'q'),
+    ('session_start', 'q'),
+    ('xfer_size', 'q'),
+    ('xfer_done', 'q'),
+    ('xfer_len', 'q'),
+    ('xfer_elapsed', 'L'),
+]
+ENTRY_FORMAT = '@' + ''.join(code for _name, code in ENTRY_FIELDS)
+
+# Commands whose argument is the file being transferred
+TRANSFER_COMMANDS = {'RETR', 'STOR', 'STOU', 'APPE'}
+
+
+def _aligned_size(fmt, alignment=8):
+    """Size of a C struct including trailing padding to its alignment"""
+    size = struct.calcsize(fmt)
+    return (size + alignment - 1) // alignment * alignment
+
+
+HEADER_SIZE = _aligned_size(HEADER_FORMAT)
+ENTRY_SIZE = _aligned_size(ENTRY_FORMAT)
+
+
+class ScoreboardError(Exception):
+    """Raised when the scoreboard file is not in the expected format"""
+
+
+def _decode(value):
+    """Decode a NUL-terminated C string"""
+    return value.split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+
+def parse_scoreboard(data):
+    """
+    Parse scoreboard bytes (or an mmap) into a list of session dicts
+
+    Empty slots (pid 0) left behind by closed connections are skipped.
+    """
+    if len(data) < HEADER_SIZE:
+        raise ScoreboardError('Scoreboard file is truncated')
+
+    magic, version, _daemon_pid, _uptime = struct.unpack_from(HEADER_FORMAT, data, 0)
+    if magic != SCOREBOARD_MAGIC:
+        raise ScoreboardError('Not a ProFTPD scoreboard file (bad magic)')
+    if version != SCOREBOARD_VERSION:
+        raise ScoreboardError(f'Unsupported scoreboard version 0x{version:08x}')
+
+    names = [name for name, _code in ENTRY_FIELDS]
+    sessions = []
+    for offset in range(HEADER_SIZE, len(data) - ENTRY_SIZE + 1, ENTRY_SIZE):
+        values = struct.unpack_from(ENTRY_FORMAT, data, offset)
+        if values[0] == 0:
+            continue
+
+        entry = dict(zip(names, values))
+        for name, code in ENTRY_FIELDS:
+            if code.endswith('s'):
+                entry[name] = _decode(entry[name])
+        entry['file'] = entry['argument'] if entry['command'] in TRANSFER_COMMANDS else ''
+        sessions.append(entry)
+
+    return sessions
+
+
+class ScoreboardReader:
+    """Cached scoreboard reader
+
+    The file is only re-parsed when its inode, size or mtime change, so
+    polling an idle server costs a single stat() call.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._key = None
+        self._sessions = []
+
+    def sessions(self):
+        """Return the active sessions, raising FileNotFoundError/ScoreboardError"""
+        stat = os.stat(self.path)
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if key == self._key:
+            return self._sessions
+
+        with open(self.path, 'rb') as f:
+            if stat.st_size == 0:
+                raise ScoreboardError('Scoreboard file is empty')
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sessions = parse_scoreboard(data)
+
+        self._key = key
+        self._sessions = sessions
+        return sessions
+
+
+_readers = {}
+
+
+def get_scoreboard_reader(path=None):
+    """Return the shared reader for path (default: settings.PROFTPD_SCOREBOARD_FILE)"""
+    if path is None:
+        path = getattr(settings, 'PROFTPD_SCOREBOARD_FILE', DEFAULT_SCOREBOARD_FILE)
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = ScoreboardReader(path)
+    return reader
+
+
+def read_sessions(path=None):
+    """Return (sessions, error) for display, never raising"""
+    reader = get_scoreboard_reader(path)
+    try:
+        return reader.sessions(), None
+    except FileNotFoundError:
+        return [], f'Scoreboard file not found: {reader.path}'
+    except PermissionError:
+        return [], f'Permission denied reading {reader.path}'
+    except ScoreboardError as e:
+        return [], str(e)
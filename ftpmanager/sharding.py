@@ -0,0 +1,102 @@
+"""
+User Sharding
+
+Assigns FTP users to ProFTPD nodes by consistent hashing. Each active
+FTPNode puts RING_POINTS points per unit of weight on a hash ring and a
+user belongs to the first point after the hash of their username, so
+adding a node only moves the users that now hash to its points and
+removing one only moves its own users. A user pinned to an active node
+(FTPUser.node) stays there.
+"""
+
+import bisect
+import hashlib
+from collections import Counter
+
+from .models import FTPNode, FTPUser
+
+
+RING_POINTS = 160
+
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring over {node name: weight}"""
+
+    def __init__(self, nodes):
+        points = sorted(
+            (ring_hash(f'{name}#{i}'), name)
+            for name, weight in nodes.items()
+            for i in range(weight * RING_POINTS)
+        )
+        self.hashes = [point for point, _name in points]
+        self.names = [name for _point, name in points]
+
+    def node_for(self, key):
+        """Name of the node owning key, None if the ring is empty"""
+        if not self.hashes:
+            return None
+        return self.names[bisect.bisect(self.hashes, ring_hash(key)) % len(self.hashes)]
+
+
+def active_nodes():
+    """{name: weight} of the active nodes"""
+    return dict(FTPNode.objects.filter(is_active=True).values_list('name', 'weight'))
+
+
+def assign_users(nodes=None):
+    """
+    Return ({username: node name}, pinned usernames) for all active users
+
+    nodes ({name: weight}) defaults to the active FTPNodes; pass another
+    mapping to see where users would go after adding or removing a node.
+    Users pinned to a node that is not in nodes are placed by hashing.
+    """
+    nodes = active_nodes() if nodes is None else nodes
+    ring = HashRing(nodes)
+    assignment = {}
+    pinned = set()
+    for username, pin in FTPUser.objects.filter(is_active=True).values_list('username', 'node__name'):
+        if pin in nodes:
+            assignment[username] = pin
+            pinned.add(username)
+        else:
+            assignment[username] = ring.node_for(username)
+    return assignment, pinned
+
+
+def users_of(assignment, node):
+    """Usernames assigned to a node"""
+    return {username for username, name in assignment.items() if name == node}
+
+
+def moved_users(before, after):
+    """Usernames whose node differs between two assignments"""
+    return sorted(username for username in before.keys() & after.keys() if before[username] != after[username])
+
+
+def load_report(assignment, pinned, nodes):
+    """
+    Per-node load as a list of dicts
+
+    share is the node's fraction of all users and expected the fraction
+    its weight asks for.
+    """
+    counts = Counter(assignment.values())
+    pinned_counts = Counter(assignment[username] for username in pinned)
+    total_users = len(assignment)
+    total_weight = sum(nodes.values())
+    return [
+        {
+            'node': name,
+            'weight': weight,
+            'users': counts[name],
+            'pinned': pinned_counts[name],
+            'share': counts[name] / total_users if total_users else 0.0,
+            'expected': weight / total_weight if total_weight else 0.0,
+        }
+        for name, weight in sorted(nodes.items())
+    ]
@@ -0,0 +1,155 @@
+"""
+Deployed Config Snapshots
+
+Every set of files written by deploy_config is recorded in a
+content-addressed store under the config directory: file contents are
+kept once under objects/ by their sha256, and index.json lists the
+revisions with their time, the ACL revision token of the database and the
+digest of each file. Rolling back copies a recorded set into place
+without reading the database or generating anything.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+
+INDEX_FILE = 'index.json'
+OBJECTS_DIR = 'objects'
+
+
+class SnapshotError(Exception):
+    """Raised for unknown revisions and missing or corrupt objects"""
+
+
+def write_atomic(path, data, mode):
+    """Write bytes to path through a temporary file and rename it into place"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class SnapshotStore:
+    """Content-addressed store of deployed file sets, rooted at a directory"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def object_path(self, digest):
+        return os.path.join(self.root, OBJECTS_DIR, digest[:2], digest)
+
+    def revisions(self):
+        """Recorded revisions, oldest first"""
+        try:
+            with open(os.path.join(self.root, INDEX_FILE)) as f:
+                return json.load(f)['revisions']
+        except FileNotFoundError:
+            return []
+
+    def get(self, rev):
+        """The index entry of a revision; SnapshotError if unknown"""
+        for revision in self.revisions():
+            if revision['rev'] == rev:
+                return revision
+        raise SnapshotError(f'Unknown snapshot revision {rev}')
+
+    def latest(self):
+        revisions = self.revisions()
+        return revisions[-1] if revisions else None
+
+    def put(self, data):
+        """Store bytes once and return their sha256"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            write_atomic(path, data, 0o600)
+        return digest
+
+    def read(self, digest):
+        """Bytes of a stored object, checked against its digest"""
+        try:
+            with open(self.object_path(digest), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise SnapshotError(f'Snapshot object {digest} is missing')
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f'Snapshot object {digest} is corrupt')
+        return data
+
+    def record(self, files, acl_revision=None, **extra):
+        """
+        Record a deployed set and return its revision entry
+
+        files maps paths relative to the config directory to
+        (content, mode). If the set equals the latest revision nothing is
+        recorded and the latest entry is returned.
+        """
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        entries = {}
+        for relpath, (content, mode) in sorted(files.items()):
+            data = content.encode() if isinstance(content, str) else content
+            entries[relpath] = {'sha256': self.put(data), 'mode': mode}
+
+        revisions = self.revisions()
+        if revisions and revisions[-1]['files'] == entries and not extra:
+            return revisions[-1]
+
+        revision = {
+            'rev': revisions[-1]['rev'] + 1 if revisions else 1,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'acl_revision': acl_revision,
+            'files': entries,
+            **extra,
+        }
+        revisions.append(revision)
+        write_atomic(
+            os.path.join(self.root, INDEX_FILE),
+            json.dumps({'revisions': revisions}, indent=1).encode(),
+            0o600,
+        )
+        return revision
+
+    def restore(self, rev, config_dir):
+        """
+        Put the files of a revision back into config_dir
+
+        Every file is read and verified and written to a temporary file next
+        to its target first; only then are they renamed into place, so a
+        missing object or a full disk leaves the deployed files untouched.
+        Returns the restored relative paths.
+        """
+        revision = self.get(rev)
+        staged = []
+        try:
+            for relpath, entry in sorted(revision['files'].items()):
+                target = os.path.join(config_dir, relpath)
+                os.makedirs(os.path.dirname(target), mode=0o755, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-')
+                staged.append((tmp_path, target))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(self.read(entry['sha256']))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp_path, entry['mode'])
+        except BaseException:
+            for tmp_path, _target in staged:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            raise
+
+        for tmp_path, target in staged:
+            os.replace(tmp_path, target)
+        return sorted(revision['files'])
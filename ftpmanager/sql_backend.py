@@ -0,0 +1,281 @@
+"""
+ProFTPD mod_sql SQLite Backend
+
+Keeps an SQLite database with the users/groups tables that mod_sql_sqlite
+reads, synced incrementally from FTPUser. Only rows that differ from the
+generated passwd entries are written, so a deploy with no user changes does
+not touch the database at all.
+
+The same database holds the quotalimits/quotatallies tables read by
+mod_quotatab_sql for per-user upload quotas.
+"""
+
+import os
+import sqlite3
+
+from .acl import effective_permissions
+from .config_generator import get_quota_users, get_uid_gid, iter_passwd_entries
+from .models import Folder, FolderUsage, FTPGroup, FTPUser
+
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    userid TEXT PRIMARY KEY,
+    passwd TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    gid INTEGER NOT NULL,
+    homedir TEXT NOT NULL,
+    shell TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS groups (
+    groupname TEXT PRIMARY KEY,
+    gid INTEGER NOT NULL,
+    members TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS groups_gid_idx ON groups (gid);
+CREATE TABLE IF NOT EXISTS quotalimits (
+    name TEXT NOT NULL,
+    quota_type TEXT NOT NULL,
+    per_session TEXT NOT NULL,
+    limit_type TEXT NOT NULL,
+    bytes_in_avail REAL NOT NULL,
+    bytes_out_avail REAL NOT NULL,
+    bytes_xfer_avail REAL NOT NULL,
+    files_in_avail INTEGER NOT NULL,
+    files_out_avail INTEGER NOT NULL,
+    files_xfer_avail INTEGER NOT NULL,
+    PRIMARY KEY (name, quota_type)
+);
+CREATE TABLE IF NOT EXISTS quotatallies (
+    name TEXT NOT NULL,
+    quota_type TEXT NOT NULL,
+    bytes_in_used REAL NOT NULL,
+    bytes_out_used REAL NOT NULL,
+    bytes_xfer_used REAL NOT NULL,
+    files_in_used INTEGER NOT NULL,
+    files_out_used INTEGER NOT NULL,
+    files_xfer_used INTEGER NOT NULL,
+    PRIMARY KEY (name, quota_type)
+);
+'''
+
+QUOTA_LIMIT_COLUMNS = [
+    'per_session', 'limit_type',
+    'bytes_in_avail', 'bytes_out_avail', 'bytes_xfer_avail',
+    'files_in_avail', 'files_out_avail', 'files_xfer_avail',
+]
+QUOTA_TALLY_COLUMNS = [
+    'bytes_in_used', 'bytes_out_used', 'bytes_xfer_used',
+    'files_in_used', 'files_out_used', 'files_xfer_used',
+]
+
+
+def get_group_name(systemuser, gid):
+    """Name the primary group of a system user for the groups table"""
+    if systemuser and not systemuser.isdigit():
+        return systemuser
+    return f"gid{gid}"
+
+
+def primary_groups():
+    """{group name: gid} of the primary groups of active users, as named in the groups table"""
+    groups = {}
+    for systemuser in FTPUser.objects.filter(is_active=True).values_list('systemuser', flat=True).distinct():
+        _uid, gid = get_uid_gid(systemuser)
+        groups[get_group_name(systemuser, gid)] = int(gid)
+    return groups
+
+
+def group_name_conflicts():
+    """Messages for FTP groups named like a primary group with another gid"""
+    primary = primary_groups()
+    return [
+        f'FTP group {name} (gid {gid}) has the name of a primary group with gid {primary[name]}; rename one of them'
+        for name, gid in FTPGroup.objects.filter(name__in=primary).values_list('name', 'gid')
+        if gid != primary[name]
+    ]
+
+
+def build_sql_rows():
+    """
+    Build the desired users and groups rows from the database
+
+    Returns (users, groups) dicts keyed by userid / groupname with row tuples
+    in table column order (without the key). An FTP group named like a
+    primary group gets the members of both if their gids match, and
+    replaces it otherwise (see group_name_conflicts()).
+    """
+    users = {}
+    groups = {}
+    systemusers = dict(FTPUser.objects.filter(is_active=True).values_list('username', 'systemuser'))
+
+    for username, password_hash, uid, gid, _gecos, homedir, shell in iter_passwd_entries():
+        users[username] = (password_hash, int(uid), int(gid), homedir, shell)
+
+        groupname = get_group_name(systemusers.get(username), gid)
+        group_gid, members = groups.get(groupname, (int(gid), []))
+        members.append(username)
+        groups[groupname] = (group_gid, members)
+
+    # Virtual groups, listed as supplementary groups of their members
+    for group in FTPGroup.objects.prefetch_related('members'):
+        members = {user.username for user in group.members.all() if user.username in users}
+        if group.name in groups and groups[group.name][0] == group.gid:
+            members.update(groups[group.name][1])
+        groups[group.name] = (group.gid, sorted(members))
+
+    groups = {name: (gid, ','.join(members)) for name, (gid, members) in groups.items()}
+    return users, groups
+
+
+def build_quota_rows():
+    """
+    Build the desired quotalimits rows and initial quotatallies rows
+
+    Limits only cover uploads (bytes_in/files_in); 0 means unlimited to
+    mod_quotatab. Initial tallies are the scanned usage of folders the user
+    is the only writer of (directly or through groups), since nobody else
+    can have uploaded those files.
+
+    Returns (limits, tallies) dicts keyed by (name, quota_type).
+    """
+    limits = {}
+    for user in get_quota_users():
+        limits[(user.username, 'user')] = (
+            'false', user.quota_type,
+            float(user.quota_bytes or 0), 0.0, 0.0,
+            user.quota_files or 0, 0, 0,
+        )
+
+    # Folders with exactly one writer, through direct or group grants
+    writers = {}
+    for user_id, permissions in effective_permissions().items():
+        for folder_id, permission in permissions.items():
+            if permission == 'write':
+                writers.setdefault(folder_id, []).append(user_id)
+    private = {folder_id: user_ids[0] for folder_id, user_ids in writers.items() if len(user_ids) == 1}
+
+    # A scan includes subfolders, so skip folders below one already counted
+    parents = dict(Folder.objects.values_list('pk', 'parent_id'))
+    for folder_id, user_id in list(private.items()):
+        ancestor = parents.get(folder_id)
+        while ancestor is not None:
+            if private.get(ancestor) == user_id:
+                del private[folder_id]
+                break
+            ancestor = parents.get(ancestor)
+
+    usernames = dict(FTPUser.objects.filter(is_active=True).values_list('pk', 'username'))
+    used = {}
+    for folder_id, used_bytes, used_files in FolderUsage.objects.filter(
+        folder_id__in=private
+    ).values_list('folder_id', 'bytes', 'files'):
+        username = usernames[private[folder_id]]
+        total_bytes, total_files = used.get(username, (0, 0))
+        used[username] = (total_bytes + used_bytes, total_files + used_files)
+
+    tallies = {}
+    for name, quota_type in limits:
+        used_bytes, used_files = used.get(name, (0, 0))
+        tallies[(name, quota_type)] = (float(used_bytes), 0.0, 0.0, used_files, 0, 0)
+
+    return limits, tallies
+
+
+def _sync_table(cursor, table, key_columns, columns, desired, update=True):
+    """
+    Upsert changed rows and delete removed rows of one table
+
+    desired maps key tuples (values of key_columns) to row tuples. With
+    update=False existing rows are left alone and only missing rows are
+    inserted, e.g. for counters maintained by ProFTPD itself.
+    """
+    keys = ', '.join(key_columns)
+    cursor.execute(f"SELECT {keys}, {', '.join(columns)} FROM {table}")
+    width = len(key_columns)
+    existing = {tuple(row[:width]): tuple(row[width:]) for row in cursor}
+
+    added = [key + row for key, row in desired.items() if key not in existing]
+    updated = []
+    if update:
+        updated = [key + row for key, row in desired.items() if key in existing and existing[key] != row]
+    removed = [key for key in existing if key not in desired]
+
+    if added or updated:
+        placeholders = ', '.join('?' for _ in range(width + len(columns)))
+        assignments = ', '.join(f"{column} = excluded.{column}" for column in columns)
+        cursor.executemany(
+            f"INSERT INTO {table} ({keys}, {', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({keys}) DO UPDATE SET {assignments}",
+            added + updated,
+        )
+    if removed:
+        conditions = ' AND '.join(f"{column} = ?" for column in key_columns)
+        cursor.executemany(f"DELETE FROM {table} WHERE {conditions}", removed)
+
+    return {'added': len(added), 'updated': len(updated), 'removed': len(removed)}
+
+
+def sync_sqlite_database(db_path, dry_run=False, auth=True):
+    """
+    Sync the mod_sql SQLite database at db_path with the active FTP users
+
+    Creates the schema if needed, then upserts only changed rows and deletes
+    rows of users that are gone or inactive, in a single transaction.
+    With dry_run the changes are computed on an in-memory copy of the
+    database. With auth=False only the quota tables are synced (for use
+    with ftpd.passwd).
+
+    Quota tallies are only inserted for new limits, seeded from the last
+    usage scan; existing tallies are kept since ProFTPD updates them.
+
+    Returns {table: {'added', 'updated', 'removed'}} counts.
+    """
+    limits, tallies = build_quota_rows()
+
+    if dry_run:
+        # Work on an in-memory copy, so that neither the file nor its schema
+        # is created or changed
+        connection = sqlite3.connect(':memory:')
+        if os.path.exists(db_path):
+            source = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+            try:
+                source.backup(connection)
+            finally:
+                source.close()
+    else:
+        connection = sqlite3.connect(db_path)
+    try:
+        connection.executescript(SQLITE_SCHEMA)
+        cursor = connection.cursor()
+        cursor.execute('BEGIN')
+        result = {}
+        if auth:
+            users, groups = build_sql_rows()
+            result['users'] = _sync_table(
+                cursor, 'users', ['userid'], ['passwd', 'uid', 'gid', 'homedir', 'shell'],
+                {(key,): row for key, row in users.items()},
+            )
+            result['groups'] = _sync_table(
+                cursor, 'groups', ['groupname'], ['gid', 'members'],
+                {(key,): row for key, row in groups.items()},
+            )
+        result['quotalimits'] = _sync_table(
+            cursor, 'quotalimits', ['name', 'quota_type'], QUOTA_LIMIT_COLUMNS, limits,
+        )
+        result['quotatallies'] = _sync_table(
+            cursor, 'quotatallies', ['name', 'quota_type'], QUOTA_TALLY_COLUMNS, tallies, update=False,
+        )
+        if dry_run:
+            connection.rollback()
+        else:
+            connection.commit()
+    finally:
+        connection.close()
+
+    return result
+
+
+def has_changes(result):
+    """Return True if a sync result reports any added, updated or removed rows"""
+    return any(any(counts.values()) for counts in result.values())
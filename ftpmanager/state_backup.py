@@ -0,0 +1,256 @@
+"""
+Panel State Backup
+
+Exports the panel's state (logins and their profiles, nodes, FTP users,
+folders, groups and all access rows) as one JSONL file per table plus a
+manifest.json with the row count and sha256 of each file. Tables are read
+with chunked iterator() queries and restored with batched bulk_create in a
+single transaction, so memory use does not grow with the size of the
+tables. Files can be gzip-compressed.
+
+Statistics and caches (log cursors, traffic and auth rollups, folder usage)
+are not part of the state; they are rebuilt by the ingest and scan
+commands.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, time, timezone
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+from .models import (
+    FTPGroup, FTPNode, FTPUser, Folder, FolderAccess, GroupFolderAccess, ServerTuning, UserProfile, bump_acl_revision,
+)
+from .snapshots import write_atomic
+
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 2000
+MANIFEST_FILE = 'manifest.json'
+
+
+class StateBackupError(Exception):
+    """Raised for missing, corrupt or incompatible backups and non-empty targets"""
+
+
+def state_tables():
+    """[(name, model)] of the exported tables, in restore order"""
+    return [
+        ('auth_user', User),
+        ('user_profile', UserProfile),
+        ('ftp_node', FTPNode),
+        ('ftp_user', FTPUser),
+        ('folder', Folder),
+        ('folder_access', FolderAccess),
+        ('ftp_group', FTPGroup),
+        ('ftp_group_members', FTPGroup.members.through),
+        ('group_folder_access', GroupFolderAccess),
+        ('server_tuning', ServerTuning),
+    ]
+
+
+class StateEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder keeping microseconds, which it rounds to milliseconds"""
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class HashingFile:
+    """Binary file wrapper that hashes everything written to or read from it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.f.write(data)
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.digest.update(data)
+        return data
+
+    def flush(self):
+        self.f.flush()
+
+
+def applied_migration():
+    """Name of the latest applied ftpmanager migration"""
+    return (
+        MigrationRecorder.Migration.objects.filter(app='ftpmanager')
+        .order_by('-applied', '-id').values_list('name', flat=True).first()
+    )
+
+
+def export_table(path, model, compress=False):
+    """Write a table as JSONL to path and return (rows, sha256 of the file)"""
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    rows = 0
+    with open(path, 'wb') as raw:
+        hashing = HashingFile(raw)
+        stream = gzip.GzipFile(fileobj=hashing, mode='wb', mtime=0) if compress else hashing
+        try:
+            for values in model.objects.order_by('pk').values_list(*attnames).iterator(chunk_size=CHUNK_SIZE):
+                stream.write(json.dumps(dict(zip(attnames, values)), cls=StateEncoder).encode() + b'\n')
+                rows += 1
+        finally:
+            if compress:
+                stream.close()
+    return rows, hashing.digest.hexdigest()
+
+
+def export_state(directory, compress=False):
+    """Export all state tables into directory and return the manifest"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    manifest = {
+        'format': FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'migration': applied_migration(),
+        'tables': {},
+    }
+    # One transaction gives all tables the same point in time
+    with transaction.atomic():
+        for name, model in state_tables():
+            filename = f'{name}.jsonl.gz' if compress else f'{name}.jsonl'
+            rows, digest = export_table(os.path.join(directory, filename), model, compress)
+            manifest['tables'][name] = {'file': filename, 'rows': rows, 'sha256': digest}
+    write_atomic(os.path.join(directory, MANIFEST_FILE), json.dumps(manifest, indent=1).encode(), 0o600)
+    return manifest
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise StateBackupError(f'No {MANIFEST_FILE} in {directory}')
+    except ValueError as e:
+        raise StateBackupError(f'{MANIFEST_FILE} is not valid JSON: {e}')
+    if manifest.get('format') != FORMAT_VERSION:
+        raise StateBackupError(f'Unsupported backup format {manifest.get("format")!r}')
+    missing = [name for name, _model in state_tables() if name not in manifest.get('tables', {})]
+    if missing:
+        raise StateBackupError(f'Backup has no data for: {", ".join(missing)}')
+    return manifest
+
+
+def iter_rows(directory, entry):
+    """Yield the rows of a table file as dicts, then check its sha256"""
+    path = os.path.join(directory, entry['file'])
+    try:
+        raw = open(path, 'rb')
+    except FileNotFoundError:
+        raise StateBackupError(f'{entry["file"]} is missing')
+    with raw:
+        hashing = HashingFile(raw)
+        stream = gzip.GzipFile(fileobj=hashing, mode='rb') if entry['file'].endswith('.gz') else hashing
+        buffered = b''
+        try:
+            while True:
+                chunk = stream.read(1 << 16)
+                if not chunk:
+                    break
+                *lines, buffered = (buffered + chunk).split(b'\n')
+                for line in lines:
+                    yield json.loads(line)
+        except (OSError, EOFError, UnicodeDecodeError, ValueError) as e:
+            raise StateBackupError(f'{entry["file"]} is corrupt: {e}')
+        # Hash whatever the decompressor left unread
+        while hashing.read(1 << 16):
+            pass
+    if buffered.strip():
+        raise StateBackupError(f'{entry["file"]} ends in a partial line')
+    if hashing.digest.hexdigest() != entry['sha256']:
+        raise StateBackupError(f'{entry["file"]} does not match its checksum')
+
+
+def verify_backup(directory):
+    """Check every file against the manifest; returns the manifest"""
+    manifest = read_manifest(directory)
+    for name, _model in state_tables():
+        entry = manifest['tables'][name]
+        rows = sum(1 for _row in iter_rows(directory, entry))
+        if rows != entry['rows']:
+            raise StateBackupError(f'{entry["file"]} has {rows} rows, the manifest says {entry["rows"]}')
+    return manifest
+
+
+@contextmanager
+def stored_timestamps(model):
+    """Keep the values of auto_now/auto_now_add fields instead of setting them to now on insert"""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def import_table(directory, entry, model):
+    """bulk_create the rows of a table file in batches and return how many there were"""
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    batch = []
+    rows = 0
+    for row in iter_rows(directory, entry):
+        unknown = row.keys() - fields.keys()
+        if unknown:
+            raise StateBackupError(
+                f'{entry["file"]}: unknown field(s) {", ".join(sorted(unknown))}; the backup is from a newer version'
+            )
+        batch.append(model(**{name: fields[name].to_python(value) for name, value in row.items()}))
+        if len(batch) >= CHUNK_SIZE:
+            model.objects.bulk_create(batch)
+            rows += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    rows += len(batch)
+    if rows != entry['rows']:
+        raise StateBackupError(f'{entry["file"]} has {rows} rows, the manifest says {entry["rows"]}')
+    return rows
+
+
+def import_state(directory):
+    """
+    Restore a backup into empty state tables and return {table: rows}
+
+    Nothing is written unless every file matches its checksum and row
+    count: the rows are checked while they are loaded and any error rolls
+    back the whole restore.
+    """
+    manifest = read_manifest(directory)
+    occupied = [name for name, model in state_tables() if model.objects.exists()]
+    if occupied:
+        raise StateBackupError(
+            f'Tables are not empty: {", ".join(occupied)}. Restore into a freshly migrated database.'
+        )
+
+    counts = {}
+    with transaction.atomic():
+        for name, model in state_tables():
+            with stored_timestamps(model):
+                counts[name] = import_table(directory, manifest['tables'][name], model)
+        # Primary keys were restored explicitly, so sequences must catch up
+        models = [model for _name, model in state_tables()]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        bump_acl_revision()
+    return counts
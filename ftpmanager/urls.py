@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Authentication
@@ -16,6 +16,14 @@ urlpatterns = [
     path('users/<int:pk>/edit/', views.user_edit, name='user_edit'),
     path('users/<int:pk>/delete/', views.user_delete, name='user_delete'),
     path('users/<int:pk>/access/', views.user_access, name='user_access'),
+    path('users/access-export/', views.access_export, name='access_export'),
+
+    # Groups
+    path('groups/', views.group_list, name='group_list'),
+    path('groups/create/', views.group_create, name='group_create'),
+    path('groups/<int:pk>/edit/', views.group_edit, name='group_edit'),
+    path('groups/<int:pk>/delete/', views.group_delete, name='group_delete'),
+    path('groups/<int:pk>/access/', views.group_access, name='group_access'),
 
     # Folders
     path('folders/', views.folder_list, name='folder_list'),
@@ -25,13 +33,32 @@ urlpatterns = [
 
     # Config generation
     path('config/', views.generate_config, name='generate_config'),
+    path('config/diff/', views.config_diff, name='config_diff'),
+    path('config/diff/<str:name>/', views.config_diff_file, name='config_diff_file'),
     path('config/download/', views.download_config, name='download_config'),
     path('config/download-users/', views.download_ftpusers, name='download_ftpusers'),
+    path('config/download-groups/', views.download_ftpgroup, name='download_ftpgroup'),
 
     # Settings
     path('settings/', views.profile_settings, name='profile_settings'),
+    path('tuning/', views.server_tuning, name='server_tuning'),
 
     # API
     path('api/directories/', views.list_directories, name='list_directories'),
     path('api/systemusers/', views.list_systemusers, name='list_systemusers'),
+    path('api/auth-failures/', views.auth_failures, name='auth_failures'),
+    path('api/sessions/', views.active_sessions, name='active_sessions'),
+    path('api/access-check/', views.access_check, name='access_check'),
+    path('api/config-preview/', views.config_preview, name='config_preview'),
+
+    # Token-authenticated JSON API (see ftpmanager.api)
+    path('api/v1/users/', api.users, name='api_users'),
+    path('api/v1/users/batch/', api.users_batch, name='api_users_batch'),
+    path('api/v1/users/<int:pk>/', api.user_detail, name='api_user'),
+    path('api/v1/folders/', api.folders, name='api_folders'),
+    path('api/v1/folders/batch/', api.folders_batch, name='api_folders_batch'),
+    path('api/v1/folders/<int:pk>/', api.folder_detail, name='api_folder'),
+    path('api/v1/access/', api.access, name='api_access'),
+    path('api/v1/access/batch/', api.access_batch, name='api_access_batch'),
+    path('api/v1/access/<int:pk>/', api.access_detail, name='api_access_detail'),
 ]
@@ -0,0 +1,136 @@
+"""
+Folder Disk Usage Scanner
+
+Walks folder trees with os.scandir on a thread pool and caches per-directory
+results, so directories whose mtime has not changed since the last scan are
+not listed again.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.utils import timezone
+
+from .models import Folder, FolderUsage
+
+
+class Throttle:
+    """Limit directory listings per second, shared by all scanner threads"""
+
+    def __init__(self, rate=0):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def scan_tree(root, cache=None, throttle=None):
+    """
+    Return (bytes, files, cache) for the directory tree at root
+
+    cache maps paths relative to root to [mtime_ns, own_bytes, own_files,
+    subdirs] from a previous scan. A directory's mtime only changes when
+    entries are added, removed or renamed, so for unchanged directories the
+    cached totals and subdirectory list are reused with a single stat().
+    Files that grew in place are not noticed until their directory changes;
+    pass an empty cache for an exact full scan. Symlinks are not followed.
+    """
+    cache = cache or {}
+    throttle = throttle or Throttle()
+    new_cache = {}
+    total_bytes = 0
+    total_files = 0
+
+    stack = ['']
+    while stack:
+        relpath = stack.pop()
+        path = os.path.join(root, relpath) if relpath else root
+        try:
+            mtime = os.stat(path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            continue
+
+        cached = cache.get(relpath)
+        if cached and cached[0] == mtime:
+            _mtime, own_bytes, own_files, subdirs = cached
+        else:
+            own_bytes = 0
+            own_files = 0
+            subdirs = []
+            throttle.wait()
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.name)
+                            elif entry.is_file(follow_symlinks=False):
+                                own_bytes += entry.stat(follow_symlinks=False).st_size
+                                own_files += 1
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+        new_cache[relpath] = [mtime, own_bytes, own_files, subdirs]
+        total_bytes += own_bytes
+        total_files += own_files
+        stack.extend(os.path.join(relpath, name) if relpath else name for name in subdirs)
+
+    return total_bytes, total_files, new_cache
+
+
+def _scan_folder(folder, cache, throttle):
+    """Scan one folder, returning (folder, bytes, files, cache, seconds, error)"""
+    started = time.monotonic()
+    if not os.path.isdir(folder.path):
+        return folder, 0, 0, {}, 0.0, f'Directory not found: {folder.path}'
+    total_bytes, total_files, new_cache = scan_tree(folder.path, cache, throttle)
+    return folder, total_bytes, total_files, new_cache, time.monotonic() - started, ''
+
+
+def scan_folders(folders=None, workers=4, max_dirs_per_second=0, full=False):
+    """
+    Scan folders concurrently and store the results in FolderUsage
+
+    Returns the list of saved FolderUsage objects. full ignores the cached
+    directory results from the previous scan.
+    """
+    if folders is None:
+        folders = Folder.objects.all()
+    folders = list(folders)
+
+    caches = {}
+    if not full:
+        caches = dict(FolderUsage.objects.filter(folder__in=folders).values_list('folder_id', 'dir_cache'))
+
+    throttle = Throttle(max_dirs_per_second)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(
+            lambda folder: _scan_folder(folder, caches.get(folder.pk), throttle), folders
+        ))
+
+    saved = []
+    now = timezone.now()
+    for folder, total_bytes, total_files, cache, seconds, error in results:
+        usage, _created = FolderUsage.objects.update_or_create(folder=folder, defaults={
+            'bytes': total_bytes,
+            'files': total_files,
+            'scanned_at': now,
+            'scan_seconds': seconds,
+            'error': error,
+            'dir_cache': cache,
+        })
+        saved.append(usage)
+    return saved
@@ -1,23 +1,53 @@
 import os
 import re
+from datetime import timedelta
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse
-from .models import FTPUser, Folder, FolderAccess, UserProfile
-from .forms import FTPUserForm, FolderForm, FolderAccessForm, UserProfileForm
-from .config_generator import generate_proftpd_config, generate_ftpusers_file
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F, Max
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from .models import (
+    FTPGroup, FTPUser, Folder, FolderAccess, GroupFolderAccess, UserProfile, TrafficRollup, AuthStat,
+    ServerTuning, TUNING_PRESETS, bump_acl_revision,
+)
+from .forms import FTPGroupForm, FTPUserForm, FolderForm, FolderAccessForm, UserProfileForm, ServerTuningForm
+from .acl import AclSnapshot, group_permissions
+from .access_check import AccessChecker, parse_grant, resolve_grant
+from .access_export import ACTIVE_CHOICES, FORMATS, LAYOUTS, PERMISSIONS, AccessFilter, export_access
+from .config_diff import preview_diff, preview_diffs, summarize
+from .config_lint import lint_files
+from .config_preview import config_sections, filter_sections, passwd_entries
+from .config_generator import (
+    generate_proftpd_config, generate_ftpusers_file, generate_ftpgroup_file, generate_tuning_config,
+    get_scoreboard_file,
+)
+from .scoreboard import read_sessions
 
 
 @login_required
 def dashboard(request):
     """Main dashboard showing overview"""
+    day_traffic = TrafficRollup.objects.since(timezone.now() - timedelta(days=1))
+    folder_traffic = TrafficRollup.objects.since(timezone.now() - timedelta(days=7)).totals_by('folder_id')
+    folder_names = dict(Folder.objects.filter(pk__in=folder_traffic).values_list('pk', 'name'))
+    top_folders = sorted(
+        ((folder_names[pk], t) for pk, t in folder_traffic.items() if pk in folder_names),
+        key=lambda item: -(item[1]['in'] + item[1]['out']),
+    )[:5]
+    sessions, sessions_error = read_sessions(get_scoreboard_file())
+
     context = {
         'users_count': FTPUser.objects.filter(is_active=True).count(),
         'folders_count': Folder.objects.count(),
         'access_rules_count': FolderAccess.objects.count(),
         'recent_users': FTPUser.objects.order_by('-created_at')[:5],
         'recent_access': FolderAccess.objects.select_related('user', 'folder').order_by('-created_at')[:10],
+        'traffic_24h': day_traffic.totals(),
+        'top_folders': top_folders,
+        'sessions': sessions,
+        'sessions_error': sessions_error,
     }
     return render(request, 'ftpmanager/dashboard.html', context)
 
@@ -26,7 +56,9 @@ def dashboard(request):
 @login_required
 def user_list(request):
     users = FTPUser.objects.prefetch_related('folder_access__folder').all()
-    return render(request, 'ftpmanager/user_list.html', {'users': users})
+    traffic = TrafficRollup.objects.since(timezone.now() - timedelta(days=7)).totals_by('user_id')
+    logins = AuthStat.objects.since(timezone.now() - timedelta(days=1)).totals_by('user_id')
+    return render(request, 'ftpmanager/user_list.html', {'users': users, 'traffic': traffic, 'logins': logins})
 
 
 @login_required
@@ -57,7 +89,15 @@ def user_edit(request, pk):
             return redirect('user_list')
     else:
         form = FTPUserForm(instance=user)
-    return render(request, 'ftpmanager/user_form.html', {'form': form, 'title': 'Edit User', 'user': user})
+
+    auth_stats = AuthStat.objects.since(timezone.now() - timedelta(days=7)).filter(username=user.username)
+    return render(request, 'ftpmanager/user_form.html', {
+        'form': form,
+        'title': 'Edit User',
+        'user': user,
+        'login_totals': auth_stats.totals_by('username').get(user.username),
+        'login_ips': auth_stats.top_failures('client_ip', limit=5),
+    })
 
 
 @login_required
@@ -75,7 +115,7 @@ def user_delete(request, pk):
 def user_access(request, pk):
     """Manage folder access for a specific user"""
     user = get_object_or_404(FTPUser, pk=pk)
-    folders = Folder.objects.all()
+    folders = Folder.objects.select_related('parent')
     current_access = {fa.folder_id: fa.permission for fa in user.folder_access.all()}
 
     if request.method == 'POST':
@@ -95,14 +135,38 @@ def user_access(request, pk):
         'user': user,
         'folders': folders,
         'current_access': current_access,
+        'group_access': group_permissions(user.pk),
+        'effective_access': AclSnapshot.current().user_permissions(user.pk),
     })
 
 
 # Folder Views
 @login_required
 def folder_list(request):
-    folders = Folder.objects.prefetch_related('user_access__user').all()
-    return render(request, 'ftpmanager/folder_list.html', {'folders': folders})
+    sort = request.GET.get('sort', 'name')
+    folders = (
+        Folder.objects.prefetch_related('user_access__user', 'group_access__group')
+        .select_related('usage', 'parent')
+        .defer('usage__dir_cache')
+    )
+    if sort == 'usage':
+        folders = folders.order_by(F('usage__bytes').desc(nulls_last=True), 'name')
+    elif sort == 'tree':
+        # Parents sort before their children, so depth is known on the way
+        folders = list(folders.order_by('tree_path'))
+        depths = {}
+        for folder in folders:
+            folder.depth = depths[folder.pk] = depths.get(folder.parent_id, -1) + 1
+    traffic = TrafficRollup.objects.since(timezone.now() - timedelta(days=7)).totals_by('folder_id')
+    acl = AclSnapshot.current()
+    # Effective (inherited and group) reader/writer counts per folder
+    reach = {
+        folder_id: (len(acl.users(folder_id)), len(acl.users(folder_id, 'write')))
+        for folder_id in acl.by_folder.row_of
+    }
+    return render(request, 'ftpmanager/folder_list.html', {
+        'folders': folders, 'traffic': traffic, 'sort': sort, 'reach': reach,
+    })
 
 
 @login_required
@@ -143,18 +207,229 @@ def folder_delete(request, pk):
     return render(request, 'ftpmanager/folder_confirm_delete.html', {'folder': folder})
 
 
+# FTP Group Views
+FIRST_GROUP_GID = 10000
+
+
+@login_required
+def group_list(request):
+    groups = FTPGroup.objects.prefetch_related('members', 'folder_access__folder')
+    return render(request, 'ftpmanager/group_list.html', {'groups': groups})
+
+
+@login_required
+def group_create(request):
+    if request.method == 'POST':
+        form = FTPGroupForm(request.POST)
+        if form.is_valid():
+            group = form.save()
+            messages.success(request, f'Group "{group.name}" created successfully.')
+            return redirect('group_list')
+    else:
+        last_gid = FTPGroup.objects.aggregate(last=Max('gid'))['last']
+        form = FTPGroupForm(initial={'gid': max(FIRST_GROUP_GID, (last_gid or 0) + 1)})
+    return render(request, 'ftpmanager/group_form.html', {'form': form, 'title': 'Create Group'})
+
+
+@login_required
+def group_edit(request, pk):
+    group = get_object_or_404(FTPGroup, pk=pk)
+    if request.method == 'POST':
+        form = FTPGroupForm(request.POST, instance=group)
+        if form.is_valid():
+            form.save()
+            messages.success(request, f'Group "{group.name}" updated successfully.')
+            return redirect('group_list')
+    else:
+        form = FTPGroupForm(instance=group)
+    return render(request, 'ftpmanager/group_form.html', {'form': form, 'title': 'Edit Group', 'group': group})
+
+
+@login_required
+def group_delete(request, pk):
+    group = get_object_or_404(FTPGroup, pk=pk)
+    if request.method == 'POST':
+        name = group.name
+        group.delete()
+        messages.success(request, f'Group "{name}" deleted successfully.')
+        return redirect('group_list')
+    return render(request, 'ftpmanager/group_confirm_delete.html', {'group': group})
+
+
+@login_required
+def group_access(request, pk):
+    """Manage folder access for all members of a group"""
+    group = get_object_or_404(FTPGroup, pk=pk)
+    folders = Folder.objects.select_related('parent')
+    current_access = {fa.folder_id: fa.permission for fa in group.folder_access.all()}
+
+    if request.method == 'POST':
+        group.folder_access.all().delete()
+        GroupFolderAccess.objects.bulk_create(
+            GroupFolderAccess(group=group, folder=folder, permission=request.POST[f'folder_{folder.id}'])
+            for folder in folders
+            if request.POST.get(f'folder_{folder.id}') in ('read', 'write', 'deny')
+        )
+        bump_acl_revision()
+
+        messages.success(request, f'Access permissions for group "{group.name}" updated.')
+        return redirect('group_list')
+
+    return render(request, 'ftpmanager/group_access.html', {
+        'group': group,
+        'folders': folders,
+        'current_access': current_access,
+    })
+
+
 # Config Generation Views
+PREVIEW_SECTIONS = 100  # table of contents rows rendered with the page
+
+
 @login_required
 def generate_config(request):
-    """Show config generation page with preview"""
+    """Show config generation page with a table of contents of the generated files"""
     config = generate_proftpd_config()
     ftpusers = generate_ftpusers_file()
+    ftpgroup = generate_ftpgroup_file()
+    user = request.GET.get('user', '').strip()
+    folder = request.GET.get('folder', '').strip()
+    sections, _bodies = config_sections(config)
+    matching = filter_sections(sections, user=user, folder=folder)
+
     return render(request, 'ftpmanager/generate_config.html', {
-        'config': config,
-        'ftpusers': ftpusers,
+        'files': [
+            {'name': name, 'bytes': len(content.encode()), 'lines': content.count('\n') + 1, 'download': download}
+            for name, content, download in (
+                ('users.conf', config, 'download_config'),
+                ('ftpd.passwd', ftpusers, 'download_ftpusers'),
+                ('ftpd.group', ftpgroup, 'download_ftpgroup'),
+            )
+        ],
+        'sections': matching[:PREVIEW_SECTIONS],
+        'sections_matching': len(matching),
+        'sections_total': len(sections),
+        'passwd_total': len(passwd_entries(ftpusers)),
+        'user': user,
+        'folder': folder,
+        'lint_issues': lint_files(config=config, passwd=ftpusers, group=ftpgroup),
+    })
+
+
+@login_required
+def config_preview(request):
+    """
+    AJAX endpoint loading parts of the generated files
+
+    file=passwd returns a page of ftpd.passwd entries (without password
+    hashes); otherwise section=N returns up to limit lines of one users.conf
+    section, and without it the section list, filtered by user and folder.
+    """
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+        limit = int(request.GET.get('limit', 0)) or None
+        section = request.GET.get('section', '')
+        section = int(section) if section else None
+    except ValueError:
+        return JsonResponse({'error': 'Parameters "offset", "limit" and "section" must be integers'}, status=400)
+    user = request.GET.get('user', '').strip()
+    folder = request.GET.get('folder', '').strip()
+
+    if request.GET.get('file', 'config') == 'passwd':
+        entries = passwd_entries(generate_ftpusers_file(), user=user)
+        limit = min(limit or 100, 1000)
+        return JsonResponse({
+            'total': len(entries),
+            'offset': offset,
+            'entries': [entry._asdict() for entry in entries[offset:offset + limit]],
+        })
+
+    sections, bodies = config_sections(generate_proftpd_config())
+    if section is not None:
+        if not 0 <= section < len(sections):
+            return JsonResponse({'error': f'No section {section}'}, status=404)
+        lines = bodies[section]
+        limit = min(limit or 500, 5000)
+        return JsonResponse({
+            **sections[section]._asdict(),
+            'offset': offset,
+            'text': ''.join(lines[offset:offset + limit]),
+            'truncated': offset + limit < len(lines),
+        })
+
+    matching = filter_sections(sections, user=user, folder=folder)
+    limit = min(limit or PREVIEW_SECTIONS, 1000)
+    return JsonResponse({
+        'total': len(matching),
+        'offset': offset,
+        'sections': [
+            {**section._asdict(), 'users': len(section.users), 'groups': len(section.groups), 'folders': len(section.folders)}
+            for section in matching[offset:offset + limit]
+        ],
     })
 
 
+@login_required
+def config_diff(request):
+    """Show what the next deploy would change in the deployed files"""
+    try:
+        diffs = preview_diffs()
+    except OSError as e:
+        return render(request, 'ftpmanager/config_diff.html', {'error': f'Cannot read {e.filename}: {e.strerror}'})
+    return render(request, 'ftpmanager/config_diff.html', {
+        'diffs': diffs,
+        'summary': summarize(diffs),
+    })
+
+
+@login_required
+def config_diff_file(request, name):
+    """Stream the unified diff of one deployed file as text"""
+    try:
+        diff = preview_diff(name)
+    except KeyError:
+        raise Http404('Unknown file')
+    except OSError as e:
+        return HttpResponse(f'Cannot read {e.filename}: {e.strerror}\n', status=500, content_type='text/plain')
+    return StreamingHttpResponse((f'{line}\n' for line in diff.iter_lines()), content_type='text/plain; charset=utf-8')
+
+
+@login_required
+def access_export(request):
+    """Stream the effective access matrix as CSV or XLSX"""
+    params = {
+        'format': request.GET.get('format', 'csv'),
+        'layout': request.GET.get('layout', 'rows'),
+        'permission': request.GET.get('permission', ''),
+        'active': request.GET.get('active', 'yes'),
+    }
+    for name, choices in (
+        ('format', FORMATS), ('layout', LAYOUTS), ('permission', [''] + PERMISSIONS), ('active', ACTIVE_CHOICES),
+    ):
+        if params[name] not in choices:
+            return HttpResponse(f'"{name}" must be one of: {", ".join(filter(None, choices))}\n', status=400, content_type='text/plain')
+
+    access_filter = AccessFilter(
+        folder=request.GET.get('folder', '').strip(),
+        user=request.GET.get('user', '').strip(),
+        permission=params['permission'],
+        active=params['active'],
+    )
+    try:
+        chunks = export_access(access_filter, layout=params['layout'], file_format=params['format'])
+    except ValueError as e:
+        return HttpResponse(f'{e}\n', status=400, content_type='text/plain')
+
+    content_type = (
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        if params['format'] == 'xlsx' else 'text/csv; charset=utf-8'
+    )
+    filename = f'access-{params["layout"]}-{timezone.now():%Y%m%d}.{params["format"]}'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def download_config(request):
     """Download proftpd.conf file"""
@@ -173,6 +448,15 @@ def download_ftpusers(request):
     return response
 
 
+@login_required
+def download_ftpgroup(request):
+    """Download ftpd.group file for virtual groups"""
+    ftpgroup = generate_ftpgroup_file()
+    response = HttpResponse(ftpgroup, content_type='text/plain')
+    response['Content-Disposition'] = 'attachment; filename="ftpd.group"'
+    return response
+
+
 # Profile Settings
 @login_required
 def profile_settings(request):
@@ -192,6 +476,38 @@ def profile_settings(request):
     return render(request, 'ftpmanager/profile_settings.html', {'form': form})
 
 
+@login_required
+def server_tuning(request):
+    """Edit the server-wide performance settings (conf.d/00-tuning.conf)"""
+    tuning = ServerTuning.load()
+
+    if request.method == 'POST' and 'preset' in request.POST:
+        preset = request.POST['preset']
+        if preset not in TUNING_PRESETS:
+            messages.error(request, f'Unknown preset "{preset}".')
+        else:
+            tuning.apply_preset(preset)
+            tuning.save()
+            messages.success(request, f'Applied preset "{TUNING_PRESETS[preset]["label"]}".')
+        return redirect('server_tuning')
+
+    if request.method == 'POST':
+        form = ServerTuningForm(request.POST, instance=tuning)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Server tuning saved. Deploy to apply it.')
+            return redirect('server_tuning')
+    else:
+        form = ServerTuningForm(instance=tuning)
+
+    return render(request, 'ftpmanager/server_tuning.html', {
+        'form': form,
+        'tuning': tuning,
+        'presets': TUNING_PRESETS,
+        'preview': generate_tuning_config(tuning),
+    })
+
+
 # Directory Lookup API
 @login_required
 def list_directories(request):
@@ -294,3 +610,97 @@ def list_systemusers(request):
         'pattern': pattern,
         'users': sorted(users)
     })
+
+
+# Live Sessions API
+@login_required
+def active_sessions(request):
+    """AJAX endpoint listing connected sessions from the ProFTPD scoreboard"""
+    sessions, error = read_sessions(get_scoreboard_file())
+    data = {
+        'count': len(sessions),
+        'sessions': [
+            {
+                'pid': s['pid'],
+                'user': s['user'],
+                'client': s['client_addr'],
+                'command': s['command'],
+                'file': s['file'],
+                'cwd': s['cwd'],
+                'bytes_transferred': s['xfer_done'],
+                'session_start': s['session_start'],
+            }
+            for s in sessions
+        ],
+    }
+    if error:
+        data['error'] = error
+    return JsonResponse(data)
+
+
+# Authentication Statistics API
+@login_required
+def auth_failures(request):
+    """AJAX endpoint with the usernames or client IPs with the most failed logins"""
+    group_by = request.GET.get('by', 'ip')
+    if group_by not in ('ip', 'user'):
+        return JsonResponse({'error': 'Parameter "by" must be "ip" or "user"', 'results': []}, status=400)
+
+    try:
+        # Capped at ten years, which keeps the start of the window a valid date
+        hours = min(int(request.GET.get('hours', 24)), 10 * 366 * 24)
+        limit = min(int(request.GET.get('limit', 10)), 100)
+    except ValueError:
+        hours = limit = 0
+    if hours < 1 or limit < 1:
+        return JsonResponse({'error': 'Parameters "hours" and "limit" must be positive integers', 'results': []}, status=400)
+
+    field = 'client_ip' if group_by == 'ip' else 'username'
+    rows = AuthStat.objects.since(timezone.now() - timedelta(hours=hours)).top_failures(field, limit=limit)
+
+    return JsonResponse({
+        'by': group_by,
+        'hours': hours,
+        'results': [
+            {group_by: row[field], 'failures': row['total_failures'], 'successes': row['total_successes']}
+            for row in rows
+        ],
+    })
+
+
+@login_required
+def access_check(request):
+    """
+    AJAX endpoint answering whether a user may run an FTP command on a path
+
+    Repeated "grant" parameters (PRINCIPAL:FOLDER_PATH:PERMISSION) are
+    evaluated in memory as unsaved changes and reported next to the current
+    result; nothing is written.
+    """
+    username = request.GET.get('user', '')
+    path = request.GET.get('path', '')
+    command = request.GET.get('command', 'RETR')
+    if not username or not path:
+        return JsonResponse({'error': 'Parameters "user" and "path" are required'}, status=400)
+
+    try:
+        grants = [resolve_grant(*parse_grant(spec)) for spec in request.GET.getlist('grant')]
+        result = access_result(AccessChecker.from_db().check(username, path, command))
+        if grants:
+            result['what_if'] = access_result(AccessChecker.from_db(grants).check(username, path, command))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ObjectDoesNotExist as e:
+        return JsonResponse({'error': f'Unknown user, group or folder in grant: {e}'}, status=400)
+
+    return JsonResponse({'user': username, 'path': path, 'command': command.upper(), **result})
+
+
+def access_result(result):
+    return {
+        'allowed': result.allowed,
+        'folder': result.folder.path if result.folder else None,
+        'permission': result.permission,
+        'reason': result.reason,
+    }
+
@@ -0,0 +1,153 @@
+"""
+Streaming XLSX Writer
+
+Produces a minimal Office Open XML workbook as a stream of bytes. Cells
+are inline strings or numbers, so no shared string table has to be held
+in memory; each worksheet is a zip entry written while its rows are
+produced and the workbook part listing the sheets is written last. Rows
+beyond the sheet size limit continue on a new sheet with the header
+repeated.
+"""
+
+import re
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+
+MAX_ROWS = 1048576
+MAX_COLUMNS = 16384
+FLUSH_BYTES = 1 << 16
+
+ILLEGAL_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+{sheets}</Types>
+'''
+SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>\n'
+)
+ROOT_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>
+'''
+WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>
+{sheets}</sheets>
+</workbook>
+'''
+WORKBOOK_SHEET = '<sheet name={name} sheetId="{index}" r:id="rId{index}"/>\n'
+WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+{sheets}</Relationships>
+'''
+WORKBOOK_REL = (
+    '<Relationship Id="rId{index}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>\n'
+)
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>\n'
+)
+SHEET_END = '</sheetData></worksheet>\n'
+
+
+class ChunkBuffer:
+    """Write-only file object whose contents are taken out by the generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+def column_name(index):
+    """Spreadsheet column letters of a 0-based index: 0 -> A, 26 -> AA"""
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def row_xml(number, values, columns):
+    cells = []
+    for column, value in zip(columns, values):
+        if value is None or value == '':
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{column}{number}"><v>{value}</v></c>')
+        else:
+            text = escape(ILLEGAL_XML_RE.sub('', str(value)))
+            cells.append(f'<c r="{column}{number}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>\n'
+
+
+def iter_xlsx(header, rows, title='Sheet'):
+    """
+    Yield the bytes of a workbook with header and rows
+
+    rows is an iterable of sequences of strings and numbers; it is
+    consumed lazily. Raises ValueError if header has more columns than a
+    sheet can hold.
+    """
+    if len(header) > MAX_COLUMNS:
+        raise ValueError(f'{len(header)} columns do not fit in a sheet (at most {MAX_COLUMNS})')
+    columns = [column_name(index) for index in range(len(header))]
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        sheets = 0
+        rows = iter(rows)
+        exhausted = False
+        while not exhausted:
+            sheets += 1
+            with archive.open(f'xl/worksheets/sheet{sheets}.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(SHEET_START.encode())
+                sheet.write(row_xml(1, header, columns).encode())
+                number = 1
+                for values in rows:
+                    number += 1
+                    sheet.write(row_xml(number, values, columns).encode())
+                    if buffer.size >= FLUSH_BYTES:
+                        yield buffer.take()
+                    if number == MAX_ROWS:
+                        break
+                else:
+                    exhausted = True
+                sheet.write(SHEET_END.encode())
+            yield buffer.take()
+
+        names = [f'{title} {index}' if sheets > 1 else title for index in range(1, sheets + 1)]
+        indexes = range(1, sheets + 1)
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES.format(
+            sheets=''.join(SHEET_CONTENT_TYPE.format(index=index) for index in indexes)
+        ))
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(
+            sheets=''.join(WORKBOOK_SHEET.format(name=quoteattr(name[:31]), index=index) for name, index in zip(names, indexes))
+        ))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS.format(
+            sheets=''.join(WORKBOOK_REL.format(index=index) for index in indexes)
+        ))
+    yield buffer.take()
@@ -127,3 +127,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Authentication
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
+
+# ProFTPD
+PROFTPD_CONFIG_DIR = '/etc/proftpd'
+# Nodes for deploy_config --target/--all-targets, e.g.
+# {'name': 'ftp2', 'config_dir': '/mnt/ftp2/etc/proftpd', 'reload': 'reload'}
+# reload is none, reload, restart or a command as a list of arguments
+PROFTPD_DEPLOY_TARGETS = []
+PROFTPD_SCOREBOARD_FILE = '/var/run/proftpd/proftpd.scoreboard'
@@ -0,0 +1,298 @@
+import json
+import random
+import re
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from ftpmanager.access_check import (
+    COMMAND_GROUPS, GROUP_OF_COMMAND, AccessChecker, apply_grant, resolve_grant, what_if,
+)
+from ftpmanager.acl import AclSnapshot
+from ftpmanager.config_generator import generate_proftpd_config
+from ftpmanager.models import AclRevision, FTPGroup, FTPUser, Folder, FolderAccess, FolderUsage, GroupFolderAccess
+
+
+def evaluate_config(config, username, groups, path, command):
+    """
+    Minimal model of ProFTPD's <Directory>/<Limit> evaluation
+
+    The most specific <Directory> containing the path applies. Within it a
+    <Limit> naming the command wins over one naming its group; without a
+    matching <Limit> the command is allowed.
+    """
+    blocks = {}
+    for match in re.finditer(r'^<Directory (\S+)>\n(.*?)^</Directory>', config, re.M | re.S):
+        limits = []
+        for limit in re.finditer(r'<Limit ([^>]+)>\n(.*?)</Limit>', match.group(2), re.S):
+            body = limit.group(2)
+            users = {name for line in re.findall(r'AllowUser (.+)', body) for name in line.split()}
+            allowed_groups = set(re.findall(r'AllowGroup (\S+)', body))
+            limits.append((limit.group(1).split(), users, allowed_groups))
+        blocks[match.group(1)] = limits
+
+    directory = path
+    while directory not in blocks:
+        if directory == '/':
+            return True
+        directory = directory.rsplit('/', 1)[0] or '/'
+
+    limits = blocks[directory]
+    for names in (command, GROUP_OF_COMMAND[command]):
+        for commands, users, allowed_groups in limits:
+            if names in commands:
+                return username in users or bool(allowed_groups & groups)
+    return True
+
+
+@pytest.fixture
+def tree(db):
+    """Folders /srv, /srv/a, /srv/a/b, /srv/c and /other with users and a group"""
+    folders = {
+        path: Folder.objects.create(name=path.rsplit('/', 1)[1], path=path)
+        for path in ('/srv', '/srv/a', '/srv/a/b', '/srv/c', '/other')
+    }
+    users = {name: FTPUser.objects.create(username=name, systemuser='1001') for name in ('ann', 'ben', 'cat', 'dan')}
+    staff = FTPGroup.objects.create(name='staff', gid=10000)
+    staff.members.add(users['ben'], users['cat'])
+    # Folders nobody can access get no rules at all
+    for path in ('/srv', '/other'):
+        FolderAccess.objects.create(user=users['dan'], folder=folders[path], permission='read')
+    return folders, users, staff
+
+
+class TestAccessChecker:
+    """Tests for AccessChecker"""
+
+    def test_longest_prefix(self, tree):
+        """Test the most specific folder decides"""
+        folders, users, _staff = tree
+        FolderAccess.objects.create(user=users['ann'], folder=folders['/srv'], permission='write')
+        FolderAccess.objects.create(user=users['ann'], folder=folders['/srv/a'], permission='read')
+
+        checker = AccessChecker.from_db()
+
+        assert checker.check('ann', '/srv/c/file', 'STOR').allowed
+        result = checker.check('ann', '/srv/a/b/file', 'STOR')
+        assert not result.allowed
+        assert result.folder == folders['/srv/a/b']
+        assert result.reason == 'read-only access to /srv/a/b'
+
+    def test_unknown_and_inactive(self, tree):
+        """Test unknown and inactive users are denied"""
+        _folders, users, _staff = tree
+        users['dan'].is_active = False
+        users['dan'].save()
+
+        checker = AccessChecker.from_db()
+
+        assert checker.check('nobody', '/srv', 'LIST').reason == 'unknown user'
+        assert not checker.check('dan', '/srv', 'LIST').allowed
+
+    def test_unmanaged_path(self, tree):
+        """Test paths outside managed folders have no config restrictions"""
+        assert AccessChecker.from_db().check('ann', '/tmp/x', 'STOR').allowed
+
+    def test_folder_without_rules(self, tree):
+        """Test a folder nobody can access is not restricted by the config"""
+        folders, _users, _staff = tree
+        FolderAccess.objects.filter(folder=folders['/other']).delete()
+
+        assert AccessChecker.from_db().check('ann', '/other/x', 'STOR').allowed
+
+    def test_over_quota(self, tree):
+        """Test a folder over its hard quota only allows deletes"""
+        folders, users, _staff = tree
+        FolderAccess.objects.create(user=users['ann'], folder=folders['/other'], permission='write')
+        folders['/other'].quota_bytes = 10
+        folders['/other'].save()
+        FolderUsage.objects.create(folder=folders['/other'], bytes=20, scanned_at=timezone.now())
+
+        checker = AccessChecker.from_db()
+
+        assert not checker.check('ann', '/other/f', 'STOR').allowed
+        assert checker.check('ann', '/other/f', 'DELE').allowed
+
+    def test_unknown_command(self, tree):
+        """Test unknown commands raise ValueError"""
+        with pytest.raises(ValueError):
+            AccessChecker.from_db().check('ann', '/srv', 'FOO')
+
+    def test_what_if_rolls_back(self, tree):
+        """Test what-if changes are evaluated and then discarded"""
+        folders, _users, _staff = tree
+        with what_if():
+            apply_grant('@staff', '/srv/', 'write')
+            assert AccessChecker.from_db().check('ben', '/srv/x', 'STOR').allowed
+
+        assert not GroupFolderAccess.objects.exists()
+        assert not AccessChecker.from_db().check('ben', '/srv/x', 'STOR').allowed
+
+    @pytest.mark.parametrize('seed', [1, 2, 3])
+    def test_unsaved_grants_match_what_if(self, tree, seed):
+        """Test grants evaluated in memory give the same answers as saved ones"""
+        folders, users, _staff = tree
+        users['cat'].is_active = False
+        users['cat'].save()
+        rng = random.Random(seed)
+        FolderAccess.objects.create(user=users['ann'], folder=folders['/srv'], permission='write')
+        grants = [
+            (rng.choice(['ann', 'ben', 'cat', '@staff']), rng.choice(list(folders)),
+             rng.choice(['read', 'write', 'deny', 'none']))
+            for _ in range(6)
+        ]
+
+        checker = AccessChecker.from_db([resolve_grant(*grant) for grant in grants])
+        with what_if():
+            for grant in grants:
+                apply_grant(*grant)
+            expected = AccessChecker.from_db()
+
+        for username in users:
+            for path in ('/srv/f', '/srv/a/f', '/srv/a/b/f', '/srv/c/f', '/other/f'):
+                for command in ('RETR', 'STOR'):
+                    assert checker.check(username, path, command) == expected.check(username, path, command)
+
+    def test_unsaved_grants_keep_snapshot(self, tree):
+        """Test in-memory grants neither write nor replace the cached snapshot"""
+        folders, _users, _staff = tree
+        snapshot = AclSnapshot.current()
+        token = AclRevision.current_token()
+
+        checker = AccessChecker.from_db([resolve_grant('@staff', '/srv', 'write')])
+
+        assert checker.check('ben', '/srv/x', 'STOR').allowed
+        assert AclRevision.current_token() == token
+        assert AclSnapshot.current() is snapshot
+        assert not GroupFolderAccess.objects.exists()
+
+    def test_resolve_unknown_grant(self, tree):
+        """Test unknown principals and folders raise DoesNotExist"""
+        with pytest.raises(FTPUser.DoesNotExist):
+            resolve_grant('nobody', '/srv', 'read')
+        with pytest.raises(Folder.DoesNotExist):
+            resolve_grant('ann', '/nowhere', 'read')
+
+    @pytest.mark.parametrize('seed', [1, 2, 3])
+    def test_matches_generated_config(self, tree, seed):
+        """Test random grants give the same answers as the generated <Limit> rules"""
+        folders, users, staff = tree
+        rng = random.Random(seed)
+        for folder in folders.values():
+            for user in users.values():
+                permission = rng.choice([None, None, 'read', 'write', 'deny'])
+                if permission:
+                    FolderAccess.objects.update_or_create(user=user, folder=folder, defaults={'permission': permission})
+            permission = rng.choice([None, 'read', 'write', 'deny'])
+            if permission:
+                GroupFolderAccess.objects.create(group=staff, folder=folder, permission=permission)
+        folders['/srv/a'].quota_bytes = 1
+        folders['/srv/a'].save()
+        FolderUsage.objects.create(folder=folders['/srv/a'], bytes=5, scanned_at=timezone.now())
+
+        config = generate_proftpd_config()
+        checker = AccessChecker.from_db()
+        paths = ['/srv/f', '/srv/a/f', '/srv/a/b/f', '/srv/c/f', '/other/f', '/srv/a/b', '/tmp/f']
+        for username, user in users.items():
+            groups = {'staff'} if staff.members.filter(pk=user.pk).exists() else set()
+            for path in paths:
+                for command in sorted(set().union(*COMMAND_GROUPS.values())):
+                    expected = evaluate_config(config, username, groups, path, command)
+                    assert checker.check(username, path, command).allowed == expected, (username, path, command)
+
+
+class TestCheckPermissionCommand:
+    """Tests for the check_permission management command"""
+
+    def test_single(self, tree):
+        """Test a single check prints the verdict and reason"""
+        folders, users, _staff = tree
+        FolderAccess.objects.create(user=users['ann'], folder=folders['/srv'], permission='read')
+        out = StringIO()
+
+        call_command('check_permission', 'ann', '/srv/a/file.txt', 'STOR', stdout=out)
+
+        assert out.getvalue() == 'DENY\tann\tSTOR\t/srv/a/file.txt\tread-only access to /srv/a\n'
+
+    def test_batch(self, tree, tmp_path):
+        """Test batch mode reads one check per line"""
+        batch = tmp_path / 'checks.txt'
+        batch.write_text('# user path command\nann /srv/x\nben /tmp/x STOR\n')
+        out, err = StringIO(), StringIO()
+
+        call_command('check_permission', '--batch', str(batch), stdout=out, stderr=err)
+
+        assert [line.split('\t')[0] for line in out.getvalue().splitlines()] == ['DENY', 'ALLOW']
+        assert 'Checked 2 in' in err.getvalue()
+
+    def test_what_if(self, tree):
+        """Test --grant shows the result before and after the change"""
+        out = StringIO()
+
+        call_command('check_permission', 'ben', '/srv/a/f', 'WRITE', '--grant', '@staff:/srv:write', stdout=out)
+
+        assert out.getvalue().startswith('DENY -> ALLOW\tben\tSTOR\t')
+        assert not GroupFolderAccess.objects.exists()
+
+    def test_deactivate(self, tree):
+        """Test --deactivate evaluates a disabled user"""
+        folders, users, _staff = tree
+        FolderAccess.objects.create(user=users['ann'], folder=folders['/srv'], permission='read')
+        out = StringIO()
+
+        call_command('check_permission', 'ann', '/srv/f', '--deactivate', 'ann', stdout=out)
+
+        assert out.getvalue().startswith('ALLOW -> DENY')
+        assert FTPUser.objects.get(username='ann').is_active
+
+    def test_bad_grant(self, tree):
+        """Test malformed grants are rejected"""
+        with pytest.raises(CommandError):
+            call_command('check_permission', 'ann', '/srv', '--grant', 'ann:/srv:admin')
+
+
+class TestAccessCheckView:
+    """Tests for the access check endpoint"""
+
+    def test_check(self, authenticated_client, tree):
+        """Test the endpoint returns the verdict as JSON"""
+        folders, users, _staff = tree
+        FolderAccess.objects.create(user=users['ann'], folder=folders['/srv'], permission='write')
+
+        response = authenticated_client.get(reverse('access_check'), {
+            'user': 'ann', 'path': '/srv/a/f', 'command': 'stor', 'grant': 'ann:/srv/a:deny',
+        })
+
+        data = json.loads(response.content)
+        assert data['allowed'] is True
+        assert data['folder'] == '/srv/a'
+        assert data['what_if']['allowed'] is False
+        assert not FolderAccess.objects.filter(permission='deny').exists()
+
+    def test_what_if_keeps_revision(self, authenticated_client, tree):
+        """Test a what-if preview does not invalidate ACL snapshots"""
+        token = AclRevision.current_token()
+
+        response = authenticated_client.get(reverse('access_check'), {
+            'user': 'ben', 'path': '/srv/f', 'grant': '@staff:/srv:read',
+        })
+
+        assert json.loads(response.content)['what_if']['allowed'] is True
+        assert AclRevision.current_token() == token
+
+    def test_unknown_grant(self, authenticated_client, tree):
+        """Test grants naming unknown objects are rejected"""
+        response = authenticated_client.get(reverse('access_check'), {
+            'user': 'ann', 'path': '/srv/f', 'grant': 'nobody:/srv:read',
+        })
+
+        assert response.status_code == 400
+
+    def test_missing_parameters(self, authenticated_client):
+        """Test user and path are required"""
+        assert authenticated_client.get(reverse('access_check')).status_code == 400
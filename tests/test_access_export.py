@@ -0,0 +1,196 @@
+import csv
+import io
+import zipfile
+from io import StringIO
+from xml.etree import ElementTree
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from ftpmanager.access_export import AccessFilter, export_access
+from ftpmanager.models import FTPGroup, FTPUser, Folder, FolderAccess, GroupFolderAccess
+from ftpmanager.xlsx import column_name, iter_xlsx
+
+
+NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+@pytest.fixture
+def matrix(db):
+    """alice writes /srv, bob reads /srv/pub through a group, carol is inactive with read on /srv"""
+    srv = Folder.objects.create(name='Srv', path='/srv')
+    pub = Folder.objects.create(name='Pub', path='/srv/pub')
+    Folder.objects.create(name='Other', path='/other')
+    alice = FTPUser.objects.create(username='alice')
+    bob = FTPUser.objects.create(username='bob')
+    carol = FTPUser.objects.create(username='carol', is_active=False)
+    FolderAccess.objects.create(user=alice, folder=srv, permission='write')
+    FolderAccess.objects.create(user=carol, folder=srv, permission='read')
+    group = FTPGroup.objects.create(name='readers', gid=2000)
+    group.members.add(bob)
+    GroupFolderAccess.objects.create(group=group, folder=pub, permission='read')
+    return srv, pub
+
+
+def read_csv(chunks):
+    return list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+
+
+def column_index(name):
+    index = 0
+    for letter in name:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def read_xlsx(data):
+    """Rows of every sheet as lists of cell texts"""
+    sheets = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        for index in range(1, len(workbook.find('s:sheets', NS)) + 1):
+            sheet = ElementTree.fromstring(archive.read(f'xl/worksheets/sheet{index}.xml'))
+            rows = []
+            for row in sheet.iter(f'{{{NS["s"]}}}row'):
+                cells = {
+                    cell.get('r').rstrip('0123456789'): cell.findtext('s:is/s:t', namespaces=NS) or cell.findtext('s:v', namespaces=NS)
+                    for cell in row
+                }
+                width = max((column_index(column) for column in cells), default=-1) + 1
+                rows.append([cells.get(column_name(index)) for index in range(width)])
+            sheets.append(rows)
+    return sheets
+
+
+class TestAccessExport:
+    """Tests for the access matrix rows"""
+
+    def test_rows(self, matrix):
+        """Test inherited, group and inactive users' access is listed by user and path"""
+        rows = read_csv(export_access(AccessFilter(active='all')))
+
+        assert rows == [
+            ['username', 'active', 'folder', 'path', 'permission'],
+            ['alice', 'yes', 'Srv', '/srv', 'write'],
+            ['alice', 'yes', 'Pub', '/srv/pub', 'write'],
+            ['bob', 'yes', 'Pub', '/srv/pub', 'read'],
+            ['carol', 'no', 'Srv', '/srv', 'read'],
+            ['carol', 'no', 'Pub', '/srv/pub', 'read'],
+        ]
+
+    def test_filters(self, matrix):
+        """Test the folder, user, permission and active filters"""
+        def users(**filters):
+            return [row[0] + ':' + row[3] for row in read_csv(export_access(AccessFilter(**{'active': 'all', **filters})))[1:]]
+
+        assert users(folder='/srv/pub/') == ['alice:/srv/pub', 'bob:/srv/pub', 'carol:/srv/pub']
+        assert users(user='AL') == ['alice:/srv', 'alice:/srv/pub']
+        assert users(permission='read', active='yes') == ['bob:/srv/pub']
+        assert users(permission='read', active='all') == ['bob:/srv/pub', 'carol:/srv', 'carol:/srv/pub']
+        assert users(active='no') == ['carol:/srv', 'carol:/srv/pub']
+
+    def test_pivot(self, matrix):
+        """Test the pivot has a column per folder and a row per user"""
+        rows = read_csv(export_access(AccessFilter(active='all'), layout='pivot'))
+
+        assert rows == [
+            ['username', 'active', '/other', '/srv', '/srv/pub'],
+            ['alice', 'yes', '', 'W', 'W'],
+            ['bob', 'yes', '', '', 'R'],
+            ['carol', 'no', '', 'R', 'R'],
+        ]
+
+    def test_xlsx(self, matrix):
+        """Test the XLSX export is a workbook with the same rows"""
+        sheets = read_xlsx(b''.join(export_access(AccessFilter(active='all'), file_format='xlsx')))
+
+        assert len(sheets) == 1
+        assert sheets[0][0] == ['username', 'active', 'folder', 'path', 'permission']
+        assert sheets[0][1] == ['alice', 'yes', 'Srv', '/srv', 'write']
+        assert len(sheets[0]) == 6
+
+
+class TestXlsx:
+    """Tests for the streaming XLSX writer"""
+
+    def test_column_names(self):
+        assert [column_name(i) for i in (0, 25, 26, 701, 702)] == ['A', 'Z', 'AA', 'ZZ', 'AAA']
+
+    def test_sheet_overflow(self, monkeypatch):
+        """Test rows beyond the sheet limit continue on a new sheet with the header"""
+        monkeypatch.setattr('ftpmanager.xlsx.MAX_ROWS', 3)
+
+        sheets = read_xlsx(b''.join(iter_xlsx(['n'], ([i] for i in range(5)))))
+
+        assert sheets == [[['n'], ['0'], ['1']], [['n'], ['2'], ['3']], [['n'], ['4']]]
+
+    def test_escaping(self):
+        """Test markup and control characters do not break the XML"""
+        sheets = read_xlsx(b''.join(iter_xlsx(['a'], [['<b>&\x01']])))
+
+        assert sheets[0][1] == ['<b>&']
+
+    def test_streams(self):
+        """Test output is produced before all rows are consumed"""
+        consumed = []
+
+        def rows():
+            for i in range(100000):
+                consumed.append(i)
+                yield [f'user{i}', 'x' * 20]
+
+        chunks = iter_xlsx(['a', 'b'], rows())
+        next(chunks)
+        next(chunks)
+
+        assert len(consumed) < 100000
+
+
+class TestAccessExportView:
+    """Tests for the access export download"""
+
+    def test_requires_login(self, client):
+        response = client.get(reverse('access_export'))
+
+        assert response.status_code == 302
+
+    def test_csv(self, authenticated_client, matrix):
+        """Test the CSV download streams active users with a dated filename"""
+        response = authenticated_client.get(reverse('access_export'), {'user': 'o'})
+
+        assert response.streaming
+        assert response['Content-Type'].startswith('text/csv')
+        assert 'attachment; filename="access-rows-' in response['Content-Disposition']
+        assert b''.join(response.streaming_content).decode().splitlines()[1:] == ['bob,yes,Pub,/srv/pub,read']
+
+    def test_xlsx_pivot(self, authenticated_client, matrix):
+        """Test the XLSX pivot download"""
+        response = authenticated_client.get(reverse('access_export'), {'format': 'xlsx', 'layout': 'pivot'})
+
+        sheets = read_xlsx(b''.join(response.streaming_content))
+        assert sheets[0][0] == ['username', 'active', '/other', '/srv', '/srv/pub']
+
+    def test_invalid_parameter(self, authenticated_client, db):
+        response = authenticated_client.get(reverse('access_export'), {'layout': 'cube'})
+
+        assert response.status_code == 400
+
+
+class TestExportAccessCommand:
+    """Tests for the export_access command"""
+
+    def test_stdout(self, matrix):
+        out = StringIO()
+
+        call_command('export_access', '--permission', 'write', stdout=out)
+
+        assert out.getvalue().splitlines()[1:] == ['alice,yes,Srv,/srv,write', 'alice,yes,Pub,/srv/pub,write']
+
+    def test_xlsx_file(self, tmp_path, matrix):
+        path = tmp_path / 'access.xlsx'
+
+        call_command('export_access', '--format', 'xlsx', '--layout', 'pivot', '--output', str(path), stderr=StringIO())
+
+        assert read_xlsx(path.read_bytes())[0][1] == ['alice', 'yes', None, 'W', 'W']
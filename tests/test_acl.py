@@ -0,0 +1,105 @@
+import pytest
+from unittest.mock import patch
+
+from django.urls import reverse
+
+from ftpmanager.acl import AclSnapshot, effective_permissions
+from ftpmanager.models import AclRevision, FTPGroup, FolderAccess
+
+
+@pytest.fixture
+def snapshot():
+    return AclSnapshot([
+        (1, 10, 'read'),
+        (1, 20, 'write'),
+        (2, 10, 'write'),
+        (3, 30, 'read'),
+    ])
+
+
+class TestAclSnapshot:
+    """Tests for AclSnapshot lookups"""
+
+    def test_permission(self, snapshot):
+        """Test single permission lookups"""
+        assert snapshot.permission(1, 20) == 'write'
+        assert snapshot.permission(1, 10) == 'read'
+        assert snapshot.permission(1, 30) is None
+        assert snapshot.permission(99, 10) is None
+
+    def test_folders(self, snapshot):
+        """Test folders per user, write implying read"""
+        assert snapshot.folders(1) == [10, 20]
+        assert snapshot.folders(1, 'write') == [20]
+        assert snapshot.folders(99) == []
+
+    def test_users(self, snapshot):
+        """Test users per folder"""
+        assert snapshot.users(10) == [1, 2]
+        assert snapshot.users(10, 'write') == [2]
+
+    def test_as_dict(self, snapshot):
+        """Test conversion to nested dicts, optionally for some users"""
+        assert snapshot.as_dict([2, 99]) == {2: {10: 'write'}}
+        assert len(snapshot.as_dict()) == 3
+        assert len(snapshot) == 4
+
+
+class TestAclRevision:
+    """Tests for snapshot invalidation"""
+
+    def test_grant_bumps_token(self, ftp_user, folder):
+        """Test a new grant changes the token"""
+        before = AclRevision.current_token()
+        FolderAccess.objects.create(user=ftp_user, folder=folder, permission='read')
+
+        assert AclRevision.current_token() != before
+        assert effective_permissions() == {ftp_user.pk: {folder.pk: 'read'}}
+
+    def test_membership_bumps_token(self, ftp_user):
+        """Test group membership changes invalidate the snapshot"""
+        group = FTPGroup.objects.create(name='staff', gid=10000)
+        before = AclRevision.current_token()
+        group.members.add(ftp_user)
+
+        assert AclRevision.current_token() != before
+
+    def test_snapshot_reused(self, folder_access_read):
+        """Test the snapshot is only rebuilt when the token changed"""
+        first = AclSnapshot.current()
+        with patch.object(AclSnapshot, 'build') as build:
+            assert AclSnapshot.current() is first
+        build.assert_not_called()
+
+    def test_deactivated_user_dropped(self, ftp_user, folder_access_read):
+        """Test deactivating a user removes them from the snapshot"""
+        AclSnapshot.current()
+        ftp_user.is_active = False
+        ftp_user.save()
+
+        assert AclSnapshot.current().folders(ftp_user.pk) == []
+
+    def test_group_access_view_bumps_token(self, authenticated_client, folder):
+        """Test the bulk group access update invalidates the snapshot"""
+        group = FTPGroup.objects.create(name='staff', gid=10000)
+        before = AclRevision.current_token()
+
+        authenticated_client.post(reverse('group_access', args=[group.pk]), {f'folder_{folder.pk}': 'read'})
+
+        assert AclRevision.current_token() != before
+
+
+class TestSnapshotViews:
+    """Tests for views answering from the snapshot"""
+
+    def test_user_access_effective(self, authenticated_client, ftp_user, folder, folder_access_read):
+        """Test the user access page shows effective permissions"""
+        response = authenticated_client.get(reverse('user_access', args=[ftp_user.pk]))
+
+        assert response.context['effective_access'] == {folder.pk: 'read'}
+
+    def test_folder_list_reach(self, authenticated_client, folder, folder_access_read):
+        """Test the folder list counts effective readers and writers"""
+        response = authenticated_client.get(reverse('folder_list'))
+
+        assert response.context['reach'] == {folder.pk: (1, 0)}
@@ -0,0 +1,319 @@
+import json
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from ftpmanager.models import AclRevision, ApiToken, FTPNode, FTPUser, Folder, FolderAccess, IdempotencyKey
+
+
+@pytest.fixture
+def api_key(django_user):
+    _token, key = ApiToken.create_token('provisioning', django_user)
+    return key
+
+
+@pytest.fixture
+def api(client, api_key):
+    """Call the API as a token holder: api('post', 'api_users', data, headers...)"""
+    def call(method, name, data=None, pk=None, **headers):
+        url = reverse(name, args=[pk] if pk is not None else [])
+        kwargs = {'HTTP_AUTHORIZATION': f'Bearer {api_key}', **{f'HTTP_{k.upper()}': v for k, v in headers.items()}}
+        if method == 'get':
+            return client.get(url, data or {}, **kwargs)
+        body = json.dumps(data) if data is not None else ''
+        return getattr(client, method)(url, body, content_type='application/json', **kwargs)
+    return call
+
+
+@pytest.mark.django_db
+class TestApiAuth:
+    """Tests for token authentication"""
+
+    def test_missing_token(self, client):
+        response = client.get(reverse('api_users'))
+
+        assert response.status_code == 401
+        assert response['WWW-Authenticate'] == 'Bearer'
+
+    def test_wrong_token(self, client, api_key):
+        response = client.get(reverse('api_users'), HTTP_AUTHORIZATION='Bearer nope')
+
+        assert response.status_code == 401
+
+    def test_revoked_token(self, client, api_key):
+        ApiToken.objects.update(is_active=False)
+
+        response = client.get(reverse('api_users'), HTTP_AUTHORIZATION=f'Bearer {api_key}')
+
+        assert response.status_code == 401
+
+    def test_session_login_is_not_enough(self, authenticated_client):
+        """Test the API needs a token even for a logged in panel user"""
+        response = authenticated_client.get(reverse('api_users'))
+
+        assert response.status_code == 401
+
+    def test_key_is_hashed(self, api_key, api):
+        """Test only a hash of the key is stored and last use is recorded"""
+        api('get', 'api_users')
+        token = ApiToken.objects.get()
+
+        assert api_key not in (token.key_hash, token.prefix)
+        assert api_key.startswith(token.prefix)
+        assert token.last_used_at is not None
+
+    def test_method_not_allowed(self, api):
+        response = api('put', 'api_users', {})
+
+        assert response.status_code == 405
+        assert 'POST' in response['Allow']
+
+
+@pytest.mark.django_db
+class TestApiResources:
+    """Tests for the single-record endpoints"""
+
+    def test_create_user(self, api):
+        """Test creating a user hashes the password and never returns it"""
+        response = api('post', 'api_users', {'username': 'alice', 'password': 'pw', 'quota_bytes': 1000})
+
+        assert response.status_code == 201
+        data = response.json()
+        assert data['username'] == 'alice'
+        assert data['has_password'] is True
+        assert 'password_hash' not in data
+        assert FTPUser.objects.get(username='alice').password_hash.startswith('$6$')
+
+    def test_invalid_user(self, api, ftp_user):
+        """Test validation errors are reported per field"""
+        response = api('post', 'api_users', {'username': 'ftpuser1', 'quota_type': 'huge', 'colour': 'red'})
+
+        assert response.status_code == 400
+        errors = response.json()['errors']
+        assert set(errors) == {'username', 'quota_type', 'colour'}
+
+    def test_wrong_types(self, api):
+        """Test values of the wrong JSON type are rejected instead of converted"""
+        response = api('post', 'api_users', {
+            'username': ['b'], 'quota_bytes': 1.5, 'max_clients': True, 'is_active': 'yes', 'systemuser': 1001,
+        })
+
+        assert response.status_code == 400
+        assert set(response.json()['errors']) == {'username', 'quota_bytes', 'max_clients', 'is_active', 'systemuser'}
+        assert not FTPUser.objects.exists()
+
+    def test_zero_limits(self, api):
+        response = api('post', 'api_users', {'username': 'alice', 'max_clients': 0, 'download_rate': 0})
+
+        assert set(response.json()['errors']) == {'max_clients', 'download_rate'}
+
+    def test_invalid_names(self, api):
+        """Test usernames and paths are checked like the generated files are"""
+        assert 'username' in api('post', 'api_users', {'username': 'bad:name'}).json()['errors']
+        assert 'path' in api('post', 'api_folders', {'name': 'Rel', 'path': 'data/rel'}).json()['errors']
+        assert not FTPUser.objects.exists() and not Folder.objects.exists()
+
+    def test_list_and_filter(self, api, ftp_user, inactive_ftp_user):
+        response = api('get', 'api_users', {'active': 'no'})
+
+        assert response.json()['total'] == 1
+        assert response.json()['results'][0]['username'] == 'inactiveuser'
+
+    def test_paging(self, api, ftp_user, inactive_ftp_user):
+        data = api('get', 'api_users', {'offset': 1, 'limit': 1}).json()
+
+        assert data['total'] == 2
+        assert [user['username'] for user in data['results']] == ['inactiveuser']
+
+    def test_patch_and_delete_user(self, api, ftp_user):
+        node = FTPNode.objects.create(name='node1')
+
+        response = api('patch', 'api_user', {'is_active': False, 'node': 'node1'}, pk=ftp_user.pk)
+
+        assert response.json()['node'] == 'node1'
+        ftp_user.refresh_from_db()
+        assert not ftp_user.is_active
+        assert ftp_user.node == node
+        assert api('delete', 'api_user', pk=ftp_user.pk).json() == {'id': ftp_user.pk, 'deleted': True}
+        assert api('get', 'api_user', pk=ftp_user.pk).status_code == 404
+
+    def test_folder_links_parent(self, api, folder):
+        response = api('post', 'api_folders', {'name': 'Sub', 'path': '/data/test/sub'})
+
+        assert response.json()['parent'] == folder.pk
+
+    def test_access_by_name(self, api, ftp_user, folder):
+        """Test grants name their user and folder"""
+        response = api('post', 'api_access', {'user': 'ftpuser1', 'folder': '/data/test/', 'permission': 'write'})
+
+        assert response.status_code == 201
+        assert response.json()['folder'] == '/data/test'
+        assert FolderAccess.objects.get().permission == 'write'
+        assert api('post', 'api_access', {'user': 'ftpuser1', 'folder': '/data/test'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestApiBatch:
+    """Tests for the batch upsert and delete endpoints"""
+
+    def test_user_upsert(self, api, ftp_user, inactive_ftp_user):
+        """Test new, changed, unchanged and deleted users are reported per item"""
+        response = api('post', 'api_users_batch', {
+            'upsert': [
+                {'username': 'new1', 'password_hash': '$6$x$y'},
+                {'username': 'ftpuser1', 'is_active': False},
+                {'username': 'ftpuser1x'},
+                {'username': 'inactiveuser', 'is_active': False},
+            ],
+            'delete': [{'username': 'ftpuser1x2'}],
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [result['status'] for result in data['upsert']] == ['created', 'updated', 'created', 'unchanged']
+        assert data['upsert'][1]['id'] == ftp_user.pk
+        assert data['upsert'][0]['id'] == FTPUser.objects.get(username='new1').pk
+        assert data['delete'] == [{'index': 0, 'status': 'not_found'}]
+        ftp_user.refresh_from_db()
+        assert not ftp_user.is_active
+        assert ftp_user.updated_at > ftp_user.created_at
+
+    def test_invalid_item_changes_nothing(self, api, ftp_user):
+        """Test one invalid item fails the whole batch with errors for that item"""
+        response = api('post', 'api_users_batch', {
+            'upsert': [{'username': 'new1'}, {'username': 'new2', 'max_clients': -1}, {'username': 'new1'}],
+            'delete': [{'username': 'ftpuser1'}],
+        })
+
+        assert response.status_code == 400
+        data = response.json()
+        assert [result['status'] for result in data['upsert']] == ['created', 'error', 'error']
+        assert 'max_clients' in data['upsert'][1]['errors']
+        assert 'Same record as item 0' in data['upsert'][2]['errors']['item'][0]
+        assert list(FTPUser.objects.values_list('username', flat=True)) == ['ftpuser1']
+
+    def test_folders_and_access(self, api, ftp_user, folder):
+        """Test folders are linked and grants are matched by username and path"""
+        revision = AclRevision.current_token()
+
+        folders = api('post', 'api_folders_batch', {'upsert': [
+            {'name': 'Sub', 'path': '/data/test/sub'},
+            {'name': 'Renamed', 'path': '/data/test/'},
+        ]}).json()
+        access = api('post', 'api_access_batch', {'upsert': [
+            {'user': 'ftpuser1', 'folder': '/data/test', 'permission': 'read'},
+            {'user': 'ftpuser1', 'folder': '/data/test/sub', 'permission': 'deny'},
+        ]}).json()
+
+        assert [result['status'] for result in folders['upsert']] == ['created', 'updated']
+        assert Folder.objects.get(path='/data/test/sub').parent == folder
+        assert Folder.objects.get(pk=folder.pk).name == 'Renamed'
+        assert [result['status'] for result in access['upsert']] == ['created', 'created']
+        assert dict(FolderAccess.objects.values_list('folder__path', 'permission')) == {
+            '/data/test': 'read', '/data/test/sub': 'deny',
+        }
+        assert AclRevision.current_token() != revision
+
+    def test_access_delete_and_unknown_names(self, api, folder_access_read):
+        response = api('post', 'api_access_batch', {
+            'upsert': [{'user': 'ghost', 'folder': '/data/test'}],
+            'delete': [{'user': 'ftpuser1', 'folder': '/data/test'}],
+        })
+
+        assert response.status_code == 400
+        assert 'user' in response.json()['upsert'][0]['errors']
+
+        response = api('post', 'api_access_batch', {'delete': [{'user': 'ftpuser1', 'folder': '/data/test'}]})
+
+        assert response.json()['delete'][0]['status'] == 'deleted'
+        assert not FolderAccess.objects.exists()
+
+    def test_delete_sends_one_acl_bump(self, api, ftp_user, inactive_ftp_user, monkeypatch):
+        """Test deleting many objects writes the ACL revision once"""
+        calls = []
+        uuid4 = uuid.uuid4
+        monkeypatch.setattr(uuid, 'uuid4', lambda: calls.append(1) or uuid4())
+
+        api('post', 'api_users_batch', {'delete': [{'username': 'ftpuser1'}, {'username': 'inactiveuser'}]})
+
+        assert not FTPUser.objects.exists()
+        assert len(calls) == 1
+
+    def test_malformed_batch(self, api):
+        assert api('post', 'api_users_batch', {'upsert': {}}).status_code == 400
+        assert api('post', 'api_users_batch', {'create': []}).status_code == 400
+        assert api('post', 'api_users_batch', {'upsert': ['alice']}).json()['upsert'][0]['status'] == 'error'
+
+
+@pytest.mark.django_db
+class TestIdempotency:
+    """Tests for Idempotency-Key replay"""
+
+    def test_retry_is_replayed(self, api):
+        """Test a retried create returns the stored response and creates nothing"""
+        first = api('post', 'api_users', {'username': 'alice'}, idempotency_key='k1')
+        second = api('post', 'api_users', {'username': 'alice'}, idempotency_key='k1')
+
+        assert second.status_code == 201
+        assert second.json() == first.json()
+        assert second['Idempotent-Replayed'] == 'true'
+        assert FTPUser.objects.count() == 1
+
+    def test_key_reused_for_other_request(self, api):
+        api('post', 'api_users', {'username': 'alice'}, idempotency_key='k1')
+
+        response = api('post', 'api_users', {'username': 'bob'}, idempotency_key='k1')
+
+        assert response.status_code == 422
+        assert not FTPUser.objects.filter(username='bob').exists()
+
+    def test_failures_are_not_stored(self, api):
+        """Test a failed write can be retried with the same key once fixed"""
+        assert api('post', 'api_access', {'user': 'alice', 'folder': '/srv'}, idempotency_key='k1').status_code == 400
+        assert not IdempotencyKey.objects.exists()
+
+    def test_expired_keys(self, api):
+        api('post', 'api_users', {'username': 'alice'}, idempotency_key='k1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        response = api('post', 'api_users', {'username': 'alice'}, idempotency_key='k1')
+
+        assert response.status_code == 400
+        assert 'username' in response.json()['errors']
+
+    def test_batch_replay(self, api):
+        body = {'upsert': [{'username': 'alice'}]}
+        first = api('post', 'api_users_batch', body, idempotency_key='b1').json()
+
+        second = api('post', 'api_users_batch', body, idempotency_key='b1').json()
+
+        assert second == first
+        assert second['upsert'][0]['status'] == 'created'
+
+
+@pytest.mark.django_db
+class TestApiTokenCommand:
+    """Tests for the api_token command"""
+
+    def test_create_list_revoke(self, django_user):
+        out = StringIO()
+
+        call_command('api_token', 'create', 'ci', '--user', 'testadmin', stdout=out)
+        key = out.getvalue().splitlines()[-1]
+        call_command('api_token', 'revoke', 'ci', stdout=out)
+        call_command('api_token', 'list', stdout=out)
+
+        assert ApiToken.objects.get().key_hash == ApiToken.hash_key(key)
+        assert ApiToken.authenticate(key) is None
+        assert 'ci\t' in out.getvalue() and 'revoked' in out.getvalue()
+
+    def test_unknown_user(self, db):
+        with pytest.raises(CommandError, match='No panel login'):
+            call_command('api_token', 'create', 'ci', '--user', 'nobody')
@@ -0,0 +1,176 @@
+import re
+from io import StringIO
+
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from ftpmanager.config_diff import FileDiff, config_blocks, preview_diffs, summarize
+from ftpmanager.config_generator import generate_ftpusers_file, generate_proftpd_config
+from ftpmanager.models import FTPUser, FolderAccess
+
+
+def apply_diff(old, diff_lines):
+    """Apply unified diff hunks to old text, checking every context and removed line"""
+    old = old.splitlines()
+    result = []
+    position = 0
+    for line in diff_lines:
+        if line.startswith(('---', '+++')):
+            continue
+        match = re.match(r'@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@', line)
+        if match:
+            start = int(match.group(1)) - (match.group(2) != '0')
+            assert start >= position, 'hunks out of order'
+            result += old[position:start]
+            position = start
+        elif line.startswith('+'):
+            result.append(line[1:])
+        else:
+            assert old[position] == line[1:]
+            if line.startswith(' '):
+                result.append(line[1:])
+            position += 1
+    return '\n'.join(result + old[position:]) + '\n'
+
+
+OLD_CONFIG = '''# Header
+#
+
+AuthOrder mod_auth_file.c
+
+# Access rules for: a
+<Directory /srv/a>
+  <Limit READ DIRS>
+    AllowUser alice
+    DenyAll
+  </Limit>
+</Directory>
+
+# Access rules for: b
+<Directory /srv/b>
+  <Limit READ DIRS>
+    AllowUser bob
+    DenyAll
+  </Limit>
+</Directory>
+
+# Limits for user: bob
+<IfModule mod_ifsession.c>
+  <IfUser bob>
+    TransferRate RETR 10
+  </IfUser>
+</IfModule>
+'''
+
+
+class TestConfigBlocks:
+    """Tests for config_blocks function"""
+
+    def test_keys(self):
+        """Test sections are keyed by their tags and keep their comments"""
+        blocks = list(config_blocks(OLD_CONFIG.splitlines(keepends=True)))
+
+        assert [key for key, _lines in blocks] == [
+            '# Header',
+            'AuthOrder mod_auth_file.c',
+            '<Directory /srv/a>',
+            '<Directory /srv/b>',
+            '<IfModule mod_ifsession.c> <IfUser bob>',
+        ]
+        assert blocks[2][1][0] == '# Access rules for: a\n'
+        assert ''.join(line for _key, lines in blocks for line in lines) == OLD_CONFIG
+
+
+class TestFileDiff:
+    """Tests for FileDiff class"""
+
+    def test_missing_file(self, tmp_path):
+        """Test a file that was never deployed diffs as all added"""
+        diff = FileDiff('passwd', str(tmp_path / 'ftpd.passwd'), 'a:x:1:1::/a:/bin/false\nb:x:1:1::/b:/bin/false\n', 'passwd')
+
+        assert diff.summary == {'added': 2, 'removed': 0, 'changed': 0, 'unit': 'user'}
+        assert list(diff.iter_lines())[:3] == ['--- /dev/null', f'+++ {diff.path} (generated)', '@@ -0,0 +1 @@']
+
+    def test_unchanged(self, tmp_path):
+        """Test identical files produce no diff"""
+        path = tmp_path / 'users.conf'
+        path.write_text(OLD_CONFIG)
+
+        diff = FileDiff('config', str(path), OLD_CONFIG)
+
+        assert not diff.has_changes
+        assert list(diff.iter_lines()) == []
+
+    def test_only_changed_blocks_diffed(self, tmp_path):
+        """Test unchanged blocks are skipped and the diff applies cleanly"""
+        path = tmp_path / 'users.conf'
+        path.write_text(OLD_CONFIG)
+        new = (OLD_CONFIG.replace('AllowUser alice', 'AllowUser alice carol')
+               .replace('# Access rules for: b', '# Access rules for: c\n<Directory /srv/c>\n</Directory>\n\n# Access rules for: b'))
+        new = new.split('\n# Limits for user: bob')[0]
+
+        with patch('ftpmanager.config_diff.difflib.SequenceMatcher', wraps=__import__('difflib').SequenceMatcher) as matcher:
+            diff = FileDiff('config', str(path), new)
+            lines = list(diff.iter_lines())
+
+        assert diff.summary == {'added': 1, 'removed': 1, 'changed': 1, 'unit': 'rule'}
+        assert matcher.call_count == 3
+        assert '-    AllowUser alice' in lines and '+    AllowUser alice carol' in lines
+        assert not any('/srv/b' in line for line in lines)
+        assert apply_diff(OLD_CONFIG, lines) == new
+
+    def test_generated_config(self, tmp_path, ftp_user, folder, folder2, folder_access_read):
+        """Test a deployed config updates to the generated one through the diff"""
+        path = tmp_path / 'users.conf'
+        old = generate_proftpd_config()
+        path.write_text(old)
+        FolderAccess.objects.create(user=ftp_user, folder=folder2, permission='write')
+        new = generate_proftpd_config()
+
+        diff = FileDiff('config', str(path), new)
+
+        assert diff.summary['added'] == 1
+        assert apply_diff(old, list(diff.iter_lines())) == new
+
+
+class TestPreview:
+    """Tests for the deployed-file preview"""
+
+    def test_summary(self, tmp_path, settings, ftp_user):
+        """Test the summary counts users and rules over all files"""
+        settings.PROFTPD_CONFIG_DIR = str(tmp_path)
+        (tmp_path / 'ftpd.passwd').write_text(generate_ftpusers_file())
+        FTPUser.objects.create(username='newbie', systemuser='1001')
+
+        diffs = {diff.name: diff for diff in preview_diffs()}
+
+        assert diffs['passwd'].summary['added'] == 1
+        assert summarize([diffs['passwd']]) == '+1 user'
+
+    def test_page_and_stream(self, authenticated_client, settings, tmp_path, ftp_user):
+        """Test the page summarizes and the per-file endpoint streams the diff"""
+        settings.PROFTPD_CONFIG_DIR = str(tmp_path)
+
+        response = authenticated_client.get(reverse('config_diff'))
+        assert response.context['summary'].startswith('+')
+
+        response = authenticated_client.get(reverse('config_diff_file', args=['passwd']))
+        body = b''.join(response.streaming_content).decode()
+        assert body.splitlines()[0] == '--- /dev/null'
+        assert '+ftpuser1:' in body
+
+    def test_unknown_file(self, authenticated_client):
+        """Test unknown file names are not found"""
+        assert authenticated_client.get(reverse('config_diff_file', args=['shadow'])).status_code == 404
+
+    def test_deploy_diff(self, tmp_path, ftp_user):
+        """Test deploy_config --diff prints the diff without writing"""
+        out = StringIO()
+
+        call_command('deploy_config', '--config-dir', str(tmp_path), '--diff', stdout=out)
+
+        assert '+ftpuser1:' in out.getvalue()
+        assert 'Next deploy: +1 user' in out.getvalue()
+        assert list(tmp_path.iterdir()) == []
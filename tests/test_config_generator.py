@@ -106,6 +106,89 @@ class TestGenerateProftpdConfig:
         assert '# DO NOT EDIT MANUALLY' in config
 
 
+class TestTransferLimits:
+    """Tests for per-user and per-folder transfer limits"""
+
+    def test_no_limits_no_ifuser(self, db, ftp_user):
+        """Test that users without limits get no <IfUser> block"""
+        assert '<IfUser' not in generate_proftpd_config()
+
+    def test_user_limits(self, db, ftp_user):
+        """Test user rates and client limits are scoped with <IfUser>"""
+        ftp_user.download_rate = 500
+        ftp_user.max_clients = 4
+        ftp_user.max_clients_per_host = 2
+        ftp_user.save()
+
+        config = generate_proftpd_config()
+
+        assert (
+            '  <IfUser ftpuser1>\n'
+            '    TransferRate RETR 500\n'
+            '    MaxClientsPerUser 4\n'
+            '    MaxClientsPerHost 2\n'
+            '  </IfUser>\n'
+        ) in config
+        assert 'STOR,STOU,APPE' not in config
+
+    def test_inactive_user_limits_skipped(self, db, inactive_ftp_user):
+        """Test that inactive users get no limits block"""
+        inactive_ftp_user.upload_rate = 100
+        inactive_ftp_user.save()
+
+        assert '<IfUser' not in generate_proftpd_config()
+
+    def test_folder_rates(self, db, ftp_user, folder):
+        """Test folder rates are emitted in its <Directory> block"""
+        folder.upload_rate = 250
+        folder.save()
+        FolderAccess.objects.create(user=ftp_user, folder=folder, permission='write')
+
+        config = generate_proftpd_config()
+
+        assert f'<Directory {folder.path}>\n  TransferRate STOR,STOU,APPE 250\n' in config
+
+
+class TestIfUserMode:
+    """Tests for acl_mode='ifuser' generation"""
+
+    def test_folders_denied_globally(self, db, ftp_user, folder, folder_access_read):
+        """Test managed folders get a global deny and no AllowUser lists"""
+        config = generate_proftpd_config(acl_mode='ifuser')
+
+        assert f'<Directory {folder.path}>\n  <Limit ALL>\n    DenyAll\n  </Limit>\n</Directory>' in config
+        assert 'AllowUser' not in config
+
+    def test_user_section(self, db, ftp_user, folder, folder2, folder_access_read, folder_access_write):
+        """Test a user's folders are granted inside its <IfUser> section"""
+        config = generate_proftpd_config(acl_mode='ifuser')
+        section = config[config.index('<IfUser ftpuser1>'):config.index('</IfUser>')]
+
+        assert f'<Directory {folder.path}>\n    <Limit READ DIRS>\n      AllowAll' in section
+        assert 'WRITE' in section[section.index(folder2.path):]
+        assert 'WRITE' not in section[section.index(folder.path):section.index(folder2.path)]
+
+    def test_identical_users_share_section(self, db, ftp_user, folder, folder_access_read):
+        """Test users with the same permissions share one regex section"""
+        user2 = FTPUser.objects.create(username='ftp.user2', systemuser='1002')
+        FolderAccess.objects.create(user=user2, folder=folder, permission='read')
+
+        config = generate_proftpd_config(acl_mode='ifuser')
+
+        assert config.count('\n<IfUser ') == 1
+        assert r'<IfUser regex ^(ftpuser1|ftp\.user2)$>' in config
+
+    def test_different_permissions_separate_sections(self, db, ftp_user, folder, folder_access_read):
+        """Test users with different permissions get separate sections"""
+        user2 = FTPUser.objects.create(username='ftpuser2', systemuser='1002')
+        FolderAccess.objects.create(user=user2, folder=folder, permission='write')
+
+        config = generate_proftpd_config(acl_mode='ifuser')
+
+        assert '<IfUser ftpuser1>' in config
+        assert '<IfUser ftpuser2>' in config
+
+
 class TestGetUidGid:
     """Tests for get_uid_gid function"""
 
@@ -287,3 +370,45 @@ class TestGenerateUserConfig:
 
         assert f'# - {folder.path}: Read Only' in config
         assert f'# - {folder2.path}: Read & Write' in config
+
+    def test_user_with_deny(self, db, ftp_user, folder, folder_access_read):
+        """Test a deny rule is listed as no access, not read only"""
+        folder_access_read.permission = 'deny'
+        folder_access_read.save()
+
+        config = generate_user_config(ftp_user)
+
+        assert f'# - {folder.path}: No Access' in config
+        assert 'Read Only' not in config
+
+
+class TestActivityOrdering:
+    """Tests for ordering ftpd.passwd by activity"""
+
+    @pytest.fixture
+    def users(self, db):
+        for name in ['carol', 'alice', 'bob', 'dave']:
+            FTPUser.objects.create(username=name, systemuser='1001')
+
+    def usernames(self, content):
+        return [l.split(':')[0] for l in content.split('\n') if not l.startswith('#')]
+
+    def test_default_order_unchanged(self, users):
+        """Test that without activity the queryset order is kept"""
+        content = generate_ftpusers_file()
+
+        assert self.usernames(content) == ['carol', 'alice', 'bob', 'dave']
+
+    def test_most_active_first(self, users):
+        """Test that active users come first and inactive ones sort by name"""
+        content = generate_ftpusers_file(activity={'dave': 100, 'bob': 3})
+
+        assert self.usernames(content) == ['dave', 'bob', 'alice', 'carol']
+
+    def test_similar_activity_stable(self, users):
+        """Test that counts in the same power-of-two bucket tie-break by name"""
+        first = generate_ftpusers_file(activity={'dave': 9, 'bob': 14})
+        second = generate_ftpusers_file(activity={'dave': 15, 'bob': 10})
+
+        assert self.usernames(first)[:2] == ['bob', 'dave']
+        assert first == second
@@ -0,0 +1,171 @@
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from ftpmanager.config_generator import (
+    MAX_DIRECTIVE_LENGTH,
+    generate_ftpgroup_file,
+    generate_ftpusers_file,
+    generate_proftpd_config,
+    generate_tuning_config,
+)
+from ftpmanager.config_lint import lint_config, lint_files, lint_group, lint_passwd
+from ftpmanager.models import FTPGroup, FTPUser, FolderAccess, GroupFolderAccess
+
+
+def messages(issues):
+    return [issue.message for issue in issues]
+
+
+class TestLintConfig:
+    """Tests for lint_config function"""
+
+    def test_unclosed_section(self):
+        """Test a section that is never closed is reported with its line"""
+        issues = lint_config('<Directory /a>\n  <Limit READ>\n    DenyAll\n  </Limit>\n')
+
+        assert [(issue.line, issue.message) for issue in issues] == [(1, '<Directory> is never closed')]
+
+    def test_mismatched_close(self):
+        """Test closing the wrong section"""
+        issues = lint_config('<Directory /a>\n  <Limit READ>\n  </Directory>\n</Limit>\n')
+
+        assert '</Directory> closes <Limit> opened on line 2' in messages(issues)
+
+    def test_unknown_limit_command(self):
+        """Test <Limit> arguments must be FTP commands or command groups"""
+        issues = lint_config('<Directory /a>\n<Limit READ STORE>\nDenyAll\n</Limit>\n</Directory>\n')
+
+        assert messages(issues) == ['Unknown command in <Limit>: STORE']
+
+    def test_duplicate_directory(self):
+        """Test the same normalized path twice in one context"""
+        issues = lint_config('<Directory /a/b>\n</Directory>\n<Directory /a//b/>\n</Directory>\n')
+
+        assert messages(issues) == ['<Directory /a//b/> duplicates line 1']
+
+    def test_same_directory_in_other_context(self):
+        """Test <IfUser> sections may repeat a global <Directory>"""
+        config = '<Directory /a>\n</Directory>\n<IfUser bob>\n<Directory /a>\n</Directory>\n</IfUser>\n'
+
+        assert lint_config(config) == []
+
+    def test_nested_directory(self):
+        """Test <Directory> inside <Directory> is rejected"""
+        issues = lint_config('<Directory /a>\n<Directory /a/b>\n</Directory>\n</Directory>\n')
+
+        assert messages(issues) == ['<Directory> nested inside <Directory>']
+
+    def test_allow_outside_limit(self):
+        """Test access directives must be inside <Limit>"""
+        issues = lint_config('<Directory /a>\nAllowUser bob\n</Directory>\n')
+
+        assert messages(issues) == ['AllowUser outside of a <Limit> section']
+
+    def test_long_line(self):
+        """Test lines longer than ProFTPD reads are reported"""
+        issues = lint_config('# ' + 'x' * MAX_DIRECTIVE_LENGTH)
+
+        assert issues[0].level == 'error'
+
+
+class TestLintAccountFiles:
+    """Tests for lint_passwd and lint_group functions"""
+
+    def test_valid_passwd(self):
+        """Test a well-formed entry passes"""
+        assert lint_passwd('bob:$6$salt$hash:1001:1001:bob:/srv/ftp:/bin/false') == []
+
+    def test_malformed_passwd(self):
+        """Test field count, root UID and relative home are reported"""
+        issues = lint_passwd('bob:$6$x:1001:1001:bob:/srv\nroot:$6$x:0:1001:root:srv:/bin/false')
+
+        assert messages(issues) == [
+            'Expected 7 fields, found 6',
+            'UID of root is 0 (root)',
+            'Home directory of root is not absolute: srv',
+        ]
+
+    def test_duplicate_user(self):
+        """Test duplicate usernames are reported"""
+        line = 'bob:$6$x:1001:1001:bob:/srv:/bin/false'
+
+        assert messages(lint_passwd(f'{line}\n{line}')) == ['Duplicate username bob, first on line 1']
+
+    def test_group_members(self):
+        """Test group members must exist and GIDs must be unique"""
+        issues = lint_group('a:x:10000:bob,eve\nb:x:10000:', usernames={'bob'})
+
+        assert messages(issues) == ['Member eve of a is not in the passwd file', 'GID 10000 already used on line 1']
+        assert issues[0].level == 'warning'
+
+
+class TestGeneratedFilesPassLint:
+    """Tests that the generators produce lint-free output"""
+
+    def test_generated_files(self, ftp_user, folder, folder2, folder_access_read):
+        """Test all generated files validate, in both ACL modes"""
+        group = FTPGroup.objects.create(name='staff', gid=10000)
+        group.members.add(ftp_user)
+        GroupFolderAccess.objects.create(group=group, folder=folder2, permission='write')
+        ftp_user.quota_bytes = 100
+        ftp_user.download_rate = 50
+        ftp_user.save()
+
+        for mode in ('directory', 'ifuser'):
+            assert lint_files(
+                config=generate_proftpd_config(acl_mode=mode),
+                passwd=generate_ftpusers_file(),
+                group=generate_ftpgroup_file(),
+                tuning=generate_tuning_config(),
+            ) == []
+
+    def test_long_user_lists_split(self, folder):
+        """Test many users with the same access stay below the line limit"""
+        for i in range(300):
+            user = FTPUser.objects.create(username=f'user{i:04d}', systemuser='1001')
+            FolderAccess.objects.create(user=user, folder=folder, permission='read')
+
+        for mode in ('directory', 'ifuser'):
+            assert lint_config(generate_proftpd_config(acl_mode=mode)) == []
+
+
+class TestDeployLint:
+    """Tests for validation in deploy_config"""
+
+    def test_errors_abort_before_writing(self, ftp_user, tmp_path):
+        """Test nothing is written when validation fails"""
+        ftp_user.username = 'bad:name'
+        ftp_user.save()
+
+        with pytest.raises(CommandError, match='failed validation'):
+            call_command('deploy_config', '--config-dir', str(tmp_path))
+        assert list(tmp_path.iterdir()) == []
+
+    def test_skip_lint(self, ftp_user, tmp_path):
+        """Test --skip-lint writes despite errors"""
+        ftp_user.username = 'bad:name'
+        ftp_user.save()
+
+        call_command('deploy_config', '--config-dir', str(tmp_path), '--skip-lint')
+
+        assert (tmp_path / 'ftpd.passwd').exists()
+
+    def test_passwordless_user_is_locked(self, ftp_user, tmp_path):
+        """Test a user without a password does not fail validation and cannot log in"""
+        FTPUser.objects.create(username='nopass', systemuser='1001')
+
+        call_command('deploy_config', '--config-dir', str(tmp_path))
+
+        assert 'nopass:!:' in (tmp_path / 'ftpd.passwd').read_text()
+
+    def test_preview_shows_issues(self, authenticated_client, ftp_user):
+        """Test the config page reports validation issues"""
+        ftp_user.username = 'bad:name'
+        ftp_user.save()
+
+        response = authenticated_client.get(reverse('generate_config'))
+
+        assert response.context['lint_issues'][0].filename == 'ftpd.passwd'
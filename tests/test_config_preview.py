@@ -0,0 +1,109 @@
+import json
+
+from django.urls import reverse
+
+from ftpmanager.config_preview import config_sections, filter_sections, ifuser_names, passwd_entries
+from ftpmanager.models import FTPUser, FolderAccess
+
+
+CONFIG = '''# Header
+
+# Access rules for: Share
+<Directory /srv/share>
+  <Limit READ DIRS>
+    AllowUser alice bob
+    AllowGroup staff
+    DenyAll
+  </Limit>
+</Directory>
+
+<IfUser regex ^(carol|d\\.e)$>
+  <Directory /srv/other>
+  </Directory>
+</IfUser>
+'''
+
+
+class TestConfigSections:
+    """Tests for config_sections and filter_sections functions"""
+
+    def test_sections(self):
+        """Test sections carry titles, line numbers and principals"""
+        sections, bodies = config_sections(CONFIG)
+
+        share = sections[1]
+        assert (share.title, share.key, share.start, share.lines) == ('Access rules for: Share', '<Directory /srv/share>', 3, 8)
+        assert share.users == ['alice', 'bob'] and share.groups == ['staff']
+        assert sections[2].users == ['carol', 'd.e']
+        assert ''.join(line for body in bodies for line in body) == CONFIG
+
+    def test_filter(self):
+        """Test filtering by user and by folder"""
+        sections, _bodies = config_sections(CONFIG)
+
+        assert [s.index for s in filter_sections(sections, user='bob')] == [1]
+        assert [s.index for s in filter_sections(sections, folder='OTHER')] == [2]
+        assert filter_sections(sections, user='bob', folder='other') == []
+
+    def test_ifuser_names(self):
+        """Test plain and generated regex <IfUser> arguments"""
+        assert ifuser_names('alice') == ['alice']
+        assert ifuser_names('regex ^(a|b\\.c)$') == ['a', 'b.c']
+
+    def test_passwd_entries(self):
+        """Test password hashes are left out and filters apply"""
+        text = '# comment\nalice:$6$x:1001:1001:alice:/srv:/bin/false\nbob:$6$y:1002:1001:bob:/srv:/bin/false'
+
+        entries = passwd_entries(text, user='bo')
+
+        assert [tuple(entry) for entry in entries] == [(3, 'bob', '1002', '1001', '/srv', '/bin/false')]
+
+
+class TestConfigPreviewView:
+    """Tests for the lazy config preview"""
+
+    def test_page_has_no_file_contents(self, authenticated_client, ftp_user, folder, folder_access_read):
+        """Test the page lists sections instead of embedding the files"""
+        response = authenticated_client.get(reverse('generate_config'))
+
+        assert response.context['sections_total'] > 0
+        assert b'$6$' not in response.content
+        assert b'AllowUser' not in response.content
+
+    def test_page_filter(self, authenticated_client, ftp_user, folder, folder2, folder_access_read):
+        """Test the page filters sections by user"""
+        response = authenticated_client.get(reverse('generate_config'), {'user': ftp_user.username})
+
+        assert [section.key for section in response.context['sections']] == [f'<Directory {folder.path}>']
+
+    def test_section(self, authenticated_client, ftp_user, folder, folder_access_read):
+        """Test one section loads with a line limit"""
+        response = authenticated_client.get(reverse('generate_config'), {'folder': folder.path})
+        index = response.context['sections'][0].index
+
+        data = json.loads(authenticated_client.get(reverse('config_preview'), {'section': index, 'limit': 2}).content)
+
+        assert data['key'] == f'<Directory {folder.path}>'
+        assert len(data['text'].splitlines()) == 2
+        assert data['truncated'] is True
+
+    def test_section_list_and_passwd(self, authenticated_client, ftp_user, folder):
+        """Test the section list and passwd pages are paginated"""
+        for i in range(5):
+            user = FTPUser.objects.create(username=f'user{i}', systemuser='1001')
+            FolderAccess.objects.create(user=user, folder=folder, permission='read')
+
+        sections = json.loads(authenticated_client.get(reverse('config_preview'), {'user': 'user3'}).content)
+        passwd = json.loads(authenticated_client.get(reverse('config_preview'), {
+            'file': 'passwd', 'user': 'user', 'offset': 1, 'limit': 2,
+        }).content)
+
+        assert sections['total'] == 1 and sections['sections'][0]['users'] == 5
+        assert passwd['total'] == 6
+        assert [entry['username'] for entry in passwd['entries']] == ['user0', 'user1']
+        assert 'password' not in passwd['entries'][0]
+
+    def test_bad_parameters(self, authenticated_client, db):
+        """Test malformed and out of range parameters"""
+        assert authenticated_client.get(reverse('config_preview'), {'limit': 'x'}).status_code == 400
+        assert authenticated_client.get(reverse('config_preview'), {'section': 999}).status_code == 404
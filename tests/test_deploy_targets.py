@@ -0,0 +1,149 @@
+import json
+import sys
+import time
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ftpmanager.deploy import DeployTarget, deploy_to_target, load_targets, parse_targets
+
+
+def sleep_command(seconds):
+    return [sys.executable, '-c', f'import time; time.sleep({seconds})']
+
+
+class TestTargets:
+    """Tests for target definitions and deploy_to_target"""
+
+    def test_parse(self):
+        """Test defaults and validation of target definitions"""
+        target, = parse_targets([{'name': 'a', 'config_dir': '/etc/a'}])
+
+        assert target == DeployTarget('a', '/etc/a', 'none', 'snapshots', None)
+        with pytest.raises(ValueError, match='Duplicate'):
+            parse_targets([{'name': 'a', 'config_dir': '/x'}, {'name': 'a', 'config_dir': '/y'}])
+        with pytest.raises(ValueError, match='reload'):
+            parse_targets([{'name': 'a', 'config_dir': '/x', 'reload': 'kill'}])
+        with pytest.raises(ValueError, match='sql_db_path'):
+            parse_targets([{'name': 'a', 'config_dir': '/x', 'sql_db_path': 'ftpd.sqlite3'}])
+
+    def test_load_from_settings(self, settings):
+        """Test targets default to PROFTPD_DEPLOY_TARGETS"""
+        settings.PROFTPD_DEPLOY_TARGETS = [{'name': 'a', 'config_dir': '/etc/a', 'reload': 'reload'}]
+
+        assert [t.name for t in load_targets()] == ['a']
+
+    def test_deploy_to_target(self, tmp_path):
+        """Test files are written once and the reload runs only on change"""
+        marker = tmp_path / 'reloaded'
+        target = DeployTarget('a', str(tmp_path / 'a'), [sys.executable, '-c', f'open({str(marker)!r}, "a").write("x")'], 'snapshots', None)
+        files = {'conf.d/users.conf': ('config', 0o644), 'ftpd.passwd': ('users', 0o600)}
+
+        first = deploy_to_target(target, files)
+        second = deploy_to_target(target, files)
+
+        assert (first.ok, first.changed, first.written, first.revision) == (True, True, ['conf.d/users.conf', 'ftpd.passwd'], 1)
+        assert (second.changed, second.revision) == (False, 1)
+        assert marker.read_text() == 'x'
+
+    def test_failed_reload(self, tmp_path):
+        """Test a failing reload command is reported, not raised"""
+        target = DeployTarget('a', str(tmp_path), [sys.executable, '-c', 'raise SystemExit(3)'], 'snapshots', None)
+
+        result = deploy_to_target(target, {'a.conf': ('x', 0o644)})
+
+        assert not result.ok
+        assert 'failed' in result.error
+
+
+class TestDeployConfigTargets:
+    """Tests for deploy_config with multiple targets"""
+
+    def write_targets(self, tmp_path, targets):
+        path = tmp_path / 'targets.json'
+        path.write_text(json.dumps({'targets': targets}))
+        return str(path)
+
+    def test_parallel(self, tmp_path, ftp_user):
+        """Test slow targets are deployed concurrently and each is reported"""
+        targets_file = self.write_targets(tmp_path, [
+            {'name': name, 'config_dir': str(tmp_path / name), 'reload': sleep_command(0.5)} for name in ('a', 'b', 'c')
+        ])
+        out = StringIO()
+
+        started = time.perf_counter()
+        call_command('deploy_config', '--targets-file', targets_file, stdout=out)
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 1.4
+        lines = [line for line in out.getvalue().splitlines() if '\tOK\t' in line]
+        assert sorted(line.split('\t')[0] for line in lines) == ['a', 'b', 'c']
+        assert all('\tchanged (4 files)\trev 1\t' in line for line in lines)
+        assert (tmp_path / 'b' / 'ftpd.passwd').exists()
+
+    def test_selected_target_unchanged(self, tmp_path, ftp_user):
+        """Test --target picks targets and an unchanged redeploy is reported"""
+        targets_file = self.write_targets(tmp_path, [
+            {'name': 'a', 'config_dir': str(tmp_path / 'a')},
+            {'name': 'b', 'config_dir': str(tmp_path / 'b')},
+        ])
+        call_command('deploy_config', '--targets-file', targets_file, '--target', 'a', stdout=StringIO())
+        out = StringIO()
+
+        call_command('deploy_config', '--targets-file', targets_file, '--target', 'a', stdout=out)
+
+        assert '\tOK\tunchanged\trev 1\t' in out.getvalue()
+        assert not (tmp_path / 'b').exists()
+
+    def test_failure_reported_after_others(self, tmp_path, ftp_user):
+        """Test one failing target does not stop the others"""
+        targets_file = self.write_targets(tmp_path, [
+            {'name': 'good', 'config_dir': str(tmp_path / 'good')},
+            {'name': 'bad', 'config_dir': str(tmp_path / 'bad'), 'reload': [sys.executable, '-c', 'raise SystemExit(1)']},
+        ])
+        out = StringIO()
+
+        with pytest.raises(CommandError, match='Deploy failed on: bad'):
+            call_command('deploy_config', '--targets-file', targets_file, stdout=out)
+
+        assert 'good\tOK' in out.getvalue()
+        assert (tmp_path / 'good' / 'ftpd.passwd').exists()
+
+    def test_unknown_target(self, tmp_path, settings, ftp_user):
+        """Test unknown target names are rejected"""
+        settings.PROFTPD_DEPLOY_TARGETS = [{'name': 'a', 'config_dir': str(tmp_path)}]
+
+        with pytest.raises(CommandError, match='Unknown deploy target'):
+            call_command('deploy_config', '--target', 'nope')
+
+    def test_dry_run(self, tmp_path, settings, ftp_user):
+        """Test --dry-run lists the files per target without writing"""
+        settings.PROFTPD_DEPLOY_TARGETS = [{'name': 'a', 'config_dir': str(tmp_path / 'a')}]
+        out = StringIO()
+
+        call_command('deploy_config', '--all-targets', '--dry-run', stdout=out)
+
+        assert f'Would write passwd to: {tmp_path / "a" / "ftpd.passwd"}' in out.getvalue()
+        assert not (tmp_path / 'a').exists()
+
+    def test_sql_database_per_target(self, tmp_path, ftp_user):
+        """Test each target's config connects to the database synced for that target"""
+        targets_file = self.write_targets(tmp_path, [
+            {'name': 'a', 'config_dir': str(tmp_path / 'a')},
+            {'name': 'b', 'config_dir': str(tmp_path / 'b'), 'sql_db_path': '/etc/proftpd/ftpd.sqlite3'},
+        ])
+
+        call_command(
+            'deploy_config', '--targets-file', targets_file, '--auth-backend', 'sql',
+            '--config-dir', str(tmp_path / 'primary'), stdout=StringIO(),
+        )
+
+        config_a = (tmp_path / 'a' / 'conf.d' / 'users.conf').read_text()
+        config_b = (tmp_path / 'b' / 'conf.d' / 'users.conf').read_text()
+        assert f'SQLConnectInfo {tmp_path / "a" / "ftpd.sqlite3"}\n' in config_a
+        assert 'SQLConnectInfo /etc/proftpd/ftpd.sqlite3\n' in config_b
+        assert 'primary' not in config_a + config_b
+        assert (tmp_path / 'a' / 'ftpd.sqlite3').exists() and (tmp_path / 'b' / 'ftpd.sqlite3').exists()
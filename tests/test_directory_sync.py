@@ -0,0 +1,249 @@
+import base64
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ftpmanager.config_generator import generate_ftpgroup_file, generate_ftpusers_file, generate_proftpd_config
+from ftpmanager.directory_sync import apply_sync, plan_sync, read_csv, read_ldif
+from ftpmanager.models import AclRevision, FTPGroup, FTPUser
+
+
+HASH = '$6$salt$' + 'a' * 86
+
+LDIF = f'''version: 1
+
+# alice, people, example.com
+dn: uid=alice,ou=people,dc=example,dc=com
+objectClass: posixAccount
+uid: alice
+uidNumber: 2001
+userPassword:: {base64.b64encode(f'{{CRYPT}}{HASH}'.encode()).decode()}
+memberOf: cn=staff,ou=groups,dc=example,dc=com
+
+dn: uid=bob,ou=people,dc=exa
+ mple,dc=com
+objectClass: posixAccount
+uid: bob
+userPassword: {{SSHA}}abcdef
+nsAccountLock: true
+
+dn: cn=readers,ou=groups,dc=example,dc=com
+objectClass: groupOfNames
+cn: readers
+member: uid=bob,ou=people,dc=example,dc=com
+member: cn=nobody,dc=example,dc=com
+
+dn: cn=writers,ou=groups,dc=example,dc=com
+objectClass: posixGroup
+cn: writers
+memberUid: alice
+'''
+
+CSV = '''username,password_hash,systemuser,groups,active,department
+alice,{CRYPT}$6$x$y,2001,staff;writers,yes,sales
+bob,,,,no,it
+,$6$x$z,,,,
+carol,,,staff,maybe,it
+'''
+
+
+def sync(source, **options):
+    plan = plan_sync(source, **options)
+    return plan, apply_sync(plan)
+
+
+class TestReadSources:
+    """Tests for the LDIF and CSV readers"""
+
+    def test_ldif(self):
+        """Test folded lines, base64 values, password schemes, locks and all membership styles"""
+        source = read_ldif(StringIO(LDIF))
+
+        alice = source.users['alice']
+        assert (alice.password_hash, alice.password, alice.systemuser, alice.active) == (HASH, None, '2001', True)
+        bob = source.users['bob']
+        assert (bob.password_hash, bob.password, bob.active) == (None, None, False)
+        assert source.groups == {'staff': {'alice'}, 'readers': {'bob'}, 'writers': {'alice'}}
+        assert any('password scheme of bob' in warning for warning in source.warnings)
+        assert any('cn=nobody' in warning for warning in source.warnings)
+
+    def test_ldif_plain_password(self):
+        source = read_ldif(StringIO('dn: uid=dave,dc=x\nuid: dave\nuserPassword: hunter2\n'))
+
+        assert source.users['dave'].password == 'hunter2'
+        assert source.groups is None
+
+    def test_csv(self):
+        """Test columns, group lists and rows that cannot be used"""
+        source = read_csv(StringIO(CSV))
+
+        assert sorted(source.users) == ['alice', 'bob']
+        assert source.users['alice'].password_hash == '$6$x$y'
+        assert source.users['bob'].active is False
+        assert source.groups == {'staff': {'alice'}, 'writers': {'alice'}}
+        assert len(source.warnings) == 3
+
+    def test_invalid_usernames_skipped(self, db):
+        """Test names that cannot be written to ftpd.passwd are skipped with a warning"""
+        source = read_csv(StringIO('username,groups\njohn doe,staff\nalice,staff\n'))
+
+        assert list(source.users) == ['alice']
+        assert source.groups == {'staff': {'alice'}}
+        assert "csv line 2: invalid username 'john doe', skipped" in plan_sync(source).warnings
+
+        source = read_ldif(StringIO('dn: uid=bad:name,dc=x\nuid: bad:name\nmemberOf: cn=staff,dc=x\n'))
+
+        assert source.users == {} and source.groups is None
+
+    def test_csv_without_username(self):
+        with pytest.raises(ValueError, match='username'):
+            read_csv(StringIO('login,password\nalice,x\n'))
+
+
+@pytest.mark.django_db
+class TestDirectorySync:
+    """Tests for planning and applying a sync"""
+
+    @pytest.fixture
+    def groups(self, db):
+        staff = FTPGroup.objects.create(name='staff', gid=2000)
+        writers = FTPGroup.objects.create(name='writers', gid=2001)
+        manual = FTPGroup.objects.create(name='manual', gid=2002)
+        return staff, writers, manual
+
+    def test_creates_updates_and_deactivates(self, ftp_user, groups):
+        """Test new users are created, changed users updated and missing users deactivated"""
+        FTPUser.objects.create(username='bob', systemuser='2002', is_active=True)
+
+        plan, written = sync(read_csv(StringIO(CSV)))
+
+        alice = FTPUser.objects.get(username='alice')
+        assert (alice.password_hash, alice.systemuser, alice.is_active) == ('$6$x$y', '2001', True)
+        assert not FTPUser.objects.get(username='bob').is_active
+        assert not FTPUser.objects.get(username='ftpuser1').is_active
+        assert [user.username for user, _fields in plan.changed_users] == ['bob']
+        assert sorted(alice.ftp_groups.values_list('name', flat=True)) == ['staff', 'writers']
+        assert written == 5
+
+    def test_noop_sync_touches_nothing(self, groups):
+        """Test syncing the same export again writes nothing and leaves the generated files alone"""
+        source = read_csv(StringIO(CSV))
+        sync(source)
+        before = (
+            list(FTPUser.objects.values_list('username', 'updated_at')),
+            AclRevision.current_token(),
+            generate_proftpd_config(), generate_ftpusers_file(), generate_ftpgroup_file(),
+        )
+
+        plan, written = sync(read_csv(StringIO(CSV)))
+
+        assert not plan.has_changes
+        assert written == 0
+        assert plan.unchanged_users == 2
+        assert before == (
+            list(FTPUser.objects.values_list('username', 'updated_at')),
+            AclRevision.current_token(),
+            generate_proftpd_config(), generate_ftpusers_file(), generate_ftpgroup_file(),
+        )
+
+    def test_plain_password_not_rehashed(self, ftp_user):
+        """Test a plain text password matching the stored hash keeps the hash and its salt"""
+        stored = ftp_user.password_hash
+
+        plan, _written = sync(read_csv(StringIO('username,password\nftpuser1,secret123\n')))
+
+        assert plan.unchanged_users == 1
+        assert FTPUser.objects.get(pk=ftp_user.pk).password_hash == stored
+
+        sync(read_csv(StringIO('username,password\nftpuser1,changed\n')))
+
+        assert FTPUser.objects.get(pk=ftp_user.pk).password_hash != stored
+
+    def test_memberships(self, groups):
+        """Test members of mentioned groups are synced and other groups are left alone"""
+        staff, writers, manual = groups
+        sync(read_csv(StringIO(CSV)))
+        alice = FTPUser.objects.get(username='alice')
+        manual.members.add(alice)
+
+        plan, _written = sync(read_csv(StringIO('username,groups\nalice,staff\nbob,writers\n')))
+
+        assert plan.new_members == [('writers', 'bob')]
+        assert plan.removed_members == [('writers', 'alice')]
+        assert sorted(alice.ftp_groups.values_list('name', flat=True)) == ['manual', 'staff']
+
+        plan, _written = sync(read_csv(StringIO('username,groups\nalice,staff\n')), managed_groups=['manual'])
+
+        assert plan.removed_members == [('manual', 'alice')]
+
+    def test_reactivates_and_keeps_missing(self, ftp_user, inactive_ftp_user):
+        plan, _written = sync(read_csv(StringIO('username\ninactiveuser\n')), deactivate_missing=False)
+
+        assert FTPUser.objects.get(pk=inactive_ftp_user.pk).is_active
+        assert FTPUser.objects.get(pk=ftp_user.pk).is_active
+        assert plan.changed_users[0][1] == ['is_active']
+
+    def test_passwordless_users_not_activated(self, inactive_ftp_user):
+        """Test users without a usable password are created inactive and not reactivated"""
+        inactive_ftp_user.password_hash = ''
+        inactive_ftp_user.save()
+
+        plan, _written = sync(read_csv(StringIO('username,password\ndave,\nerin,pw\ninactiveuser,\n')))
+
+        assert sorted(FTPUser.objects.values_list('username', 'is_active')) == [
+            ('dave', False), ('erin', True), ('inactiveuser', False),
+        ]
+        assert plan.warnings == [
+            'user dave has no usable password; created inactive',
+            'user inactiveuser has no usable password; left inactive',
+        ]
+
+    def test_ldif_sync(self, groups):
+        """Test an LDIF export with nested membership styles"""
+        plan, _written = sync(read_ldif(StringIO(LDIF)))
+
+        assert sorted(FTPUser.objects.values_list('username', 'is_active')) == [('alice', True), ('bob', False)]
+        assert plan.new_members == [('staff', 'alice'), ('writers', 'alice')]
+        assert any('readers does not exist' in warning for warning in plan.warnings)
+
+
+@pytest.mark.django_db
+class TestSyncDirectoryCommand:
+    """Tests for the sync_directory command"""
+
+    def test_dry_run_then_sync(self, tmp_path, ftp_user):
+        path = tmp_path / 'people.csv'
+        path.write_text('username,systemuser,password_hash\nalice,2001,$6$x$y\n')
+        out = StringIO()
+
+        call_command('sync_directory', str(path), '--dry-run', stdout=out, stderr=StringIO())
+
+        assert '+ user alice (uid 2001)' in out.getvalue()
+        assert '- user ftpuser1 (deactivated)' in out.getvalue()
+        assert not FTPUser.objects.filter(username='alice').exists()
+
+        call_command('sync_directory', str(path), stdout=out, stderr=StringIO())
+        call_command('sync_directory', str(path), stdout=out, stderr=StringIO())
+
+        assert FTPUser.objects.filter(username='alice').exists()
+        assert 'Already in sync' in out.getvalue()
+
+    def test_empty_export(self, tmp_path, ftp_user):
+        """Test an export without users does not deactivate everyone"""
+        path = tmp_path / 'people.ldif'
+        path.write_text('version: 1\n')
+
+        with pytest.raises(CommandError, match='no users'):
+            call_command('sync_directory', str(path))
+
+        assert FTPUser.objects.get(pk=ftp_user.pk).is_active
+
+    def test_unknown_extension(self, tmp_path, db):
+        path = tmp_path / 'people.txt'
+        path.write_text('username\nalice\n')
+
+        with pytest.raises(CommandError, match='--format'):
+            call_command('sync_directory', str(path))
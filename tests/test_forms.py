@@ -99,6 +99,26 @@ class TestFTPUserForm:
         assert not form.is_valid()
         assert 'username' in form.errors
 
+    def test_form_invalid_username(self, db):
+        """Test usernames that cannot be written to ftpd.passwd are rejected"""
+        for username in ['john doe', 'bad:name', '-dash']:
+            form = FTPUserForm(data={'username': username, 'systemuser': '1001'})
+            assert not form.is_valid()
+            assert 'username' in form.errors
+
+    def test_form_invalid_zero_limits(self, db):
+        """Test rates and client limits must be at least 1"""
+        form = FTPUserForm(data={
+            'username': 'limited',
+            'systemuser': '1001',
+            'download_rate': 0,
+            'upload_rate': 0,
+            'max_clients': 0,
+            'max_clients_per_host': 0,
+        })
+        assert not form.is_valid()
+        assert set(form.errors) == {'download_rate', 'upload_rate', 'max_clients', 'max_clients_per_host'}
+
     def test_form_widgets(self, db):
         """Test that form widgets have correct classes"""
         form = FTPUserForm()
@@ -155,6 +175,17 @@ class TestFolderForm:
         assert not form.is_valid()
         assert 'path' in form.errors
 
+    def test_form_invalid_zero_rates(self, db):
+        """Test transfer rates must be at least 1"""
+        form = FolderForm(data={
+            'name': 'Test Folder',
+            'path': '/data/test',
+            'download_rate': 0,
+            'upload_rate': 0,
+        })
+        assert not form.is_valid()
+        assert set(form.errors) == {'download_rate', 'upload_rate'}
+
     def test_form_widgets(self, db):
         """Test that form widgets have correct classes"""
         form = FolderForm()
@@ -0,0 +1,172 @@
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from ftpmanager.acl import effective_permissions, group_permissions
+from ftpmanager.config_generator import generate_ftpgroup_file, generate_ftpusers_file, generate_proftpd_config
+from ftpmanager.models import FTPGroup, FTPUser, FolderAccess, GroupFolderAccess
+from ftpmanager.sql_backend import build_sql_rows
+
+
+@pytest.fixture
+def ftp_group(db, ftp_user):
+    group = FTPGroup.objects.create(name='staff', gid=10000)
+    group.members.add(ftp_user)
+    return group
+
+
+class TestEffectivePermissions:
+    """Tests for the union of user and group grants"""
+
+    def test_group_grant(self, ftp_group, ftp_user, folder):
+        """Test members get the group's folders"""
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='read')
+
+        assert effective_permissions() == {ftp_user.pk: {folder.pk: 'read'}}
+
+    def test_strongest_grant_wins(self, ftp_group, ftp_user, folder, folder_access_read):
+        """Test a group write grant upgrades a direct read grant"""
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='write')
+
+        assert effective_permissions()[ftp_user.pk][folder.pk] == 'write'
+
+    def test_direct_write_not_downgraded(self, ftp_group, ftp_user, folder):
+        """Test a group read grant does not downgrade a direct write grant"""
+        FolderAccess.objects.create(user=ftp_user, folder=folder, permission='write')
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='read')
+
+        assert effective_permissions()[ftp_user.pk][folder.pk] == 'write'
+
+    def test_inactive_members_excluded(self, ftp_group, inactive_ftp_user, folder):
+        """Test inactive members get no permissions"""
+        ftp_group.members.add(inactive_ftp_user)
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='read')
+
+        assert inactive_ftp_user.pk not in effective_permissions()
+
+    def test_group_permissions_names_groups(self, ftp_group, ftp_user, folder):
+        """Test the groups granting each folder are reported"""
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='read')
+
+        assert group_permissions(ftp_user.pk) == {folder.pk: ('read', ['staff'])}
+
+
+class TestGroupConfig:
+    """Tests for group output of the config generators"""
+
+    def test_allow_group_lines(self, ftp_group, folder, folder2):
+        """Test each group gets its own AllowGroup line"""
+        other = FTPGroup.objects.create(name='ops', gid=10001)
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='read')
+        GroupFolderAccess.objects.create(group=other, folder=folder, permission='write')
+
+        config = generate_proftpd_config()
+        block = config[config.index(f'<Directory {folder.path}>'):]
+
+        assert '<Limit READ DIRS>\n    AllowGroup staff\n    AllowGroup ops\n    DenyAll' in block
+        assert '<Limit WRITE STOR DELE MKD RMD>\n    AllowGroup ops\n    DenyAll' in block
+        assert 'AllowUser' not in block
+        assert f'<Directory {folder2.path}>' not in config
+
+    def test_auth_group_file(self, ftp_group):
+        """Test AuthGroupFile is only configured once groups exist"""
+        assert 'AuthGroupFile /etc/proftpd/ftpd.group' in generate_proftpd_config()
+        ftp_group.delete()
+        assert 'AuthGroupFile' not in generate_proftpd_config()
+
+    def test_ftpgroup_file(self, ftp_group, inactive_ftp_user):
+        """Test ftpd.group lists active members"""
+        FTPUser.objects.create(username='alice', systemuser='1001')
+        ftp_group.members.add(inactive_ftp_user, FTPUser.objects.get(username='alice'))
+
+        lines = generate_ftpgroup_file().split('\n')
+
+        assert lines[0].startswith('#')
+        assert lines[-1] == 'staff:x:10000:alice,ftpuser1'
+
+    def test_ifuser_mode_uses_union(self, ftp_group, folder, folder2, folder_access_read):
+        """Test <IfUser> sections include folders granted through groups"""
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder2, permission='write')
+
+        config = generate_proftpd_config(acl_mode='ifuser')
+        section = config[config.index('<IfUser ftpuser1>'):]
+
+        assert f'<Directory {folder.path}>' in section
+        assert f'<Directory {folder2.path}>' in section
+
+    def test_home_from_group_folder(self, ftp_group, folder):
+        """Test users with only group access get a group folder as home"""
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='read')
+
+        assert f':{folder.path}:' in generate_ftpusers_file()
+
+    def test_sql_groups_table(self, ftp_group):
+        """Test virtual groups are written to the mod_sql groups table"""
+        _users, groups = build_sql_rows()
+
+        assert groups['staff'] == (10000, 'ftpuser1')
+
+    def test_deploy_writes_group_file(self, ftp_group, tmp_path):
+        """Test deploy_config writes ftpd.group"""
+        call_command('deploy_config', '--config-dir', str(tmp_path))
+
+        assert (tmp_path / 'ftpd.group').read_text() == generate_ftpgroup_file()
+
+
+class TestGroupViews:
+    """Tests for group management views"""
+
+    def test_group_list(self, authenticated_client, ftp_group):
+        """Test the group list shows groups"""
+        response = authenticated_client.get(reverse('group_list'))
+
+        assert response.status_code == 200
+        assert list(response.context['groups']) == [ftp_group]
+
+    def test_group_create_suggests_gid(self, authenticated_client, ftp_group):
+        """Test the create form suggests the next free GID"""
+        response = authenticated_client.get(reverse('group_create'))
+
+        assert response.context['form'].initial['gid'] == 10001
+
+    def test_group_create(self, authenticated_client, ftp_user):
+        """Test creating a group with members"""
+        response = authenticated_client.post(reverse('group_create'), {
+            'name': 'dept', 'gid': 10005, 'members': [ftp_user.pk],
+        })
+
+        assert response.status_code == 302
+        assert list(FTPGroup.objects.get(name='dept').members.all()) == [ftp_user]
+
+    def test_group_name_validated(self, authenticated_client):
+        """Test names that would break ftpd.group are rejected"""
+        response = authenticated_client.post(reverse('group_create'), {'name': 'a:b', 'gid': 10005})
+
+        assert response.status_code == 200
+        assert 'name' in response.context['form'].errors
+
+    def test_group_access(self, authenticated_client, ftp_group, folder, folder2):
+        """Test setting folder permissions for a group"""
+        response = authenticated_client.post(reverse('group_access', args=[ftp_group.pk]), {
+            f'folder_{folder.pk}': 'write',
+            f'folder_{folder2.pk}': 'none',
+        })
+
+        assert response.status_code == 302
+        assert list(ftp_group.folder_access.values_list('folder_id', 'permission')) == [(folder.pk, 'write')]
+
+    def test_group_delete(self, authenticated_client, ftp_group):
+        """Test deleting a group"""
+        response = authenticated_client.post(reverse('group_delete', args=[ftp_group.pk]))
+
+        assert response.status_code == 302
+        assert not FTPGroup.objects.exists()
+
+    def test_user_access_shows_group_grants(self, authenticated_client, ftp_group, ftp_user, folder):
+        """Test the user access page shows permissions inherited from groups"""
+        GroupFolderAccess.objects.create(group=ftp_group, folder=folder, permission='read')
+
+        response = authenticated_client.get(reverse('user_access', args=[ftp_user.pk]))
+
+        assert response.context['group_access'] == {folder.pk: ('read', ['staff'])}
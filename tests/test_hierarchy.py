@@ -0,0 +1,261 @@
+import pytest
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+from django.utils import timezone
+
+from ftpmanager.acl import effective_permissions, resolve_folder_acls
+from ftpmanager.config_generator import generate_proftpd_config
+from ftpmanager.forms import FolderForm
+from ftpmanager.models import FTPGroup, FTPUser, Folder, FolderAccess, FolderUsage, GroupFolderAccess
+from ftpmanager.sql_backend import build_quota_rows
+
+
+@pytest.fixture
+def child(db, folder):
+    return Folder.objects.create(name='Child', path='/data/test/child')
+
+
+@pytest.fixture
+def bob(db):
+    return FTPUser.objects.create(username='bob', systemuser='1001')
+
+
+def directory_block(config, path):
+    start = config.index(f'<Directory {path}>')
+    return config[start:config.index('</Directory>', start)]
+
+
+class TestFolderTree:
+    """Tests for parent links and materialized paths"""
+
+    def test_tree_path(self, folder):
+        """Test the tree path is the normalized path with a trailing slash"""
+        folder.path = '/data//test/'
+        folder.save()
+
+        assert folder.tree_path == '/data/test/'
+
+    def test_parent_linked_on_create(self, folder, child):
+        """Test a folder inside another one gets it as parent"""
+        grandchild = Folder.objects.create(name='Grandchild', path='/data/test/child/deep/er')
+
+        assert child.parent == folder
+        assert grandchild.parent == child
+
+    def test_existing_children_relinked(self, folder):
+        """Test creating a folder between a parent and child relinks the child"""
+        deep = Folder.objects.create(name='Deep', path='/data/test/a/b')
+        middle = Folder.objects.create(name='Middle', path='/data/test/a')
+
+        deep.refresh_from_db()
+        assert deep.parent == middle
+        assert middle.parent == folder
+
+    def test_similar_prefix_not_a_child(self, folder):
+        """Test /data/testing is not below /data/test"""
+        other = Folder.objects.create(name='Other', path='/data/testing')
+
+        assert other.parent is None
+        assert list(folder.descendants()) == []
+
+    def test_move(self, folder, folder2, child):
+        """Test moving a folder relinks both the old and the new subtree"""
+        child.path = '/data/second/child'
+        child.save()
+
+        assert child.parent == folder2
+        assert list(folder.descendants()) == []
+
+    def test_delete_relinks_children(self, folder, child):
+        """Test children of a deleted folder move up to the next ancestor"""
+        grandchild = Folder.objects.create(name='Grandchild', path='/data/test/child/deep')
+        child.delete()
+
+        grandchild.refresh_from_db()
+        assert grandchild.parent == folder
+
+    def test_ancestors(self, folder, child):
+        """Test ancestors are returned root first"""
+        grandchild = Folder.objects.create(name='Grandchild', path='/data/test/child/deep')
+
+        assert list(grandchild.ancestors()) == [folder, child]
+
+    def test_duplicate_normalized_path_rejected(self, folder):
+        """Test a path differing only in slashes is a duplicate"""
+        with pytest.raises(ValidationError):
+            Folder(name='Dup', path='/data/test/').full_clean()
+
+    def test_form_rejects_duplicate(self, folder):
+        """Test the folder form reports duplicate paths"""
+        form = FolderForm({'name': 'Dup', 'path': '/data//test'})
+
+        assert 'path' in form.errors
+
+
+class TestInheritance:
+    """Tests for inherited permissions"""
+
+    def test_child_inherits_user_grant(self, ftp_user, folder, child, folder_access_read):
+        """Test a grant on a parent applies to its children"""
+        assert effective_permissions()[ftp_user.pk] == {folder.pk: 'read', child.pk: 'read'}
+
+    def test_nearest_grant_wins(self, ftp_user, folder, child):
+        """Test a child grant overrides the parent grant for that user"""
+        FolderAccess.objects.create(user=ftp_user, folder=folder, permission='write')
+        FolderAccess.objects.create(user=ftp_user, folder=child, permission='read')
+
+        assert effective_permissions()[ftp_user.pk] == {folder.pk: 'write', child.pk: 'read'}
+
+    def test_deny_revokes(self, ftp_user, folder, child, folder_access_read):
+        """Test deny removes inherited access"""
+        FolderAccess.objects.create(user=ftp_user, folder=child, permission='deny')
+
+        assert effective_permissions()[ftp_user.pk] == {folder.pk: 'read'}
+
+    def test_denied_member_expands_group(self, ftp_user, bob, folder, child):
+        """Test a group with a denied member is replaced by its other members"""
+        group = FTPGroup.objects.create(name='staff', gid=10000)
+        group.members.add(ftp_user, bob)
+        GroupFolderAccess.objects.create(group=group, folder=folder, permission='write')
+        FolderAccess.objects.create(user=bob, folder=child, permission='deny')
+
+        acls = {folder.pk: (users, groups) for folder, users, groups in resolve_folder_acls()}
+
+        assert acls[folder.pk] == ({}, {'staff': 'write'})
+        assert acls[child.pk] == ({'ftpuser1': 'write'}, {})
+
+    def test_group_deny(self, ftp_user, folder, child, folder_access_read):
+        """Test denying a group keeps direct user grants"""
+        group = FTPGroup.objects.create(name='staff', gid=10000)
+        group.members.add(ftp_user)
+        GroupFolderAccess.objects.create(group=group, folder=folder, permission='write')
+        GroupFolderAccess.objects.create(group=group, folder=child, permission='deny')
+
+        assert effective_permissions()[ftp_user.pk] == {folder.pk: 'write', child.pk: 'read'}
+
+
+class TestHierarchyConfig:
+    """Tests for config generation with nested folders"""
+
+    def test_unchanged_child_has_no_block(self, folder, child, folder_access_read):
+        """Test a child with the parent's rules relies on the parent block"""
+        config = generate_proftpd_config()
+
+        assert f'<Directory {folder.path}>' in config
+        assert f'<Directory {child.path}>' not in config
+
+    def test_denied_child_block(self, ftp_user, folder, child, folder_access_read):
+        """Test a child denied to every user of the parent is locked down"""
+        FolderAccess.objects.create(user=ftp_user, folder=child, permission='deny')
+
+        block = directory_block(generate_proftpd_config(), child.path)
+
+        assert '<Limit READ DIRS>\n    DenyAll' in block
+        assert '<Limit WRITE STOR DELE MKD RMD>\n    DenyAll' in block
+
+    def test_child_block_repeats_inherited_users(self, ftp_user, bob, folder, child, folder_access_read):
+        """Test a child block lists inherited users next to its own"""
+        FolderAccess.objects.create(user=bob, folder=child, permission='write')
+
+        block = directory_block(generate_proftpd_config(), child.path)
+
+        assert '<Limit READ DIRS>\n    AllowUser ftpuser1 bob\n' in block
+        assert '<Limit WRITE STOR DELE MKD RMD>\n    AllowUser bob\n' in block
+
+    def test_child_inherits_rates(self, ftp_user, bob, folder, child, folder_access_read):
+        """Test a child block carries the parent's transfer rates"""
+        folder.download_rate = 100
+        folder.save()
+        FolderAccess.objects.create(user=bob, folder=child, permission='read')
+
+        assert 'TransferRate RETR 100' in directory_block(generate_proftpd_config(), child.path)
+
+    def test_ifuser_mode(self, ftp_user, folder, child, folder_access_read):
+        """Test denied children get a global deny without an <IfUser> grant"""
+        FolderAccess.objects.create(user=ftp_user, folder=child, permission='deny')
+
+        config = generate_proftpd_config(acl_mode='ifuser')
+        section = config[config.index('<IfUser ftpuser1>'):]
+
+        assert f'<Directory {child.path}>\n  <Limit ALL>\n    DenyAll' in config
+        assert f'<Directory {child.path}>' not in section
+
+    def test_nested_tally_counted_once(self, ftp_user, folder, child):
+        """Test quota tallies do not count subfolders twice"""
+        ftp_user.quota_bytes = 1000
+        ftp_user.save()
+        FolderAccess.objects.create(user=ftp_user, folder=folder, permission='write')
+        FolderUsage.objects.create(folder=folder, bytes=300, files=3, scanned_at=timezone.now())
+        FolderUsage.objects.create(folder=child, bytes=100, files=1, scanned_at=timezone.now())
+
+        _limits, tallies = build_quota_rows()
+
+        assert tallies[('ftpuser1', 'user')][0] == 300.0
+
+
+class TestHierarchyViews:
+    """Tests for hierarchy in the views"""
+
+    def test_user_access_deny(self, authenticated_client, ftp_user, child):
+        """Test deny can be set on a subfolder"""
+        response = authenticated_client.post(reverse('user_access', args=[ftp_user.pk]), {
+            f'folder_{child.pk}': 'deny',
+        })
+
+        assert response.status_code == 302
+        assert FolderAccess.objects.get(user=ftp_user).permission == 'deny'
+
+    def test_folder_list_tree_sort(self, authenticated_client, folder, folder2, child):
+        """Test the tree sort lists children after their parent"""
+        response = authenticated_client.get(reverse('folder_list'), {'sort': 'tree'})
+
+        folders = response.context['folders']
+        assert [f.name for f in folders] == ['Second Folder', 'Test Folder', 'Child']
+        assert [f.depth for f in folders] == [0, 0, 1]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestHierarchyMigration:
+    """Tests for upgrading folders that had their own rules"""
+
+    def migrate(self, target=None):
+        """Migrate to target (default: the latest migration) and return its historical apps"""
+        executor = MigrationExecutor(connection)
+        target = target or executor.loader.graph.leaf_nodes('ftpmanager')[0][1]
+        executor.migrate([('ftpmanager', target)])
+        executor.loader.build_graph()
+        return executor.loader.project_state([('ftpmanager', target)]).apps
+
+    def test_subfolder_rules_still_replace_the_parent(self):
+        """Test grantees of the parent get no access to a subfolder that had rules of its own"""
+        apps = self.migrate('0011_ftpgroup')
+        Folder = apps.get_model('ftpmanager', 'Folder')
+        FTPUser = apps.get_model('ftpmanager', 'FTPUser')
+        FTPGroup = apps.get_model('ftpmanager', 'FTPGroup')
+        FolderAccess = apps.get_model('ftpmanager', 'FolderAccess')
+        GroupFolderAccess = apps.get_model('ftpmanager', 'GroupFolderAccess')
+        srv = Folder.objects.create(name='Srv', path='/srv')
+        ruled = Folder.objects.create(name='Ruled', path='/srv/ruled')
+        Folder.objects.create(name='Open', path='/srv/open')
+        alice, bob, carol = (FTPUser.objects.create(username=name) for name in ('alice', 'bob', 'carol'))
+        staff = FTPGroup.objects.create(name='staff', gid=2000)
+        others = FTPGroup.objects.create(name='others', gid=2001)
+        staff.members.add(bob)
+        FolderAccess.objects.create(user=alice, folder=srv, permission='write')
+        FolderAccess.objects.create(user=bob, folder=srv, permission='write')
+        FolderAccess.objects.create(user=carol, folder=ruled, permission='read')
+        GroupFolderAccess.objects.create(group=others, folder=srv, permission='read')
+        GroupFolderAccess.objects.create(group=staff, folder=ruled, permission='read')
+
+        self.migrate('0012_folder_hierarchy')
+        self.migrate()
+
+        acls = {folder.path: (users, groups) for folder, users, groups in resolve_folder_acls()}
+        assert acls['/srv/ruled'] == ({'carol': 'read', 'bob': 'read'}, {'staff': 'read'})
+        assert acls['/srv/open'] == ({'alice': 'write', 'bob': 'write'}, {'others': 'read'})
+        assert set(FolderAccess.objects.filter(folder__path='/srv/ruled').values_list('user__username', 'permission')) == {
+            ('carol', 'read'), ('alice', 'deny'), ('bob', 'read'),
+        }
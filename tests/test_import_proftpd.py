@@ -0,0 +1,219 @@
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ftpmanager.config_generator import generate_ftpgroup_file, generate_ftpusers_file, generate_proftpd_config
+from ftpmanager.models import AclRevision, FTPGroup, FTPUser, Folder, FolderAccess, GroupFolderAccess
+from ftpmanager.proftpd_import import apply_import, parse_config, plan_import
+
+
+PASSWD = '''# users
+alice:$6$salt$hash1:1001:1001:alice:/srv/ftp/share:/bin/false
+bob:$6$salt$hash2:1002:1002:bob:/srv/ftp:/bin/false
+carol:!$6$salt$hash3:1003:1003:carol:/tmp:/bin/false
+broken:line
+john doe:$6$salt$hash4:1004:1004:john:/tmp:/bin/false
+'''
+
+GROUP = '''staff:x:2000:alice,bob
+'''
+
+CONFIG = '''AuthUserFile /etc/proftpd/ftpd.passwd
+
+<Directory /srv/ftp>
+  <Limit READ DIRS>
+    AllowUser alice bob
+    AllowGroup staff
+    DenyAll
+  </Limit>
+  <Limit WRITE STOR DELE MKD RMD>
+    AllowUser alice
+    DenyAll
+  </Limit>
+</Directory>
+
+<Directory /srv/ftp/private/>
+  <Limit READ DIRS>
+    AllowUser alice
+    DenyAll
+  </Limit>
+</Directory>
+
+<Directory ~/incoming>
+  <Limit ALL>
+    AllowAll
+  </Limit>
+</Directory>
+'''
+
+
+def write_files(tmp_path, passwd=PASSWD, group=GROUP, config=CONFIG):
+    paths = {'passwd': tmp_path / 'ftpd.passwd', 'group': tmp_path / 'ftpd.group', 'config': tmp_path / 'users.conf'}
+    paths['passwd'].write_text(passwd)
+    paths['group'].write_text(group)
+    paths['config'].write_text(config)
+    return [
+        '--passwd-file', str(paths['passwd']), '--group-file', str(paths['group']), '--config-file', str(paths['config']),
+    ]
+
+
+def grants():
+    return sorted(
+        [(a.user.username, a.folder.path, a.permission) for a in FolderAccess.objects.select_related('user', 'folder')]
+        + [(f'@{a.group.name}', a.folder.path, a.permission) for a in GroupFolderAccess.objects.select_related('group', 'folder')]
+    )
+
+
+class TestParseConfig:
+    """Tests for reading <Directory> rules"""
+
+    def test_limits(self):
+        """Test read and write limits map to permissions and child blocks deny missing users"""
+        rules = parse_config(CONFIG.splitlines())
+
+        folders = rules.with_denials()
+
+        assert folders['/srv/ftp'] == ({'alice': 'write', 'bob': 'read'}, {'staff': 'read'})
+        assert folders['/srv/ftp/private'] == ({'alice': 'read', 'bob': 'deny'}, {'staff': 'deny'})
+        assert any('~/incoming' in warning for warning in rules.warnings)
+
+    def test_ifuser_sections(self):
+        """Test AllowAll inside <IfUser> grants the section's users"""
+        config = '''<Directory /srv/a>
+  <Limit ALL>
+    DenyAll
+  </Limit>
+</Directory>
+<IfUser regex ^(alice|bob\\.smith)$>
+  <Directory /srv/a>
+    <Limit READ DIRS>
+      AllowAll
+    </Limit>
+    <Limit WRITE STOR DELE MKD RMD>
+      AllowAll
+    </Limit>
+  </Directory>
+</IfUser>
+'''
+        rules = parse_config(config.splitlines())
+
+        assert rules.folders['/srv/a'] == ({'alice': 'write', 'bob.smith': 'write'}, {})
+        assert rules.warnings == []
+
+    def test_unsupported_rules(self):
+        """Test AllowAll outside <IfUser> and AND-ed groups are reported, not imported"""
+        config = '''<Directory /srv/a>
+  <Limit READ>
+    AllowAll
+    AllowGroup a,b
+  </Limit>
+</Directory>
+'''
+        rules = parse_config(config.splitlines())
+
+        assert rules.folders['/srv/a'] == ({}, {})
+        assert len(rules.warnings) == 2
+
+
+@pytest.mark.django_db
+class TestImportCommand:
+    """Tests for the import_proftpd command"""
+
+    def test_import(self, tmp_path):
+        """Test users keep their hashes and folders, groups and grants are created"""
+        call_command('import_proftpd', *write_files(tmp_path), stdout=StringIO(), stderr=StringIO())
+
+        alice = FTPUser.objects.get(username='alice')
+        assert (alice.password_hash, alice.systemuser, alice.is_active) == ('$6$salt$hash1', '1001', True)
+        assert not FTPUser.objects.get(username='carol').is_active
+        assert not FTPUser.objects.filter(username='broken').exists()
+        assert sorted(FTPGroup.objects.get(name='staff').members.values_list('username', flat=True)) == ['alice', 'bob']
+        assert Folder.objects.get(path='/srv/ftp/private').parent == Folder.objects.get(path='/srv/ftp')
+        assert grants() == [
+            ('@staff', '/srv/ftp', 'read'),
+            ('@staff', '/srv/ftp/private', 'deny'),
+            ('alice', '/srv/ftp', 'write'),
+            ('alice', '/srv/ftp/private', 'read'),
+            ('bob', '/srv/ftp', 'read'),
+            ('bob', '/srv/ftp/private', 'deny'),
+        ]
+        assert AclRevision.current_token() is not None
+
+    def test_rerun_is_idempotent(self, tmp_path):
+        """Test importing the same files twice changes nothing"""
+        arguments = write_files(tmp_path)
+        call_command('import_proftpd', *arguments, stdout=StringIO(), stderr=StringIO())
+        token = AclRevision.current_token()
+        out = StringIO()
+
+        call_command('import_proftpd', *arguments, stdout=out, stderr=StringIO())
+
+        assert 'Nothing to import.' in out.getvalue()
+        assert AclRevision.current_token() == token
+        assert FolderAccess.objects.count() == 4
+
+    def test_dry_run(self, tmp_path):
+        """Test --dry-run prints the changes and writes nothing"""
+        out = StringIO()
+        err = StringIO()
+
+        call_command('import_proftpd', *write_files(tmp_path), '--dry-run', stdout=out, stderr=err)
+
+        assert '+ user alice (uid 1001)' in out.getvalue()
+        assert '+ access bob /srv/ftp/private deny' in out.getvalue()
+        assert 'passwd line 5' in err.getvalue()
+        assert "passwd line 6: invalid username 'john doe', skipped" in err.getvalue()
+        assert not FTPUser.objects.exists()
+
+    def test_update(self, tmp_path):
+        """Test differing hashes are kept unless --update is given"""
+        FTPUser.objects.create(username='alice', password_hash='old', systemuser='1001')
+        arguments = write_files(tmp_path)
+        out = StringIO()
+
+        call_command('import_proftpd', *arguments, stdout=out, stderr=StringIO())
+        kept = FTPUser.objects.get(username='alice').password_hash
+        call_command('import_proftpd', *arguments, '--update', stdout=StringIO(), stderr=StringIO())
+
+        assert kept == 'old'
+        assert 'use --update' in out.getvalue()
+        assert FTPUser.objects.get(username='alice').password_hash == '$6$salt$hash1'
+
+    def test_needs_a_file(self):
+        """Test the command needs at least one file"""
+        with pytest.raises(CommandError, match='at least one'):
+            call_command('import_proftpd')
+
+    def test_missing_file(self, tmp_path):
+        """Test unreadable files are reported"""
+        with pytest.raises(CommandError, match='Cannot read'):
+            call_command('import_proftpd', '--passwd-file', str(tmp_path / 'nope'))
+
+
+@pytest.mark.django_db
+class TestRoundTrip:
+    """Tests importing files generated by the panel"""
+
+    @pytest.mark.parametrize('acl_mode', ['directory', 'ifuser'])
+    def test_generated_files(self, acl_mode, folder, folder2, ftp_user, inactive_ftp_user):
+        """Test importing generated files into an empty database reproduces them"""
+        FolderAccess.objects.create(user=ftp_user, folder=folder, permission='read')
+        FolderAccess.objects.create(user=ftp_user, folder=folder2, permission='write')
+        group = FTPGroup.objects.create(name='staff', gid=2000)
+        group.members.add(ftp_user)
+        GroupFolderAccess.objects.create(group=group, folder=folder, permission='read')
+        files = (generate_ftpusers_file(), generate_ftpgroup_file(), generate_proftpd_config(acl_mode=acl_mode))
+        before = [line for line in files[2].splitlines() if not line.startswith('#')]
+        FTPUser.objects.all().delete()
+        FTPGroup.objects.all().delete()
+        Folder.objects.all().delete()
+
+        plan = plan_import(*(text.splitlines() for text in files))
+        apply_import(plan)
+
+        assert plan.warnings == []
+        after = [line for line in generate_proftpd_config(acl_mode=acl_mode).splitlines() if not line.startswith('#')]
+        assert after == before
@@ -0,0 +1,227 @@
+import os
+
+import pytest
+
+from django.core.management import call_command
+
+from ftpmanager.models import AuthStat, Folder, FolderAccess, LogCursor, TrafficRollup
+from ftpmanager.log_ingest import ingest_authlog, ingest_xferlog
+from ftpmanager.paths import FolderPathIndex, normalize_path
+
+
+def xfer_line(filename, size=100, direction='o', username='ftpuser1', hour=12, status='c'):
+    return f'Mon Oct 19 {hour:02d}:15:00 2026 1 10.0.0.1 {size} {filename} b _ {direction} r {username} ftp 0 * {status}\n'
+
+
+class TestFolderPathIndex:
+    """Tests for FolderPathIndex longest-prefix lookups"""
+
+    def test_longest_prefix(self):
+        """Test that the most specific folder wins"""
+        index = FolderPathIndex([(1, '/data'), (2, '/data/projects/'), (3, '/other')])
+
+        assert index.lookup('/data/projects/alpha/file.txt') == 2
+        assert index.lookup('/data/docs') == 1
+        assert index.lookup('/data/projects') == 2
+        assert index.lookup('/elsewhere') is None
+
+    def test_component_boundaries(self):
+        """Test that prefixes only match whole path components"""
+        index = FolderPathIndex([(1, '/data/test')])
+
+        assert index.lookup('/data/testing/file') is None
+        assert index.lookup_file('/data/test/file') == 1
+
+    def test_normalize_path(self):
+        """Test path normalization"""
+        assert normalize_path('data//a/../b/') == '/data/b'
+        assert normalize_path('/') == '/'
+
+
+class TestIngestXferlog:
+    """Tests for ingest_xferlog function"""
+
+    @pytest.fixture
+    def log_path(self, tmp_path):
+        return str(tmp_path / 'xferlog')
+
+    def test_rollups_per_folder_and_direction(self, db, ftp_user, folder, folder2, log_path):
+        """Test lines are grouped by hour, user, folder and direction"""
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/a.txt', size=100))
+            f.write(xfer_line('/data/test/sub/b.txt', size=50))
+            f.write(xfer_line('/data/second/c.txt', size=7, direction='i'))
+            f.write(xfer_line('/data/test/d.txt', size=5, status='i'))
+
+        lines, skipped = ingest_xferlog(log_path)
+
+        assert (lines, skipped) == (4, 0)
+        download = TrafficRollup.objects.get(folder=folder, direction='o')
+        assert (download.bytes, download.files) == (155, 2)
+        upload = TrafficRollup.objects.get(folder=folder2, direction='i')
+        assert (upload.bytes, upload.files) == (7, 1)
+
+    def test_incremental_offset(self, db, ftp_user, folder, log_path):
+        """Test that a second run only reads new lines and adds to rollups"""
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/a.txt'))
+        ingest_xferlog(log_path)
+
+        with open(log_path, 'a') as f:
+            f.write(xfer_line('/data/test/b.txt'))
+        lines, _skipped = ingest_xferlog(log_path)
+
+        assert lines == 1
+        assert TrafficRollup.objects.get(folder=folder).bytes == 200
+        assert LogCursor.objects.get(path=log_path).offset == os.path.getsize(log_path)
+
+    def test_partial_line_deferred(self, db, ftp_user, folder, log_path):
+        """Test that an incomplete last line is left for the next run"""
+        line = xfer_line('/data/test/a.txt')
+        with open(log_path, 'w') as f:
+            f.write(line + line[:20])
+
+        assert ingest_xferlog(log_path)[0] == 1
+
+        with open(log_path, 'a') as f:
+            f.write(line[20:])
+        assert ingest_xferlog(log_path)[0] == 1
+        assert TrafficRollup.objects.get(folder=folder).files == 2
+
+    def test_rotation_drains_old_file(self, db, ftp_user, folder, log_path):
+        """Test that lines appended before rotation are not lost"""
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/a.txt'))
+        ingest_xferlog(log_path)
+        with open(log_path, 'a') as f:
+            f.write(xfer_line('/data/test/b.txt'))
+        os.rename(log_path, log_path + '.1')
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/c.txt'))
+
+        lines, _skipped = ingest_xferlog(log_path)
+
+        assert lines == 2
+        assert TrafficRollup.objects.get(folder=folder).files == 3
+
+    def test_truncation_restarts(self, db, ftp_user, folder, log_path):
+        """Test that a truncated file is read from the beginning"""
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/a.txt') * 3)
+        ingest_xferlog(log_path)
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/b.txt'))
+
+        assert ingest_xferlog(log_path)[0] == 1
+
+    def test_unknown_user_and_unmanaged_path(self, db, ftp_user, folder, log_path):
+        """Test unknown users are skipped and paths outside folders have no folder"""
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/a.txt', username='stranger'))
+            f.write(xfer_line('/srv/other/a.txt'))
+            f.write('not an xferlog line\n')
+
+        lines, skipped = ingest_xferlog(log_path)
+
+        assert (lines, skipped) == (3, 2)
+        assert TrafficRollup.objects.get().folder is None
+
+    def test_deletions_are_not_traffic(self, db, ftp_user, folder, log_path):
+        """Test delete records (direction d) are skipped and do not count as downloads"""
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/data/test/a.txt', size=5000000, direction='d'))
+            f.write(xfer_line('/data/test/b.txt', size=10, direction='i'))
+
+        lines, skipped = ingest_xferlog(log_path)
+
+        assert (lines, skipped) == (2, 1)
+        assert TrafficRollup.objects.totals() == {'in': 10, 'out': 0, 'files': 1}
+        assert TrafficRollup.objects.totals_by('user') == {ftp_user.pk: {'in': 10, 'out': 0, 'files': 1}}
+
+    def test_chroot_relative_path(self, db, ftp_user, folder, folder_access_read, log_path):
+        """Test paths relative to the DefaultRoot chroot map to the home folder"""
+        with open(log_path, 'w') as f:
+            f.write(xfer_line('/report.pdf'))
+
+        ingest_xferlog(log_path)
+
+        assert TrafficRollup.objects.get().folder == folder
+
+    def test_small_batches(self, db, ftp_user, folder, log_path):
+        """Test that batching does not change the totals"""
+        with open(log_path, 'w') as f:
+            for hour in range(10):
+                f.write(xfer_line('/data/test/a.txt', hour=hour))
+                f.write(xfer_line('/data/test/a.txt', hour=hour))
+
+        ingest_xferlog(log_path, batch_size=3)
+
+        assert TrafficRollup.objects.count() == 10
+        assert sum(TrafficRollup.objects.values_list('files', flat=True)) == 20
+
+
+class TestIngestXferlogCommand:
+    """Tests for the ingest_xferlog management command"""
+
+    def test_command(self, db, ftp_user, folder, tmp_path):
+        """Test the command ingests the given log"""
+        log_path = tmp_path / 'xferlog'
+        log_path.write_text(xfer_line('/data/test/a.txt'))
+
+        call_command('ingest_xferlog', '--log', str(log_path))
+
+        assert TrafficRollup.objects.filter(folder=folder).exists()
+
+    def test_missing_log(self, db, tmp_path):
+        """Test a missing log file raises CommandError"""
+        from django.core.management.base import CommandError
+        with pytest.raises(CommandError):
+            call_command('ingest_xferlog', '--log', str(tmp_path / 'missing'))
+
+
+def auth_line(username='ftpuser1', ip='10.0.0.5', ok=True, hour=12):
+    message = f'USER {username}: Login successful.' if ok else f'USER {username} (Login failed): Incorrect password'
+    return f'2026-10-19 {hour:02d}:10:00,000 ftp proftpd[100] ftp.example.com ({ip}[{ip}]): {message}\n'
+
+
+class TestIngestAuthlog:
+    """Tests for ingest_authlog function"""
+
+    def test_counters_per_user_and_ip(self, db, ftp_user, tmp_path):
+        """Test login events are counted per hour, username and IP"""
+        log_path = tmp_path / 'proftpd.log'
+        log_path.write_text(
+            auth_line() + auth_line(ok=False) * 2 + auth_line('root', ip='10.9.9.9', ok=False)
+            + '2026-10-19 12:00:00,000 ftp proftpd[1] ftp (a[1.2.3.4]): FTP session opened.\n'
+        )
+
+        lines, skipped = ingest_authlog(str(log_path))
+
+        assert (lines, skipped) == (5, 1)
+        stat = AuthStat.objects.get(username='ftpuser1')
+        assert (stat.successes, stat.failures, stat.user) == (1, 2, ftp_user)
+        assert AuthStat.objects.get(username='root').user is None
+
+    def test_incremental(self, db, ftp_user, tmp_path):
+        """Test that counters accumulate across runs"""
+        log_path = tmp_path / 'proftpd.log'
+        log_path.write_text(auth_line(ok=False))
+        ingest_authlog(str(log_path))
+        with open(log_path, 'a') as f:
+            f.write(auth_line(ok=False))
+
+        assert ingest_authlog(str(log_path))[0] == 1
+        assert AuthStat.objects.get().failures == 2
+
+    def test_top_failures(self, db, ftp_user, tmp_path):
+        """Test the top-N aggregate orders by failures"""
+        log_path = tmp_path / 'proftpd.log'
+        log_path.write_text(
+            auth_line(ip='10.0.0.1', ok=False) + auth_line(ip='10.0.0.2', ok=False) * 3
+            + auth_line(ip='10.0.0.3', ok=True)
+        )
+        ingest_authlog(str(log_path))
+
+        top = AuthStat.objects.top_failures('client_ip')
+
+        assert [row['client_ip'] for row in top] == ['10.0.0.2', '10.0.0.1']
@@ -0,0 +1,116 @@
+import gzip
+from datetime import datetime
+
+import pytest
+
+from ftpmanager.logparse import (
+    parse_xferlog_line,
+    parse_auth_line,
+    count_user_activity,
+)
+
+
+XFER_LINE = 'Mon Oct 19 12:30:05 2026 2 192.168.1.10 4096 /data/test/report.pdf b _ o r alice ftp 0 * c\n'
+XFER_LINE_SPACES = 'Mon Oct  5 08:01:00 2026 1 10.0.0.1 12 /data/test/my file.txt a _ i r bob ftp 0 * i\n'
+AUTH_OK = ('2026-10-19 12:30:00,123 ftp proftpd[4242] ftp.example.com (client.example.com[192.168.1.10]): '
+           'USER alice: Login successful.\n')
+AUTH_FAILED = ('2026-10-19 12:31:00,001 ftp proftpd[4243] ftp.example.com (::ffff:10.0.0.5[10.0.0.5]): '
+               'USER alice (Login failed): Incorrect password\n')
+AUTH_NO_USER = ('2026-10-19 12:32:00,001 ftp proftpd[4244] ftp.example.com (10.0.0.6[10.0.0.6]): '
+                'USER root: no such user found from 10.0.0.6 [10.0.0.6] to 10.0.0.1:21\n')
+
+
+class TestParseXferlogLine:
+    """Tests for parse_xferlog_line function"""
+
+    def test_parse_download(self):
+        """Test parsing a completed outgoing transfer"""
+        record = parse_xferlog_line(XFER_LINE)
+
+        assert record.timestamp == datetime(2026, 10, 19, 12, 30, 5)
+        assert record.remote_host == '192.168.1.10'
+        assert record.size == 4096
+        assert record.filename == '/data/test/report.pdf'
+        assert record.direction == 'o'
+        assert record.username == 'alice'
+        assert record.completed is True
+
+    def test_filename_with_spaces(self):
+        """Test filenames containing spaces are kept intact"""
+        record = parse_xferlog_line(XFER_LINE_SPACES)
+
+        assert record.filename == '/data/test/my file.txt'
+        assert record.direction == 'i'
+        assert record.username == 'bob'
+        assert record.completed is False
+
+    def test_malformed_line(self):
+        """Test that malformed lines return None"""
+        assert parse_xferlog_line('garbage\n') is None
+        assert parse_xferlog_line(XFER_LINE.replace('Oct', 'Foo')) is None
+        assert parse_xferlog_line(XFER_LINE.replace(' o r ', ' x r ')) is None
+
+
+class TestParseAuthLine:
+    """Tests for parse_auth_line function"""
+
+    def test_successful_login(self):
+        """Test parsing a successful login"""
+        event = parse_auth_line(AUTH_OK)
+
+        assert event.username == 'alice'
+        assert event.client_ip == '192.168.1.10'
+        assert event.success is True
+        assert event.timestamp == datetime(2026, 10, 19, 12, 30, 0)
+
+    def test_failed_login(self):
+        """Test parsing a failed login"""
+        event = parse_auth_line(AUTH_FAILED)
+
+        assert event.username == 'alice'
+        assert event.client_ip == '10.0.0.5'
+        assert event.success is False
+
+    def test_unknown_user(self):
+        """Test that logins for unknown users count as failures"""
+        event = parse_auth_line(AUTH_NO_USER)
+
+        assert event.username == 'root'
+        assert event.success is False
+
+    def test_other_lines_ignored(self):
+        """Test that non-login lines return None"""
+        assert parse_auth_line(XFER_LINE) is None
+        assert parse_auth_line('2026-10-19 12:00:00,000 ftp proftpd[1] ftp (a[1.2.3.4]): FTP session opened.\n') is None
+
+
+class TestCountUserActivity:
+    """Tests for count_user_activity function"""
+
+    def test_counts_transfers_and_logins(self, tmp_path):
+        """Test activity counts combine xferlog and SystemLog files"""
+        xferlog = tmp_path / 'xferlog'
+        xferlog.write_text(XFER_LINE * 3 + XFER_LINE_SPACES)
+        systemlog = tmp_path / 'proftpd.log'
+        systemlog.write_text(AUTH_OK + AUTH_FAILED + AUTH_NO_USER)
+
+        activity = count_user_activity([str(xferlog), str(systemlog)])
+
+        assert activity == {'alice': 4, 'bob': 1}
+
+    def test_since_filter(self, tmp_path):
+        """Test that old entries are ignored"""
+        xferlog = tmp_path / 'xferlog'
+        xferlog.write_text(XFER_LINE + XFER_LINE_SPACES)
+
+        activity = count_user_activity([str(xferlog)], since=datetime(2026, 10, 10))
+
+        assert activity == {'alice': 1}
+
+    def test_gzip_log(self, tmp_path):
+        """Test reading rotated gzip logs"""
+        path = tmp_path / 'xferlog.1.gz'
+        with gzip.open(path, 'wt') as f:
+            f.write(XFER_LINE)
+
+        assert count_user_activity([str(path)]) == {'alice': 1}
@@ -0,0 +1,135 @@
+import sqlite3
+
+import pytest
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from ftpmanager.config_generator import generate_proftpd_config, generate_quota_config
+from ftpmanager.models import FolderUsage
+from ftpmanager.sql_backend import build_quota_rows, sync_sqlite_database
+
+
+def fetch_table(db_path, table):
+    connection = sqlite3.connect(db_path)
+    try:
+        return {row[:2]: row[2:] for row in connection.execute(f'SELECT * FROM {table}')}
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def quota_user(ftp_user):
+    ftp_user.quota_bytes = 1000
+    ftp_user.quota_files = 10
+    ftp_user.save()
+    return ftp_user
+
+
+def set_usage(folder, used_bytes, files=1):
+    FolderUsage.objects.update_or_create(
+        folder=folder, defaults={'bytes': used_bytes, 'files': files, 'scanned_at': timezone.now()}
+    )
+
+
+class TestQuotaConfig:
+    """Tests for quota directives in the generated config"""
+
+    def test_no_quota_directives_without_quotas(self, db, ftp_user):
+        """Test that mod_quotatab is not configured when no user has a quota"""
+        assert 'QuotaEngine' not in generate_proftpd_config()
+
+    def test_quota_directives(self, db, quota_user):
+        """Test QuotaEngine and the SQL limit/tally tables are emitted"""
+        config = generate_proftpd_config()
+
+        assert 'QuotaEngine on' in config
+        assert 'QuotaLimitTable sql:/get-quota-limit' in config
+        assert 'QuotaTallyTable sql:/get-quota-tally/update-quota-tally/insert-quota-tally' in config
+        # ftpd.passwd stays the auth source
+        assert 'SQLAuthenticate off' in config
+        assert 'AuthOrder mod_auth_file.c' in config
+
+    def test_sql_backend_reuses_connection(self):
+        """Test the SQL auth backend does not get a second connection"""
+        config = generate_quota_config('/etc/proftpd/ftpd.sqlite3', auth_backend='sql')
+
+        assert 'SQLConnectInfo' not in config
+        assert "WHERE name = '%{0}' AND quota_type = '%{1}'" in config
+
+    def test_folder_over_hard_quota_read_only(self, db, ftp_user, folder, folder_access_read):
+        """Test a folder at its hard limit denies uploads but allows deletes"""
+        folder_access_read.permission = 'write'
+        folder_access_read.save()
+        folder.quota_bytes = 100
+        folder.save()
+        set_usage(folder, 150)
+
+        config = generate_proftpd_config()
+
+        assert '<Limit STOR STOU APPE MKD XMKD RNTO>\n    DenyAll' in config
+        assert '<Limit DELE RMD XRMD>\n    AllowUser ftpuser1' in config
+        assert '<Limit WRITE STOR DELE MKD RMD>' not in config
+
+    def test_folder_soft_quota_not_enforced(self, db, ftp_user, folder, folder_access_read):
+        """Test a soft folder quota only reports"""
+        folder_access_read.permission = 'write'
+        folder_access_read.save()
+        folder.quota_bytes = 100
+        folder.quota_type = 'soft'
+        folder.save()
+        set_usage(folder, 150)
+
+        assert folder.current_quota_status == 'soft'
+        assert '<Limit WRITE STOR DELE MKD RMD>\n    AllowUser ftpuser1' in generate_proftpd_config()
+
+
+class TestQuotaTables:
+    """Tests for the quotalimits/quotatallies tables"""
+
+    def test_limit_rows(self, db, quota_user, inactive_ftp_user):
+        """Test only active users with a quota get a limit row"""
+        limits, _tallies = build_quota_rows()
+
+        assert limits == {('ftpuser1', 'user'): ('false', 'hard', 1000.0, 0.0, 0.0, 10, 0, 0)}
+
+    def test_tallies_seeded_from_private_folders(self, db, quota_user, folder, folder_access_read):
+        """Test tallies are seeded from folders the user alone can write to"""
+        folder_access_read.permission = 'write'
+        folder_access_read.save()
+        set_usage(folder, 400, files=4)
+
+        _limits, tallies = build_quota_rows()
+
+        assert tallies[('ftpuser1', 'user')] == (400.0, 0.0, 0.0, 4, 0, 0)
+
+    def test_existing_tally_kept(self, db, quota_user, tmp_path):
+        """Test a tally maintained by ProFTPD is not overwritten"""
+        db_path = str(tmp_path / 'ftpd.sqlite3')
+        sync_sqlite_database(db_path, auth=False)
+        connection = sqlite3.connect(db_path)
+        connection.execute("UPDATE quotatallies SET bytes_in_used = 123")
+        connection.commit()
+        connection.close()
+
+        result = sync_sqlite_database(db_path, auth=False)
+
+        assert result['quotatallies'] == {'added': 0, 'updated': 0, 'removed': 0}
+        assert fetch_table(db_path, 'quotatallies')[('ftpuser1', 'user')][0] == 123
+
+    def test_quota_only_sync(self, db, quota_user, tmp_path):
+        """Test auth=False leaves the users table empty"""
+        db_path = str(tmp_path / 'ftpd.sqlite3')
+
+        result = sync_sqlite_database(db_path, auth=False)
+
+        assert 'users' not in result
+        assert fetch_table(db_path, 'users') == {}
+        assert list(fetch_table(db_path, 'quotalimits')) == [('ftpuser1', 'user')]
+
+    def test_deploy_file_backend_syncs_quotas(self, db, quota_user, tmp_path):
+        """Test deploy_config syncs quota tables next to ftpd.passwd"""
+        call_command('deploy_config', '--config-dir', str(tmp_path))
+
+        assert (tmp_path / 'ftpd.passwd').exists()
+        assert list(fetch_table(str(tmp_path / 'ftpd.sqlite3'), 'quotalimits')) == [('ftpuser1', 'user')]
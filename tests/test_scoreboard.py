@@ -0,0 +1,166 @@
+import json
+import os
+import struct
+
+import pytest
+
+from django.urls import reverse
+
+from ftpmanager.scoreboard import (
+    ENTRY_FIELDS,
+    ENTRY_FORMAT,
+    ENTRY_SIZE,
+    HEADER_FORMAT,
+    HEADER_SIZE,
+    SCOREBOARD_MAGIC,
+    SCOREBOARD_VERSION,
+    ScoreboardError,
+    ScoreboardReader,
+    parse_scoreboard,
+)
+
+
+def make_entry(**values):
+    """Pack a scoreboard entry, unspecified fields are zero/empty"""
+    packed = []
+    for name, code in ENTRY_FIELDS:
+        value = values.get(name, b'' if code.endswith('s') else 0)
+        if isinstance(value, str):
+            value = value.encode()
+        packed.append(value)
+    return struct.pack(ENTRY_FORMAT, *packed).ljust(ENTRY_SIZE, b'\0')
+
+
+def make_scoreboard(*entries, magic=SCOREBOARD_MAGIC, version=SCOREBOARD_VERSION):
+    header = struct.pack(HEADER_FORMAT, magic, version, 1, 1760000000).ljust(HEADER_SIZE, b'\0')
+    return header + b''.join(entries)
+
+
+@pytest.fixture
+def scoreboard_file(tmp_path):
+    path = tmp_path / 'proftpd.scoreboard'
+    path.write_bytes(make_scoreboard(
+        make_entry(pid=101, user='alice', client_addr='10.0.0.1', command='RETR',
+                   argument='/data/test/big.iso', cwd='/data/test', xfer_done=1048576),
+        make_entry(),  # empty slot
+        make_entry(pid=102, user='bob', client_addr='10.0.0.2', command='LIST', argument='-la'),
+    ))
+    return path
+
+
+class TestParseScoreboard:
+    """Tests for parse_scoreboard function"""
+
+    def test_sessions(self, scoreboard_file):
+        """Test active sessions are decoded and empty slots skipped"""
+        sessions = parse_scoreboard(scoreboard_file.read_bytes())
+
+        assert [s['pid'] for s in sessions] == [101, 102]
+        alice = sessions[0]
+        assert alice['user'] == 'alice'
+        assert alice['client_addr'] == '10.0.0.1'
+        assert alice['command'] == 'RETR'
+        assert alice['file'] == '/data/test/big.iso'
+        assert alice['xfer_done'] == 1048576
+
+    def test_file_only_for_transfers(self, scoreboard_file):
+        """Test that non-transfer arguments are not reported as files"""
+        sessions = parse_scoreboard(scoreboard_file.read_bytes())
+
+        assert sessions[1]['argument'] == '-la'
+        assert sessions[1]['file'] == ''
+
+    def test_bad_magic(self):
+        """Test a wrong magic number is rejected"""
+        with pytest.raises(ScoreboardError):
+            parse_scoreboard(make_scoreboard(magic=0x12345678))
+
+    def test_bad_version(self):
+        """Test an unknown layout version is rejected"""
+        with pytest.raises(ScoreboardError):
+            parse_scoreboard(make_scoreboard(version=0x01020000))
+
+    def test_truncated(self):
+        """Test a truncated header is rejected"""
+        with pytest.raises(ScoreboardError):
+            parse_scoreboard(b'\0' * 4)
+
+    def test_partial_trailing_entry_ignored(self):
+        """Test a partially written last record is ignored"""
+        data = make_scoreboard(make_entry(pid=5, user='carol')) + make_entry(pid=6)[:100]
+
+        assert [s['pid'] for s in parse_scoreboard(data)] == [5]
+
+
+class TestScoreboardReader:
+    """Tests for the cached ScoreboardReader"""
+
+    def test_reads_file(self, scoreboard_file):
+        """Test the reader memory-maps and parses the file"""
+        reader = ScoreboardReader(str(scoreboard_file))
+
+        assert len(reader.sessions()) == 2
+
+    def test_cached_until_changed(self, scoreboard_file):
+        """Test that an unchanged file is not parsed again"""
+        reader = ScoreboardReader(str(scoreboard_file))
+        first = reader.sessions()
+
+        assert reader.sessions() is first
+
+        scoreboard_file.write_bytes(make_scoreboard(make_entry(pid=7, user='dave')))
+        stat = os.stat(scoreboard_file)
+        os.utime(scoreboard_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+        assert [s['user'] for s in reader.sessions()] == ['dave']
+
+    def test_missing_file(self, tmp_path):
+        """Test a missing scoreboard raises FileNotFoundError"""
+        with pytest.raises(FileNotFoundError):
+            ScoreboardReader(str(tmp_path / 'missing')).sessions()
+
+    def test_empty_file(self, tmp_path):
+        """Test an empty scoreboard raises ScoreboardError"""
+        path = tmp_path / 'empty'
+        path.write_bytes(b'')
+        with pytest.raises(ScoreboardError):
+            ScoreboardReader(str(path)).sessions()
+
+
+class TestActiveSessionsView:
+    """Tests for the sessions API and dashboard"""
+
+    def test_active_sessions_requires_login(self, client, db):
+        """Test that the sessions API requires authentication"""
+        response = client.get(reverse('active_sessions'))
+        assert response.status_code == 302
+
+    def test_active_sessions(self, authenticated_client, scoreboard_file, settings):
+        """Test the sessions API returns decoded sessions"""
+        settings.PROFTPD_SCOREBOARD_FILE = str(scoreboard_file)
+
+        response = authenticated_client.get(reverse('active_sessions'))
+        data = json.loads(response.content)
+
+        assert data['count'] == 2
+        assert data['sessions'][0]['user'] == 'alice'
+        assert data['sessions'][0]['bytes_transferred'] == 1048576
+        assert 'error' not in data
+
+    def test_active_sessions_missing_file(self, authenticated_client, tmp_path, settings):
+        """Test a missing scoreboard is reported as an error"""
+        settings.PROFTPD_SCOREBOARD_FILE = str(tmp_path / 'missing')
+
+        data = json.loads(authenticated_client.get(reverse('active_sessions')).content)
+
+        assert data['count'] == 0
+        assert 'not found' in data['error']
+
+    def test_dashboard_sessions(self, authenticated_client, scoreboard_file, settings):
+        """Test the dashboard lists connected sessions"""
+        settings.PROFTPD_SCOREBOARD_FILE = str(scoreboard_file)
+
+        response = authenticated_client.get(reverse('dashboard'))
+
+        assert len(response.context['sessions']) == 2
+        assert response.context['sessions_error'] is None
@@ -0,0 +1,202 @@
+import json
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ftpmanager.config_generator import generate_ftpusers_file, generate_proftpd_config
+from ftpmanager.models import FTPNode, FTPUser, FolderAccess
+from ftpmanager.sharding import HashRing, assign_users, load_report, moved_users, users_of
+
+
+@pytest.fixture
+def nodes(db):
+    return [FTPNode.objects.create(name=name) for name in ('node1', 'node2', 'node3')]
+
+
+@pytest.fixture
+def many_users(db):
+    FTPUser.objects.bulk_create([FTPUser(username=f'user{i:04d}', systemuser='1001') for i in range(600)])
+
+
+def user_with_access(username, folder, node=None):
+    user = FTPUser.objects.create(username=username, systemuser='1001', node=node)
+    user.set_password('secret123')
+    user.save()
+    FolderAccess.objects.create(user=user, folder=folder, permission='read')
+    return user
+
+
+class TestHashRing:
+    """Tests for the consistent hash ring"""
+
+    def test_distribution(self):
+        """Test keys spread roughly evenly and by weight"""
+        ring = HashRing({'a': 1, 'b': 1, 'c': 2})
+        counts = {'a': 0, 'b': 0, 'c': 0}
+        for i in range(8000):
+            counts[ring.node_for(f'user{i}')] += 1
+
+        assert 1500 < counts['a'] < 2500
+        assert 1500 < counts['b'] < 2500
+        assert 3300 < counts['c'] < 4700
+
+    def test_empty(self):
+        """Test an empty ring assigns nothing"""
+        assert HashRing({}).node_for('alice') is None
+
+
+class TestAssignment:
+    """Tests for assigning users to nodes"""
+
+    def test_adding_node_moves_only_to_it(self, nodes, many_users):
+        """Test adding a node moves about its share of users, all onto the new node"""
+        before, _pinned = assign_users()
+        after, _pinned = assign_users({'node1': 1, 'node2': 1, 'node3': 1, 'node4': 1})
+
+        moved = moved_users(before, after)
+
+        assert 90 < len(moved) < 220
+        assert all(after[username] == 'node4' for username in moved)
+
+    def test_removing_node_moves_only_its_users(self, nodes, many_users):
+        """Test removing a node moves only the users it had"""
+        before, _pinned = assign_users()
+        after, _pinned = assign_users({'node1': 1, 'node2': 1})
+
+        assert set(moved_users(before, after)) == users_of(before, 'node3')
+
+    def test_pinned(self, nodes, many_users):
+        """Test a pinned user stays on its node and falls back to hashing when it is inactive"""
+        FTPUser.objects.filter(username='user0001').update(node=nodes[2])
+
+        assignment, pinned = assign_users()
+        nodes[2].is_active = False
+        nodes[2].save()
+        without, _pinned = assign_users()
+
+        assert assignment['user0001'] == 'node3'
+        assert pinned == {'user0001'}
+        assert without['user0001'] in ('node1', 'node2')
+
+    def test_inactive_users_skipped(self, nodes, ftp_user, inactive_ftp_user):
+        """Test only active users are assigned"""
+        assignment, _pinned = assign_users()
+
+        assert set(assignment) == {'ftpuser1'}
+
+    def test_load_report(self, nodes, many_users):
+        """Test the report counts users and pinned users per node"""
+        FTPUser.objects.filter(username='user0001').update(node=nodes[0])
+        assignment, pinned = assign_users()
+
+        report = load_report(assignment, pinned, {'node1': 1, 'node2': 1, 'node3': 1})
+
+        assert [row['node'] for row in report] == ['node1', 'node2', 'node3']
+        assert sum(row['users'] for row in report) == 600
+        assert report[0]['pinned'] == 1
+        assert all(abs(row['share'] - row['expected']) < 0.1 for row in report)
+
+
+class TestNodeConfig:
+    """Tests for per-node generated files"""
+
+    def test_only_node_users(self, nodes, folder, folder2):
+        """Test a node's files hold only its users and other nodes' folders stay denied"""
+        user_with_access('alice', folder, node=nodes[0])
+        user_with_access('bob', folder2, node=nodes[1])
+
+        config = generate_proftpd_config(usernames={'alice'})
+        passwd = generate_ftpusers_file(usernames={'alice'})
+
+        assert 'AllowUser alice' in config
+        assert 'bob' not in config
+        assert [line.split(':')[0] for line in passwd.splitlines() if not line.startswith('#')] == ['alice']
+        assert f'<Directory {folder2.path}>' in config
+
+    def test_ifuser_mode(self, nodes, folder, folder2):
+        """Test <IfUser> sections are only generated for the node's users"""
+        user_with_access('alice', folder, node=nodes[0])
+        user_with_access('bob', folder2, node=nodes[1])
+
+        config = generate_proftpd_config(acl_mode='ifuser', usernames={'bob'})
+
+        assert 'bob' in config
+        assert 'alice' not in config
+
+
+class TestShardUsersCommand:
+    """Tests for the shard_users command"""
+
+    def test_report(self, nodes, many_users):
+        """Test the load report lists every node"""
+        out = StringIO()
+
+        call_command('shard_users', stdout=out)
+
+        assert [line.split()[0] for line in out.getvalue().splitlines()[1:]] == ['node1', 'node2', 'node3']
+
+    def test_add_node(self, nodes, many_users):
+        """Test --add-node reports the users that would move"""
+        out = StringIO()
+
+        call_command('shard_users', '--add-node', 'node4:2', stdout=out)
+
+        first, *rows = out.getvalue().splitlines()
+        assert 'users would move' in first
+        assert rows[-1].split()[:2] == ['node4', '2']
+
+    def test_output_dir(self, tmp_path, nodes, folder, folder2):
+        """Test --output-dir writes each node's files"""
+        user_with_access('alice', folder, node=nodes[0])
+        user_with_access('bob', folder2, node=nodes[1])
+
+        call_command('shard_users', '--output-dir', str(tmp_path), stdout=StringIO())
+
+        assert 'alice:' in (tmp_path / 'node1' / 'ftpd.passwd').read_text()
+        assert 'bob' not in (tmp_path / 'node1' / 'conf.d' / 'users.conf').read_text()
+        assert 'bob:' in (tmp_path / 'node2' / 'ftpd.passwd').read_text()
+
+    def test_output_dir_lint_errors(self, tmp_path, nodes, folder, folder2):
+        """Test no node files are written when any node's files fail validation"""
+        user_with_access('alice', folder, node=nodes[0])
+        user = user_with_access('bob', folder2, node=nodes[1])
+        user.username = 'bad:name'
+        user.save()
+
+        with pytest.raises(CommandError, match='node2 failed validation'):
+            call_command('shard_users', '--output-dir', str(tmp_path), stdout=StringIO())
+        assert not any(tmp_path.iterdir())
+
+        call_command('shard_users', '--output-dir', str(tmp_path), '--skip-lint', stdout=StringIO())
+        assert 'bad:name' in (tmp_path / 'node2' / 'ftpd.passwd').read_text()
+
+    def test_no_nodes(self, db):
+        """Test the command needs at least one node"""
+        with pytest.raises(CommandError, match='No active FTP nodes'):
+            call_command('shard_users')
+
+    def test_deploy_node_targets(self, tmp_path, nodes, folder, folder2):
+        """Test deploy_config targets with a node get only that node's users"""
+        user_with_access('alice', folder, node=nodes[0])
+        user_with_access('bob', folder2, node=nodes[1])
+        targets_file = tmp_path / 'targets.json'
+        targets_file.write_text(json.dumps([
+            {'name': 'a', 'config_dir': str(tmp_path / 'a'), 'node': 'node1'},
+            {'name': 'b', 'config_dir': str(tmp_path / 'b'), 'node': 'node2'},
+        ]))
+
+        call_command('deploy_config', '--targets-file', str(targets_file), stdout=StringIO())
+
+        assert 'bob:' not in (tmp_path / 'a' / 'ftpd.passwd').read_text()
+        assert 'alice:' not in (tmp_path / 'b' / 'ftpd.passwd').read_text()
+
+    def test_deploy_unknown_node(self, tmp_path, nodes, ftp_user):
+        """Test targets naming an unknown node are rejected"""
+        targets_file = tmp_path / 'targets.json'
+        targets_file.write_text(json.dumps([{'name': 'a', 'config_dir': str(tmp_path / 'a'), 'node': 'nope'}]))
+
+        with pytest.raises(CommandError, match='unknown or inactive node'):
+            call_command('deploy_config', '--targets-file', str(targets_file), stdout=StringIO())
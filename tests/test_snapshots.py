@@ -0,0 +1,111 @@
+import json
+import os
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ftpmanager.models import FTPUser
+from ftpmanager.snapshots import SnapshotError, SnapshotStore
+
+
+def object_count(store):
+    return sum(len(files) for _root, _dirs, files in os.walk(os.path.join(store.root, 'objects')))
+
+
+class TestSnapshotStore:
+    """Tests for SnapshotStore class"""
+
+    def test_record_deduplicates(self, tmp_path):
+        """Test identical contents are stored once and an unchanged set is not recorded again"""
+        store = SnapshotStore(str(tmp_path / 'snapshots'))
+
+        first = store.record({'a.conf': ('same', 0o644), 'b.conf': ('one', 0o644)}, acl_revision='x')
+        second = store.record({'a.conf': ('same', 0o644), 'b.conf': ('two', 0o644)})
+        again = store.record({'a.conf': ('same', 0o644), 'b.conf': ('two', 0o644)})
+
+        assert (first['rev'], second['rev'], again['rev']) == (1, 2, 2)
+        assert object_count(store) == 3
+        assert [r['acl_revision'] for r in store.revisions()] == ['x', None]
+
+    def test_restore(self, tmp_path):
+        """Test a revision is written back with its modes"""
+        store = SnapshotStore(str(tmp_path / 'snapshots'))
+        store.record({'conf.d/users.conf': ('config', 0o644), 'ftpd.passwd': ('users', 0o600)})
+        target = tmp_path / 'etc'
+
+        assert store.restore(1, str(target)) == ['conf.d/users.conf', 'ftpd.passwd']
+
+        assert (target / 'conf.d' / 'users.conf').read_text() == 'config'
+        assert (target / 'ftpd.passwd').stat().st_mode & 0o777 == 0o600
+
+    def test_corrupt_object_restores_nothing(self, tmp_path):
+        """Test a damaged object aborts the restore before any file is replaced"""
+        store = SnapshotStore(str(tmp_path / 'snapshots'))
+        revision = store.record({'a.conf': ('old a', 0o644), 'b.conf': ('old b', 0o644)})
+        with open(store.object_path(revision['files']['b.conf']['sha256']), 'w') as f:
+            f.write('tampered')
+        (tmp_path / 'a.conf').write_text('current a')
+
+        with pytest.raises(SnapshotError, match='corrupt'):
+            store.restore(1, str(tmp_path))
+
+        assert (tmp_path / 'a.conf').read_text() == 'current a'
+        assert not [name for name in os.listdir(tmp_path) if name.startswith('.tmp-')]
+
+    def test_unknown_revision(self, tmp_path):
+        """Test unknown revisions raise SnapshotError"""
+        with pytest.raises(SnapshotError):
+            SnapshotStore(str(tmp_path)).get(3)
+
+
+class TestDeployRollback:
+    """Tests for snapshots in deploy_config"""
+
+    def test_deploy_and_rollback(self, tmp_path, ftp_user):
+        """Test deploys are recorded and --rollback restores an earlier set"""
+        call_command('deploy_config', '--config-dir', str(tmp_path), stdout=StringIO())
+        first_passwd = (tmp_path / 'ftpd.passwd').read_text()
+        newbie = FTPUser(username='newbie', systemuser='1001')
+        newbie.set_password('secret123')
+        newbie.save()
+        call_command('deploy_config', '--config-dir', str(tmp_path), stdout=StringIO())
+        assert 'newbie' in (tmp_path / 'ftpd.passwd').read_text()
+        out = StringIO()
+
+        call_command('deploy_config', '--config-dir', str(tmp_path), '--rollback', '1', stdout=out)
+
+        assert (tmp_path / 'ftpd.passwd').read_text() == first_passwd
+        assert 'Restoring' in out.getvalue()
+        assert FTPUser.objects.filter(username='newbie').exists()
+        index = json.loads((tmp_path / 'snapshots' / 'index.json').read_text())
+        assert [(r['rev'], r.get('rollback_of')) for r in index['revisions']] == [(1, None), (2, None), (3, 1)]
+
+    def test_unchanged_deploy_not_recorded(self, tmp_path, ftp_user):
+        """Test deploying the same files twice keeps one revision"""
+        call_command('deploy_config', '--config-dir', str(tmp_path), stdout=StringIO())
+        call_command('deploy_config', '--config-dir', str(tmp_path), stdout=StringIO())
+        out = StringIO()
+
+        call_command('deploy_config', '--config-dir', str(tmp_path), '--list-snapshots', stdout=out)
+
+        assert out.getvalue().startswith('1\t')
+        assert len(out.getvalue().splitlines()) == 1
+
+    def test_rollback_dry_run(self, tmp_path, ftp_user):
+        """Test --dry-run --rollback only reports what would be restored"""
+        call_command('deploy_config', '--config-dir', str(tmp_path), stdout=StringIO())
+        (tmp_path / 'ftpd.passwd').write_text('edited')
+        out = StringIO()
+
+        call_command('deploy_config', '--config-dir', str(tmp_path), '--rollback', '1', '--dry-run', stdout=out)
+
+        assert 'Would restore' in out.getvalue()
+        assert (tmp_path / 'ftpd.passwd').read_text() == 'edited'
+
+    def test_unknown_revision(self, tmp_path, db):
+        """Test rolling back to an unknown revision fails"""
+        with pytest.raises(CommandError, match='Unknown snapshot revision 7'):
+            call_command('deploy_config', '--config-dir', str(tmp_path), '--rollback', '7')
@@ -0,0 +1,160 @@
+import sqlite3
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ftpmanager.models import FTPGroup, FTPUser, FolderAccess
+from ftpmanager.config_generator import generate_proftpd_config, generate_sql_auth_config
+from ftpmanager.sql_backend import build_sql_rows, group_name_conflicts, sync_sqlite_database, has_changes
+
+
+def fetch_users(db_path):
+    connection = sqlite3.connect(db_path)
+    try:
+        return {row[0]: row[1:] for row in connection.execute('SELECT * FROM users')}
+    finally:
+        connection.close()
+
+
+class TestBuildSqlRows:
+    """Tests for build_sql_rows function"""
+
+    def test_active_users_only(self, db, ftp_user, inactive_ftp_user):
+        """Test that only active users get rows"""
+        users, groups = build_sql_rows()
+
+        assert list(users) == ['ftpuser1']
+        assert users['ftpuser1'][0] == ftp_user.password_hash
+        assert users['ftpuser1'][1:3] == (1001, 1001)
+
+    def test_group_members(self, db, ftp_user):
+        """Test users sharing a system user are grouped"""
+        FTPUser.objects.create(username='ftpuser2', systemuser='1001')
+
+        users, groups = build_sql_rows()
+
+        assert groups == {'gid1001': (1001, 'ftpuser1,ftpuser2')}
+
+    def test_group_named_like_primary_group(self, db, ftp_user):
+        """Test an FTP group named like a primary group is merged with the same gid and reported otherwise"""
+        other = FTPUser.objects.create(username='ftpuser2', systemuser='1002')
+        group = FTPGroup.objects.create(name='gid1001', gid=1001)
+        group.members.add(other)
+
+        assert build_sql_rows()[1]['gid1001'] == (1001, 'ftpuser1,ftpuser2')
+        assert group_name_conflicts() == []
+
+        FTPGroup.objects.filter(pk=group.pk).update(gid=3000)
+
+        assert 'gid1001 (gid 3000)' in group_name_conflicts()[0]
+
+
+class TestSyncSqliteDatabase:
+    """Tests for sync_sqlite_database function"""
+
+    def test_initial_sync_creates_rows(self, db, ftp_user, tmp_path):
+        """Test first sync creates schema and inserts all users"""
+        db_path = str(tmp_path / 'ftpd.sqlite3')
+
+        result = sync_sqlite_database(db_path)
+
+        assert result['users'] == {'added': 1, 'updated': 0, 'removed': 0}
+        assert fetch_users(db_path)['ftpuser1'][3] == '/tmp'
+
+    def test_second_sync_is_noop(self, db, ftp_user, tmp_path):
+        """Test that syncing unchanged data writes nothing"""
+        db_path = str(tmp_path / 'ftpd.sqlite3')
+        sync_sqlite_database(db_path)
+
+        result = sync_sqlite_database(db_path)
+
+        assert not has_changes(result)
+
+    def test_changed_user_updated(self, db, ftp_user, folder, tmp_path):
+        """Test that only the changed row is updated"""
+        db_path = str(tmp_path / 'ftpd.sqlite3')
+        sync_sqlite_database(db_path)
+        FolderAccess.objects.create(user=ftp_user, folder=folder, permission='read')
+
+        result = sync_sqlite_database(db_path)
+
+        assert result['users'] == {'added': 0, 'updated': 1, 'removed': 0}
+        assert fetch_users(db_path)['ftpuser1'][3] == folder.path
+
+    def test_deactivated_user_removed(self, db, ftp_user, tmp_path):
+        """Test that deactivated users are deleted from the database"""
+        db_path = str(tmp_path / 'ftpd.sqlite3')
+        sync_sqlite_database(db_path)
+        ftp_user.is_active = False
+        ftp_user.save()
+
+        result = sync_sqlite_database(db_path)
+
+        assert result['users']['removed'] == 1
+        assert result['groups']['removed'] == 1
+        assert fetch_users(db_path) == {}
+
+    def test_dry_run_does_not_write(self, db, ftp_user, tmp_path):
+        """Test dry run reports changes without creating the database"""
+        db_path = tmp_path / 'ftpd.sqlite3'
+
+        result = sync_sqlite_database(str(db_path), dry_run=True)
+
+        assert result['users']['added'] == 1
+        assert not db_path.exists()
+
+    def test_dry_run_leaves_existing_database_alone(self, db, ftp_user, tmp_path):
+        """Test a dry run does not create missing tables in an existing database"""
+        db_path = tmp_path / 'ftpd.sqlite3'
+        connection = sqlite3.connect(db_path)
+        connection.execute('CREATE TABLE users (userid TEXT PRIMARY KEY, passwd TEXT, uid INTEGER, gid INTEGER, homedir TEXT, shell TEXT)')
+        connection.commit()
+        connection.close()
+        before = db_path.read_bytes()
+
+        result = sync_sqlite_database(str(db_path), dry_run=True)
+
+        assert result['users']['added'] == 1
+        assert db_path.read_bytes() == before
+
+
+class TestSqlAuthConfig:
+    """Tests for the mod_sql config snippet"""
+
+    def test_snippet_directives(self):
+        """Test snippet points mod_sql at the database"""
+        config = generate_sql_auth_config('/srv/ftpd.sqlite3')
+
+        assert 'SQLBackend sqlite3' in config
+        assert 'SQLConnectInfo /srv/ftpd.sqlite3' in config
+        assert 'SQLUserInfo users userid passwd uid gid homedir shell' in config
+
+    def test_sql_backend_replaces_auth_user_file(self, db):
+        """Test sql backend config has no AuthUserFile"""
+        config = generate_proftpd_config(auth_backend='sql')
+
+        assert 'AuthUserFile' not in config
+        assert 'AuthOrder mod_sql.c' in config
+
+
+class TestDeployConfigSqlBackend:
+    """Tests for deploy_config --auth-backend sql"""
+
+    def test_deploy_syncs_database(self, db, ftp_user, tmp_path):
+        """Test deploy writes users.conf and the database, but no passwd file"""
+        call_command('deploy_config', '--config-dir', str(tmp_path), '--auth-backend', 'sql')
+
+        assert (tmp_path / 'conf.d' / 'users.conf').exists()
+        assert not (tmp_path / 'ftpd.passwd').exists()
+        assert 'ftpuser1' in fetch_users(str(tmp_path / 'ftpd.sqlite3'))
+
+    def test_group_name_conflict_aborts(self, db, ftp_user, tmp_path):
+        """Test a group that would replace a primary group fails validation before writing"""
+        FTPGroup.objects.create(name='gid1001', gid=3000)
+
+        with pytest.raises(CommandError, match='failed validation'):
+            call_command('deploy_config', '--config-dir', str(tmp_path), '--auth-backend', 'sql')
+
+        assert list(tmp_path.iterdir()) == []
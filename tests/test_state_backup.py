@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import json
+from io import StringIO
+
+import pytest
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ftpmanager.models import (
+    AclRevision, FTPGroup, FTPNode, FTPUser, Folder, FolderAccess, GroupFolderAccess, ServerTuning, UserProfile,
+)
+from ftpmanager.state_backup import StateBackupError, export_state, import_state, state_tables, verify_backup
+
+
+@pytest.fixture
+def state(django_user, folder, folder2, folder_access_read, folder_access_write):
+    """Rows in every exported table"""
+    node = FTPNode.objects.create(name='node1', weight=2)
+    FTPUser.objects.filter(pk=folder_access_read.user_id).update(node=node)
+    group = FTPGroup.objects.create(name='staff', gid=2000)
+    group.members.add(folder_access_read.user)
+    GroupFolderAccess.objects.create(group=group, folder=folder, permission='write')
+    Folder.objects.create(name='Sub', path='/data/test/sub')
+    tuning = ServerTuning.load()
+    tuning.max_instances = 50
+    tuning.save()
+
+
+def dump():
+    """Every exported row as comparable values"""
+    return {
+        name: list(model.objects.order_by('pk').values_list(*[field.attname for field in model._meta.concrete_fields]))
+        for name, model in state_tables()
+    }
+
+
+def clear():
+    FTPGroup.objects.all().delete()
+    FTPUser.objects.all().delete()
+    Folder.objects.all().delete()
+    FTPNode.objects.all().delete()
+    User.objects.all().delete()
+    ServerTuning.objects.all().delete()
+
+
+@pytest.mark.django_db
+class TestStateBackup:
+    """Tests for export_state and import_state"""
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_round_trip(self, tmp_path, state, compress):
+        """Test a restore into empty tables reproduces every row"""
+        before = dump()
+        manifest = export_state(str(tmp_path), compress=compress)
+        clear()
+
+        counts = import_state(str(tmp_path))
+
+        assert dump() == before
+        assert counts['folder'] == 3
+        assert manifest['tables']['ftp_group_members']['rows'] == 1
+        assert Folder.objects.get(path='/data/test/sub').parent.path == '/data/test'
+        assert FTPUser.objects.get(username='ftpuser1').node.name == 'node1'
+
+    def test_new_rows_after_restore(self, tmp_path, state):
+        """Test rows created after a restore get fresh primary keys"""
+        export_state(str(tmp_path))
+        clear()
+        import_state(str(tmp_path))
+
+        folder = Folder.objects.create(name='New', path='/data/new')
+
+        assert folder.pk > max(Folder.objects.exclude(pk=folder.pk).values_list('pk', flat=True))
+
+    def test_compressed_files(self, tmp_path, state):
+        """Test --compress writes gzip JSONL with one object per line"""
+        export_state(str(tmp_path), compress=True)
+
+        with gzip.open(tmp_path / 'ftp_user.jsonl.gz', 'rt') as f:
+            rows = [json.loads(line) for line in f]
+
+        assert [row['username'] for row in rows] == ['ftpuser1']
+        assert 'password_hash' in rows[0]
+
+    def test_not_empty(self, tmp_path, state):
+        """Test restoring over existing rows is refused"""
+        export_state(str(tmp_path))
+
+        with pytest.raises(StateBackupError, match='not empty'):
+            import_state(str(tmp_path))
+
+    def test_corrupt_file_rolls_back(self, tmp_path, state):
+        """Test a file that does not match its checksum restores nothing"""
+        export_state(str(tmp_path))
+        path = tmp_path / 'folder_access.jsonl'
+        path.write_text(path.read_text().replace('"read"', '"write"'))
+        clear()
+
+        with pytest.raises(StateBackupError, match='checksum'):
+            import_state(str(tmp_path))
+
+        assert not FTPUser.objects.exists()
+        assert not User.objects.exists()
+
+    def test_verify(self, tmp_path, state):
+        """Test verify_backup checks files and row counts"""
+        export_state(str(tmp_path))
+        verify_backup(str(tmp_path))
+        manifest = json.loads((tmp_path / 'manifest.json').read_text())
+        manifest['tables']['folder']['rows'] = 7
+        (tmp_path / 'manifest.json').write_text(json.dumps(manifest))
+
+        with pytest.raises(StateBackupError, match='manifest says 7'):
+            verify_backup(str(tmp_path))
+
+    def test_unknown_field(self, tmp_path, state):
+        """Test rows with fields this version does not know are rejected"""
+        export_state(str(tmp_path))
+        path = tmp_path / 'ftp_node.jsonl'
+        path.write_text(path.read_text().replace('"weight"', '"capacity"'))
+        manifest = json.loads((tmp_path / 'manifest.json').read_text())
+        manifest['tables']['ftp_node']['sha256'] = hashlib.sha256(path.read_bytes()).hexdigest()
+        (tmp_path / 'manifest.json').write_text(json.dumps(manifest))
+        clear()
+
+        with pytest.raises(StateBackupError, match='capacity'):
+            import_state(str(tmp_path))
+
+
+@pytest.mark.django_db
+class TestStateCommands:
+    """Tests for the export_state and import_state commands"""
+
+    def test_commands(self, tmp_path, state):
+        """Test exporting and restoring through the commands"""
+        out = StringIO()
+        call_command('export_state', str(tmp_path), '--compress', stdout=out)
+        clear()
+
+        call_command('import_state', str(tmp_path), '--verify', stdout=out)
+        call_command('import_state', str(tmp_path), stdout=out)
+
+        assert 'is intact' in out.getvalue()
+        assert 'Restored' in out.getvalue()
+        assert UserProfile.objects.count() == 1
+        assert FolderAccess.objects.count() == 2
+        assert AclRevision.current_token() is not None
+
+    def test_missing_backup(self, tmp_path, db):
+        """Test a directory without a manifest is reported"""
+        with pytest.raises(CommandError, match='No manifest.json'):
+            call_command('import_state', str(tmp_path))
@@ -0,0 +1,141 @@
+from io import StringIO
+
+import pytest
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.urls import reverse
+
+from ftpmanager.config_generator import generate_tuning_config
+from ftpmanager.models import ServerTuning, TUNING_PRESETS
+
+
+class TestServerTuning:
+    """Tests for the ServerTuning model"""
+
+    def test_singleton(self, db):
+        """Test that saving always uses the same row"""
+        ServerTuning(max_instances=50).save()
+        ServerTuning(max_instances=60).save()
+
+        assert ServerTuning.objects.count() == 1
+        assert ServerTuning.load().max_instances == 60
+
+    def test_current_does_not_create(self, db):
+        """Test current() returns defaults without writing a row"""
+        assert ServerTuning.current().max_instances == 30
+        assert not ServerTuning.objects.exists()
+
+    def test_apply_preset(self, db):
+        """Test a preset sets all values and is recognised on save"""
+        tuning = ServerTuning.load()
+        tuning.apply_preset('busy_ingest')
+        tuning.save()
+
+        assert tuning.preset == 'busy_ingest'
+        assert tuning.socket_rcvbuf == TUNING_PRESETS['busy_ingest']['socket_rcvbuf']
+
+    def test_edit_makes_custom(self, db):
+        """Test changing a preset value switches to custom"""
+        tuning = ServerTuning.load()
+        tuning.apply_preset('small_nas')
+        tuning.timeout_idle += 1
+        tuning.save()
+
+        assert tuning.preset == 'custom'
+
+    def test_clients_per_host_above_instances(self, db):
+        """Test MaxClientsPerHost cannot exceed MaxInstances"""
+        tuning = ServerTuning(max_instances=5, max_clients_per_host=10)
+
+        with pytest.raises(ValidationError) as excinfo:
+            tuning.full_clean()
+        assert 'max_clients_per_host' in excinfo.value.message_dict
+
+    def test_socket_buffer_range(self, db):
+        """Test socket buffers outside the allowed range are rejected"""
+        with pytest.raises(ValidationError):
+            ServerTuning(socket_rcvbuf=1024).full_clean()
+
+    def test_relative_scoreboard_rejected(self, db):
+        """Test the scoreboard path must be absolute"""
+        with pytest.raises(ValidationError):
+            ServerTuning(scoreboard_file='proftpd.scoreboard').full_clean()
+
+
+class TestGenerateTuningConfig:
+    """Tests for generate_tuning_config function"""
+
+    def test_defaults(self, db, settings):
+        """Test the defaults match the former contrib/proftpd.conf values"""
+        settings.PROFTPD_SCOREBOARD_FILE = '/run/proftpd.scoreboard'
+
+        config = generate_tuning_config()
+
+        assert 'MaxInstances 30\n' in config
+        assert 'MaxClientsPerHost 8\n' in config
+        assert 'TimeoutIdle 600\n' in config
+        assert 'UseSendfile on\n' in config
+        assert 'SocketOptions' not in config
+        assert 'ScoreboardFile /run/proftpd.scoreboard\n' in config
+
+    def test_socket_options(self, db):
+        """Test socket buffer sizes are emitted on one SocketOptions line"""
+        tuning = ServerTuning(socket_rcvbuf=65536, socket_sndbuf=131072, use_sendfile=False)
+
+        config = generate_tuning_config(tuning)
+
+        assert 'SocketOptions rcvbuf 65536 sndbuf 131072\n' in config
+        assert 'UseSendfile off\n' in config
+
+
+class TestDeployTuning:
+    """Tests for deploying 00-tuning.conf"""
+
+    def test_writes_tuning_file(self, db, tmp_path):
+        """Test deploy writes the tuning file and skips it when unchanged"""
+        call_command('deploy_config', '--config-dir', str(tmp_path))
+        tuning_path = tmp_path / 'conf.d' / '00-tuning.conf'
+        assert tuning_path.read_text() == generate_tuning_config()
+
+        out = StringIO()
+        call_command('deploy_config', '--config-dir', str(tmp_path), stdout=out)
+
+        assert f'Tuning unchanged: {tuning_path}' in out.getvalue()
+        assert 'No changes detected.' in out.getvalue()
+
+
+class TestServerTuningView:
+    """Tests for the server tuning page"""
+
+    def test_requires_login(self, client, db):
+        """Test that the page requires authentication"""
+        assert client.get(reverse('server_tuning')).status_code == 302
+
+    def test_get(self, authenticated_client):
+        """Test the page shows the form and a config preview"""
+        response = authenticated_client.get(reverse('server_tuning'))
+
+        assert response.status_code == 200
+        assert 'MaxInstances 30' in response.context['preview']
+
+    def test_apply_preset(self, authenticated_client):
+        """Test posting a preset applies it"""
+        response = authenticated_client.post(reverse('server_tuning'), {'preset': 'many_idle'})
+
+        assert response.status_code == 302
+        assert ServerTuning.load().max_instances == TUNING_PRESETS['many_idle']['max_instances']
+
+    def test_invalid_values_rejected(self, authenticated_client):
+        """Test model validation errors are shown on the form"""
+        response = authenticated_client.post(reverse('server_tuning'), {
+            'max_instances': 5,
+            'max_clients_per_host': 10,
+            'timeout_login': 300,
+            'timeout_idle': 600,
+            'timeout_no_transfer': 900,
+            'timeout_stalled': 300,
+        })
+
+        assert response.status_code == 200
+        assert 'max_clients_per_host' in response.context['form'].errors
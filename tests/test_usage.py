@@ -0,0 +1,129 @@
+import os
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from ftpmanager.models import Folder, FolderUsage
+from ftpmanager.usage import Throttle, scan_folders, scan_tree
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Create a small directory tree: 3 files, 60 bytes"""
+    root = tmp_path / 'pool'
+    (root / 'a' / 'b').mkdir(parents=True)
+    (root / 'top.txt').write_bytes(b'x' * 10)
+    (root / 'a' / 'one.txt').write_bytes(b'x' * 20)
+    (root / 'a' / 'b' / 'two.txt').write_bytes(b'x' * 30)
+    return root
+
+
+class TestScanTree:
+    """Tests for scan_tree function"""
+
+    def test_totals(self, tree):
+        """Test bytes and files are summed over the whole tree"""
+        total_bytes, total_files, cache = scan_tree(str(tree))
+
+        assert (total_bytes, total_files) == (60, 3)
+        assert set(cache) == {'', 'a', os.path.join('a', 'b')}
+
+    def test_unchanged_directories_not_listed(self, tree, monkeypatch):
+        """Test a rescan with an unchanged tree does not call scandir"""
+        _bytes, _files, cache = scan_tree(str(tree))
+
+        def fail(path):
+            raise AssertionError(f'scandir called for {path}')
+        monkeypatch.setattr(os, 'scandir', fail)
+
+        assert scan_tree(str(tree), cache)[:2] == (60, 3)
+
+    def test_changed_directory_rescanned(self, tree):
+        """Test a new file is picked up through its directory mtime"""
+        _bytes, _files, cache = scan_tree(str(tree))
+        (tree / 'a' / 'b' / 'three.txt').write_bytes(b'x' * 5)
+        stat = os.stat(tree / 'a' / 'b')
+        os.utime(tree / 'a' / 'b', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+        assert scan_tree(str(tree), cache)[:2] == (65, 4)
+
+    def test_symlinks_not_followed(self, tree, tmp_path):
+        """Test that symlinked directories are not counted"""
+        outside = tmp_path / 'outside'
+        outside.mkdir()
+        (outside / 'big').write_bytes(b'x' * 1000)
+        os.symlink(outside, tree / 'link')
+
+        assert scan_tree(str(tree))[:2] == (60, 3)
+
+
+class TestThrottle:
+    """Tests for Throttle"""
+
+    def test_unlimited(self):
+        """Test that a zero rate never sleeps"""
+        throttle = Throttle(0)
+        for _ in range(1000):
+            throttle.wait()
+
+
+class TestScanFolders:
+    """Tests for scan_folders function"""
+
+    def test_stores_usage(self, db, tree):
+        """Test results are stored per folder"""
+        folder = Folder.objects.create(name='Pool', path=str(tree))
+
+        scan_folders(workers=2)
+
+        usage = FolderUsage.objects.get(folder=folder)
+        assert (usage.bytes, usage.files, usage.error) == (60, 3, '')
+
+    def test_missing_directory(self, db, tmp_path):
+        """Test a missing folder path is recorded as an error"""
+        folder = Folder.objects.create(name='Gone', path=str(tmp_path / 'gone'))
+
+        scan_folders()
+
+        assert 'not found' in FolderUsage.objects.get(folder=folder).error
+
+    def test_command(self, db, tree):
+        """Test the scan_usage command"""
+        Folder.objects.create(name='Pool', path=str(tree))
+
+        call_command('scan_usage', '--workers', '1')
+
+        assert FolderUsage.objects.get().bytes == 60
+
+    def test_deploy_scan_is_full(self, db, tree, tmp_path):
+        """Test deploy_config --scan-usage notices a file that grew in place"""
+        Folder.objects.create(name='Pool', path=str(tree))
+        scan_folders()
+        stat = os.stat(tree / 'a')
+        with open(tree / 'a' / 'one.txt', 'ab') as f:
+            f.write(b'x' * 40)
+        os.utime(tree / 'a', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        call_command('deploy_config', '--config-dir', str(tmp_path / 'etc'), '--scan-usage', stdout=StringIO())
+
+        assert FolderUsage.objects.get().bytes == 100
+
+
+class TestFolderListUsage:
+    """Tests for usage display in the folder list"""
+
+    def test_sort_by_usage(self, authenticated_client, db):
+        """Test folders are sorted by stored usage, unscanned last"""
+        from django.utils import timezone
+        small = Folder.objects.create(name='Small', path='/small')
+        big = Folder.objects.create(name='Big', path='/big')
+        Folder.objects.create(name='Aaa', path='/unscanned')
+        FolderUsage.objects.create(folder=small, bytes=10, scanned_at=timezone.now())
+        FolderUsage.objects.create(folder=big, bytes=1000, scanned_at=timezone.now())
+
+        response = authenticated_client.get(reverse('folder_list'), {'sort': 'usage'})
+
+        assert [f.name for f in response.context['folders']] == ['Big', 'Small', 'Aaa']
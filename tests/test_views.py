@@ -34,6 +34,17 @@ class TestDashboardView:
         assert response.context['folders_count'] == 1
         assert response.context['access_rules_count'] == 1
 
+    def test_dashboard_traffic(self, authenticated_client, ftp_user, folder):
+        """Test dashboard shows traffic from rollups"""
+        from django.utils import timezone
+        from ftpmanager.models import TrafficRollup
+        TrafficRollup.objects.create(hour=timezone.now(), user=ftp_user, folder=folder, direction='i', bytes=2048, files=1)
+
+        response = authenticated_client.get(reverse('dashboard'))
+
+        assert response.context['traffic_24h'] == {'in': 2048, 'out': 0, 'files': 1}
+        assert response.context['top_folders'][0][0] == folder.name
+
 
 class TestUserListView:
     """Tests for user list view"""
@@ -54,6 +65,26 @@ class TestUserListView:
         assert 'users' in response.context
         assert ftp_user in response.context['users']
 
+    def test_user_list_traffic(self, authenticated_client, ftp_user, folder):
+        """Test user list includes per-user traffic totals"""
+        from django.utils import timezone
+        from ftpmanager.models import TrafficRollup
+        TrafficRollup.objects.create(hour=timezone.now(), user=ftp_user, folder=folder, direction='o', bytes=512, files=2)
+
+        response = authenticated_client.get(reverse('user_list'))
+
+        assert response.context['traffic'][ftp_user.pk] == {'in': 0, 'out': 512, 'files': 2}
+
+    def test_user_list_deny_badge(self, authenticated_client, folder_access_read):
+        """Test a deny rule gets its own badge instead of the read badge"""
+        folder_access_read.permission = 'deny'
+        folder_access_read.save()
+
+        content = authenticated_client.get(reverse('user_list')).content.decode()
+
+        assert 'bi-slash-circle' in content
+        assert 'bi-eye' not in content
+
 
 class TestUserCreateView:
     """Tests for user create view"""
@@ -277,8 +308,8 @@ class TestGenerateConfigView:
         """Test generate config page is displayed"""
         response = authenticated_client.get(reverse('generate_config'))
         assert response.status_code == 200
-        assert 'config' in response.context
-        assert 'ftpusers' in response.context
+        assert 'sections' in response.context
+        assert [f['name'] for f in response.context['files']] == ['users.conf', 'ftpd.passwd', 'ftpd.group']
 
 
 class TestDownloadConfigView:
@@ -473,3 +504,57 @@ class TestListSystemusersView:
         data = json.loads(response.content)
         assert 'error' in data
         assert 'Permission denied' in data['error']
+
+
+class TestAuthFailuresView:
+    """Tests for auth failures API"""
+
+    @pytest.fixture
+    def stats(self, db, ftp_user):
+        from django.utils import timezone
+        from ftpmanager.models import AuthStat
+        now = timezone.now()
+        AuthStat.objects.create(hour=now, username='ftpuser1', user=ftp_user, client_ip='10.0.0.1', failures=2, successes=1)
+        AuthStat.objects.create(hour=now, username='root', client_ip='10.0.0.2', failures=5)
+
+    def test_auth_failures_requires_login(self, client, db):
+        """Test that auth failures API requires authentication"""
+        response = client.get(reverse('auth_failures'))
+        assert response.status_code == 302
+
+    def test_auth_failures_by_ip(self, authenticated_client, stats):
+        """Test top failures grouped by client IP"""
+        response = authenticated_client.get(reverse('auth_failures'), {'by': 'ip'})
+        data = json.loads(response.content)
+
+        assert [row['ip'] for row in data['results']] == ['10.0.0.2', '10.0.0.1']
+
+    def test_auth_failures_by_user(self, authenticated_client, stats):
+        """Test top failures grouped by username, with limit"""
+        response = authenticated_client.get(reverse('auth_failures'), {'by': 'user', 'limit': 1})
+        data = json.loads(response.content)
+
+        assert data['results'] == [{'user': 'root', 'failures': 5, 'successes': 0}]
+
+    def test_auth_failures_invalid_params(self, authenticated_client):
+        """Test invalid parameters return 400"""
+        assert authenticated_client.get(reverse('auth_failures'), {'by': 'x'}).status_code == 400
+        assert authenticated_client.get(reverse('auth_failures'), {'hours': 'x'}).status_code == 400
+
+    def test_auth_failures_out_of_range(self, authenticated_client, stats):
+        """Test limits and windows below one are rejected and huge windows are capped"""
+        assert authenticated_client.get(reverse('auth_failures'), {'limit': -1}).status_code == 400
+        assert authenticated_client.get(reverse('auth_failures'), {'limit': 0}).status_code == 400
+        assert authenticated_client.get(reverse('auth_failures'), {'hours': -5}).status_code == 400
+
+        response = authenticated_client.get(reverse('auth_failures'), {'hours': 10 ** 12})
+
+        assert response.status_code == 200
+        assert len(json.loads(response.content)['results']) == 2
+
+    def test_user_edit_shows_login_stats(self, authenticated_client, ftp_user, stats):
+        """Test user edit page includes the user's login counters"""
+        response = authenticated_client.get(reverse('user_edit', args=[ftp_user.pk]))
+
+        assert response.context['login_totals'] == {'successes': 1, 'failures': 2}
+        assert response.context['login_ips'][0]['client_ip'] == '10.0.0.1'